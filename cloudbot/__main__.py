@@ -1,3 +1,5 @@
+import asyncio
+import json
 import logging
 import os
 import signal
@@ -16,10 +18,23 @@ sys.path.insert(0, str(install_dir))
 os.chdir(str(install_dir))
 
 # import bot
+from cloudbot import shard
 from cloudbot.bot import CloudBot
 from cloudbot.util import async_util
 
 
+def load_sharding_config():
+    """
+    Read just enough of the config to decide whether to start the shard supervisor,
+    CloudBot itself handles a missing or broken config file
+    """
+    try:
+        with open("config.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
 def main():
     # Logging optimizations, doing it here because we only want to change this if we're the main file
     logging._srcfile = None
@@ -27,10 +42,16 @@ def main():
     logging.logProcesses = 0
 
     logger = logging.getLogger("cloudbot")
-    logger.info("Starting CloudBot.")
 
-    # create the bot
-    _bot = CloudBot()
+    is_worker = shard.ENV_ADDR in os.environ
+    config = load_sharding_config()
+    if shard.is_supervisor(config):
+        logger.info("Starting CloudBot shard supervisor.")
+        _bot = shard.Supervisor(config, asyncio.get_event_loop(), sys.argv[1:])
+    else:
+        logger.info("Starting CloudBot.")
+        # create the bot
+        _bot = CloudBot()
 
     # whether we are killed while restarting
     stopped_while_restarting = False
@@ -55,7 +76,11 @@ def main():
         # restore the original handler so if they do it again it triggers
         signal.signal(signal.SIGINT, original_sigint)
 
-    signal.signal(signal.SIGINT, exit_gracefully)
+    if is_worker:
+        # Ctrl+C reaches the whole process group, leave it to the supervisor to stop the workers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    else:
+        signal.signal(signal.SIGINT, exit_gracefully)
 
     # start the bot master
 
@@ -63,7 +88,8 @@ def main():
     restart = _bot.run()
 
     # the bot has stopped, do we want to restart?
-    if restart:
+    # workers are restarted by the supervisor, never by themselves
+    if restart and not is_worker:
         # remove reference to cloudbot, so exit_gracefully won't try to stop it
         _bot = None
         # sleep one second for timeouts
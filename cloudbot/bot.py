@@ -9,7 +9,6 @@ from functools import partial
 from pathlib import Path
 from typing import Type
 
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
 from venusian import Scanner
@@ -18,11 +17,13 @@ from watchdog.observers import Observer
 from cloudbot import clients
 from cloudbot.client import Client
 from cloudbot.config import Config
-from cloudbot.event import Event, CommandEvent, RegexEvent, EventType
+from cloudbot.event import Event, BatchEvent, CommandEvent, RegexEvent, EventType
 from cloudbot.hook import Action
 from cloudbot.plugin import PluginManager
 from cloudbot.reloader import PluginReloader, ConfigReloader
+from cloudbot.shard import ShardClient
 from cloudbot.util import database, formatting, async_util
+from cloudbot.util.async_db import AsyncDatabase, DEFAULT_BATCH_SIZE
 from cloudbot.util.mapping import KeyFoldDict
 
 logger = logging.getLogger("cloudbot")
@@ -96,9 +97,11 @@ class CloudBot:
     :type db_engine: sqlalchemy.engine.Engine
     :type db_factory: sqlalchemy.orm.session.sessionmaker
     :type db_session: sqlalchemy.orm.scoping.scoped_session
+    :type adb: AsyncDatabase
     :type db_metadata: sqlalchemy.sql.schema.MetaData
     :type loop: asyncio.events.AbstractEventLoop
     :type stopped_future: asyncio.Future
+    :type shard: ShardClient | None
     :param: stopped_future: Future that will be given a result when the bot has stopped.
     """
 
@@ -144,11 +147,19 @@ class CloudBot:
         self.user_agent = self.config.get('user_agent', 'CloudBot/3.0 - CloudBot Refresh '
                                                         '<https://github.com/CloudBotIRC/CloudBot/>')
 
+        # set when running as a worker under a shard supervisor
+        self.shard = ShardClient.from_env(self)
+
         # setup db
         db_path = self.config.get('database', 'sqlite:///cloudbot.db')
-        self.db_engine = create_engine(db_path)
+        db_options = self.config.get('database_options', {})
+        self.db_engine = database.make_engine(db_path, db_options)
+        logger.info("Database: %s", database.describe_engine(self.db_engine))
+
         self.db_factory = sessionmaker(bind=self.db_engine)
         self.db_session = scoped_session(self.db_factory)
+        # for coroutine hooks, see cloudbot.util.async_db
+        self.adb = AsyncDatabase(self.db_engine, db_options.get('batch_size', DEFAULT_BATCH_SIZE))
         self.db_metadata = database.metadata
         self.db_base = declarative_base(metadata=self.db_metadata, bind=self.db_engine)
 
@@ -190,6 +201,7 @@ class CloudBot:
         logger.debug("Waiting for plugin unload")
         self.loop.run_until_complete(self.plugin_manager.unload_all())
         logger.debug("Unload complete")
+        self.adb.close()
         self.loop.close()
         return restart
 
@@ -202,6 +214,10 @@ class CloudBot:
     def create_connections(self):
         """ Create a BotConnection for all the networks defined in the config """
         for config in self.config['connections']:
+            if self.shard and config['name'] not in self.shard.connections:
+                # Handled by another worker
+                continue
+
             # strip all spaces and capitalization from the connection name
             name = clean_name(config['name'])
             nick = config['nick']
@@ -213,8 +229,16 @@ class CloudBot:
             )
             logger.debug("[%s] Created connection.", name)
 
-    async def stop(self, reason=None, *, restart=False):
-        """quits all networks and shuts the bot down"""
+    async def stop(self, reason=None, *, restart=False, forwarded=False):
+        """quits all networks and shuts the bot down
+
+        When running as a shard worker, the request is passed on to the supervisor so every worker stops,
+        unless `forwarded` is set because it came from the supervisor in the first place
+        """
+        if self.shard and self.shard.connected and not forwarded:
+            await self.shard.stop(reason, restart)
+            return
+
         logger.info("Stopping bot.")
 
         if self.config_reloading_enabled:
@@ -252,6 +276,9 @@ class CloudBot:
 
         logger.debug("All clients closed")
 
+        if self.shard:
+            self.shard.close()
+
         self.running = False
         # Give the stopped_future a result, so that run() will exit
         logger.debug("Setting future result for shutdown")
@@ -262,6 +289,9 @@ class CloudBot:
         await self.stop(reason=reason, restart=True)
 
     async def _init_routine(self):
+        if self.shard:
+            await self.shard.connect()
+
         # Load plugins
         await self.plugin_manager.load_all(os.path.abspath("plugins"))
 
@@ -282,8 +312,11 @@ class CloudBot:
         for conn in self.connections.values():
             conn.active = True
 
+        # Load caches for deferred plugins while connecting
+        self.plugin_manager.start_deferred()
+
         # Connect to servers
-        await asyncio.gather(*[conn.try_connect() for conn in self.connections.values()], loop=self.loop)
+        await asyncio.gather(*[conn.try_connect() for conn in self.connections.values()])
         logger.debug("Connections created.")
 
         # Run a manual garbage collection cycle, to clean up any unused objects created during initialization
@@ -403,5 +436,30 @@ class CloudBot:
                         break
 
         # Run the tasks
-        await asyncio.gather(*run_before_tasks, loop=self.loop)
-        await asyncio.gather(*tasks, loop=self.loop)
+        await asyncio.gather(*run_before_tasks)
+        await asyncio.gather(*tasks)
+
+    async def process_batch(self, conn, events, returning=frozenset()):
+        """
+        Dispatch a batch of events to the irc_batch hooks, each hook running once with all of the events it matches
+
+        :type conn: cloudbot.client.Client
+        :type events: list[Event]
+        :param returning: The casefolded nicks of users rejoining after a netsplit
+        :type returning: frozenset[str]
+        """
+        tasks = []
+        for batch_hook in self.plugin_manager.batch_hooks:
+            if batch_hook.clients and conn.type not in batch_hook.clients:
+                continue
+
+            if batch_hook.is_catch_all():
+                matched = events
+            else:
+                matched = [event for event in events if event.irc_command in batch_hook.triggers]
+
+            if matched:
+                batch_event = BatchEvent(bot=self, conn=conn, hook=batch_hook, events=matched, returning=returning)
+                tasks.append(self.plugin_manager.launch(batch_hook, batch_event))
+
+        await asyncio.gather(*tasks)
@@ -41,6 +41,9 @@ class Client:
     :type vars: dict
     :type history: dict[str, list[tuple]]
     :type permissions: PermissionManager
+    :type lines_in: int
+    :type lines_out: int
+    :type pending_events: int
     """
 
     def __init__(self, bot, _type, name, nick, *, channels=None, config=None):
@@ -78,6 +81,12 @@ class Client:
         # set when on_load in core_misc is done
         self.ready = False
 
+        # traffic counters, exposed by core.metrics
+        self.lines_in = 0
+        self.lines_out = 0
+        # events received which are still being processed
+        self.pending_events = 0
+
         self._active = False
 
         self.cancelled_future = async_util.create_future(self.loop)
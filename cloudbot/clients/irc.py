@@ -13,6 +13,8 @@ from irclib.parser import Message
 from cloudbot.client import Client, client, ClientConnectError
 from cloudbot.event import Event, EventType, IrcOutEvent
 from cloudbot.util import async_util
+from cloudbot.util.netsplit import JoinQuitBatcher
+from cloudbot.util.reply_batch import WhoReplyBatcher
 
 logger = logging.getLogger("cloudbot")
 
@@ -47,6 +49,107 @@ def decode(bytestring):
     return bytestring.decode('utf-8', errors='ignore')
 
 
+def make_event(conn, message, line):
+    """
+    Build an Event from a parsed IRC message
+
+    :type conn: cloudbot.client.Client
+    :type message: irclib.parser.Message
+    :param line: The raw line the message was parsed from
+    :rtype: Event
+    """
+    command = message.command
+    command_params = message.parameters
+
+    # Content
+    if command_params.has_trail:
+        content_raw = command_params[-1]
+        content = irc_clean(content_raw)
+    else:
+        content_raw = None
+        content = None
+
+    # Event type
+    event_type = irc_command_to_event_type.get(
+        command, EventType.other
+    )
+
+    # Target (for KICK, INVITE)
+    if event_type is EventType.kick:
+        target = command_params[1]
+    elif command in ("INVITE", "MODE"):
+        target = command_params[0]
+    else:
+        # TODO: Find more commands which give a target
+        target = None
+
+    # Parse for CTCP
+    if event_type is EventType.message and content_raw.startswith("\x01"):
+        possible_ctcp = content_raw[1:]
+        if content_raw.endswith('\x01'):
+            possible_ctcp = possible_ctcp[:-1]
+
+        if '\x01' in possible_ctcp:
+            logger.debug(
+                "[%s] Invalid CTCP message received, "
+                "treating it as a mornal message",
+                conn.name
+            )
+            ctcp_text = None
+        else:
+            ctcp_text = possible_ctcp
+            ctcp_text_split = ctcp_text.split(None, 1)
+            if ctcp_text_split[0] == "ACTION":
+                # this is a CTCP ACTION, set event_type and content accordingly
+                event_type = EventType.action
+                content = irc_clean(ctcp_text_split[1])
+            else:
+                # this shouldn't be considered a regular message
+                event_type = EventType.other
+    else:
+        ctcp_text = None
+
+    # Channel
+    channel = None
+    if command_params:
+        if command in ["NOTICE", "PRIVMSG", "KICK", "JOIN", "PART", "MODE"]:
+            channel = command_params[0]
+        elif command == "INVITE":
+            channel = command_params[1]
+        elif len(command_params) > 2 or not (command_params.has_trail and len(command_params) == 1):
+            channel = command_params[0]
+
+    prefix = message.prefix
+
+    if prefix is None:
+        nick = None
+        user = None
+        host = None
+        mask = None
+    else:
+        nick = prefix.nick
+        user = prefix.user
+        host = prefix.host
+        mask = prefix.mask
+
+    if channel:
+        # TODO Migrate plugins to accept the original case of the channel
+        channel = channel.lower()
+
+        channel = channel.split()[0]  # Just in case there is more data
+
+        if channel == conn.nick.lower():
+            channel = nick.lower()
+
+    # Set up parsed message
+    # TODO: Do we really want to send the raw `prefix` and `command_params` here?
+    return Event(
+        bot=conn.bot, conn=conn, event_type=event_type, content_raw=content_raw, content=content,
+        target=target, channel=channel, nick=nick, user=user, host=host, mask=mask, irc_raw=line,
+        irc_prefix=mask, irc_command=command, irc_paramlist=command_params, irc_ctcp_text=ctcp_text
+    )
+
+
 @client("irc")
 class IrcClient(Client):
     """
@@ -92,6 +195,11 @@ class IrcClient(Client):
 
         self._connecting = False
 
+        # Batches joins and quits during netsplits
+        self.batcher = JoinQuitBatcher(self)
+        # Batches the lines of WHO replies
+        self.reply_batcher = WhoReplyBatcher(self)
+
     def make_ssl_context(self, conn_config):
         if self.use_ssl:
             ssl_context = ssl.create_default_context()
@@ -404,6 +512,7 @@ class _IrcProtocol(asyncio.Protocol):
             logger.debug("[%s|out] >> %r", self.conn.name, line)
 
         self._transport.write(line)
+        self.conn.lines_out += 1
 
     def data_received(self, data):
         self._input_buffer += data
@@ -411,6 +520,7 @@ class _IrcProtocol(asyncio.Protocol):
         while b"\r\n" in self._input_buffer:
             line_data, self._input_buffer = self._input_buffer.split(b"\r\n", 1)
             line = decode(line_data)
+            self.conn.lines_in += 1
 
             try:
                 message = Message.parse(line)
@@ -421,106 +531,21 @@ class _IrcProtocol(asyncio.Protocol):
                 )
                 continue
 
-            command = message.command
-            command_params = message.parameters
-
             # Reply to pings immediately
+            if message.command == "PING":
+                self.conn.send("PONG " + message.parameters[-1], log=False)
 
-            if command == "PING":
-                self.conn.send("PONG " + command_params[-1], log=False)
-
-            # Parse the command and params
-
-            # Content
-            if command_params.has_trail:
-                content_raw = command_params[-1]
-                content = irc_clean(content_raw)
-            else:
-                content_raw = None
-                content = None
-
-            # Event type
-            event_type = irc_command_to_event_type.get(
-                command, EventType.other
-            )
-
-            # Target (for KICK, INVITE)
-            if event_type is EventType.kick:
-                target = command_params[1]
-            elif command in ("INVITE", "MODE"):
-                target = command_params[0]
-            else:
-                # TODO: Find more commands which give a target
-                target = None
-
-            # Parse for CTCP
-            if event_type is EventType.message and content_raw.startswith("\x01"):
-                possible_ctcp = content_raw[1:]
-                if content_raw.endswith('\x01'):
-                    possible_ctcp = possible_ctcp[:-1]
-
-                if '\x01' in possible_ctcp:
-                    logger.debug(
-                        "[%s] Invalid CTCP message received, "
-                        "treating it as a mornal message",
-                        self.conn.name
-                    )
-                    ctcp_text = None
-                else:
-                    ctcp_text = possible_ctcp
-                    ctcp_text_split = ctcp_text.split(None, 1)
-                    if ctcp_text_split[0] == "ACTION":
-                        # this is a CTCP ACTION, set event_type and content accordingly
-                        event_type = EventType.action
-                        content = irc_clean(ctcp_text_split[1])
-                    else:
-                        # this shouldn't be considered a regular message
-                        event_type = EventType.other
-            else:
-                ctcp_text = None
-
-            # Channel
-            channel = None
-            if command_params:
-                if command in ["NOTICE", "PRIVMSG", "KICK", "JOIN", "PART", "MODE"]:
-                    channel = command_params[0]
-                elif command == "INVITE":
-                    channel = command_params[1]
-                elif len(command_params) > 2 or not (command_params.has_trail and len(command_params) == 1):
-                    channel = command_params[0]
-
-            prefix = message.prefix
-
-            if prefix is None:
-                nick = None
-                user = None
-                host = None
-                mask = None
-            else:
-                nick = prefix.nick
-                user = prefix.user
-                host = prefix.host
-                mask = prefix.mask
-
-            if channel:
-                # TODO Migrate plugins to accept the original case of the channel
-                channel = channel.lower()
-
-                channel = channel.split()[0]  # Just in case there is more data
-
-                if channel == self.conn.nick.lower():
-                    channel = nick.lower()
-
-            # Set up parsed message
-            # TODO: Do we really want to send the raw `prefix` and `command_params` here?
-            event = Event(
-                bot=self.bot, conn=self.conn, event_type=event_type, content_raw=content_raw, content=content,
-                target=target, channel=channel, nick=nick, user=user, host=host, mask=mask, irc_raw=line,
-                irc_prefix=mask, irc_command=command, irc_paramlist=command_params, irc_ctcp_text=ctcp_text
-            )
+            event = make_event(self.conn, message, line)
+            if self.conn.batcher.add(event) or self.conn.reply_batcher.add(event):
+                continue
 
             # handle the message, async
-            async_util.wrap_future(self.bot.process(event), loop=self.loop)
+            self.conn.pending_events += 1
+            task = async_util.wrap_future(self.bot.process(event), loop=self.loop)
+            task.add_done_callback(self._event_done)
+
+    def _event_done(self, _fut):
+        self.conn.pending_events -= 1
 
     @property
     def connected(self):
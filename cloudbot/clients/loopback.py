@@ -0,0 +1,171 @@
+"""
+An in-process client with no transport, for load testing, simulations and embedding the plugin engine
+
+Everything the bot sends is appended to `LoopbackClient.outgoing`, and input is handed to the client directly as
+pre-built Events or raw IRC lines, so hooks run exactly as they would on a real connection minus the socket, encoding
+and framing. Outgoing sieves operate on raw IRC lines and are not applied.
+
+Configured like any other connection, with "type": "loopback":
+    {"name": "loopback", "type": "loopback", "nick": "CloudBot", "channels": ["#test"]}
+"""
+
+import asyncio
+import logging
+from collections import deque, namedtuple
+
+from irclib.parser import Message
+
+from cloudbot.client import Client, client
+from cloudbot.clients.irc import irc_nick_re, make_event
+from cloudbot.event import Event
+from cloudbot.util import async_util
+
+logger = logging.getLogger("cloudbot")
+
+OutMessage = namedtuple('OutMessage', 'command target text')
+
+
+@client("loopback")
+class LoopbackClient(Client):
+    """
+    A Client whose output goes to an in-memory queue
+
+    Appending to the queue is thread-safe, so threaded hooks don't need to hop back to the event loop to send.
+
+    :type outgoing: collections.deque[OutMessage]
+    """
+
+    def __init__(self, bot, _type, name, nick, *, channels=None, config=None):
+        super().__init__(bot, _type, name, nick, channels=channels, config=config)
+        self.target_nick = nick
+        self.outgoing = deque(maxlen=self.config.get("max_queue"))
+        self._connected = False
+        self._tasks = set()
+
+    def describe_server(self):
+        return "loopback"
+
+    async def connect(self, timeout=None):
+        self._connected = True
+        self._active = True
+        tasks = [
+            self.bot.plugin_manager.launch(hook, Event(bot=self.bot, conn=self, hook=hook))
+            for hook in self.bot.plugin_manager.connect_hooks
+            if not hook.clients or self.type in hook.clients
+        ]
+        await asyncio.gather(*tasks)
+
+    def quit(self, reason=None, set_inactive=True):
+        if set_inactive:
+            self._active = False
+
+        if self.connected:
+            self._queue("QUIT", None, reason)
+
+    def close(self):
+        self.quit()
+        self._connected = False
+
+    def _queue(self, command, target, text):
+        self.outgoing.append(OutMessage(command, target, text))
+        self.lines_out += 1
+
+    def message(self, target, *messages):
+        for text in messages:
+            self._queue("PRIVMSG", target, text)
+
+    def admin_log(self, text, console=True):
+        log_chan = self.config.get("log_channel")
+        if log_chan:
+            self.message(log_chan, text)
+
+        if console:
+            logger.info("[%s|admin] %s", self.name, text)
+
+    def action(self, target, text):
+        self._queue("ACTION", target, text)
+
+    def notice(self, target, text):
+        self._queue("NOTICE", target, text)
+
+    def set_nick(self, nick):
+        self.nick = nick
+        self._queue("NICK", None, nick)
+
+    def join(self, channel):
+        self._queue("JOIN", channel, None)
+        if channel not in self.channels:
+            self.channels.append(channel)
+
+    def part(self, channel):
+        self._queue("PART", channel, None)
+        if channel in self.channels:
+            self.channels.remove(channel)
+
+    def ctcp(self, target, ctcp_type, text):
+        self.message(target, "\x01{} {}\x01".format(ctcp_type, text))
+
+    def cmd(self, command, *params):
+        self.send(str(Message(None, None, command, list(map(str, params)))))
+
+    def send(self, line, log=True):
+        """
+        Queue a raw line, for plugins which talk IRC directly
+        """
+        self._queue("RAW", None, line)
+
+    def is_nick_valid(self, nick):
+        return bool(irc_nick_re.fullmatch(nick))
+
+    @property
+    def connected(self):
+        return self._connected
+
+    def feed_event(self, event):
+        """
+        Dispatch a pre-built Event as if it had just been received
+
+        :type event: Event
+        :return: A future which completes once every hook triggered by the event has finished
+        :rtype: asyncio.Future
+        """
+        self.lines_in += 1
+        self.pending_events += 1
+        task = async_util.wrap_future(self.bot.process(event), loop=self.loop)
+        self._tasks.add(task)
+        task.add_done_callback(self._event_done)
+        return task
+
+    def feed_line(self, line):
+        """
+        Parse a raw IRC line into an Event and dispatch it
+
+        :type line: str
+        :rtype: asyncio.Future
+        """
+        return self.feed_event(make_event(self, Message.parse(line), line))
+
+    def _event_done(self, task):
+        self.pending_events -= 1
+        self._tasks.discard(task)
+
+    async def wait_idle(self):
+        """
+        Wait for every event fed to this client so far to finish processing
+        """
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+            # Let the tasks' done callbacks run
+            await asyncio.sleep(0)
+
+    def drain(self):
+        """
+        Remove and return everything currently in the outgoing queue
+
+        :rtype: list[OutMessage]
+        """
+        out = []
+        while self.outgoing:
+            out.append(self.outgoing.popleft())
+
+        return out
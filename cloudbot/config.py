@@ -4,10 +4,109 @@ import os
 import sys
 import time
 from collections import OrderedDict
+from collections.abc import Mapping
 
 logger = logging.getLogger("cloudbot")
 
 
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+# Stands in for the old value of an added key, or the new value of a removed one, in a config diff
+MISSING = _Missing()
+
+
+def _named_items(value):
+    """
+    Index a list of objects which all have a "name", like the connections list, by their names
+
+    :rtype: dict | None
+    """
+    if not isinstance(value, list) or not value:
+        return None
+
+    if not all(isinstance(item, Mapping) and 'name' in item for item in value):
+        return None
+
+    items = OrderedDict((item['name'], item) for item in value)
+    if len(items) != len(value):
+        return None
+
+    return items
+
+
+def diff_config(old, new, path=()):
+    """
+    Find every value which differs between two config trees
+
+    Mappings are compared key by key, and lists of objects which all have a unique "name" by name. Anything else is
+    compared as a single value.
+
+    >>> sorted(diff_config({"a": 1, "b": {"c": 2}}, {"a": 1, "b": {"c": 3, "d": 4}}).items())
+    [(('b', 'c'), (2, 3)), (('b', 'd'), (MISSING, 4))]
+    >>> diff_config({"connections": [{"name": "a", "nick": "x"}]}, {"connections": [{"name": "a", "nick": "y"}]})
+    {('connections', 'a', 'nick'): ('x', 'y')}
+
+    :return: A dict of the path to each changed value to its old and new values, MISSING where there is none
+    :rtype: dict[tuple, tuple]
+    """
+    changes = {}
+    if isinstance(old, Mapping) and isinstance(new, Mapping):
+        for key in old:
+            changes.update(diff_config(old[key], new.get(key, MISSING), path + (key,)))
+
+        for key in new:
+            if key not in old:
+                changes[path + (key,)] = (MISSING, new[key])
+
+        return changes
+
+    old_items = _named_items(old)
+    new_items = _named_items(new)
+    if old_items is not None and new_items is not None:
+        return diff_config(old_items, new_items, path)
+
+    if old != new:
+        changes[path] = (old, new)
+
+    return changes
+
+
+def parse_path(path):
+    """
+    >>> parse_path("api_keys.google_dev_key")
+    ('api_keys', 'google_dev_key')
+
+    :type path: str | tuple
+    :rtype: tuple
+    """
+    if isinstance(path, tuple):
+        return path
+
+    return tuple(path.split('.'))
+
+
+def path_matches(path, watched):
+    """
+    Whether a change at `path` affects the value at `watched`, because one contains the other
+
+    >>> path_matches(('plugins', 'weather', 'units'), ('plugins', 'weather'))
+    True
+    >>> path_matches(('plugins',), ('plugins', 'weather'))
+    True
+    >>> path_matches(('plugins', 'tell'), ('plugins', 'weather'))
+    False
+
+    :type path: tuple
+    :type watched: tuple
+    :rtype: bool
+    """
+    length = min(len(path), len(watched))
+    return path[:length] == watched[:length]
+
+
 class Config(OrderedDict):
     """
     :type filename: str
@@ -28,6 +127,8 @@ class Config(OrderedDict):
         self.update(*args, **kwargs)
 
         self._api_keys = {}
+        # Changes are only applied to the rest of the bot after the initial load
+        self._loaded = False
 
         # populate self with config data
         self.load_config()
@@ -40,8 +141,13 @@ class Config(OrderedDict):
             return value
 
     def load_config(self):
-        """(re)loads the bot config from the config file"""
-        self._api_keys.clear()
+        """(re)loads the bot config from the config file
+
+        On a reload, only the parts of the bot affected by the changed values are updated, see apply_changes().
+
+        :return: The changes from the previous config, see diff_config()
+        :rtype: dict[tuple, tuple]
+        """
         if not os.path.exists(self.path):
             # if there is no config, show an error and die
             logger.critical("No config file found, bot shutting down!")
@@ -54,13 +160,76 @@ class Config(OrderedDict):
         with open(self.path) as f:
             data = json.load(f, object_pairs_hook=OrderedDict)
 
+        changes = diff_config(self, data)
+        for key in [key for key in self if key not in data]:
+            del self[key]
+
         self.update(data)
         logger.debug("Config loaded from file.")
 
-        # reload permissions
-        if self.bot.connections:
-            for connection in self.bot.connections.values():
-                connection.permissions.reload()
+        if self._loaded:
+            self.apply_changes(changes)
+        else:
+            self._api_keys.clear()
+            self._loaded = True
+
+        return changes
+
+    def apply_changes(self, changes):
+        """
+        Update the parts of the bot which depend on the changed config values: cached API keys, each affected
+        connection's config and permissions, and plugins' config hooks
+
+        :type changes: dict[tuple, tuple]
+        """
+        if not changes:
+            logger.info("Config reloaded, nothing changed.")
+            return
+
+        logger.info("Config reloaded, changed: %s", ", ".join('.'.join(map(str, path)) for path in changes))
+
+        for path in changes:
+            if path[0] != 'api_keys':
+                continue
+
+            if len(path) > 1:
+                self._api_keys.pop(path[1], None)
+            else:
+                self._api_keys.clear()
+
+        connections = getattr(self.bot, "connections", None) or {}
+        for conn in connections.values():
+            self._update_connection(conn, changes)
+
+        plugin_manager = getattr(self.bot, "plugin_manager", None)
+        if plugin_manager is not None:
+            plugin_manager.config_changed(changes)
+
+    def _update_connection(self, conn, changes):
+        """
+        :type conn: cloudbot.client.Client
+        :type changes: dict[tuple, tuple]
+        """
+        name = conn.config.get('name')
+        conn_path = ('connections', name)
+        if not any(path_matches(path, conn_path) for path in changes):
+            return
+
+        conn_list = self.get('connections', [])
+        for i, conn_config in enumerate(conn_list):
+            if conn_config.get('name') == name:
+                break
+        else:
+            logger.warning("[%s] Connection removed from the config, restart the bot to disconnect it", conn.name)
+            return
+
+        # Keep the connection's config object, the permission manager and others hold on to it
+        conn.config.clear()
+        conn.config.update(conn_config)
+        conn_list[i] = conn.config
+
+        if any(path_matches(path, conn_path + ('permissions',)) for path in changes):
+            conn.permissions.reload()
 
     def save_config(self):
         """saves the contents of the config dict to the config file"""
@@ -209,6 +209,15 @@ class Event:
             self.db.close()
             self.db = None
 
+    @property
+    def adb(self):
+        """
+        The bot's async database, for coroutine hooks
+
+        :rtype: cloudbot.util.async_db.AsyncDatabase
+        """
+        return self.bot.adb
+
     @property
     def event(self):
         """
@@ -509,10 +518,51 @@ class IrcOutEvent(Event):
 
 
 class PostHookEvent(Event):
+    """
+    :type run_time: float | None
+    :type queue_time: float | None
+    """
+
     def __init__(self, *args, launched_hook=None, launched_event=None,
-                 result=None, error=None, **kwargs):
+                 result=None, error=None, run_time=None, queue_time=None,
+                 **kwargs):
+        """
+        :param run_time: Seconds the launched hook spent running, if it was timed
+        :param queue_time: Seconds the launched hook spent waiting on sieves, locks and the executor before running
+        """
         super().__init__(*args, **kwargs)
         self.launched_hook = launched_hook
         self.launched_event = launched_event
         self.result = result
         self.error = error
+        self.run_time = run_time
+        self.queue_time = queue_time
+
+
+class ConfigEvent(Event):
+    """
+    :type changes: dict[tuple, tuple]
+    """
+
+    def __init__(self, *args, changes=None, **kwargs):
+        """
+        :param changes: The changed config paths the hook watches, mapped to their old and new values
+        """
+        super().__init__(*args, **kwargs)
+        self.changes = changes or {}
+
+
+class BatchEvent(Event):
+    """
+    :type events: list[Event]
+    :type returning: frozenset[str]
+    """
+
+    def __init__(self, *args, events=(), returning=frozenset(), **kwargs):
+        """
+        :param events: The batched events, in the order they were received
+        :param returning: The casefolded nicks of users rejoining after a netsplit
+        """
+        super().__init__(*args, **kwargs)
+        self.events = list(events)
+        self.returning = returning
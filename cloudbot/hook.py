@@ -154,6 +154,19 @@ class _RawHook(_Hook):
             self.triggers.update(trigger_param)
 
 
+class _BatchHook(_RawHook):
+    """
+    :type triggers: set[str]
+    """
+
+    def __init__(self, function):
+        """
+        :type function: function
+        """
+        _Hook.__init__(self, function, "irc_batch")
+        self.triggers = set()
+
+
 class _PeriodicHook(_Hook):
     def __init__(self, function):
         """
@@ -219,6 +232,20 @@ class _PermissionHook(_Hook):
         self.perms.update(perms)
 
 
+class _ConfigHook(_Hook):
+    """
+    :type paths: set[str]
+    """
+
+    def __init__(self, func):
+        super().__init__(func, "config")
+        self.paths = set()
+
+    def add_hook(self, paths, kwargs):
+        self._add_hook(kwargs)
+        self.paths.update(paths)
+
+
 def _add_hook(func, hook):
     if not hasattr(func, HOOK_ATTR):
         setattr(func, HOOK_ATTR, {})
@@ -278,6 +305,34 @@ def irc_raw(triggers_param, **kwargs):
     return _raw_hook
 
 
+def irc_batch(triggers_param, **kwargs):
+    """External batched raw decorator. Must be used as a function to return a decorator
+
+    During a netsplit or a burst of joins and quits, JOIN and QUIT lines from other users are collected and handed to
+    these hooks together, instead of to the irc_raw hooks and the EventType.join and EventType.quit event hooks for
+    each line. Those hooks don't see batched lines at all, so a plugin which needs every join or quit should have a
+    batch hook as well. The hook can take an `events` argument, the
+    list of batched events matching its triggers in the order they were received, and a `returning` argument, the
+    casefolded nicks of users rejoining after a netsplit. "*" matches every batched line.
+    :type triggers_param: str | list[str]
+    """
+
+    def _batch_hook(func):
+        hook = _get_hook(func, "irc_batch")
+        if hook is None:
+            hook = _BatchHook(func)
+            _add_hook(func, hook)
+
+        hook.add_hook(triggers_param, kwargs)
+        return func
+
+    if callable(triggers_param):  # this decorator is being used directly, which isn't good
+        raise TypeError("@irc_batch() must be used as a function that returns a decorator")
+
+    # this decorator is being used as a function, so return a decorator
+    return _batch_hook
+
+
 def event(types_param, **kwargs):
     """External event decorator. Must be used as a function to return a decorator
     :type types_param: cloudbot.event.EventType | list[cloudbot.event.EventType]
@@ -367,6 +422,10 @@ def periodic(interval, **kwargs):
 
 def on_start(param=None, **kwargs):
     """External on_start decorator. Can be used directly as a decorator, or with args to return a decorator
+
+    With `defer=True`, the hook doesn't hold up loading the plugin. It's run alongside the plugin's other deferred
+    hooks once the bot starts connecting, and the plugin's other hooks wait for it to finish before they run.
+
     :type param: function | None
     """
 
@@ -510,3 +569,26 @@ def permission(*perms, **kwargs):
         return func
 
     return _perm_hook
+
+
+def config(*paths, **kwargs):
+    """External config decorator. Must be used as a function that returns a decorator
+
+    This hook will fire when the config is reloaded and any value at or under one of `paths` has changed. Paths are
+    dotted keys, like "api_keys.google_dev_key" or "plugins.weather", and connections are keyed by their name, like
+    "connections.snoonet.ratelimit". The hook can take a `changes` argument, a dict of each changed path (as a tuple)
+    to its (old, new) values, see cloudbot.config.diff_config().
+    """
+    if not paths or callable(paths[0]):
+        raise TypeError("@config() must be used as a function that returns a decorator")
+
+    def _config_hook(func):
+        hook = _get_hook(func, "config")
+        if hook is None:
+            hook = _ConfigHook(func)
+            _add_hook(func, hook)
+
+        hook.add_hook(paths, kwargs)
+        return func
+
+    return _config_hook
@@ -1,7 +1,11 @@
 import asyncio
 import importlib
+import importlib.util
 import logging
+import os
 import sys
+import threading
+import time
 from collections import defaultdict
 from functools import partial
 from itertools import chain
@@ -12,13 +16,20 @@ from weakref import WeakValueDictionary
 
 import sqlalchemy
 
-from cloudbot.event import Event, PostHookEvent
+from cloudbot.config import path_matches
+from cloudbot.event import ConfigEvent, Event, PostHookEvent
 from cloudbot.plugin_hooks import hook_name_to_plugin
+from cloudbot.plugin_manifest import PluginManifest
 from cloudbot.util import HOOK_ATTR, LOADED_ATTR, async_util, database
 from cloudbot.util.func_utils import call_with_args
+from cloudbot.util.isolation import IsolatedPool
+from cloudbot.util.lazy_import import lazy_module
 
 logger = logging.getLogger("cloudbot")
 
+# Hook types which pick up the plugin-wide "hook_limits" defaults from the config
+LIMITED_HOOK_TYPES = ("command", "regex", "irc_raw", "irc_batch", "event")
+
 
 def find_hooks(parent, module):
     """
@@ -43,6 +54,21 @@ def find_hooks(parent, module):
     return hooks
 
 
+def hooks_from_manifest(parent, entry):
+    """
+    Create stand-in hooks for a plugin from its manifest entry
+
+    :type parent: Plugin
+    :type entry: dict
+    :rtype: dict
+    """
+    hooks = defaultdict(list)
+    for data in entry['hooks']:
+        hooks[data['type']].append(hook_name_to_plugin(data['type']).from_manifest(parent, data))
+
+    return hooks
+
+
 def find_tables(code):
     """
     :type code: object
@@ -57,6 +83,106 @@ def find_tables(code):
     return tables
 
 
+STARTUP_PHASES = ("import", "tables", "on_start", "register", "deferred")
+
+
+def format_startup_times(plugins, limit=20):
+    """
+    Format a table of the time each plugin spent in each phase of starting up, slowest first
+
+    :type plugins: collections.Iterable[Plugin]
+    :rtype: str
+    """
+    rows = []
+    for plugin in plugins:
+        times = [plugin.startup_times.get(phase) for phase in STARTUP_PHASES]
+        rows.append((sum(t for t in times if t is not None), plugin.title, times))
+
+    rows.sort(key=lambda row: row[0], reverse=True)
+    lines = ["{:<30} {}".format("plugin", ' '.join('{:>9}'.format(name) for name in STARTUP_PHASES + ("total",)))]
+    for total, title, times in rows[:limit]:
+        lines.append("{:<30} {} {:>9.3f}".format(
+            title, ' '.join('{:>9}'.format('-' if t is None else '{:.3f}'.format(t)) for t in times), total
+        ))
+
+    return '\n'.join(lines)
+
+
+class HookTimer:
+    """
+    Records how long a single hook invocation spent waiting to run (sieves, locks, the executor queue) and running
+
+    :type launched: float | None
+    :type started: float | None
+    :type finished: float | None
+    """
+
+    __slots__ = ('launched', 'started', 'finished')
+
+    def __init__(self, launched=None):
+        self.launched = launched
+        self.started = None
+        self.finished = None
+
+    @classmethod
+    def launch(cls):
+        return cls(time.perf_counter())
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def queue_time(self):
+        if self.launched is None or self.started is None:
+            return None
+
+        return self.started - self.launched
+
+    @property
+    def run_time(self):
+        if self.started is None or self.finished is None:
+            return None
+
+        return self.finished - self.started
+
+
+class ReloadStats:
+    """
+    Counts of plugin reloads and how long they took, successful or not
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_time = 0.0
+        self.last_time = None
+
+    def record(self, duration, success):
+        """
+        :type duration: float
+        :type success: bool
+        """
+        self.count += 1
+        if not success:
+            self.failures += 1
+
+        self.total_time += duration
+        self.last_time = duration
+
+    @property
+    def average_time(self):
+        """
+        :rtype: float | None
+        """
+        if not self.count:
+            return None
+
+        return self.total_time / self.count
+
+
 class PluginManager:
     """
     PluginManager is the core of CloudBot plugin loading.
@@ -76,10 +202,13 @@ class PluginManager:
     :type commands: dict[str, cloudbot.plugin_hooks.CommandHook]
     :type raw_triggers: dict[str, list[cloudbot.plugin_hooks.RawHook]]
     :type catch_all_triggers: list[cloudbot.plugin_hooks.RawHook]
+    :type batch_hooks: list[cloudbot.plugin_hooks.BatchHook]
     :type event_type_hooks: dict[cloudbot.event.EventType,
         list[cloudbot.plugin_hooks.EventHook]]
     :type regex_hooks: list[(re.__Regex, cloudbot.plugin_hooks.RegexHook)]
     :type sieves: list[cloudbot.plugin_hooks.SieveHook]
+    :type running_hooks: dict[asyncio.Future, cloudbot.plugin_hooks.Hook]
+    :type hook_threads: dict[int, cloudbot.plugin_hooks.Hook]
     """
 
     def __init__(self, bot):
@@ -94,6 +223,7 @@ class PluginManager:
         self.commands = {}
         self.raw_triggers = {}
         self.catch_all_triggers = []
+        self.batch_hooks = []
         self.event_type_hooks = {}
         self.regex_hooks = []
         self.sieves = []
@@ -102,6 +232,30 @@ class PluginManager:
         self.out_sieves = []
         self.hook_hooks = defaultdict(list)
         self.perm_hooks = defaultdict(list)
+        self.config_hooks = []
+
+        # Hooks which are currently running, keyed by their task, and threaded hooks keyed by the executor thread
+        # running them. Used by monitoring plugins to attribute stalls and samples to hooks.
+        self.running_hooks = {}
+        self.hook_threads = {}
+
+        # Worker processes for isolated hooks, started the first time one runs
+        self._isolated_pool = None
+
+        # Set once deferred on_start hooks have been started, plugins loaded after that start theirs straight away
+        self._deferred_started = False
+
+        # The hook manifest, if lazy plugin loading is enabled, and locks held while importing plugins on first use
+        self.manifest = None
+        self._import_locks = {}
+
+        # Set while loading all plugins at startup, to create their tables together. Reloaded plugins create their
+        # own tables as they're loaded.
+        self._batch_tables = False
+        self._table_registry = None
+
+        # Latency and failures of hot-swap reloads
+        self.reload_stats = ReloadStats()
 
     def _add_plugin(self, plugin: 'Plugin'):
         self.plugins[plugin.file_path] = plugin
@@ -119,6 +273,37 @@ class PluginManager:
         """
         return self._plugin_name_map.get(title)
 
+    def find_frame_hooks(self, frame, thread_id=None):
+        """
+        Find the running hooks responsible for a stack, by the thread running it for threaded hooks
+        or by matching the stack's frames against running coroutine hooks
+
+        Safe to call from threads other than the event loop's.
+
+        :param frame: The innermost frame of the stack
+        :param thread_id: The identifier of the thread the stack was taken from
+        :return: A list of hooks, outermost first
+        """
+        if thread_id is not None:
+            _hook = self.hook_threads.get(thread_id)
+            if _hook is not None:
+                return [_hook]
+
+        codes = {
+            _hook.function.__code__: _hook for _hook in list(self.running_hooks.values()) if not _hook.threaded
+        }
+
+        found = []
+        while frame is not None:
+            _hook = codes.get(frame.f_code)
+            if _hook is not None and _hook not in found:
+                found.append(_hook)
+
+            frame = frame.f_back
+
+        found.reverse()
+        return found
+
     def safe_resolve(self, path_obj: Path) -> Path:
         """Resolve the parts of a path that exist, allowing a non-existant path
         to be resolved to allow resolution of its parents
@@ -190,14 +375,90 @@ class PluginManager:
         # Load all .py files in the plugins directory and any subdirectory
         # But ignore files starting with _
         path_list = plugin_dir.rglob("[!_]*.py")
-        # Load plugins asynchronously :O
-        await asyncio.gather(*[self.load_plugin(path) for path in path_list], loop=self.bot.loop)
+        start = time.perf_counter()
+        self.manifest = self._open_manifest()
+        self._batch_tables = True
+        try:
+            # Load plugins asynchronously :O
+            await asyncio.gather(*[self._load_plugin(path, lazy=True) for path in path_list])
+        finally:
+            self._batch_tables = False
+            registry, self._table_registry = self._table_registry, None
 
-    async def unload_all(self):
-        await asyncio.gather(
-            *[self.unload_plugin(path) for path in self.plugins], loop=self.bot.loop
+        if registry is not None:
+            logger.info("Created %d new tables in %d batches", registry.created, registry.batches)
+
+        self._save_manifest()
+        logger.info(
+            "Loaded %d plugins in %.3f seconds (%d deferred until first use)",
+            len(self.plugins), time.perf_counter() - start, sum(plugin.stub for plugin in self.plugins.values())
         )
 
+    async def unload_all(self):
+        await asyncio.gather(*[self.unload_plugin(path) for path in self.plugins])
+        if self._isolated_pool is not None:
+            self._isolated_pool.close()
+            self._isolated_pool = None
+
+    def _open_manifest(self):
+        """
+        :rtype: PluginManifest | None
+        """
+        conf = self.bot.config.get("plugin_loading", {})
+        if not conf.get("lazy", False):
+            return None
+
+        manifest = PluginManifest(os.path.join(self.bot.data_dir, conf.get("manifest", "plugin_manifest.json")))
+        manifest.load()
+        return manifest
+
+    def _save_manifest(self):
+        if self.manifest is None:
+            return
+
+        try:
+            self.manifest.save()
+        except OSError:
+            logger.exception("Unable to save plugin manifest")
+
+    def _manifest_entry(self, title, file_path):
+        """
+        Find a plugin's manifest entry, if it can be registered without importing it
+
+        :rtype: dict | None
+        """
+        if self.manifest is None or title in self.bot.config.get("plugin_loading", {}).get("eager", []):
+            return None
+
+        entry = self.manifest.get(title, str(file_path))
+        if entry is None or not entry['lazy']:
+            return None
+
+        return entry
+
+    def _get_table_registry(self):
+        """
+        :rtype: database.TableRegistry | None
+        """
+        if not self._batch_tables:
+            return None
+
+        if self._table_registry is None:
+            self._table_registry = database.TableRegistry(self.bot.db_engine, self.bot.loop)
+
+        return self._table_registry
+
+    @property
+    def isolated_pool(self):
+        """
+        :rtype: IsolatedPool
+        """
+        if self._isolated_pool is None:
+            conf = dict(self.bot.config.get("isolation", {}))
+            self._isolated_pool = IsolatedPool(self.bot.loop, conf.pop("workers", 2), conf)
+
+        return self._isolated_pool
+
     def _load_mod(self, name):
         plugin_module = importlib.import_module(name)
         # if this plugin was loaded before, reload it
@@ -214,7 +475,14 @@ class PluginManager:
 
         :type path: str | Path
         """
+        await self._load_plugin(path)
+        self._save_manifest()
 
+    async def _load_plugin(self, path, lazy=False):
+        """
+        :param lazy: Register the plugin from the manifest without importing it, if it can be
+        :type path: str | Path
+        """
         path = Path(path)
         file_path = self.safe_resolve(path)
         file_name = file_path.name
@@ -229,7 +497,16 @@ class PluginManager:
         if self.get_plugin(file_path):
             await self.unload_plugin(file_path)
 
+        load_start = time.perf_counter()
         module_name = "plugins.{}".format(title)
+
+        entry = self._manifest_entry(title, file_path) if lazy else None
+        if entry is not None:
+            plugin = Plugin(str(file_path), file_name, title, lazy_module(module_name), manifest=entry)
+            self._register_hooks(plugin)
+            plugin.startup_times["register"] = plugin.load_time = time.perf_counter() - load_start
+            return
+
         try:
             plugin_module = self._load_mod(module_name)
         except Exception:
@@ -238,22 +515,233 @@ class PluginManager:
 
         # create the plugin
         plugin = Plugin(str(file_path), file_name, title, plugin_module)
+        plugin.startup_times["import"] = time.perf_counter() - load_start
+
+        if not await self._start_plugin(plugin):
+            return
+
+        phase_start = time.perf_counter()
+        self._register_hooks(plugin)
+        plugin.startup_times["register"] = time.perf_counter() - phase_start
+        plugin.load_time = time.perf_counter() - load_start
+
+        if self._deferred_started:
+            self._start_deferred(plugin)
+
+    async def _start_plugin(self, plugin):
+        """
+        Create a freshly imported plugin's tables and run its on_start hooks, leaving deferred ones until the bot
+        starts connecting, before its hooks are registered
 
-        # proceed to register hooks
+        :type plugin: Plugin
+        :return: Whether the plugin started, its tables are unregistered again if it didn't
+        :rtype: bool
+        """
+        self._configure_limits(plugin)
 
         # create database tables
-        await plugin.create_tables(self.bot)
+        phase_start = time.perf_counter()
+        if plugin.tables:
+            await plugin.create_tables(self.bot, self._get_table_registry())
+        plugin.startup_times["tables"] = time.perf_counter() - phase_start
 
         # run on_start hooks
+        phase_start = time.perf_counter()
         for on_start_hook in plugin.hooks["on_start"]:
+            if on_start_hook.deferred:
+                plugin.deferred_hooks.append(on_start_hook)
+                continue
+
             success = await self.launch(on_start_hook, Event(bot=self.bot, hook=on_start_hook))
             if not success:
                 logger.warning("Not registering hooks from plugin %s: on_start hook errored", plugin.title)
 
                 # unregister databases
                 plugin.unregister_tables(self.bot)
-                return
+                return False
+
+        plugin.startup_times["on_start"] = time.perf_counter() - phase_start
+
+        if self.manifest is not None:
+            self.manifest.record(plugin)
+
+        return True
+
+    async def reload_plugin(self, path):
+        """
+        Reload a plugin without a gap in its hooks, loading it normally if it isn't already loaded.
+
+        The new version is imported as a separate module and started (tables created and on_start hooks run) while
+        the old version keeps handling events, then the old version's hooks are swapped for the new ones without
+        yielding to the event loop. Only then are the old version's on_stop hooks run and its tasks cancelled. If the
+        new version fails to import, the old version stays loaded.
+
+        Some plugins can't have two versions started at once, as their on_start hooks claim something (a port, a
+        registered name) the old version only gives back in its on_stop hooks. If the new version fails to start
+        next to the old one, the old version is stopped first and the new one started again, as a plain unload and
+        load would. The plugin is left unloaded if it fails then too.
+
+        :type path: str | Path
+        :return: Whether the plugin is loaded from the current version of the file
+        :rtype: bool
+        """
+        path = Path(path)
+        file_path = self.safe_resolve(path)
+        old_plugin = self.get_plugin(file_path)
+        if old_plugin is None:
+            await self.load_plugin(file_path)
+            return self.get_plugin(file_path) is not None
+
+        if not self.can_load(old_plugin.title):
+            return False
+
+        start = time.perf_counter()
+        plugin = self._import_reload(old_plugin)
+        if plugin is None:
+            old_plugin.register_tables(self.bot)
+            return self._reload_done(old_plugin, None, start)
+
+        started = await self._start_plugin(plugin)
+        if self.get_plugin(file_path) is not old_plugin:
+            # The plugin was unloaded or loaded again while the new version was starting
+            if started:
+                plugin.unregister_tables(self.bot)
+
+            return self._reload_done(old_plugin, None, start)
 
+        if not started:
+            plugin = await self._restart_plugin(old_plugin, plugin, start)
+            return self._reload_done(old_plugin, plugin, start)
+
+        plugin.load_time = time.perf_counter() - start
+        self._swap_plugin(old_plugin, plugin)
+        self._reload_done(old_plugin, plugin, start)
+        await self._stop_plugin(old_plugin)
+        return True
+
+    def _reload_done(self, old_plugin, plugin, start):
+        """
+        Record how a reload went, and finish setting up the new version if it's loaded
+
+        :type old_plugin: Plugin
+        :type plugin: Plugin | None
+        :rtype: bool
+        """
+        duration = time.perf_counter() - start
+        self.reload_stats.record(duration, plugin is not None)
+        if plugin is None:
+            logger.warning(
+                "Reloading %s failed after %.3f seconds (%d of %d reloads failed)",
+                old_plugin.title, duration, self.reload_stats.failures, self.reload_stats.count
+            )
+            return False
+
+        logger.info("Reloaded %s in %.3f seconds", plugin.title, duration)
+
+        self._save_manifest()
+        if self._deferred_started:
+            self._start_deferred(plugin)
+
+        return True
+
+    def _import_reload(self, old_plugin):
+        """
+        Import the new version of a loaded plugin, without touching its loaded version's hooks
+
+        The loaded version's tables are unregistered, the caller registers them again if it keeps that version.
+
+        :type old_plugin: Plugin
+        :return: The new version, ready to be started, or None if it failed to import
+        :rtype: Plugin | None
+        """
+        load_start = time.perf_counter()
+        # The new version will define tables with the same names in the global metadata
+        old_plugin.unregister_tables(self.bot)
+        try:
+            plugin_module = self._import_fresh("plugins.{}".format(old_plugin.title))
+            plugin = Plugin(old_plugin.file_path, old_plugin.file_name, old_plugin.title, plugin_module)
+        except Exception:
+            logger.exception("Error reloading %s:", old_plugin.title)
+            return None
+
+        plugin.startup_times["import"] = time.perf_counter() - load_start
+        return plugin
+
+    async def _restart_plugin(self, old_plugin, plugin, load_start):
+        """
+        Stop a loaded plugin and try starting its new version again, for plugins which can't run two at once
+
+        :type old_plugin: Plugin
+        :param plugin: The new version, which failed to start while the old version was loaded
+        :type plugin: Plugin
+        :return: The new version, loaded, or None if it failed to start
+        :rtype: Plugin | None
+        """
+        logger.info(
+            "New version of %s failed to start alongside the loaded one, stopping the loaded version first",
+            old_plugin.title
+        )
+        old_plugin.register_tables(self.bot)
+        await self.unload_plugin(old_plugin.file_path)
+
+        plugin.deferred_hooks.clear()
+        if not await self._start_plugin(plugin):
+            logger.warning("New version of %s failed to start, leaving the plugin unloaded", old_plugin.title)
+            return None
+
+        plugin.load_time = time.perf_counter() - load_start
+        self._install_module(plugin)
+        self._register_hooks(plugin)
+        return plugin
+
+    def _import_fresh(self, name):
+        """
+        Import a new copy of a plugin module, leaving any copy already imported as it is
+
+        The new module isn't added to sys.modules, that happens once it replaces the loaded plugin.
+
+        :type name: str
+        :rtype: module
+        """
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ImportError("No module named {!r}".format(name), name=name)
+
+        plugin_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(plugin_module)
+        return plugin_module
+
+    def _swap_plugin(self, old_plugin, plugin):
+        """
+        Replace a loaded plugin's hooks with the new version's, in one go
+
+        :type old_plugin: Plugin
+        :type plugin: Plugin
+        """
+        self._unregister_hooks(old_plugin)
+        self._register_hooks(plugin)
+        self._install_module(plugin)
+
+    def _install_module(self, plugin):
+        """
+        Make a newly imported plugin module the one imported by its name
+
+        :type plugin: Plugin
+        """
+        name = plugin.code.__name__
+        sys.modules[name] = plugin.code
+        parent, _, child = name.rpartition('.')
+        if parent in sys.modules:
+            setattr(sys.modules[parent], child, plugin.code)
+
+        setattr(plugin.code, LOADED_ATTR, True)
+
+    def _register_hooks(self, plugin):
+        """
+        Add a plugin and all of its hooks
+
+        :type plugin: Plugin
+        """
         self._add_plugin(plugin)
 
         for on_cap_available_hook in plugin.hooks["on_cap_available"]:
@@ -268,7 +756,7 @@ class PluginManager:
 
         for periodic_hook in plugin.hooks["periodic"]:
             task = async_util.wrap_future(self._start_periodic(periodic_hook))
-            plugin.tasks.append(task)
+            plugin.tasks.add(task)
             self._log_hook(periodic_hook)
 
         # register commands
@@ -296,6 +784,10 @@ class PluginManager:
                         self.raw_triggers[trigger] = [raw_hook]
             self._log_hook(raw_hook)
 
+        for batch_hook in plugin.hooks["irc_batch"]:
+            self.batch_hooks.append(batch_hook)
+            self._log_hook(batch_hook)
+
         # register events
         for event_hook in plugin.hooks["event"]:
             for event_type in event_hook.types:
@@ -335,17 +827,78 @@ class PluginManager:
 
             self._log_hook(perm_hook)
 
+        for config_hook in plugin.hooks["config"]:
+            self.config_hooks.append(config_hook)
+            self._log_hook(config_hook)
+
         # Sort hooks
         self.regex_hooks.sort(key=lambda x: x[1].priority)
         dicts_of_lists_of_hooks = (self.event_type_hooks, self.raw_triggers, self.perm_hooks, self.hook_hooks)
-        lists_of_hooks = [self.catch_all_triggers, self.sieves, self.connect_hooks, self.out_sieves]
+        lists_of_hooks = [
+            self.catch_all_triggers, self.batch_hooks, self.sieves, self.connect_hooks, self.out_sieves,
+            self.config_hooks,
+        ]
         lists_of_hooks.extend(chain.from_iterable(d.values() for d in dicts_of_lists_of_hooks))
 
         for lst in lists_of_hooks:
             lst.sort(key=attrgetter("priority"))
 
         # we don't need this anymore
-        del plugin.hooks["on_start"]
+        plugin.hooks.pop("on_start", None)
+
+    def start_deferred(self):
+        """
+        Start running every loaded plugin's deferred on_start hooks, all at once
+
+        :return: A task finishing once they've all finished
+        :rtype: asyncio.Future
+        """
+        self._deferred_started = True
+        start = time.perf_counter()
+        tasks = [self._start_deferred(plugin) for plugin in list(self.plugins.values()) if plugin.deferred_hooks]
+        return async_util.wrap_future(self._log_startup(start, [task for task in tasks if task is not None]))
+
+    def _start_deferred(self, plugin):
+        if plugin.warmup is None and plugin.deferred_hooks:
+            plugin.warmup = async_util.wrap_future(self._run_deferred(plugin))
+            plugin.tasks.add(plugin.warmup)
+
+        return plugin.warmup
+
+    async def _run_deferred(self, plugin):
+        """
+        :type plugin: Plugin
+        :return: Whether all of the plugin's deferred hooks succeeded
+        """
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            self.launch(on_start_hook, Event(bot=self.bot, hook=on_start_hook))
+            for on_start_hook in plugin.deferred_hooks
+        ])
+        plugin.startup_times["deferred"] = time.perf_counter() - start
+        if not all(results):
+            logger.warning("Deferred on_start hook errored in plugin %s, its hooks will not run", plugin.title)
+            return False
+
+        return True
+
+    async def _wait_deferred(self, plugin):
+        """
+        Wait for a plugin's deferred on_start hooks, starting them if they haven't been yet
+
+        :type plugin: Plugin
+        :return: Whether they succeeded
+        """
+        warmup = self._start_deferred(plugin)
+        # Don't let one cancelled hook cancel the loaders every other hook is waiting on
+        return await asyncio.shield(warmup)
+
+    async def _log_startup(self, start, tasks):
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info("Deferred on_start hooks finished in %.3f seconds", time.perf_counter() - start)
+
+        logger.info("Plugin startup times:\n%s", format_startup_times(self.plugins.values()))
 
     async def unload_plugin(self, path):
         """
@@ -364,6 +917,26 @@ class PluginManager:
         if not plugin:
             return False
 
+        self._unregister_hooks(plugin)
+        await self._stop_plugin(plugin)
+
+        # unregister databases
+        plugin.unregister_tables(self.bot)
+
+        # remove last reference to plugin
+        self._rem_plugin(plugin)
+
+        if self.bot.config.get("logging", {}).get("show_plugin_loading", True):
+            logger.info("Unloaded all plugins from %s", plugin.title)
+
+        return True
+
+    def _unregister_hooks(self, plugin):
+        """
+        Remove all of a plugin's hooks, leaving the plugin itself in place
+
+        :type plugin: Plugin
+        """
         for on_cap_available_hook in plugin.hooks["on_cap_available"]:
             available_hooks = self.cap_hooks["on_available"]
             for cap in on_cap_available_hook.caps:
@@ -398,6 +971,9 @@ class PluginManager:
                     if not self.raw_triggers[trigger]:  # if that was the last hook for this trigger
                         del self.raw_triggers[trigger]
 
+        for batch_hook in plugin.hooks["irc_batch"]:
+            self.batch_hooks.remove(batch_hook)
+
         # unregister events
         for event_hook in plugin.hooks["event"]:
             for event_type in event_hook.types:
@@ -429,29 +1005,74 @@ class PluginManager:
             for perm in perm_hook.perms:
                 self.perm_hooks[perm].remove(perm_hook)
 
+        for config_hook in plugin.hooks["config"]:
+            self.config_hooks.remove(config_hook)
+
+    async def _stop_plugin(self, plugin):
+        """
+        Run a plugin's on_stop hooks and cancel its running tasks, once its hooks have been removed
+
+        :type plugin: Plugin
+        """
         # Run on_stop hooks
         for on_stop_hook in plugin.hooks["on_stop"]:
             event = Event(bot=self.bot, hook=on_stop_hook)
             await self.launch(on_stop_hook, event)
 
-        # unregister databases
-        plugin.unregister_tables(self.bot)
-
         task_count = len(plugin.tasks)
         if task_count > 0:
             logger.debug("Cancelling running tasks in %s", plugin.title)
-            for task in plugin.tasks:
+            for task in list(plugin.tasks):
                 task.cancel()
 
             logger.info("Cancelled %d tasks from %s", task_count, plugin.title)
 
-        # remove last reference to plugin
-        self._rem_plugin(plugin)
+    def config_changed(self, changes):
+        """
+        Run the config hooks watching any of the changed paths
 
-        if self.bot.config.get("logging", {}).get("show_plugin_loading", True):
-            logger.info("Unloaded all plugins from %s", plugin.title)
+        :type changes: dict[tuple, tuple]
+        :return: A task finishing once they've all run, or None if none were affected
+        :rtype: asyncio.Future | None
+        """
+        tasks = []
+        for config_hook in self.config_hooks:
+            matched = {
+                path: change for path, change in changes.items()
+                if any(path_matches(path, watched) for watched in config_hook.paths)
+            }
+            if matched:
+                event = ConfigEvent(bot=self.bot, hook=config_hook, changes=matched)
+                tasks.append(self.launch(config_hook, event))
+
+        if not tasks:
+            return None
+
+        return async_util.wrap_future(asyncio.gather(*tasks))
+
+    def _configure_limits(self, plugin):
+        """
+        Applies the plugin's configured default invocation limits to any hooks which don't set their own
 
-        return True
+        :type plugin: Plugin
+        """
+        plugin_conf = self.bot.config.get("plugins", {}).get(plugin.title, {})
+        limits = plugin_conf.get("hook_limits", {})
+
+        for hook_type, hooks in plugin.hooks.items():
+            for hook in hooks:
+                if hook_type in LIMITED_HOOK_TYPES:
+                    if hook.max_concurrency is None:
+                        hook.max_concurrency = limits.get("max_concurrency")
+
+                    if hook.timeout is None:
+                        hook.timeout = limits.get("timeout")
+
+                    if hook.reject_excess is None:
+                        hook.reject_excess = limits.get("reject_excess", False)
+
+                if hook.max_concurrency:
+                    hook.semaphore = asyncio.Semaphore(hook.max_concurrency)
 
     def _log_hook(self, hook):
         """
@@ -463,23 +1084,34 @@ class PluginManager:
             logger.info("Loaded %s", hook)
             logger.debug("Loaded %r", hook)
 
-    def _execute_hook_threaded(self, hook, event):
+    def _execute_hook_threaded(self, hook, event, timer=None):
         """
         :type hook: cloudbot.plugin_hooks.Hook
         :type event: cloudbot.event.Event
+        :type timer: HookTimer
         """
+        if timer is not None:
+            timer.start()
+
+        thread_id = threading.get_ident()
+        self.hook_threads[thread_id] = hook
         event.prepare_threaded()
 
         try:
             return call_with_args(hook.function, event)
         finally:
             event.close_threaded()
+            del self.hook_threads[thread_id]
 
-    async def _execute_hook_sync(self, hook, event):
+    async def _execute_hook_sync(self, hook, event, timer=None):
         """
         :type hook: cloudbot.plugin_hooks.Hook
         :type event: cloudbot.event.Event
+        :type timer: HookTimer
         """
+        if timer is not None:
+            timer.start()
+
         await event.prepare()
 
         try:
@@ -487,34 +1119,93 @@ class PluginManager:
         finally:
             await event.close()
 
-    async def internal_launch(self, hook, event):
+    async def _execute_hook_isolated(self, hook, event, timer=None):
+        """
+        :type hook: cloudbot.plugin_hooks.Hook
+        :type event: cloudbot.event.Event
+        :type timer: HookTimer
+        """
+        args = [event[name] for name in hook.required_args]
+        if timer is not None:
+            timer.start()
+
+        return await self.isolated_pool.run(hook.function, *args, **hook.isolated)
+
+    async def internal_launch(self, hook, event, timer=None):
         """
         Launches a hook with the data from [event]
         :param hook: The hook to launch
         :param event: The event providing data for the hook
+        :param timer: An optional HookTimer to record the hook's start and finish times on
         :return: a tuple of (ok, result) where ok is a boolean that determines if the hook ran without error and result
             is the result from the hook
         """
-        if hook.threaded:
-            coro = self.bot.loop.run_in_executor(None, self._execute_hook_threaded, hook, event)
+        if hook.isolated is not None:
+            coro = self._execute_hook_isolated(hook, event, timer)
+        elif hook.threaded:
+            coro = self.bot.loop.run_in_executor(None, self._execute_hook_threaded, hook, event, timer)
         else:
-            coro = self._execute_hook_sync(hook, event)
+            coro = self._execute_hook_sync(hook, event, timer)
 
         task = async_util.wrap_future(coro)
-        hook.plugin.tasks.append(task)
+        hook.plugin.tasks.add(task)
+        self.running_hooks[task] = hook
         try:
-            out = await task
+            out = await self._await_hook_task(hook, task)
             ok = True
         except Exception:
             logger.exception("Error in hook %s", hook.description)
             ok = False
             out = sys.exc_info()
+        finally:
+            hook.plugin.tasks.discard(task)
+            del self.running_hooks[task]
 
-        hook.plugin.tasks.remove(task)
+        if timer is not None:
+            timer.finish()
 
         return ok, out
 
-    async def _execute_hook(self, hook, event):
+    async def _await_hook_task(self, hook, task):
+        """
+        Waits for a running hook, enforcing the hook's timeout if it has one
+
+        :type hook: cloudbot.plugin_hooks.Hook
+        :type task: asyncio.Future
+        """
+        if not hook.timeout:
+            return await task
+
+        try:
+            done, _ = await asyncio.wait([task], timeout=hook.timeout)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+        if done:
+            return task.result()
+
+        hook.timed_out += 1
+        if hook.threaded and hook.isolated is None:
+            # Executor threads can't be interrupted, so wait for it to finish to keep the concurrency limit honest
+            logger.warning(
+                "Hook %s exceeded its %s second timeout, waiting for its thread to finish", hook.description,
+                hook.timeout
+            )
+            try:
+                await task
+            except Exception:
+                pass
+        else:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        raise asyncio.TimeoutError("Hook {} timed out after {} seconds".format(hook.description, hook.timeout))
+
+    async def _execute_hook(self, hook, event, timer=None):
         """
         Runs the specific hook with the given bot and event.
 
@@ -522,9 +1213,13 @@ class PluginManager:
 
         :type hook: cloudbot.plugin_hooks.Hook
         :type event: cloudbot.event.Event
+        :type timer: HookTimer
         :rtype: bool
         """
-        ok, out = await self.internal_launch(hook, event)
+        if timer is None:
+            timer = HookTimer()
+
+        ok, out = await self.internal_launch(hook, event, timer)
         result, error = None, None
         if ok is True:
             result = out
@@ -533,7 +1228,7 @@ class PluginManager:
 
         post_event = partial(
             PostHookEvent, launched_hook=hook, launched_event=event, bot=event.bot,
-            conn=event.conn, result=result, error=error
+            conn=event.conn, result=result, error=error, run_time=timer.run_time, queue_time=timer.queue_time
         )
         for post_hook in self.hook_hooks["post"]:
             success, res = await self.internal_launch(post_hook, post_event(hook=post_hook))
@@ -555,19 +1250,22 @@ class PluginManager:
             coro = sieve.function(self.bot, event, hook)
 
         result, error = None, None
+        timer = HookTimer()
+        timer.start()
         task = async_util.wrap_future(coro)
-        sieve.plugin.tasks.append(task)
+        sieve.plugin.tasks.add(task)
         try:
             result = await task
         except Exception:
             logger.exception("Error running sieve %s on %s:", sieve.description, hook.description)
             error = sys.exc_info()
 
-        sieve.plugin.tasks.remove(task)
+        timer.finish()
+        sieve.plugin.tasks.discard(task)
 
         post_event = partial(
             PostHookEvent, launched_hook=sieve, launched_event=event, bot=event.bot,
-            conn=event.conn, result=result, error=error
+            conn=event.conn, result=result, error=error, run_time=timer.run_time
         )
         for post_hook in self.hook_hooks["post"]:
             success, res = await self.internal_launch(post_hook, post_event(hook=post_hook))
@@ -596,22 +1294,108 @@ class PluginManager:
         :type hook: cloudbot.plugin_hooks.Hook | cloudbot.plugin_hooks.CommandHook
         :rtype: bool
         """
+        timer = HookTimer.launch()
+
+        if hook.plugin.stub:
+            hook = await self.resolve_hook(hook)
+            if hook is None:
+                return False
+
+            event.hook = hook
+
+        event = await self.check_launch(hook, event)
+        if event is None:
+            return False
+
+        if hook.semaphore is not None:
+            if hook.reject_excess and hook.semaphore.locked():
+                hook.rejected += 1
+                self._notify_rejected(hook, event)
+                return False
+
+            async with hook.semaphore:
+                result = await self._launch_locked(hook, event, timer)
+        else:
+            result = await self._launch_locked(hook, event, timer)
+
+        # Return the result
+        return result
+
+    async def check_launch(self, hook, event):
+        """
+        Do everything launch() does before running a hook: wait for its plugin's deferred on_start hooks, then run
+        the event through the sieves
+
+        :type hook: cloudbot.plugin_hooks.Hook
+        :type event: cloudbot.event.Event
+        :return: The event as the sieves left it, or None if the hook shouldn't run
+        :rtype: cloudbot.event.Event | None
+        """
+        if hook.plugin.deferred_hooks and hook.type not in ("on_start", "on_stop"):
+            if not await self._wait_deferred(hook.plugin):
+                return None
 
-        if hook.type not in ("on_start", "on_stop", "periodic"):  # we don't need sieves on on_start hooks.
-            for sieve in self.bot.plugin_manager.sieves:
+        if hook.type not in ("on_start", "on_stop", "periodic", "config"):  # we don't need sieves on on_start hooks.
+            for sieve in self.sieves:
                 event = await self._sieve(sieve, event, hook)
                 if event is None:
-                    return False
+                    return None
+
+        return event
+
+    async def resolve_hook(self, hook):
+        """
+        Get the real hook for a stand-in registered from the manifest, importing its plugin if it hasn't been yet
 
+        :type hook: cloudbot.plugin_hooks.Hook
+        :return: The real hook matching `hook`, or None if the plugin couldn't be loaded
+        :rtype: cloudbot.plugin_hooks.Hook | None
+        """
+        if not hook.plugin.stub:
+            return hook
+
+        file_path = hook.plugin.file_path
+        lock = self._import_locks.get(file_path)
+        if lock is None:
+            lock = self._import_locks[file_path] = asyncio.Lock()
+
+        async with lock:
+            # Another event may have triggered the import while this one was waiting
+            if self.plugins.get(file_path) is hook.plugin:
+                logger.info("Importing plugin %s on first use", hook.plugin.title)
+                await self.load_plugin(file_path)
+
+        self._import_locks.pop(file_path, None)
+        plugin = self.plugins.get(file_path)
+        if plugin is None or plugin.stub:
+            return None
+
+        for real_hook in plugin.hooks[hook.type]:
+            if real_hook.function_name == hook.function_name:
+                return real_hook
+
+        logger.warning("Hook %s is no longer in its plugin", hook.description)
+        return None
+
+    async def _launch_locked(self, hook, event, timer):
         if hook.lock:
             async with hook.lock:
                 # Run the plugin with the message, and wait for it to finish
-                result = await self._execute_hook(hook, event)
-        else:
-            result = await self._execute_hook(hook, event)
+                return await self._execute_hook(hook, event, timer)
 
-        # Return the result
-        return result
+        return await self._execute_hook(hook, event, timer)
+
+    def _notify_rejected(self, hook, event):
+        """
+        :type hook: cloudbot.plugin_hooks.Hook
+        :type event: cloudbot.event.Event
+        """
+        logger.info(
+            "Rejected invocation of %s, already running %d instances", hook.description, hook.max_concurrency
+        )
+
+        if hook.type == "command" and event.conn and event.nick:
+            event.notice("Sorry, that command is busy right now. Please try again later.")
 
 
 class Plugin:
@@ -623,39 +1407,68 @@ class Plugin:
     :type title: str
     :type hooks: dict
     :type tables: list[sqlalchemy.Table]
+    :type tasks: set[asyncio.Future]
     """
 
-    def __init__(self, filepath, filename, title, code):
+    def __init__(self, filepath, filename, title, code, manifest=None):
         """
         :type filepath: str
         :type filename: str
         :type code: object
+        :param manifest: The plugin's manifest entry, to create stand-in hooks from instead of searching `code`
+        :type manifest: dict | None
         """
-        self.tasks = []
+        self.tasks = set()
         self.file_path = filepath
         self.file_name = filename
         self.title = title
-        self.hooks = find_hooks(self, code)
-        # we need to find tables for each plugin so that they can be unloaded from the global metadata when the
-        # plugin is reloaded
-        self.tables = find_tables(code)
+        # Whether this plugin's hooks are stand-ins from the manifest, and it hasn't been imported yet
+        self.stub = manifest is not None
+        if self.stub:
+            self.hooks = hooks_from_manifest(self, manifest)
+            self.tables = []
+        else:
+            self.hooks = find_hooks(self, code)
+            # we need to find tables for each plugin so that they can be unloaded from the global metadata when the
+            # plugin is reloaded
+            self.tables = find_tables(code)
+
         # Keep a reference to this in case another plugin needs to access it
         self.code = code
-
-    async def create_tables(self, bot):
+        # Seconds spent importing and registering the plugin, set by the PluginManager
+        self.load_time = None
+        # Seconds spent in each phase of loading the plugin: import, tables, on_start, register and deferred
+        self.startup_times = {}
+        # on_start hooks run after the bot starts connecting, and the task running them once started
+        self.deferred_hooks = []
+        self.warmup = None
+
+    async def create_tables(self, bot, registry=None):
         """
         Creates all sqlalchemy Tables that are registered in this plugin
 
         :type bot: cloudbot.bot.CloudBot
+        :param registry: A registry to create the tables along with other plugins' tables, instead of on their own
+        :type registry: database.TableRegistry | None
         """
         if self.tables:
             # if there are any tables
 
             logger.info("Registering tables for %s", self.title)
 
-            for table in self.tables:
-                if not (await bot.loop.run_in_executor(None, table.exists, bot.db_engine)):
-                    await bot.loop.run_in_executor(None, table.create, bot.db_engine)
+            if registry is not None:
+                await registry.register(self.tables)
+            else:
+                await bot.loop.run_in_executor(None, database.create_tables, bot.db_engine, self.tables)
+
+    def register_tables(self, bot):
+        """
+        Adds this plugin's Tables back to the global metadata after unregister_tables, without creating them
+        :type bot: cloudbot.bot.CloudBot
+        """
+        for table in self.tables:
+            # MetaData has no public way to add an existing Table
+            bot.db_metadata._add_table(table.name, table.schema, table)
 
     def unregister_tables(self, bot):
         """
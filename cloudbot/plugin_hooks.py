@@ -1,11 +1,20 @@
 import asyncio
 import inspect
 import logging
+import re
 
+from cloudbot.config import parse_path
+from cloudbot.event import EventType
 from cloudbot.hook import Action, Priority
 
 logger = logging.getLogger("cloudbot")
 
+# Event fields which are plain data, and so can be passed to hooks running in an isolated process
+ISOLATED_ARGS = {
+    'text', 'chan', 'nick', 'user', 'host', 'mask', 'content', 'content_raw', 'irc_raw', 'irc_command',
+    'irc_paramlist', 'irc_ctcp_text', 'triggered_command', 'triggered_prefix',
+}
+
 
 class Hook:
     """
@@ -20,6 +29,13 @@ class Hook:
     :type threaded: bool
     :type permissions: list[str]
     :type single_thread: bool
+    :type max_concurrency: int | None
+    :type timeout: float | None
+    :type reject_excess: bool | None
+    :type semaphore: asyncio.Semaphore | None
+    :type rejected: int
+    :type timed_out: int
+    :type isolated: dict | None
     """
 
     def __init__(self, _type, plugin, func_hook):
@@ -59,6 +75,19 @@ class Hook:
 
         self.lock = lock
 
+        # Invocation limits, unset values are filled from the plugin's config when the plugin is loaded
+        self.max_concurrency = func_hook.kwargs.pop("max_concurrency", None)
+        self.timeout = func_hook.kwargs.pop("timeout", None)
+        self.reject_excess = func_hook.kwargs.pop("reject_excess", None)
+        self.semaphore = None
+
+        # Counters for invocations refused or cut short by the limits above
+        self.rejected = 0
+        self.timed_out = 0
+
+        # Limits for running the hook in an isolated worker process, or None to run it normally
+        self.isolated = self._get_isolation(func_hook.kwargs.pop("isolated", False))
+
         clients = func_hook.kwargs.pop("clients", [])
 
         if isinstance(clients, str):
@@ -72,6 +101,80 @@ class Hook:
                 "Ignoring extra args %s from %s", func_hook.kwargs, self.description
             )
 
+    def _get_isolation(self, isolated):
+        if not isolated:
+            return None
+
+        if not self.threaded:
+            logger.warning("Coroutine hook %s can't be isolated, running it normally", self.description)
+            return None
+
+        bad_args = [arg for arg in self.required_args if arg not in ISOLATED_ARGS]
+        if bad_args:
+            logger.warning(
+                "Hook %s takes arguments which can't be passed to another process (%s), running it normally",
+                self.description, ', '.join(bad_args)
+            )
+            return None
+
+        return isolated if isinstance(isolated, dict) else {}
+
+    def to_manifest(self):
+        """
+        Describe the hook as plain data, for registering it from the plugin manifest without importing its plugin
+
+        :rtype: dict
+        """
+        return {
+            'type': self.type,
+            'function_name': self.function_name,
+            'required_args': self.required_args,
+            'threaded': self.threaded,
+            'permissions': list(self.permissions),
+            'action': self.action.name,
+            'priority': int(self.priority),
+            'clients': list(self.clients),
+        }
+
+    @classmethod
+    def from_manifest(cls, plugin, data):
+        """
+        Create a stand-in for a hook from its manifest entry, which has no function and can't be run itself.
+        The PluginManager imports the plugin and runs the real hook in its place.
+
+        :type plugin: Plugin
+        :type data: dict
+        """
+        self = cls.__new__(cls)
+        self._load_manifest(plugin, data)
+        return self
+
+    def _load_manifest(self, plugin, data):
+        self.type = data['type']
+        self.plugin = plugin
+        self.function = None
+        self.function_name = data['function_name']
+        self.required_args = data['required_args']
+        self.threaded = data['threaded']
+        self.permissions = data['permissions']
+        self.single_thread = False
+        self.action = Action[data['action']]
+        try:
+            self.priority = Priority(data['priority'])
+        except ValueError:
+            self.priority = data['priority']
+
+        # Limits only apply to the real hook
+        self.lock = None
+        self.max_concurrency = None
+        self.timeout = None
+        self.reject_excess = None
+        self.semaphore = None
+        self.rejected = 0
+        self.timed_out = 0
+        self.isolated = None
+        self.clients = data['clients']
+
     @property
     def description(self):
         return "{}:{}".format(self.plugin.title, self.function_name)
@@ -116,6 +219,18 @@ class CommandHook(Hook):
         )  # make sure the name, or 'main alias' is in position 0
         self.doc = cmd_hook.doc
 
+    def to_manifest(self):
+        data = super().to_manifest()
+        data.update(name=self.name, aliases=self.aliases, doc=self.doc, auto_help=self.auto_help)
+        return data
+
+    def _load_manifest(self, plugin, data):
+        super()._load_manifest(plugin, data)
+        self.name = data['name']
+        self.aliases = data['aliases']
+        self.doc = data['doc']
+        self.auto_help = data['auto_help']
+
     def __repr__(self):
         return "Command[name: {}, aliases: {}, {}]".format(
             self.name, self.aliases[1:], Hook.__repr__(self)
@@ -147,6 +262,20 @@ class RegexHook(Hook):
 
         self.regexes = regex_hook.regexes
 
+    def to_manifest(self):
+        data = super().to_manifest()
+        data.update(
+            run_on_cmd=self.run_on_cmd, only_no_match=self.only_no_match,
+            regexes=[[regex.pattern, regex.flags] for regex in self.regexes],
+        )
+        return data
+
+    def _load_manifest(self, plugin, data):
+        super()._load_manifest(plugin, data)
+        self.run_on_cmd = data['run_on_cmd']
+        self.only_no_match = data['only_no_match']
+        self.regexes = [re.compile(pattern, flags) for pattern, flags in data['regexes']]
+
     def __repr__(self):
         return "Regex[regexes: [{}], {}]".format(
             ", ".join(regex.pattern for regex in self.regexes), Hook.__repr__(self)
@@ -202,6 +331,15 @@ class RawHook(Hook):
 
         self.triggers = irc_raw_hook.triggers
 
+    def to_manifest(self):
+        data = super().to_manifest()
+        data['triggers'] = sorted(self.triggers)
+        return data
+
+    def _load_manifest(self, plugin, data):
+        super()._load_manifest(plugin, data)
+        self.triggers = set(data['triggers'])
+
     def is_catch_all(self):
         return "*" in self.triggers
 
@@ -216,6 +354,34 @@ class RawHook(Hook):
         )
 
 
+class BatchHook(Hook):
+    """
+    :type triggers: set[str]
+    """
+
+    def __init__(self, plugin, irc_batch_hook):
+        """
+        :type plugin: Plugin
+        :type irc_batch_hook: cloudbot.hook._BatchHook
+        """
+        super().__init__("irc_batch", plugin, irc_batch_hook)
+
+        self.triggers = irc_batch_hook.triggers
+
+    def is_catch_all(self):
+        return "*" in self.triggers
+
+    def __repr__(self):
+        return "Batch[triggers: {}, {}]".format(
+            list(self.triggers), Hook.__repr__(self)
+        )
+
+    def __str__(self):
+        return "irc batch {} ({}) from {}".format(
+            self.function_name, ",".join(self.triggers), self.plugin.file_name
+        )
+
+
 class SieveHook(Hook):
     def __init__(self, plugin, sieve_hook):
         """
@@ -245,6 +411,15 @@ class EventHook(Hook):
 
         self.types = event_hook.types
 
+    def to_manifest(self):
+        data = super().to_manifest()
+        data['types'] = sorted(event_type.name for event_type in self.types)
+        return data
+
+    def _load_manifest(self, plugin, data):
+        super()._load_manifest(plugin, data)
+        self.types = {EventType[name] for name in data['types']}
+
     def __repr__(self):
         return "Event[types: {}, {}]".format(list(self.types), Hook.__repr__(self))
 
@@ -262,6 +437,8 @@ class OnStartHook(Hook):
         :type plugin: Plugin
         :type on_start_hook: cloudbot.util.hook._On_startHook
         """
+        # Deferred hooks are run after the bot starts connecting, see PluginManager.start_deferred()
+        self.deferred = on_start_hook.kwargs.pop("defer", False)
         super().__init__("on_start", plugin, on_start_hook)
 
     def __repr__(self):
@@ -365,10 +542,34 @@ class PermHook(Hook):
         )
 
 
+class ConfigHook(Hook):
+    """
+    :type paths: list[tuple]
+    """
+
+    def __init__(self, plugin, config_hook):
+        """
+        :type plugin: Plugin
+        :type config_hook: cloudbot.hook._ConfigHook
+        """
+        super().__init__("config", plugin, config_hook)
+
+        self.paths = sorted(parse_path(path) for path in config_hook.paths)
+
+    def __repr__(self):
+        return "Config[paths: {}, {}]".format(['.'.join(path) for path in self.paths], Hook.__repr__(self))
+
+    def __str__(self):
+        return "config hook {} ({}) from {}".format(
+            self.function_name, ",".join('.'.join(path) for path in self.paths), self.plugin.file_name
+        )
+
+
 _hook_name_to_plugin = {
     "command": CommandHook,
     "regex": RegexHook,
     "irc_raw": RawHook,
+    "irc_batch": BatchHook,
     "sieve": SieveHook,
     "event": EventHook,
     "periodic": PeriodicHook,
@@ -380,6 +581,7 @@ _hook_name_to_plugin = {
     "irc_out": IrcOutHook,
     "post_hook": PostHookHook,
     "perm_check": PermHook,
+    "config": ConfigHook,
 }
 
 hook_name_to_plugin = _hook_name_to_plugin.__getitem__
@@ -0,0 +1,151 @@
+"""
+plugin_manifest.py
+
+A record of the hooks in each plugin file, so plugins can be registered on startup without importing them.
+
+The manifest maps each plugin's title to the size, modification time and hash of its file, and a description of each
+of its hooks. When a plugin file hasn't changed since it was recorded, and all of its hooks are of a type which only
+runs in response to something (commands, regexes, raw IRC lines and events), the PluginManager registers stand-in
+hooks from the manifest and only imports the plugin the first time one of them is triggered. Anything else, and any
+plugin which is new or has changed, is loaded normally and its entry recorded for the next start.
+
+Enabled from the "plugin_loading" section of the config:
+
+    "plugin_loading": {
+        "lazy": true,
+        "manifest": "plugin_manifest.json",
+        "eager": ["some_plugin"]
+    }
+
+The manifest path is relative to the bot's data directory, plugins listed in "eager" are always imported on startup.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+__all__ = ('PluginManifest', 'can_defer', 'LAZY_HOOK_TYPES', 'MANIFEST_VERSION')
+
+logger = logging.getLogger("cloudbot")
+
+# Bumped whenever the recorded hook data changes, to discard manifests written by older versions
+MANIFEST_VERSION = 1
+
+# Hook types which can wait for their plugin to be imported until they are first triggered
+LAZY_HOOK_TYPES = ("command", "regex", "irc_raw", "event")
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()  # nosec
+
+
+def _file_info(path):
+    st = os.stat(path)
+    return {'mtime': st.st_mtime_ns, 'size': st.st_size}
+
+
+def can_defer(plugin):
+    """
+    Whether a plugin can be registered from the manifest and imported on first use
+
+    :type plugin: cloudbot.plugin.Plugin
+    :rtype: bool
+    """
+    return all(hook_type in LAZY_HOOK_TYPES for hook_type, hooks in plugin.hooks.items() if hooks)
+
+
+class PluginManifest:
+    """
+    :type path: str
+    :type entries: dict[str, dict]
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._dirty = False
+
+    def load(self):
+        """
+        Read the manifest from disk, starting a new one if it's missing, unreadable or from another version
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError):
+            logger.warning("Unable to read plugin manifest %s, rebuilding it", self.path)
+            data = None
+
+        if data and data.get('version') == MANIFEST_VERSION:
+            self.entries = data.get('plugins', {})
+        else:
+            self.entries = {}
+
+        self._dirty = False
+
+    def save(self):
+        """
+        Write the manifest out if it's changed, replacing the old file in one step
+        """
+        if not self._dirty:
+            return
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'plugins': self.entries}, f, indent=4, sort_keys=True)
+            f.write('\n')
+
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def get(self, title, file_path):
+        """
+        Get a plugin's entry, if its file hasn't changed since it was recorded
+
+        :type title: str
+        :type file_path: str
+        :rtype: dict | None
+        """
+        entry = self.entries.get(title)
+        if entry is None:
+            return None
+
+        try:
+            info = _file_info(file_path)
+        except OSError:
+            return None
+
+        if info['size'] != entry['size']:
+            return None
+
+        if info['mtime'] != entry['mtime']:
+            # Touched but maybe not changed, like by a checkout, so compare the contents
+            if _file_hash(file_path) != entry['hash']:
+                return None
+
+            entry['mtime'] = info['mtime']
+            self._dirty = True
+
+        return entry
+
+    def record(self, plugin):
+        """
+        Record a freshly imported plugin's hooks
+
+        :type plugin: cloudbot.plugin.Plugin
+        """
+        entry = _file_info(plugin.file_path)
+        entry['hash'] = _file_hash(plugin.file_path)
+        entry['lazy'] = can_defer(plugin)
+        entry['hooks'] = [
+            hook.to_manifest() for hook_type, hooks in plugin.hooks.items() if hook_type in LAZY_HOOK_TYPES
+            for hook in hooks
+        ] if entry['lazy'] else []
+
+        if self.entries.get(plugin.title) != entry:
+            self.entries[plugin.title] = entry
+            self._dirty = True
@@ -1,4 +1,5 @@
 import asyncio
+import logging
 from abc import ABC
 from pathlib import Path
 
@@ -6,6 +7,8 @@ from watchdog.events import PatternMatchingEventHandler
 
 from cloudbot.util import async_util
 
+logger = logging.getLogger("cloudbot")
+
 
 class Reloader(ABC):
     def __init__(self, bot, handler, pattern, recursive=False):
@@ -64,20 +67,55 @@ class PluginReloader(Reloader):
         # are no other file changes in that time.
         await asyncio.sleep(0.2)
         self.reloading.remove(path)
-        await self.bot.plugin_manager.load_plugin(path)
+        # Swaps in the new version once it's loaded, so its hooks keep running throughout
+        await self.bot.plugin_manager.reload_plugin(path)
 
     async def _unload(self, path):
         await self.bot.plugin_manager.unload_plugin(path)
 
 
 class ConfigReloader(Reloader):
+    """
+    Reloads the config once it stops changing, as saving a file often fires several events
+    """
+
+    # Seconds to wait after the last change before reloading
+    delay = 0.5
+
     def __init__(self, bot):
         super().__init__(bot, ConfigEventHandler, "*{}".format(bot.config.filename))
+        self._timer = None
 
     def reload(self, path):
+        """
+        Schedule a reload, restarting the wait if one is already scheduled. Thread safe.
+        """
         if self.bot.running:
-            self.bot.logger.info("Config changed, triggering reload.")
+            self.bot.loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self._timer = self.bot.loop.call_later(self.delay, self._reload)
+
+    def _reload(self):
+        self._timer = None
+        if not self.bot.running:
+            return
+
+        logger.info("Config changed, triggering reload.")
+        try:
             self.bot.config.load_config()
+        except ValueError:
+            # Most likely saved half-way through an edit, the next save will trigger another reload
+            logger.exception("Unable to parse the config file, keeping the current config")
+
+    def stop(self):
+        super().stop()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
 
 
 class ReloadHandler(PatternMatchingEventHandler):
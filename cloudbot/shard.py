@@ -0,0 +1,393 @@
+"""
+shard.py
+
+Runs groups of connections in separate worker processes, each with its own event loop and PluginManager, so one busy
+network can't starve the others of CPU time.
+
+In supervisor mode the main process doesn't connect anywhere itself. It spawns a `python -m cloudbot` worker per
+connection group and relays messages between them over a local TCP socket, one JSON object per line:
+
+    {"type": "hello", "name": ..., "token": ...}          worker -> supervisor, sent once on connect
+    {"type": "stop", "reason": ..., "restart": ...}       worker -> supervisor, stop or restart every worker
+    {"type": "broadcast", "name": ..., "args": {...}}     worker -> supervisor -> all other workers
+    {"type": "gather", "id": ..., "name": ..., "args": {...}}
+                                                          worker -> supervisor, call a handler on every worker
+    {"type": "call", "id": ..., "name": ..., "args": {...}}
+                                                          supervisor -> worker, call a handler
+    {"type": "result", "id": ..., "data": ...}            the reply to a call or gather
+
+Handlers are registered on `bot.shard.handlers` by plugins, and are called with the bot and the message args.
+Enabled in the config with:
+    "sharding": {"enabled": true, "groups": [["snoonet", "esper"], ["freenode"]]}
+Connections not listed in any group get a worker of their own.
+"""
+
+import asyncio
+import binascii
+import hmac
+import json
+import logging
+import os
+import sys
+from collections import OrderedDict
+
+from cloudbot.util import async_util
+
+logger = logging.getLogger("cloudbot")
+
+ENV_ADDR = "CLOUDBOT_SHARD_ADDR"
+ENV_TOKEN = "CLOUDBOT_SHARD_TOKEN"
+ENV_NAME = "CLOUDBOT_SHARD_NAME"
+ENV_CONNECTIONS = "CLOUDBOT_SHARD_CONNECTIONS"
+
+# Seconds to wait before respawning a worker which exited on its own
+RESPAWN_DELAY = 5
+
+# Seconds to wait for workers to reply to a gather request
+GATHER_TIMEOUT = 10
+
+# Seconds to wait for workers to exit after being told to stop
+STOP_TIMEOUT = 30
+
+
+def get_groups(config):
+    """
+    Split the configured connections into worker groups
+
+    >>> conns = [{"name": "a"}, {"name": "b"}, {"name": "c"}]
+    >>> get_groups({"connections": conns, "sharding": {"groups": [["c", "a"]]}})
+    OrderedDict([('c', ['c', 'a']), ('b', ['b'])])
+
+    :rtype: OrderedDict[str, list[str]]
+    """
+    names = [conn['name'] for conn in config.get('connections', [])]
+    groups = OrderedDict()
+    grouped = set()
+    for group in config.get('sharding', {}).get('groups', []):
+        group = [name for name in group if name in names and name not in grouped]
+        if group:
+            groups[group[0]] = group
+            grouped.update(group)
+
+    for name in names:
+        if name not in grouped:
+            groups[name] = [name]
+
+    return groups
+
+
+def is_supervisor(config):
+    return config.get('sharding', {}).get('enabled', False) and ENV_ADDR not in os.environ
+
+
+def write_message(writer, msg):
+    writer.write(json.dumps(msg).encode() + b'\n')
+
+
+async def read_message(reader):
+    """
+    :return: The next message, or None once the other end has disconnected
+    :rtype: dict | None
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+
+    return json.loads(line.decode())
+
+
+class Supervisor:
+    """
+    Spawns and watches the worker processes, and relays messages between them
+
+    :type workers: dict[str, asyncio.StreamWriter]
+    :type processes: dict[str, asyncio.subprocess.Process]
+    """
+
+    def __init__(self, config, loop, args=()):
+        self.config = config
+        self.loop = loop
+        self.args = list(args)
+        self.groups = get_groups(config)
+        self.token = binascii.hexlify(os.urandom(16)).decode()
+        self.server = None
+        self.workers = {}
+        self.processes = {}
+        self.stopping = False
+        self.stopped_future = async_util.create_future(loop)
+        self._calls = {}
+        self._call_id = 0
+
+    @property
+    def address(self):
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return "{}:{}".format(host, port)
+
+    async def start(self, spawn=True):
+        self.server = await asyncio.start_server(self.handle_worker, '127.0.0.1', 0)
+        logger.info("Shard supervisor listening on %s with %d worker(s)", self.address, len(self.groups))
+        if spawn:
+            for name in self.groups:
+                await self.spawn(name)
+
+    def worker_env(self, name):
+        env = dict(os.environ)
+        env[ENV_ADDR] = self.address
+        env[ENV_TOKEN] = self.token
+        env[ENV_NAME] = name
+        env[ENV_CONNECTIONS] = json.dumps(self.groups[name])
+        return env
+
+    async def spawn(self, name):
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "cloudbot", *self.args, env=self.worker_env(name)
+        )
+        self.processes[name] = proc
+        logger.info("[shard] Started worker '%s' (pid %d) for %s", name, proc.pid, ', '.join(self.groups[name]))
+        async_util.wrap_future(self._watch(name, proc), loop=self.loop)
+
+    async def _watch(self, name, proc):
+        code = await proc.wait()
+        if self.processes.get(name) is proc:
+            del self.processes[name]
+
+        if self.stopping:
+            logger.info("[shard] Worker '%s' exited", name)
+            return
+
+        logger.warning("[shard] Worker '%s' exited unexpectedly with code %s, restarting", name, code)
+        await asyncio.sleep(RESPAWN_DELAY)
+        if not self.stopping:
+            await self.spawn(name)
+
+    async def handle_worker(self, reader, writer):
+        hello = await read_message(reader)
+        if not hello or hello.get('type') != 'hello' or not hmac.compare_digest(
+                str(hello.get('token')), self.token
+        ):
+            logger.warning("[shard] Rejected connection with invalid handshake")
+            writer.close()
+            return
+
+        name = hello['name']
+        self.workers[name] = writer
+        logger.debug("[shard] Worker '%s' connected", name)
+        try:
+            while True:
+                msg = await read_message(reader)
+                if msg is None:
+                    break
+
+                await self.handle_message(name, msg)
+        finally:
+            if self.workers.get(name) is writer:
+                del self.workers[name]
+
+            writer.close()
+
+    async def handle_message(self, name, msg):
+        msg_type = msg.get('type')
+        if msg_type == 'stop':
+            async_util.wrap_future(self.stop(msg.get('reason'), restart=msg.get('restart', False)), loop=self.loop)
+        elif msg_type == 'broadcast':
+            for worker_name, writer in list(self.workers.items()):
+                if worker_name != name:
+                    write_message(writer, {'type': 'call', 'name': msg['name'], 'args': msg.get('args', {})})
+        elif msg_type == 'gather':
+            async_util.wrap_future(self._gather(name, msg), loop=self.loop)
+        elif msg_type == 'result':
+            fut = self._calls.pop(msg.get('id'), None)
+            if fut is not None and not fut.done():
+                fut.set_result(msg.get('data'))
+        else:
+            logger.warning("[shard] Unknown message type from '%s': %r", name, msg_type)
+
+    async def call(self, name, handler, args):
+        """
+        Call a handler on a single worker and wait for its result
+        """
+        self._call_id += 1
+        call_id = self._call_id
+        self._calls[call_id] = fut = async_util.create_future(self.loop)
+        write_message(self.workers[name], {'type': 'call', 'id': call_id, 'name': handler, 'args': args})
+        try:
+            return await asyncio.wait_for(fut, GATHER_TIMEOUT)
+        finally:
+            self._calls.pop(call_id, None)
+
+    async def gather(self, handler, args=None):
+        """
+        Call a handler on every connected worker
+
+        :return: A mapping of worker name to result, with None for workers which didn't reply in time
+        :rtype: dict
+        """
+        names = list(self.workers)
+        results = await asyncio.gather(
+            *[self.call(name, handler, args or {}) for name in names], return_exceptions=True
+        )
+        return {
+            name: None if isinstance(result, Exception) else result for name, result in zip(names, results)
+        }
+
+    async def _gather(self, name, msg):
+        data = await self.gather(msg['name'], msg.get('args'))
+        writer = self.workers.get(name)
+        if writer is not None:
+            write_message(writer, {'type': 'result', 'id': msg['id'], 'data': data})
+
+    async def stop(self, reason=None, *, restart=False):
+        """
+        Stop every worker, then resolve `stopped_future` with whether the supervisor should restart
+        """
+        if self.stopping:
+            return
+
+        self.stopping = True
+        logger.info("[shard] %s all workers", "Restarting" if restart else "Stopping")
+        for writer in list(self.workers.values()):
+            write_message(writer, {'type': 'call', 'name': 'stop', 'args': {'reason': reason}})
+
+        procs = list(self.processes.values())
+        if procs:
+            done, pending = await asyncio.wait([asyncio.ensure_future(proc.wait()) for proc in procs],
+                                               timeout=STOP_TIMEOUT)
+            if pending:
+                logger.warning("[shard] %d worker(s) didn't stop in time, killing them", len(pending))
+                for proc in procs:
+                    if proc.returncode is None:
+                        proc.kill()
+
+        self.server.close()
+        if not self.stopped_future.done():
+            self.stopped_future.set_result(restart)
+
+    def run(self):
+        """
+        :return: True if the supervisor should be restarted, False otherwise
+        :rtype: bool
+        """
+        self.loop.run_until_complete(self.start())
+        restart = self.loop.run_until_complete(self.stopped_future)
+        self.loop.close()
+        return restart
+
+
+class ShardClient:
+    """
+    A worker's connection to the supervisor
+
+    :type handlers: dict[str, (cloudbot.bot.CloudBot, ...) -> object]
+    """
+
+    def __init__(self, bot, address, token, name, connections):
+        self.bot = bot
+        self.address = address
+        self.token = token
+        self.name = name
+        self.connections = connections
+        self.handlers = {'stop': self._handle_stop}
+        self.reader = None
+        self.writer = None
+        self._calls = {}
+        self._call_id = 0
+        self._read_task = None
+
+    @classmethod
+    def from_env(cls, bot):
+        """
+        :return: A client for the supervisor which started this process, or None if it wasn't started by one
+        :rtype: ShardClient | None
+        """
+        if ENV_ADDR not in os.environ:
+            return None
+
+        return cls(
+            bot, os.environ[ENV_ADDR], os.environ[ENV_TOKEN], os.environ[ENV_NAME],
+            json.loads(os.environ[ENV_CONNECTIONS])
+        )
+
+    @property
+    def connected(self):
+        return self.writer is not None
+
+    async def connect(self):
+        host, _, port = self.address.rpartition(':')
+        self.reader, self.writer = await asyncio.open_connection(host, int(port))
+        write_message(self.writer, {'type': 'hello', 'name': self.name, 'token': self.token})
+        self._read_task = async_util.wrap_future(self._read_loop(), loop=self.bot.loop)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def _read_loop(self):
+        while True:
+            msg = await read_message(self.reader)
+            if msg is None:
+                break
+
+            if msg.get('type') == 'result':
+                fut = self._calls.pop(msg.get('id'), None)
+                if fut is not None and not fut.done():
+                    fut.set_result(msg.get('data'))
+            elif msg.get('type') == 'call':
+                async_util.wrap_future(self._handle_call(msg), loop=self.bot.loop)
+
+        self.writer = None
+        if self.bot.running:
+            logger.warning("[shard] Lost connection to the supervisor, stopping")
+            await self.bot.stop("Supervisor went away", forwarded=True)
+
+    async def _handle_call(self, msg):
+        name = msg.get('name')
+        try:
+            handler = self.handlers[name]
+        except LookupError:
+            logger.warning("[shard] No handler registered for '%s'", name)
+            data = None
+        else:
+            try:
+                data = await async_util.run_func(self.bot.loop, handler, self.bot, **msg.get('args', {}))
+            except Exception:
+                logger.exception("[shard] Error in handler '%s'", name)
+                data = None
+
+        if 'id' in msg and self.writer is not None:
+            write_message(self.writer, {'type': 'result', 'id': msg['id'], 'data': data})
+
+    @staticmethod
+    async def _handle_stop(bot, reason=None):
+        if bot.running:
+            await bot.stop(reason, forwarded=True)
+
+    async def stop(self, reason=None, restart=False):
+        """
+        Ask the supervisor to stop or restart every worker, including this one
+        """
+        write_message(self.writer, {'type': 'stop', 'reason': reason, 'restart': restart})
+        await self.writer.drain()
+
+    async def broadcast(self, name, **args):
+        """
+        Call a handler on every other worker, without waiting for the results
+        """
+        write_message(self.writer, {'type': 'broadcast', 'name': name, 'args': args})
+        await self.writer.drain()
+
+    async def gather(self, name, **args):
+        """
+        Call a handler on every worker, this one included
+
+        :return: A mapping of worker name to result
+        :rtype: dict
+        """
+        self._call_id += 1
+        call_id = self._call_id
+        self._calls[call_id] = fut = async_util.create_future(self.bot.loop)
+        write_message(self.writer, {'type': 'gather', 'id': call_id, 'name': name, 'args': args})
+        try:
+            return await asyncio.wait_for(fut, GATHER_TIMEOUT * 2)
+        finally:
+            self._calls.pop(call_id, None)
@@ -0,0 +1,230 @@
+"""
+async_db.py
+
+Database access for coroutine hooks, without a per-event executor.
+
+Queries made during one tick of the event loop are collected and handed to a single worker thread together, once
+the tick is over. The worker runs them in one transaction, up to `batch_size` requests at a time, so the many small
+queries made by hooks in the same tick share a single connection checkout and commit. Results are fully read
+in the worker thread before being handed back, so nothing touches the connection from the event loop.
+
+Hooks get it as the `adb` argument:
+
+    @hook.command
+    async def seen(text, adb):
+        row = (await adb.execute(table.select().where(table.c.name == text))).first()
+
+Each `execute()` is committed along with the rest of its batch. Several statements which must be applied together
+should be passed as one function to `run()`, which calls it with the batch's connection.
+
+If any request in a batch fails, the whole batch is rolled back. The failed request gets its error, and each of the
+others is run again in its own transaction, so one bad query only fails its own caller. Functions passed to `run()`
+can therefore be called twice, and must be safe to repeat: anything they do besides using the connection should be
+derived from what they read through it, like reloading a cache.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+
+__all__ = ('AsyncDatabase', 'Result', 'DEFAULT_BATCH_SIZE')
+
+logger = logging.getLogger("cloudbot")
+
+DEFAULT_BATCH_SIZE = 50
+
+_STOP = object()
+
+
+class Result:
+    """
+    The materialized result of a statement, usable after the connection it came from is gone
+
+    :type rows: list
+    :type rowcount: int
+    """
+
+    def __init__(self, rows, rowcount, inserted_primary_key=None):
+        self.rows = rows
+        self.rowcount = rowcount
+        self.inserted_primary_key = inserted_primary_key
+
+    @classmethod
+    def from_proxy(cls, proxy):
+        """
+        :type proxy: sqlalchemy.engine.ResultProxy
+        """
+        rows = proxy.fetchall() if proxy.returns_rows else []
+        inserted = None
+        if proxy.context.isinsert and not proxy.context.executemany:
+            inserted = proxy.inserted_primary_key
+
+        proxy.close()
+        return cls(rows, proxy.rowcount, inserted)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        row = self.first()
+        return row[0] if row is not None else None
+
+    def __repr__(self):
+        return "{}(rows={}, rowcount={})".format(type(self).__name__, len(self.rows), self.rowcount)
+
+
+class _Request:
+    __slots__ = ('func', 'future', 'loop')
+
+    def __init__(self, func, future, loop):
+        self.func = func
+        self.future = future
+        self.loop = loop
+
+    def _set(self, method, value):
+        if not self.future.done():
+            method(value)
+
+    def resolve(self, result=None, exc=None):
+        if exc is not None:
+            self.loop.call_soon_threadsafe(self._set, self.future.set_exception, exc)
+        else:
+            self.loop.call_soon_threadsafe(self._set, self.future.set_result, result)
+
+
+class AsyncDatabase:
+    """
+    A worker thread running queued database requests in batches
+
+    :type engine: sqlalchemy.engine.Engine
+    """
+
+    def __init__(self, engine, batch_size=DEFAULT_BATCH_SIZE):
+        self.engine = engine
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pending = []
+        self.requests = 0
+        self.batches = 0
+        self.retried_batches = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="cloudbot-db", daemon=True)
+                self._thread.start()
+
+    def _submit(self, func):
+        if self._thread is None:
+            self._start()
+
+        loop = asyncio.get_event_loop()
+        fut = loop.create_future()
+        if not self._pending:
+            loop.call_soon(self._flush)
+
+        self._pending.append(_Request(func, fut, loop))
+        return fut
+
+    def _flush(self):
+        pending = self._pending
+        self._pending = []
+        for start in range(0, len(pending), self.batch_size):
+            self._queue.put(pending[start:start + self.batch_size])
+
+    async def execute(self, statement, *multiparams, **params):
+        """
+        Run a statement and return its materialized result
+
+        :rtype: Result
+        """
+        def _execute(conn):
+            return Result.from_proxy(conn.execute(statement, *multiparams, **params))
+
+        return await self._submit(_execute)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Call `func(conn, *args, **kwargs)` in the worker thread, inside the batch's transaction
+
+        The function must not hold on to the connection or any result proxies after it returns. If another request in
+        the batch fails, the function is called again in a transaction of its own, so it must be safe to repeat.
+        """
+        return await self._submit(lambda conn: func(conn, *args, **kwargs))
+
+    def _work(self):
+        while True:
+            batch = self._queue.get()
+            if batch is _STOP:
+                return
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        results = []
+        failed = None
+        try:
+            with self.engine.connect() as conn:
+                with conn.begin():
+                    for req in batch:
+                        failed = req
+                        results.append(req.func(conn))
+
+                    # Anything failing from here on is the commit, which none of the requests are to blame for
+                    failed = None
+        except Exception as e:
+            if failed is not None:
+                failed.resolve(exc=e)
+            elif len(batch) == 1:
+                batch[0].resolve(exc=e)
+                return
+
+            retry = [req for req in batch if req is not failed]
+            if not retry:
+                return
+
+            self.retried_batches += 1
+            logger.debug("Database batch of %d requests failed, retrying %d individually", len(batch), len(retry))
+            for req in retry:
+                self._run_single(req)
+
+            return
+
+        for req, result in zip(batch, results):
+            req.resolve(result)
+
+    def _run_single(self, req):
+        try:
+            with self.engine.connect() as conn:
+                with conn.begin():
+                    result = req.func(conn)
+        except Exception as e:
+            req.resolve(exc=e)
+        else:
+            req.resolve(result)
+
+    def close(self, timeout=None):
+        """
+        Finish any queued requests and stop the worker thread
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
@@ -0,0 +1,278 @@
+"""
+cached_table.py
+
+An in-memory, key-indexed copy of a database table, kept up to date by writing through it.
+
+Plugins which keep a module-level cache of a table used to re-read the whole table after every write and often
+stored it as a list to be scanned. A CachedTable is loaded once, indexed by a key (and optionally other columns), and
+applies each write to the database and its own copy in one step:
+
+    location_cache = CachedTable(table, 'nick')
+
+    @hook.on_start()
+    def load_cache(db):
+        location_cache.load(db)
+
+    location_cache.get_value(nick.lower(), 'loc')
+    location_cache.set(db, {'nick': nick.lower(), 'loc': location})
+
+Keys are a single value for a single key column, or a tuple of values in column order for several. Rows are handed
+out as dicts, which must not be modified.
+
+A full load builds a new copy and swaps it in at once, so readers always see either the old or the new contents.
+Tables too big to hold in memory can be created with `lazy=True`, in which case `load()` reads nothing and rows are
+read from the database one key at a time, as `get()` is called with a `db`.
+"""
+
+import threading
+
+from sqlalchemy import and_
+
+__all__ = ('CachedTable',)
+
+_MISSING = object()
+
+
+def _columns(names):
+    if isinstance(names, str):
+        return (names,)
+
+    return tuple(names)
+
+
+class CachedTable:
+    """
+    :type table: sqlalchemy.Table
+    """
+
+    def __init__(self, table, key, *, indexes=(), lazy=False):
+        """
+        :param table: The table to cache
+        :param key: The column, or tuple of columns, rows are looked up by. Should be unique in the table.
+        :param indexes: Other columns, or tuples of columns, to group rows by for `lookup()`
+        :param lazy: Read rows one key at a time instead of loading the whole table
+        """
+        self.table = table
+        self.key_columns = _columns(key)
+        self._single_key = len(self.key_columns) == 1
+        self.index_columns = [_columns(index) for index in indexes]
+        self.lazy = lazy
+        self._lock = threading.RLock()
+        self._data = {}
+        self._indexes = self._empty_indexes()
+        # Keys known not to be in the table, in lazy mode
+        self._absent = set()
+
+    def _empty_indexes(self):
+        return {columns: {} for columns in self.index_columns}
+
+    def _make_key(self, row, columns):
+        if len(columns) == 1:
+            return row[columns[0]]
+
+        return tuple(row[name] for name in columns)
+
+    def key_of(self, row):
+        """
+        :type row: dict
+        """
+        return self._make_key(row, self.key_columns)
+
+    def _key_values(self, key):
+        return (key,) if self._single_key else tuple(key)
+
+    def _key_clause(self, key):
+        return and_(*(
+            self.table.c[name] == value for name, value in zip(self.key_columns, self._key_values(key))
+        ))
+
+    def _add(self, data, indexes, row):
+        key = self.key_of(row)
+        old = data.get(key)
+        if old is not None:
+            self._remove(data, indexes, key)
+
+        data[key] = row
+        for columns, index in indexes.items():
+            index.setdefault(self._make_key(row, columns), {})[key] = row
+
+    def _remove(self, data, indexes, key):
+        row = data.pop(key, None)
+        if row is None:
+            return None
+
+        for columns, index in indexes.items():
+            index_key = self._make_key(row, columns)
+            group = index.get(index_key)
+            if group is not None:
+                group.pop(key, None)
+                if not group:
+                    del index[index_key]
+
+        return row
+
+    def load(self, db):
+        """
+        (Re)load the whole table, or in lazy mode, just forget everything cached
+
+        :type db: sqlalchemy.orm.Session
+        """
+        data = {}
+        indexes = self._empty_indexes()
+        if not self.lazy:
+            for row in db.execute(self.table.select()):
+                self._add(data, indexes, dict(row))
+
+        with self._lock:
+            self._data, self._indexes = data, indexes
+            self._absent = set()
+
+    def _fetch(self, db, key):
+        row = db.execute(self.table.select().where(self._key_clause(key))).first()
+        with self._lock:
+            if row is None:
+                self._absent.add(key)
+                return None
+
+            row = dict(row)
+            self._add(self._data, self._indexes, row)
+            return row
+
+    def get(self, key, default=None, db=None):
+        """
+        Get the row with `key`, reading it from `db` if it isn't cached yet in lazy mode
+
+        :rtype: dict
+        """
+        row = self._data.get(key, _MISSING)
+        if row is _MISSING:
+            if self.lazy and db is not None and key not in self._absent:
+                row = self._fetch(db, key)
+                if row is not None:
+                    return row
+
+            return default
+
+        return row
+
+    def get_value(self, key, column, default=None, db=None):
+        row = self.get(key, db=db)
+        if row is None:
+            return default
+
+        return row[column]
+
+    def lookup(self, index, value):
+        """
+        Get the cached rows with `value` in the `index` columns
+
+        :type index: str | tuple[str]
+        :rtype: list[dict]
+        """
+        with self._lock:
+            return list(self._indexes[_columns(index)].get(value, {}).values())
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def values(self):
+        with self._lock:
+            return list(self._data.values())
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def cache_row(self, row):
+        """
+        Add or replace a row in the cache only, for rows which are already in the database
+
+        :type row: dict
+        """
+        with self._lock:
+            row = dict(row)
+            self._absent.discard(self.key_of(row))
+            self._add(self._data, self._indexes, row)
+
+    def uncache(self, key):
+        """
+        Drop a row from the cache only
+        """
+        with self._lock:
+            self._remove(self._data, self._indexes, key)
+
+    @staticmethod
+    def _default(column):
+        default = column.default
+        if default is not None and default.is_scalar:
+            return default.arg
+
+        return None
+
+    def set(self, db, values, commit=True):
+        """
+        Insert or update the row keyed by the key columns in `values`, in the database and the cache
+
+        :type db: sqlalchemy.orm.Session
+        :type values: dict
+        :return: The row as now cached
+        :rtype: dict
+        """
+        key = self.key_of(values)
+        changes = {name: value for name, value in values.items() if name not in self.key_columns}
+        res = None
+        existing = None
+        inserted = False
+        if changes:
+            res = db.execute(self.table.update().where(self._key_clause(key)).values(**changes))
+
+        if res is None or res.rowcount <= 0:
+            existing = db.execute(self.table.select().where(self._key_clause(key))).first() if res is None else None
+            if existing is None:
+                db.execute(self.table.insert().values(**values))
+                inserted = True
+
+        if commit:
+            db.commit()
+
+        base = None
+        if inserted:
+            base = {column.name: self._default(column) for column in self.table.columns}
+        elif key not in self._data:
+            # An existing row which isn't cached, read it back rather than guessing at the columns not in `values`
+            if existing is None:
+                existing = db.execute(self.table.select().where(self._key_clause(key))).first()
+
+            base = dict(existing)
+
+        with self._lock:
+            current = self._data.get(key)
+            row = dict(current) if current is not None and not inserted else base
+
+            row.update(values)
+            self._absent.discard(key)
+            self._add(self._data, self._indexes, row)
+
+        return row
+
+    def delete(self, db, key, commit=True):
+        """
+        Delete the row with `key` from the database and the cache
+
+        :type db: sqlalchemy.orm.Session
+        :return: Whether a row was deleted from the database
+        :rtype: bool
+        """
+        res = db.execute(self.table.delete().where(self._key_clause(key)))
+        if commit:
+            db.commit()
+
+        self.uncache(key)
+        return res.rowcount > 0
@@ -1,10 +1,281 @@
 """
 database - contains variables set by cloudbot to be easily access
+
+Also builds the bot's engine from the "database" and "database_options" config keys. For SQLite databases, pragmas
+are applied to every new connection, WAL journaling by default so readers and writers in different executor threads
+don't block each other:
+
+    "database_options": {
+        "sqlite": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -16000,
+            "mmap_size": 268435456,
+            "busy_timeout": 30000,
+            "temp_store": "MEMORY"
+        },
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 3600,
+        "batch_size": 50
+    }
+
+batch_size is the most queued requests cloudbot.util.async_db runs in one transaction.
+
+Plugin tables are created through a TableRegistry, which collects the tables registered during one tick of the event
+loop, as all plugins loaded together at startup do, and creates whichever are missing in one transaction.
 """
-from sqlalchemy import MetaData
+import asyncio
+import logging
+from collections import defaultdict
 
-__all__ = ('metadata', 'base')
+from sqlalchemy import MetaData, create_engine, event, inspect
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
+
+__all__ = ('metadata', 'base', 'DEFAULT_SQLITE_PRAGMAS', 'DEFAULT_POOL', 'make_engine', 'get_sqlite_pragmas',
+           'describe_engine', 'read_sqlite_pragmas', 'create_tables', 'TableRegistry')
+
+logger = logging.getLogger("cloudbot")
 
 # this is assigned in the CloudBot so that its recreated when the bot restarts
 metadata = MetaData()
 base = None
+
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    # NORMAL is safe from corruption in WAL mode, only the last transactions before a power loss can be lost
+    "synchronous": "NORMAL",
+    # negative values are in KiB
+    "cache_size": -16000,
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 30000,
+    "temp_store": "MEMORY",
+}
+
+DEFAULT_POOL = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 3600,
+}
+
+# Pragmas which take one of a fixed set of keywords, anything else is an integer
+_PRAGMA_KEYWORDS = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+    "locking_mode": {"NORMAL", "EXCLUSIVE"},
+}
+
+
+def _format_pragma(name, value):
+    """
+    >>> _format_pragma("synchronous", "normal")
+    'PRAGMA synchronous=NORMAL'
+    >>> _format_pragma("cache_size", -2000)
+    'PRAGMA cache_size=-2000'
+    """
+    if name in _PRAGMA_KEYWORDS:
+        value = str(value).upper()
+        if value not in _PRAGMA_KEYWORDS[name]:
+            raise ValueError("Invalid value {!r} for SQLite pragma {}".format(value, name))
+
+        return "PRAGMA {}={}".format(name, value)
+
+    if not name.isidentifier():
+        raise ValueError("Invalid SQLite pragma {!r}".format(name))
+
+    return "PRAGMA {}={:d}".format(name, int(value))
+
+
+def get_sqlite_pragmas(options):
+    """
+    Merge the configured SQLite pragmas over the defaults, a pragma set to null is left at SQLite's default
+
+    >>> get_sqlite_pragmas({"sqlite": {"synchronous": "FULL", "mmap_size": None}})["synchronous"]
+    'FULL'
+
+    :type options: dict
+    :rtype: dict
+    """
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS)
+    pragmas.update(options.get("sqlite", {}))
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def _is_memory_db(url):
+    return not url.database or url.database == ":memory:"
+
+
+def make_engine(db_url, options=None):
+    """
+    Create the bot's engine, choosing a pool to suit the database and applying SQLite pragmas on connect
+
+    File-based SQLite databases get a QueuePool shared between threads, instead of SQLAlchemy's default of a new
+    connection per checkout, so pragmas only run once per connection. In-memory databases keep one connection per
+    thread, as each connection would otherwise see a different database.
+
+    :type db_url: str
+    :type options: dict | None
+    :rtype: sqlalchemy.engine.Engine
+    """
+    options = options or {}
+    url = make_url(db_url)
+    pool = dict(DEFAULT_POOL)
+    pool.update({key: options[key] for key in DEFAULT_POOL if key in options})
+
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(url, **pool)
+
+    if _is_memory_db(url):
+        engine = create_engine(url, poolclass=SingletonThreadPool)
+    else:
+        engine = create_engine(
+            url, poolclass=QueuePool, connect_args={"check_same_thread": False},
+            pool_size=pool["pool_size"], max_overflow=pool["max_overflow"], pool_timeout=pool["pool_timeout"]
+        )
+
+    pragmas = get_sqlite_pragmas(options)
+    statements = [_format_pragma(name, value) for name, value in pragmas.items()]
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+
+        cursor.close()
+
+    @event.listens_for(engine, "first_connect")
+    def _log_pragmas(dbapi_conn, _record):
+        # first_connect runs before connect, so apply the pragmas before reading them back
+        _on_connect(dbapi_conn, _record)
+        logger.info("SQLite settings in effect: %s", ", ".join(read_sqlite_pragmas(dbapi_conn, pragmas)))
+
+    return engine
+
+
+def read_sqlite_pragmas(dbapi_conn, names):
+    """
+    Read back pragma values from a connection, which may differ from those configured
+    (an in-memory database can't use WAL, for example)
+
+    :rtype: list[str]
+    """
+    cursor = dbapi_conn.cursor()
+    values = []
+    try:
+        for name in names:
+            # Pragmas which don't apply to the database, like mmap_size for an in-memory one, return no rows
+            row = cursor.execute("PRAGMA {}".format(name)).fetchone()
+            values.append("{}={}".format(name, row[0] if row else "n/a"))
+    finally:
+        cursor.close()
+
+    return values
+
+
+def describe_engine(engine):
+    """
+    Describe the engine's database and pool, without connecting to it
+
+    :type engine: sqlalchemy.engine.Engine
+    :rtype: str
+    """
+    pool = engine.pool
+    desc = "{} using {}".format(repr(engine.url), type(pool).__name__)
+    if isinstance(pool, QueuePool):
+        desc += "(size={}, overflow={}, timeout={})".format(pool.size(), pool._max_overflow, pool._timeout)
+
+    return desc
+
+
+def create_tables(engine, tables):
+    """
+    Create any of `tables` which don't exist yet, in one transaction
+
+    The existing tables are read with a single query per schema, instead of checking each table separately.
+
+    :type engine: sqlalchemy.engine.Engine
+    :type tables: list[sqlalchemy.Table]
+    :return: The tables which were created
+    :rtype: list[sqlalchemy.Table]
+    """
+    by_schema = defaultdict(list)
+    for table in tables:
+        by_schema[table.schema].append(table)
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        missing = []
+        for schema, schema_tables in by_schema.items():
+            existing = set(inspector.get_table_names(schema=schema))
+            missing.extend(table for table in schema_tables if table.name not in existing)
+
+        if missing:
+            missing[0].metadata.create_all(conn, tables=missing, checkfirst=False)
+
+    return missing
+
+
+class TableRegistry:
+    """
+    Creates the tables registered during each tick of the event loop together, in the loop's executor
+
+    :type engine: sqlalchemy.engine.Engine
+    """
+
+    def __init__(self, engine, loop):
+        self.engine = engine
+        self.loop = loop
+        self._pending = []
+        self.batches = 0
+        self.created = 0
+
+    async def register(self, tables):
+        """
+        Wait for `tables` to be created along with any others registered in the same tick
+
+        If creating the batch fails, `tables` are retried on their own, so only the plugin they're from fails.
+
+        :type tables: list[sqlalchemy.Table]
+        """
+        fut = self.loop.create_future()
+        if not self._pending:
+            self.loop.call_soon(self._flush)
+
+        self._pending.append((tables, fut))
+        try:
+            await asyncio.shield(fut)
+        except Exception:
+            logger.warning("Creating tables in a batch failed, retrying %s on their own",
+                           ", ".join(table.name for table in tables))
+            await self.loop.run_in_executor(None, create_tables, self.engine, tables)
+
+    def _flush(self):
+        pending = self._pending
+        self._pending = []
+        tables = []
+        for plugin_tables, _ in pending:
+            tables.extend(table for table in plugin_tables if table not in tables)
+
+        self.batches += 1
+        task = self.loop.run_in_executor(None, create_tables, self.engine, tables)
+
+        def _done(done_fut):
+            exc = done_fut.exception()
+            if exc is None:
+                self.created += len(done_fut.result())
+
+            for _, fut in pending:
+                if fut.done():
+                    continue
+
+                if exc is not None:
+                    fut.set_exception(exc)
+                else:
+                    fut.set_result(None)
+
+        task.add_done_callback(_done)
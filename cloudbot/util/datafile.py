@@ -0,0 +1,215 @@
+"""
+datafile.py
+
+Random access to the lines of large text files in the data directory, without loading them into memory.
+
+A DataFile builds an index of where each line starts, stored as a compact array of ints, and reads individual lines
+through a read-only memory map as they're asked for. The index is rebuilt when the file's modification time or size
+changes, and can optionally be cached on disk next to the file so it survives restarts.
+
+    fortunes = DataFile(os.path.join(bot.data_dir, "fortunes.txt"), skip_comments=True)
+    fortunes.random_line()
+    fortunes[0]
+"""
+
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from array import array
+
+__all__ = ('DataFile', 'COMMENT_PREFIX', 'INDEX_SUFFIX')
+
+COMMENT_PREFIX = b"//"
+
+INDEX_SUFFIX = ".idx"
+
+# Index cache header: magic, format version, file mtime (ns), file size, whether comments were skipped, array typecode
+_HEADER = struct.Struct("<4sHqQ?c")
+_MAGIC = b"CBDI"
+_VERSION = 1
+
+
+def _build_index(data, skip_comments):
+    """
+    Find the start of every line in `data`, skipping lines starting with COMMENT_PREFIX if asked to
+
+    >>> list(_build_index(b"a\\n//b\\nc", True))
+    [0, 6]
+
+    :type data: bytes | mmap.mmap
+    :rtype: array
+    """
+    size = len(data)
+    offsets = array('I' if size < 2 ** 32 else 'Q')
+    pos = 0
+    while pos < size:
+        if not (skip_comments and data[pos:pos + len(COMMENT_PREFIX)] == COMMENT_PREFIX):
+            offsets.append(pos)
+
+        end = data.find(b"\n", pos)
+        if end == -1:
+            break
+
+        pos = end + 1
+
+    return offsets
+
+
+class DataFile:
+    """
+    A read-only, line-indexed view of a text file
+
+    Lines are decoded and stripped of surrounding whitespace as they're read.
+    """
+
+    def __init__(self, path, *, skip_comments=False, encoding="utf-8", cache_index=False, check_interval=5.0):
+        """
+        :param path: The file to read
+        :param skip_comments: Whether to leave out lines starting with "//"
+        :param cache_index: Whether to save the line index next to the file, to be reused on the next start
+        :param check_interval: Minimum seconds between checks for the file having changed
+        """
+        self.path = str(path)
+        self.skip_comments = skip_comments
+        self.encoding = encoding
+        self.cache_index = cache_index
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._file = None
+        self._map = None
+        self._size = 0
+        self._offsets = array('I')
+        self._stat = None
+        self._last_check = None
+        self.load()
+
+    @property
+    def index_path(self):
+        return self.path + INDEX_SUFFIX
+
+    def load(self):
+        """
+        (Re)open the file and index it
+        """
+        with self._lock:
+            self.close()
+            st = os.stat(self.path)
+            self._stat = (st.st_mtime_ns, st.st_size)
+            self._last_check = time.monotonic()
+            self._size = st.st_size
+            if not st.st_size:
+                # Empty files can't be mapped
+                self._offsets = array('I')
+                return
+
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            offsets = self._read_cached_index() if self.cache_index else None
+            if offsets is None:
+                offsets = _build_index(self._map, self.skip_comments)
+                if self.cache_index:
+                    self._write_cached_index(offsets)
+
+            self._offsets = offsets
+
+    def _read_cached_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                magic, version, mtime, size, skip_comments, typecode = _HEADER.unpack(header)
+                if (magic, version, (mtime, size), skip_comments) != (
+                        _MAGIC, _VERSION, self._stat, self.skip_comments
+                ):
+                    return None
+
+                offsets = array(typecode.decode())
+                offsets.frombytes(f.read())
+                return offsets
+        except (OSError, struct.error, ValueError):
+            return None
+
+    def _write_cached_index(self, offsets):
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                mtime, size = self._stat
+                f.write(_HEADER.pack(
+                    _MAGIC, _VERSION, mtime, size, self.skip_comments, offsets.typecode.encode()
+                ))
+                f.write(offsets.tobytes())
+
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # The data directory may be read-only, the index will just be rebuilt next time
+            pass
+
+    def _check(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+
+        self._last_check = now
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            # Keep serving the old contents if the file is being replaced
+            return
+
+        if (st.st_mtime_ns, st.st_size) != self._stat:
+            self.load()
+
+    def _read_line(self, index):
+        start = self._offsets[index]
+        end = self._map.find(b"\n", start)
+        if end == -1:
+            end = self._size
+
+        return self._map[start:end].decode(self.encoding, "replace").strip()
+
+    def __len__(self):
+        with self._lock:
+            self._check()
+            return len(self._offsets)
+
+    def __getitem__(self, index):
+        """
+        :type index: int
+        :rtype: str
+        """
+        with self._lock:
+            self._check()
+            return self._read_line(index)
+
+    def __iter__(self):
+        with self._lock:
+            self._check()
+            return iter([self._read_line(i) for i in range(len(self._offsets))])
+
+    def random_line(self, rand=random):
+        """
+        :param rand: The random number generator to use, anything with a `randrange()` method
+        :raises IndexError: If the file has no lines
+        :rtype: str
+        """
+        with self._lock:
+            self._check()
+            if not self._offsets:
+                raise IndexError("Cannot choose a line from an empty file")
+
+            return self._read_line(rand.randrange(len(self._offsets)))
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __repr__(self):
+        return "{}({!r}, lines={})".format(type(self).__name__, self.path, len(self._offsets))
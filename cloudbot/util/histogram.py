@@ -0,0 +1,161 @@
+"""
+histogram.py
+
+Fixed-bucket, log-scale histograms for recording latencies with a constant memory footprint.
+
+Values are sorted into geometrically sized buckets, so any percentile read back from the histogram is accurate to
+within one bucket width (roughly 25% of the value) no matter how many samples have been recorded.
+"""
+
+import bisect
+import math
+from array import array
+
+__all__ = ('Histogram', 'BUCKET_BOUNDS')
+
+
+def _make_bounds(lowest, highest, growth):
+    bounds = []
+    value = lowest
+    while value < highest:
+        bounds.append(value)
+        value *= growth
+
+    bounds.append(highest)
+    return tuple(bounds)
+
+
+# Upper bounds (in seconds) of each bucket, from 10 microseconds to ~16 minutes.
+# Anything larger lands in a final overflow bucket.
+BUCKET_BOUNDS = _make_bounds(1e-5, 1e3, 1.25)
+
+
+class Histogram:
+    """
+    A latency histogram with fixed log-scale buckets
+
+    >>> hist = Histogram()
+    >>> for i in range(1, 101):
+    ...     hist.record(i / 1000)
+    >>> hist.count
+    100
+    >>> 0.04 < hist.percentile(50) < 0.065
+    True
+    >>> hist.percentile(100)
+    0.1
+    """
+
+    __slots__ = ('_counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self._counts = array('I', [0]) * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """
+        Add a single sample to the histogram
+        :type value: float
+        """
+        if value < 0:
+            value = 0.0
+
+        self._counts[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Add all samples from another histogram to this one
+        :type other: Histogram
+        """
+        if not other.count:
+            return
+
+        for i, cnt in enumerate(other._counts):
+            if cnt:
+                self._counts[i] += cnt
+
+        self.count += other.count
+        self.total += other.total
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+
+    def to_state(self):
+        """
+        :return: The histogram's contents as plain, JSON serializable data
+        :rtype: dict
+        """
+        return {
+            'counts': {str(i): cnt for i, cnt in enumerate(self._counts) if cnt},
+            'total': self.total, 'min': self.min, 'max': self.max,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Rebuild a histogram from the output of `to_state()`
+
+        >>> hist = Histogram()
+        >>> hist.record(0.5)
+        >>> copy = Histogram.from_state(hist.to_state())
+        >>> (copy.count, copy.total, copy.percentile(50))
+        (1, 0.5, 0.5)
+        """
+        hist = cls()
+        for i, cnt in state['counts'].items():
+            hist._counts[int(i)] = cnt
+            hist.count += cnt
+
+        hist.total = state['total']
+        hist.min = state['min']
+        hist.max = state['max']
+        return hist
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+
+        return self.total / self.count
+
+    def percentile(self, pct):
+        """
+        Estimate the value below which `pct` percent of the samples fall
+        :type pct: float
+        :rtype: float | None
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, int(math.ceil(self.count * pct / 100)))
+        seen = 0
+        for i, cnt in enumerate(self._counts):
+            seen += cnt
+            if seen >= rank:
+                if i >= len(BUCKET_BOUNDS):
+                    return self.max
+
+                return max(self.min, min(BUCKET_BOUNDS[i], self.max))
+
+        return self.max  # pragma: no cover
+
+    def buckets(self):
+        """
+        Iterate over the cumulative count of samples at or below each bucket's upper bound,
+        ending with the overflow bucket as `float('inf')`
+        """
+        seen = 0
+        for bound, cnt in zip(BUCKET_BOUNDS + (float('inf'),), self._counts):
+            seen += cnt
+            yield bound, seen
@@ -9,13 +9,17 @@ import warnings
 from typing import Union
 from urllib.parse import quote_plus as _quote_plus
 
-from bs4 import BeautifulSoup
-from lxml import etree, html
 from multidict import MultiDict
 from yarl import URL
 
-# security
-parser = etree.XMLParser(resolve_entities=False, no_network=True)
+from cloudbot.util.lazy_import import lazy_module
+
+# bs4 and lxml are slow to import and only needed once a page is parsed
+bs4 = lazy_module("bs4")
+etree = lazy_module("lxml.etree")
+html = lazy_module("lxml.html")
+
+_parser = None
 
 ua_cloudbot = 'Cloudbot/DEV http://github.com/CloudDev/CloudBot'
 
@@ -56,7 +60,7 @@ def parse_soup(text, features=None, **kwargs):
     if features is None:
         features = 'lxml'
 
-    return BeautifulSoup(text, features=features, **kwargs)
+    return bs4.BeautifulSoup(text, features=features, **kwargs)
 
 
 def get_soup(*args, **kwargs):
@@ -68,6 +72,18 @@ def get_xml(*args, **kwargs):
     return parse_xml(get(*args, **kwargs))
 
 
+def get_xml_parser():
+    """
+    The parser used by parse_xml(), created on first use
+    """
+    global _parser
+    if _parser is None:
+        # security
+        _parser = etree.XMLParser(resolve_entities=False, no_network=True)
+
+    return _parser
+
+
 def parse_xml(text):
     """
     >>> elem = parse_xml('<foo>bar</foo>')
@@ -76,7 +92,7 @@ def parse_xml(text):
     >>> elem.text
     'bar'
     """
-    return etree.fromstring(text, parser=parser)  # nosec
+    return etree.fromstring(text, parser=get_xml_parser())  # nosec
 
 
 def get_json(*args, **kwargs):
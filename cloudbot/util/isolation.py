@@ -0,0 +1,219 @@
+"""
+isolation.py
+
+Runs CPU-bound functions in warm worker processes with CPU time, wall clock and memory limits, so they don't hold
+the GIL in the bot's process and a runaway call can be killed without taking anything else down.
+
+Each worker is a single process, reused between calls. Functions and their arguments and results must be picklable,
+which means functions need to be defined at the top level of a module. A worker which exceeds its CPU time or wall
+clock limit is killed and replaced with a fresh one. A call which exceeds the memory limit just raises MemoryError.
+
+Hooks can be run in a worker with the `isolated` hook option:
+    @hook.command(isolated=True)
+    def bf(text):
+        ...
+or with specific limits:
+    @hook.command(isolated={"cpu_time": 2, "memory": 64 * 1024 * 1024})
+
+Limits default to the "isolation" section of the config.
+"""
+
+import asyncio
+import logging
+import math
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows, calls are still moved out of process but only the wall clock limit applies
+    resource = None
+
+__all__ = ('IsolatedPool', 'IsolationTimeout', 'DEFAULT_LIMITS')
+
+logger = logging.getLogger("cloudbot")
+
+DEFAULT_LIMITS = {
+    "cpu_time": 5,  # seconds of CPU time per call
+    "wall_time": 10,  # seconds per call, including time spent waiting for a free worker
+    "memory": 128 * 1024 * 1024,  # bytes the worker may allocate on top of its size when the call starts
+}
+
+
+class IsolationTimeout(asyncio.TimeoutError):
+    pass
+
+
+def _vm_size():
+    """
+    :return: The current process's virtual memory size in bytes, or None if it can't be determined
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return pages * resource.getpagesize()
+
+
+def _set_soft_limit(limit, value):
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+
+    resource.setrlimit(limit, (value, hard))
+
+
+def _run_limited(func, args, cpu_time, memory):
+    """
+    Runs in the worker process, applying the limits for this call before running it
+    """
+    if resource is not None:
+        if cpu_time:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            # The kernel sends SIGXCPU, killing the worker, once the soft limit is passed
+            _set_soft_limit(resource.RLIMIT_CPU, int(math.ceil(usage.ru_utime + usage.ru_stime + cpu_time)))
+
+        size = _vm_size() if memory else None
+        if size is not None:
+            _set_soft_limit(resource.RLIMIT_AS, size + memory)
+
+    try:
+        return func(*args)
+    finally:
+        if resource is not None:
+            if memory:
+                _set_soft_limit(resource.RLIMIT_AS, resource.RLIM_INFINITY)
+
+            if cpu_time:
+                _set_soft_limit(resource.RLIMIT_CPU, resource.RLIM_INFINITY)
+
+
+def _noop():
+    pass
+
+
+class _Worker:
+    """
+    A single process, wrapped in an executor so results and exceptions are passed back for us
+    """
+
+    def __init__(self):
+        self.executor = ProcessPoolExecutor(max_workers=1)
+        self.calls = 0
+
+    def warm(self):
+        return self.executor.submit(_noop)
+
+    def kill(self):
+        # The executor has no way to interrupt a running call, so kill the process out from under it
+        for proc in list(getattr(self.executor, '_processes', {}).values()):
+            if proc.is_alive():
+                proc.kill()
+
+        self.executor.shutdown(wait=False)
+
+
+class IsolatedPool:
+    """
+    A fixed number of warm worker processes, handed out one call at a time
+
+    :type loop: asyncio.AbstractEventLoop
+    """
+
+    def __init__(self, loop, size=2, limits=None):
+        self.loop = loop
+        self.size = size
+        self.limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+
+        self._idle = None
+        self._workers = set()
+        self.calls = 0
+        self.killed = 0
+
+    def _start(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._add_worker()
+
+    def _add_worker(self):
+        worker = _Worker()
+        worker.warm()
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+    def _replace(self, worker):
+        logger.warning("Replacing isolated worker process after %d calls", worker.calls)
+        self.killed += 1
+        self._workers.discard(worker)
+        worker.kill()
+        self._add_worker()
+
+    async def run(self, func, *args, cpu_time=None, wall_time=None, memory=None):
+        """
+        Run `func(*args)` in a worker process
+
+        :param cpu_time: Seconds of CPU time the call may use, defaults to the pool's limit
+        :param wall_time: Seconds the call may take in total, defaults to the pool's limit
+        :param memory: Bytes the call may allocate, defaults to the pool's limit
+        :raises IsolationTimeout: If the call ran out of CPU or wall clock time
+        """
+        if self._idle is None:
+            self._start()
+
+        if cpu_time is None:
+            cpu_time = self.limits["cpu_time"]
+
+        if wall_time is None:
+            wall_time = self.limits["wall_time"]
+
+        if memory is None:
+            memory = self.limits["memory"]
+
+        end = self.loop.time() + wall_time if wall_time else None
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), wall_time or None)
+        except asyncio.TimeoutError:
+            raise IsolationTimeout(
+                "{} exceeded its {} second time limit waiting for a free worker".format(func.__name__, wall_time)
+            ) from None
+
+        self.calls += 1
+        worker.calls += 1
+        fut = asyncio.wrap_future(worker.executor.submit(_run_limited, func, args, cpu_time, memory), loop=self.loop)
+        healthy = False
+        try:
+            # Time spent waiting for the worker counts towards the limit
+            remaining = max(0, end - self.loop.time()) if end is not None else None
+            done, _ = await asyncio.wait([fut], timeout=remaining)
+            if not done:
+                raise IsolationTimeout("{} exceeded its {} second time limit".format(func.__name__, wall_time))
+
+            try:
+                result = fut.result()
+            except BrokenProcessPool:
+                raise IsolationTimeout(
+                    "{} was killed, most likely for exceeding its {} second CPU time limit".format(
+                        func.__name__, cpu_time
+                    )
+                ) from None
+            finally:
+                healthy = not isinstance(fut.exception(), BrokenProcessPool)
+        finally:
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                self._replace(worker)
+
+        return result
+
+    def close(self):
+        for worker in self._workers:
+            worker.kill()
+
+        self._workers.clear()
+        self._idle = None
@@ -0,0 +1,108 @@
+"""
+lazy_import.py
+
+Module proxies which import the real module the first time they're used.
+
+Several plugins depend on large libraries (tweepy, googlemaps, feedparser, geoip2, lxml, ...) which take tens to
+hundreds of milliseconds each to import, all of it spent before the bot can connect, even though most of them are only
+needed once a command is used. Importing them through a proxy moves that cost to the first use:
+
+    from cloudbot.util.lazy_import import lazy_module
+
+    feedparser = lazy_module("feedparser")
+
+    def get_feed(url):
+        return feedparser.parse(url)
+
+Submodules are looked up as attributes, so `lazy_module("geoip2").database` imports `geoip2.database` when it isn't
+already an attribute of the package. A name which is only ever used as `from x import y` can't be deferred this way,
+use `lazy_module("x").y` where it's needed instead.
+
+The import happens under a lock, so a proxy can be first used from several threads at once.
+"""
+
+import importlib
+import threading
+
+__all__ = ('LazyModule', 'lazy_module')
+
+
+class LazyModule:
+    """
+    A stand-in for a module which imports it on first attribute access
+    """
+
+    __slots__ = ('_name', '_module', '_lock')
+
+    def __init__(self, name):
+        """
+        :param name: The absolute name of the module to import
+        :type name: str
+        """
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    @property
+    def loaded(self):
+        """
+        Whether the module has been imported yet
+        """
+        return self._module is not None
+
+    def load(self):
+        """
+        Import the module now, if it hasn't been already
+
+        :rtype: module
+        """
+        module = self._module
+        if module is None:
+            with self._lock:
+                module = self._module
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    object.__setattr__(self, '_module', module)
+
+        return module
+
+    def __getattr__(self, item):
+        module = self.load()
+        try:
+            return getattr(module, item)
+        except AttributeError:
+            if item.startswith('__'):
+                raise
+
+        # Not imported by the package's __init__, try it as a submodule
+        try:
+            return importlib.import_module("{}.{}".format(self._name, item))
+        except ImportError:
+            raise AttributeError("module {!r} has no attribute {!r}".format(self._name, item)) from None
+
+    def __setattr__(self, key, value):
+        setattr(self.load(), key, value)
+
+    def __delattr__(self, item):
+        delattr(self.load(), item)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        if self._module is None:
+            return "<lazy module {!r} (not loaded)>".format(self._name)
+
+        return "<lazy module {!r}>".format(self._name)
+
+
+def lazy_module(name):
+    """
+    >>> json = lazy_module("json")
+    >>> json.dumps([1])
+    '[1]'
+
+    :type name: str
+    :rtype: LazyModule
+    """
+    return LazyModule(name)
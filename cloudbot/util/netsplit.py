@@ -0,0 +1,241 @@
+"""
+netsplit.py
+
+Netsplit detection and batching of the JOIN and QUIT storms around them.
+
+When servers split, every user on the far side quits at once with the two server names as the reason, and when the
+servers rejoin they all join back. Handling each of those lines on its own, through every raw hook, leaves the bot
+minutes behind. While a netsplit or a burst of joins and quits is under way, JOIN and QUIT lines from other users are
+collected instead, and every `batch_interval` seconds handed to the irc_batch hooks together, see
+cloudbot.bot.CloudBot.process_batch(). Normal handling resumes once `quiet_time` seconds pass without a netsplit quit
+or a burst.
+
+Configured from the "netsplit" section of a connection's config:
+
+    "netsplit": {
+        "enabled": true,
+        "burst_lines": 50,
+        "burst_window": 2,
+        "batch_interval": 0.5,
+        "max_batch": 1000,
+        "quiet_time": 10,
+        "rejoin_window": 900
+    }
+
+`burst_lines` joins and quits within `burst_window` seconds count as a burst. Users who quit in a netsplit and join
+again within `rejoin_window` seconds are passed to the hooks as returning, so plugins can skip greeting them.
+"""
+
+import logging
+import re
+from collections import OrderedDict
+
+from cloudbot.util import async_util
+
+__all__ = ('JoinQuitBatcher', 'is_netsplit_quit', 'BATCH_COMMANDS')
+
+logger = logging.getLogger("cloudbot")
+
+# Two server names, some networks hide them as "*.net *.split"
+netsplit_re = re.compile(r'^(?:[\w*-]+\.)+[\w*-]+ (?:[\w*-]+\.)+[\w*-]+$')
+
+# Lines which may be batched
+BATCH_COMMANDS = ("JOIN", "QUIT")
+
+# Lines which depend on the joins and quits before them being applied, so a pending batch is dispatched first
+ORDERED_COMMANDS = ("MODE", "NICK", "PART", "KICK", "353", "366")
+
+DEFAULTS = {
+    "enabled": True,
+    "burst_lines": 50,
+    "burst_window": 2,
+    "batch_interval": 0.5,
+    "max_batch": 1000,
+    "quiet_time": 10,
+    "rejoin_window": 900,
+}
+
+
+def is_netsplit_quit(reason):
+    """
+    Whether a quit reason is the one servers give users lost in a netsplit. Servers prefix the reasons users give
+    themselves, usually with "Quit: ", so they can't be mistaken for one.
+
+    >>> is_netsplit_quit("hub.example.net leaf.example.com")
+    True
+    >>> is_netsplit_quit("*.net *.split")
+    True
+    >>> is_netsplit_quit("Quit: hub.example.net leaf.example.com")
+    False
+    >>> is_netsplit_quit("Ping timeout: 240 seconds")
+    False
+    >>> is_netsplit_quit(None)
+    False
+
+    :type reason: str | None
+    :rtype: bool
+    """
+    return bool(reason) and netsplit_re.match(reason) is not None
+
+
+class JoinQuitBatcher:
+    """
+    Collects a connection's JOIN and QUIT lines while a netsplit or burst is under way
+
+    :type conn: cloudbot.client.Client
+    :type active: bool
+    """
+
+    def __init__(self, conn):
+        """
+        :type conn: cloudbot.client.Client
+        """
+        self.conn = conn
+        self.active = False
+
+        self._events = []
+        self._handle = None
+        self._quiet_handle = None
+        self._quiet_until = 0
+        self._window_start = 0
+        self._window_lines = 0
+
+        # Casefolded nicks of users who quit in a netsplit, to the time they quit, oldest first
+        self._split_nicks = OrderedDict()
+
+        self.storms = 0
+        self.batches = 0
+        self.batched_lines = 0
+
+    def get_setting(self, name):
+        return self.conn.config.get("netsplit", {}).get(name, DEFAULTS[name])
+
+    def add(self, event):
+        """
+        Take an event into the current batch, if it should be batched
+
+        :type event: cloudbot.event.Event
+        :return: True if the event was batched, False if it should be processed as normal
+        :rtype: bool
+        """
+        command = event.irc_command
+        if command not in BATCH_COMMANDS:
+            if self._events and command in ORDERED_COMMANDS:
+                self.flush()
+
+            return False
+
+        if not event.nick or event.nick.casefold() == self.conn.nick.casefold() or not self.get_setting("enabled"):
+            # Our own joins and quits are always handled as they arrive
+            self.flush()
+            return False
+
+        now = self.conn.loop.time()
+        storm = False
+        if command == "QUIT" and is_netsplit_quit(event.content):
+            nick = event.nick.casefold()
+            # Keep the dict ordered by time, so expired entries can be pruned from the front
+            self._split_nicks[nick] = now
+            self._split_nicks.move_to_end(nick)
+            storm = True
+
+        if now - self._window_start > self.get_setting("burst_window"):
+            self._window_start = now
+            self._window_lines = 0
+
+        self._window_lines += 1
+        if self._window_lines >= self.get_setting("burst_lines"):
+            storm = True
+
+        if storm:
+            if not self.active:
+                self.active = True
+                self.storms += 1
+                logger.info("[%s] Netsplit or join/quit burst detected, batching joins and quits", self.conn.name)
+
+            self._quiet_until = now + self.get_setting("quiet_time")
+            if self._quiet_handle is None:
+                self._quiet_handle = self.conn.loop.call_at(self._quiet_until, self._check_quiet)
+        elif self.active and now > self._quiet_until:
+            self._end_storm()
+
+        if not self.active:
+            return False
+
+        if not self._events:
+            # Counted as one pending event until the batch has been processed
+            self.conn.pending_events += 1
+
+        self._events.append(event)
+        if len(self._events) >= self.get_setting("max_batch"):
+            self.flush()
+        elif self._handle is None:
+            self._handle = self.conn.loop.call_later(self.get_setting("batch_interval"), self.flush)
+
+        return True
+
+    def _check_quiet(self):
+        self._quiet_handle = None
+        if not self.active:
+            return
+
+        if self.conn.loop.time() < self._quiet_until:
+            # Still going, check again once it may be over
+            self._quiet_handle = self.conn.loop.call_at(self._quiet_until, self._check_quiet)
+        else:
+            self._end_storm()
+
+    def _end_storm(self):
+        if self._quiet_handle is not None:
+            self._quiet_handle.cancel()
+            self._quiet_handle = None
+
+        self.flush()
+        self.active = False
+        logger.info("[%s] Join/quit burst over, resuming normal handling", self.conn.name)
+
+    def get_returning(self, events):
+        """
+        :type events: list[cloudbot.event.Event]
+        :return: The casefolded nicks of users in `events` joining again after a netsplit
+        :rtype: frozenset[str]
+        """
+        cutoff = self.conn.loop.time() - self.get_setting("rejoin_window")
+        split_nicks = self._split_nicks
+        while split_nicks:
+            _, quit_time = next(iter(split_nicks.items()))
+            if quit_time >= cutoff:
+                break
+
+            split_nicks.popitem(last=False)
+
+        if not split_nicks:
+            return frozenset()
+
+        return frozenset(
+            nick for nick in (event.nick.casefold() for event in events if event.irc_command == "JOIN")
+            if nick in split_nicks
+        )
+
+    def flush(self):
+        """
+        Dispatch the current batch now
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if not self._events:
+            return
+
+        events = self._events
+        self._events = []
+        self.batches += 1
+        self.batched_lines += len(events)
+        task = async_util.wrap_future(
+            self.conn.bot.process_batch(self.conn, events, self.get_returning(events)), loop=self.conn.loop
+        )
+        task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, _fut):
+        self.conn.pending_events -= 1
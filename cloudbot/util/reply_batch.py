@@ -0,0 +1,112 @@
+"""
+reply_batch.py
+
+Batching of long numeric replies, currently WHO replies.
+
+A WHO for a busy channel is answered with a line per member, and each of those lines going through every raw hook
+costs far more than the update it carries. The RPL_WHOREPLY (352) and RPL_WHOSPCRPL (354) lines of a reply are
+collected instead, and handed to the irc_batch hooks together when the RPL_ENDOFWHO (315) line arrives, see
+cloudbot.bot.CloudBot.process_batch(). The 315 line is dispatched as part of the batch. Lines are also dispatched once
+`max_batch` of them have built up, or `batch_interval` seconds after the first, so a reply which never ends isn't held
+back.
+
+Configured from the "reply_batch" section of a connection's config:
+
+    "reply_batch": {
+        "enabled": true,
+        "batch_interval": 1,
+        "max_batch": 1000
+    }
+"""
+
+import logging
+
+from cloudbot.util import async_util
+
+__all__ = ('WhoReplyBatcher', 'WHO_REPLIES', 'WHO_END')
+
+logger = logging.getLogger("cloudbot")
+
+# RPL_WHOREPLY and RPL_WHOSPCRPL
+WHO_REPLIES = ("352", "354")
+
+# RPL_ENDOFWHO
+WHO_END = "315"
+
+DEFAULTS = {
+    "enabled": True,
+    "batch_interval": 1,
+    "max_batch": 1000,
+}
+
+
+class WhoReplyBatcher:
+    """
+    Collects a connection's WHO reply lines
+
+    :type conn: cloudbot.client.Client
+    """
+
+    def __init__(self, conn):
+        """
+        :type conn: cloudbot.client.Client
+        """
+        self.conn = conn
+
+        self._events = []
+        self._handle = None
+
+        self.batches = 0
+        self.batched_lines = 0
+
+    def get_setting(self, name):
+        return self.conn.config.get("reply_batch", {}).get(name, DEFAULTS[name])
+
+    def add(self, event):
+        """
+        Take an event into the current batch, if it should be batched
+
+        :type event: cloudbot.event.Event
+        :return: True if the event was batched, False if it should be processed as normal
+        :rtype: bool
+        """
+        command = event.irc_command
+        if command not in WHO_REPLIES and command != WHO_END:
+            return False
+
+        if not self.get_setting("enabled"):
+            self.flush()
+            return False
+
+        if not self._events:
+            # Counted as one pending event until the batch has been processed
+            self.conn.pending_events += 1
+
+        self._events.append(event)
+        if command == WHO_END or len(self._events) >= self.get_setting("max_batch"):
+            self.flush()
+        elif self._handle is None:
+            self._handle = self.conn.loop.call_later(self.get_setting("batch_interval"), self.flush)
+
+        return True
+
+    def flush(self):
+        """
+        Dispatch the current batch now
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if not self._events:
+            return
+
+        events = self._events
+        self._events = []
+        self.batches += 1
+        self.batched_lines += len(events)
+        task = async_util.wrap_future(self.conn.bot.process_batch(self.conn, events), loop=self.conn.loop)
+        task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, _fut):
+        self.conn.pending_events -= 1
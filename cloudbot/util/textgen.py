@@ -41,12 +41,161 @@ License:
     SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
-import copy
+import bisect
 import random
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 
 TEMPLATE_RE = re.compile(r"{(.+?)\}")
 
+DEFAULT_WEIGHT = 5
+
+# Compiled part lists are shared between generators built from the same data, see `get_weighted_parts()`
+MAX_CACHED_PARTS = 1024
+
+_parts_cache = OrderedDict()
+# Hooks generating strings run in the executor, so the cache may be used from several threads at once
+_parts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def compile_template(text):
+    """
+    Split a template into literal text and placeholder names, which alternate starting with literal text
+
+    >>> compile_template("{thing} is {stuff}!")
+    ('', 'thing', ' is ', 'stuff', '!')
+
+    :type text: str
+    :rtype: tuple[str]
+    """
+    return tuple(TEMPLATE_RE.split(text))
+
+
+def fill_template(text, values):
+    """
+    Replace every placeholder in `text` which has a value in `values`, leaving the rest as they are
+
+    >>> fill_template("{a} and {b}", {"a": "x"})
+    'x and {b}'
+    """
+    tokens = compile_template(text)
+    if len(tokens) == 1:
+        return text
+
+    out = []
+    for i, token in enumerate(tokens):
+        if i % 2 == 0:
+            out.append(token)
+        elif token in values:
+            out.append(values[token])
+        else:
+            out.append("{" + token + "}")
+
+    return ''.join(out)
+
+
+class WeightedParts:
+    """
+    A list of parts with their weights, precomputed for sampling with `bisect`
+
+    Parts are either a plain value with the default weight of 5, or a (value, weight) pair.
+    """
+
+    __slots__ = ('values', 'cum_weights', 'weights', 'total', 'indices')
+
+    def __init__(self, parts):
+        self.values = []
+        self.weights = []
+        self.cum_weights = []
+        # Every index holding a given value, so a used value can be excluded wherever it appears
+        self.indices = {}
+        total = 0
+        for part in parts:
+            if isinstance(part, (list, tuple)):
+                value, weight = part
+            else:
+                value, weight = part, DEFAULT_WEIGHT
+
+            if weight <= 0:
+                continue
+
+            self.indices.setdefault(value, []).append(len(self.values))
+            total += weight
+            self.values.append(value)
+            self.weights.append(weight)
+            self.cum_weights.append(total)
+
+        self.total = total
+
+    def choice(self, rand=random, excluded=None, excluded_weight=0):
+        """
+        Pick a weighted random value, skipping the indices in `excluded`
+
+        :type excluded: set[int] | None
+        :param excluded_weight: The sum of the weights of the excluded indices
+        :return: The index of the chosen value
+        :rtype: int
+        """
+        remaining = self.total - excluded_weight
+        if remaining <= 0:
+            raise IndexError("No parts left to choose from")
+
+        if not excluded:
+            return bisect.bisect_right(self.cum_weights, rand.random() * self.total)
+
+        if remaining * 2 >= self.total:
+            # Most of the weight is still available, so just retry until we land on an unused part
+            while True:
+                index = bisect.bisect_right(self.cum_weights, rand.random() * self.total)
+                if index not in excluded:
+                    return index
+
+        target = rand.random() * remaining
+        seen = 0
+        for index, weight in enumerate(self.weights):
+            if index in excluded:
+                continue
+
+            seen += weight
+            if seen > target:
+                return index
+
+        # Floating point rounding can leave us just short of the end
+        return max(set(range(len(self.values))) - excluded)  # pragma: no cover
+
+
+def get_weighted_parts(parts):
+    """
+    Get the compiled form of a part list, reusing it between generators built from the same list
+
+    Part lists are expected not to change once they have been used to generate a string.
+
+    :type parts: list
+    :rtype: WeightedParts
+    """
+    key = id(parts)
+    with _parts_lock:
+        try:
+            cached_parts, compiled = _parts_cache[key]
+        except KeyError:
+            pass
+        else:
+            if cached_parts is parts:
+                _parts_cache.move_to_end(key)
+                return compiled
+
+    compiled = WeightedParts(parts)
+    with _parts_lock:
+        # Keep a reference to the list, so its id can't be reused while it's in the cache
+        _parts_cache[key] = (parts, compiled)
+        if len(_parts_cache) > MAX_CACHED_PARTS:
+            _parts_cache.popitem(last=False)
+
+    return compiled
+
 
 class TextGenerator(object):
     def __init__(self, templates, parts, default_templates=None, variables=None):
@@ -56,20 +205,8 @@ class TextGenerator(object):
         self.variables = variables
 
     def get_part(self, required_part, part_list):
-        _parts = part_list[required_part]
-        _weighted_parts = []
-        # this uses way too much code, but I wrote it at like 6am
-
-        for _part in _parts:
-            if isinstance(_part, (list, tuple)):
-                __part, __weight = _part
-                _weighted_parts.append((__part, __weight))
-            else:
-                __part = _part
-                _weighted_parts.append((__part, 5))
-
-        population = [val for val, cnt in _weighted_parts for _ in range(cnt)]
-        return random.choice(population)
+        weighted = get_weighted_parts(part_list[required_part])
+        return weighted.values[weighted.choice()]
 
     def generate_string(self, template=None):
         """
@@ -81,35 +218,43 @@ class TextGenerator(object):
         else:
             text = random.choice(self.templates)
 
-        # make a copy of parts for this string generation
-        _parts = copy.deepcopy(self.parts)
-
-        # get a list of all text parts we need
-        required_parts = TEMPLATE_RE.findall(text)
+        variables = self.variables or {}
+        # indices of the parts already used in this string, as each part is only used once per string
+        used = {}
+        out = []
+        for i, token in enumerate(compile_template(text)):
+            if i % 2 == 0:
+                out.append(token)
+                continue
 
-        # do magic
-        for required_part in required_parts:
-            # get the part
             try:
-                replacement = self.get_part(required_part, _parts)
+                part_list = self.parts[token]
             except KeyError:
+                # Not a part, fill it from the variables if we can
+                out.append(variables[token] if token in variables else "{" + token + "}")
                 continue
 
-            # remove the used part
-            for _part in _parts[required_part]:
-                if isinstance(_part, (list, tuple)) and _part[0] == replacement:
-                    _parts[required_part].remove(_part)
-                elif _part == replacement:
-                    _parts[required_part].remove(_part)
+            weighted = get_weighted_parts(part_list)
+            excluded, excluded_weight = used.get(token, (None, 0))
+            index = weighted.choice(random, excluded, excluded_weight)
+            value = weighted.values[index]
 
-            text = text.replace("{%s}" % required_part, replacement, 1)
+            # exclude every copy of the chosen value
+            if excluded is None:
+                excluded = set()
 
-        # replace static variables in the template with provided values
-        if self.variables:
-            for key, value in list(self.variables.items()):
-                text = text.replace("{%s}" % key, value)
+            for same in weighted.indices[value]:
+                if same not in excluded:
+                    excluded.add(same)
+                    excluded_weight += weighted.weights[same]
 
-        return text
+            used[token] = (excluded, excluded_weight)
+            if variables and '{' in value:
+                value = fill_template(value, variables)
+
+            out.append(value)
+
+        return ''.join(out)
 
     def generate_strings(self, amount):
         strings = []
@@ -1,11 +1,11 @@
 import re
-from collections import defaultdict
 
-from sqlalchemy import Table, Column, String, PrimaryKeyConstraint, select
+from sqlalchemy import Table, Column, String, PrimaryKeyConstraint
 
 from cloudbot import hook
 from cloudbot.event import EventType
 from cloudbot.util import database
+from cloudbot.util.cached_table import CachedTable
 
 table = Table(
     'badwords',
@@ -16,7 +16,7 @@ table = Table(
     PrimaryKeyConstraint('word', 'chan')
 )
 
-badcache = defaultdict(list)
+badcache = CachedTable(table, ('word', 'chan'), indexes=['chan'])
 
 
 class BadwordMatcher:
@@ -30,20 +30,19 @@ matcher = BadwordMatcher()
 @hook.command("loadbad", permissions=["badwords"], autohelp=False)
 def load_bad(db):
     """- Should run on start of bot to load the existing words into the regex"""
-    words = []
-    new_cache = defaultdict(list)
-    for chan, word in db.execute(select([table.c.chan, table.c.word])):
-        new_cache[chan.casefold()].append(word)
-        words.append(word)
+    badcache.load(db)
+    update_regex()
 
-    new_regex = re.compile(
+
+def update_regex():
+    words = [row["word"] for row in badcache.values()]
+    matcher.regex = re.compile(
         r'(\s|^|[^\w\s])({0})(\s|$|[^\w\s])'.format('|'.join(words)), re.IGNORECASE
     )
 
-    matcher.regex = new_regex
 
-    badcache.clear()
-    badcache.update(new_cache)
+def get_words(chan):
+    return [row["word"] for row in badcache.lookup('chan', chan.casefold())]
 
 
 @hook.command("addbad", permissions=["badwords"])
@@ -61,15 +60,14 @@ def add_bad(text, nick, db):
             word, channel
         )
 
-    if len(badcache[channel]) >= 10:
+    if len(get_words(channel)) >= 10:
         return "There are too many words listed for channel {}. Please remove a word using .rmbad before adding " \
                "anymore. For a list of bad words use .listbad".format(
             channel
         )
 
-    db.execute(table.insert().values(word=word, nick=nick, chan=channel))
-    db.commit()
-    load_bad(db)
+    badcache.set(db, {'word': word, 'nick': nick, 'chan': channel})
+    update_regex()
     wordlist = list_bad(channel)
     return "Current badwords: {}".format(wordlist)
 
@@ -82,10 +80,9 @@ def del_bad(text, db):
     if not channel.startswith('#'):
         return "Please specify a valid channel name after the bad word."
 
-    db.execute(table.delete().where(table.c.word == word).where(table.c.chan == channel))
-    db.commit()
+    badcache.delete(db, (word, channel))
     newlist = list_bad(channel)
-    load_bad(db)
+    update_regex()
     return "Removing {} new bad word list for {} is: {}".format(
         word, channel, newlist
     )
@@ -98,7 +95,7 @@ def list_bad(text):
     if not text.startswith('#'):
         return "Please specify a valid channel name"
 
-    return '|'.join(badcache[text])
+    return '|'.join(get_words(text))
 
 
 @hook.event([EventType.message, EventType.action], singlethread=True)
@@ -109,6 +106,6 @@ def check_badwords(conn, message, chan, content, nick):
 
     # Check to see if the match is for this channel
     word = match.group().lower().strip()
-    if word in badcache[chan]:
+    if word in get_words(chan):
         conn.cmd("KICK", chan, nick, "that fucking word is so damn offensive")
         message("{}, congratulations you've won!".format(nick))
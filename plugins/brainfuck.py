@@ -1,5 +1,10 @@
 """brainfuck interpreter adapted from (public domain) code at
-http://brainfuck.sourceforge.net/brain.py"""
+http://brainfuck.sourceforge.net/brain.py
+
+Programs are compiled to a list of ops before running: runs of +-<> become single ops, [-] clears the cell in one op,
+loops which only move the current cell's value into others ([->+>++<<] and the like) become a single multiply op, and
+bracket jumps are resolved ahead of time. MAX_STEPS counts compiled ops.
+"""
 
 import random
 import re
@@ -9,102 +14,191 @@ from cloudbot import hook
 BUFFER_SIZE = 5000
 MAX_STEPS = 1000000
 
+# Compiled op codes
+ADD = 0
+MOVE = 1
+JUMP_ZERO = 2
+JUMP_NONZERO = 3
+CLEAR = 4
+MULTIPLY = 5
+OUTPUT = 6
+INPUT = 7
+
 
 class UnbalancedBrackets(ValueError):
     pass
 
 
-class BrainfuckProgram:
-    def __init__(self, text):
-        self.op_map = {
-            '+': self.inc,
-            '-': self.dec,
-            '>': self.next_cell,
-            '<': self.prev_cell,
-            '.': self.print,
-            ',': self.set_random,
-            '[': self.loop_enter,
-            ']': self.loop_exit,
-        }
-
-        self.ip = 0  # instruction pointer
-        self.mp = 0  # memory pointer
-        self.steps = 0
-        self.memory = [0] * BUFFER_SIZE  # initial memory area
-        self.rightmost = 0
-        self.text = text
-        self.program_size = len(text)
-        self.output = ""
-        self.bracket_map = self.populate_brackets()
-
-    def populate_brackets(self):
-        open_brackets = []
-        bracket_map = {}
-        for pos, c in enumerate(self.text):
-            if c == '[':
-                open_brackets.append(pos)
-            elif c == ']':
-                if not open_brackets:
-                    raise UnbalancedBrackets()
-
-                pos1 = open_brackets.pop()
-                bracket_map[pos] = pos1
-                bracket_map[pos1] = pos
-
-        if open_brackets:
-            raise UnbalancedBrackets()
-
-        return bracket_map
-
-    def grow_memory(self):
-        self.memory.extend([0] * BUFFER_SIZE)
-
-    def get(self):
-        return self.memory[self.mp]
-
-    def set(self, val):
-        self.memory[self.mp] = val % 256
-        return self.get()
-
-    def set_random(self):
-        return self.set(random.randrange(1, 256))
-
-    def inc(self):
-        self.set(self.get() + 1)
-
-    def dec(self):
-        self.set(self.get() - 1)
-
-    def next_cell(self):
-        self.mp += 1
-        if self.mp > self.rightmost:
-            self.rightmost = self.mp
-            if self.mp >= len(self.memory):
-                # no restriction on memory growth!
-                self.grow_memory()
-
-    def prev_cell(self):
-        self.mp -= 1 % len(self.memory)
-
-    def get_op(self, pos):
-        return self.text[pos]
-
-    def get_cur_op(self):
-        return self.get_op(self.ip)
-
-    def loop_enter(self):
-        if self.get() == 0:
-            self.ip = self.bracket_map[self.ip]
+def _simple_loop(body):
+    """
+    If a loop body only adds to cells and ends up back where it started, decrementing the start cell by one each time,
+    work out how much each other cell gains per iteration
 
-    def loop_exit(self):
-        if self.get() != 0:
-            self.ip = self.bracket_map[self.ip]
+    :type body: str
+    :return: A list of (offset, factor) pairs, or None if the loop isn't that simple
+    :rtype: list[(int, int)] | None
+    """
+    offset = 0
+    deltas = {}
+    for c in body:
+        if c == '>':
+            offset += 1
+        elif c == '<':
+            offset -= 1
+        elif c == '+':
+            deltas[offset] = deltas.get(offset, 0) + 1
+        elif c == '-':
+            deltas[offset] = deltas.get(offset, 0) - 1
+        else:
+            return None
+
+    if offset != 0 or deltas.pop(0, 0) % 256 != 255:
+        return None
+
+    return [(off, factor % 256) for off, factor in sorted(deltas.items()) if factor % 256]
+
+
+def compile_program(text):
+    """
+    Compile brainfuck source to a list of (op, arg) tuples
 
-    def print(self):
-        self.output += chr(self.get())
+    >>> compile_program("+++>>-<[-]")
+    [(0, 3), (1, 2), (0, 255), (1, -1), (4, None)]
+    >>> compile_program("[->+>+++<<]")
+    [(5, ((1, 1), (2, 3)))]
 
+    :type text: str
+    :rtype: list[(int, object)]
+    """
+    ops = []
+    open_brackets = []
+    pos = 0
+    size = len(text)
+    while pos < size:
+        c = text[pos]
+        if c in '+-':
+            total = 0
+            while pos < size and text[pos] in '+-':
+                total += 1 if text[pos] == '+' else -1
+                pos += 1
+
+            if total % 256:
+                ops.append((ADD, total % 256))
+
+            continue
+
+        if c in '<>':
+            total = 0
+            while pos < size and text[pos] in '<>':
+                total += 1 if text[pos] == '>' else -1
+                pos += 1
+
+            if total:
+                ops.append((MOVE, total))
+
+            continue
+
+        if c == '[':
+            end = text.find(']', pos)
+            inner = text[pos + 1:end] if end != -1 else None
+            if inner is not None and '[' not in inner:
+                if inner in ('-', '+'):
+                    ops.append((CLEAR, None))
+                    pos = end + 1
+                    continue
+
+                factors = _simple_loop(inner)
+                if factors is not None:
+                    ops.append((MULTIPLY, tuple(factors)) if factors else (CLEAR, None))
+                    pos = end + 1
+                    continue
+
+            open_brackets.append(len(ops))
+            ops.append((JUMP_ZERO, None))
+        elif c == ']':
+            if not open_brackets:
+                raise UnbalancedBrackets()
+
+            start = open_brackets.pop()
+            # Each jump lands on its partner, which the interpreter then steps past
+            ops[start] = (JUMP_ZERO, len(ops))
+            ops.append((JUMP_NONZERO, start))
+        elif c == '.':
+            ops.append((OUTPUT, None))
+        elif c == ',':
+            ops.append((INPUT, None))
+
+        pos += 1
+
+    if open_brackets:
+        raise UnbalancedBrackets()
+
+    return ops
+
+
+def run_program(ops, max_steps=MAX_STEPS):
+    """
+    Run a compiled program
 
-@hook.command("brainfuck", "bf")
+    :type ops: list[(int, object)]
+    :return: The output, the number of ops run and whether the program ran out of steps before finishing
+    :rtype: (str, int, bool)
+    """
+    tape = bytearray(BUFFER_SIZE)
+    tape_len = BUFFER_SIZE
+    output = []
+    mp = 0
+    ip = 0
+    steps = 0
+    op_count = len(ops)
+    randrange = random.randrange
+    while ip < op_count:
+        if steps >= max_steps:
+            return ''.join(map(chr, output)), steps, True
+
+        steps += 1
+        op, arg = ops[ip]
+        if op == ADD:
+            tape[mp] = (tape[mp] + arg) & 255
+        elif op == MOVE:
+            mp += arg
+            if mp >= tape_len:
+                # no restriction on memory growth!
+                grow = max(BUFFER_SIZE, mp - tape_len + 1)
+                tape.extend(bytes(grow))
+                tape_len += grow
+        elif op == JUMP_ZERO:
+            if not tape[mp]:
+                ip = arg
+        elif op == JUMP_NONZERO:
+            if tape[mp]:
+                ip = arg
+        elif op == CLEAR:
+            tape[mp] = 0
+        elif op == MULTIPLY:
+            value = tape[mp]
+            if value:
+                for offset, factor in arg:
+                    pos = mp + offset
+                    if pos >= tape_len:
+                        grow = max(BUFFER_SIZE, pos - tape_len + 1)
+                        tape.extend(bytes(grow))
+                        tape_len += grow
+
+                    tape[pos] = (tape[pos] + value * factor) & 255
+
+                tape[mp] = 0
+        elif op == OUTPUT:
+            output.append(tape[mp])
+        else:
+            tape[mp] = randrange(1, 256)
+
+        ip += 1
+
+    return ''.join(map(chr, output)), steps, False
+
+
+@hook.command("brainfuck", "bf", isolated=True)
 def bf(text):
     """<prog> - executes <prog> as Brainfuck code
 
@@ -114,27 +208,21 @@ def bf(text):
     program_text = re.sub(r'[^][<>+\-.,]', '', text)
 
     try:
-        program = BrainfuckProgram(program_text)
+        ops = compile_program(program_text)
     except UnbalancedBrackets:
         return "Unbalanced brackets"
 
-    # the main program loop:
-    while program.ip < program.program_size:
-        program.op_map[program.get_cur_op()]()
-
-        program.ip += 1
-        program.steps += 1
-        if program.steps > MAX_STEPS:
-            if not program.output:
-                program.output = "(no output)"
+    output, _, exceeded = run_program(ops)
+    if exceeded:
+        if not output:
+            output = "(no output)"
 
-            program.output += "(exceeded {} iterations)".format(MAX_STEPS)
-            break
+        output += "(exceeded {} iterations)".format(MAX_STEPS)
 
-    stripped_output = re.sub(r'[\x00-\x1F]', '', program.output)
+    stripped_output = re.sub(r'[\x00-\x1F]', '', output)
 
     if not stripped_output:
-        if program.output:
+        if output:
             return "No printable output"
 
         return "No output"
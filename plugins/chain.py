@@ -30,7 +30,7 @@ def load_cache(db):
 
 
 def format_hook_name(_hook):
-    return _hook.plugin.title + "." + _hook.function.__name__
+    return _hook.plugin.title + "." + _hook.function_name
 
 
 def get_hook_from_command(bot, hook_name):
@@ -11,6 +11,7 @@ container = APIContainer()
 
 
 @hook.on_start
+@hook.config("api_keys.cleverbot")
 def make_api(bot):
     container.api = CleverWrap(bot.config.get_api_key("cleverbot"))
 
@@ -1,15 +1,22 @@
 """
 Track channel ops for permissions checks
 
+Users and channels are stored compactly, as large networks can have tens of thousands of users: both are classes with
+__slots__, keyed by their interned casefolded names, and each channel stores its members' statuses as a bitmask per
+member (with a bit set at each status' level) instead of an object per membership.
+
 Requires:
 server_info.py
 """
 import gc
 import json
 import logging
+import sys
 import time
 import weakref
-from collections import Mapping, Iterable, namedtuple
+from abc import ABCMeta, abstractmethod
+from collections import namedtuple
+from collections.abc import Iterable, Mapping, MutableMapping
 from contextlib import suppress
 from numbers import Number
 from operator import attrgetter
@@ -21,11 +28,53 @@ from cloudbot import hook
 from cloudbot.client import Client
 from cloudbot.clients.irc import IrcClient
 from cloudbot.util import web
-from cloudbot.util.mapping import KeyFoldDict, KeyFoldMixin
+from cloudbot.util.mapping import KeyFoldDict
 
 logger = logging.getLogger("cloudbot")
 
 
+def fold(name):
+    """
+    Casefold a nick or channel name for use as a key, interning it so each copy of the key is the same string
+
+    >>> fold("#Channel") is fold("#CHANNEL")
+    True
+
+    :type name: str
+    :rtype: str
+    """
+    return sys.intern(name.casefold())
+
+
+def status_bits(statuses):
+    """
+    Get the bitmask for a list of statuses
+
+    :type statuses: list[plugins.core.server_info.Status]
+    :rtype: int
+    """
+    bits = 0
+    for status in statuses:
+        bits |= 1 << status.level
+
+    return bits
+
+
+def get_status_list(conn, bits):
+    """
+    Get the statuses set in a bitmask, highest level first
+
+    :type conn: cloudbot.client.Client
+    :type bits: int
+    :rtype: list[plugins.core.server_info.Status]
+    """
+    if not bits:
+        return []
+
+    levels = {status.level: status for status in conn.memory["server_info"]["statuses"].values()}
+    return [levels[level] for level in sorted(levels, reverse=True) if bits >> level & 1]
+
+
 class WeakDict(dict):
     """
     A subclass of dict to allow it to be weakly referenced
@@ -50,34 +99,168 @@ class MemberNotFoundException(KeyError):
         ]
 
 
-class ChannelMembersDict(KeyFoldDict):
+class ChannelMembersDict(MutableMapping):
+    """
+    The members of a channel, keyed by casefolded nick
+
+    Stores each member's User and, only for members which have any, their status bitmask and extra data. Looking a
+    member up returns a Channel.Member view of those.
+    """
+
+    __slots__ = ('chan', '_users', '_status', '_data')
+
     def __init__(self, chan):
-        super().__init__()
         self.chan = weakref.ref(chan)
+        self._users = {}
+        self._status = {}
+        self._data = {}
+
+    def _member(self, key, user):
+        return Channel.Member(user, self.chan(), key)
 
     def __getitem__(self, item):
+        key = item.casefold()
         try:
-            return super().__getitem__(item)
+            user = self._users[key]
         except KeyError as e:
             raise MemberNotFoundException(item, self.chan()) from e
 
+        return self._member(key, user)
+
+    def __setitem__(self, key, member):
+        """
+        :type member: Channel.Member
+        """
+        self.add(member.user, member.status_bits)
+
     def __delitem__(self, item):
+        key = item.casefold()
         try:
-            super().__delitem__(item)
+            user = self._users.pop(key)
         except KeyError as e:
             raise MemberNotFoundException(item, self.chan()) from e
 
-    def pop(self, key, *args, **kwargs):
+        self._status.pop(key, None)
+        self._data.pop(key, None)
+        user.leave_channel(self.chan())
+
+    def __contains__(self, item):
+        return item.casefold() in self._users
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+    def get(self, key, default=None):
+        key = key.casefold()
+        user = self._users.get(key)
+        if user is None:
+            return default
+
+        return self._member(key, user)
+
+    def pop(self, key, *args):
         try:
-            return super().pop(key, *args, **kwargs)
-        except KeyError as e:
-            raise MemberNotFoundException(key, self.chan()) from e
+            member = self[key]
+        except KeyError:
+            if args:
+                return args[0]
 
+            raise
 
-class KeyFoldWeakValueDict(KeyFoldMixin, weakref.WeakValueDictionary):
-    """
-    KeyFolded WeakValueDictionary
-    """
+        del self[key]
+        return member
+
+    def clear(self):
+        chan = self.chan()
+        for user in self._users.values():
+            user.leave_channel(chan)
+
+        self._users.clear()
+        self._status.clear()
+        self._data.clear()
+
+    def add(self, user, bits=None):
+        """
+        Add a user to the channel, or update their status if they're already in it
+
+        :type user: User
+        :param bits: The member's status bitmask, None to leave it unchanged
+        :type bits: int | None
+        :rtype: Channel.Member
+        """
+        key = user.key
+        if self._users.get(key) is not user:
+            self._users[key] = user
+            chan = self.chan()
+            if chan not in user.chans:
+                user.chans += (chan,)
+
+        if bits is not None:
+            self.set_status_bits(key, bits)
+
+        return self._member(key, user)
+
+    def add_many(self, members):
+        """
+        Add users to the channel in bulk, like `add`
+
+        :param members: An iterable of (User, status bitmask) pairs
+        """
+        chan = self.chan()
+        users = self._users
+        for user, bits in members:
+            key = user.key
+            if users.get(key) is not user:
+                users[key] = user
+                if chan not in user.chans:
+                    user.chans += (chan,)
+
+            if bits:
+                self._status[key] = bits
+            else:
+                self._status.pop(key, None)
+
+    def rename(self, old_nick, new_nick):
+        """
+        Move a member to their new nick
+        """
+        old_key = fold(old_nick)
+        new_key = fold(new_nick)
+        self._users[new_key] = self._users.pop(old_key)
+        for data in (self._status, self._data):
+            if old_key in data:
+                data[new_key] = data.pop(old_key)
+
+    def get_status_bits(self, key):
+        """
+        :param key: A casefolded nick
+        :rtype: int
+        """
+        return self._status.get(key, 0)
+
+    def set_status_bits(self, key, bits):
+        """
+        :param key: A casefolded nick
+        :type bits: int
+        """
+        if bits:
+            self._status[key] = bits
+        else:
+            self._status.pop(key, None)
+
+    def get_data(self, key, create=False):
+        """
+        :param key: A casefolded nick
+        :param create: Whether to create the member's data if it doesn't have any yet
+        :rtype: dict | None
+        """
+        if create:
+            return self._data.setdefault(key, {})
+
+        return self._data.get(key)
 
 
 class ChanDict(KeyFoldDict):
@@ -93,20 +276,32 @@ class ChanDict(KeyFoldDict):
 
         self.conn = weakref.ref(conn)
 
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, fold(key), value)
+
     def getchan(self, name):
         """
         :type name: str
         """
-        try:
-            return self[name]
-        except KeyError:
-            self[name] = value = Channel(name, self.conn())
-            return value
+        key = fold(name)
+        value = dict.get(self, key)
+        if value is None:
+            value = Channel(name, self.conn())
+            dict.__setitem__(self, key, value)
+
+        return value
 
+    def __delitem__(self, key):
+        chan = self[key]
+        super().__delitem__(key)
+        chan.users.clear()
 
-class UsersDict(KeyFoldWeakValueDict):
+
+class UsersDict(KeyFoldDict):
     """
     Mapping for users on a network
+
+    Users are removed once they're no longer in any of the tracked channels.
     """
 
     def __init__(self, conn):
@@ -117,24 +312,37 @@ class UsersDict(KeyFoldWeakValueDict):
 
         self.conn = weakref.ref(conn)
 
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, fold(key), value)
+
     def getuser(self, nick):
         """
         :type nick: str
         """
-        try:
-            return self[nick]
-        except KeyError:
-            self[nick] = value = User(nick, self.conn())
-            return value
+        key = fold(nick)
+        value = dict.get(self, key)
+        if value is None:
+            value = User(nick, self.conn())
+            dict.__setitem__(self, key, value)
+
+        return value
+
+    def forget(self, user):
+        """
+        Remove a user if they're not in any channels
+
+        :type user: User
+        """
+        if not user.chans and dict.get(self, user.key) is user:
+            dict.__delitem__(self, user.key)
 
 
-class MappingAttributeAdapter:
+class MappingAttributeAdapter(metaclass=ABCMeta):
     """
     Map item lookups to attribute lookups
     """
 
-    def __init__(self):
-        self.data = {}
+    __slots__ = ()
 
     def __getitem__(self, item):
         try:
@@ -148,23 +356,69 @@ class MappingAttributeAdapter:
         else:
             setattr(self, key, value)
 
+    @abstractmethod
+    def as_dict(self):
+        """
+        The object's attributes, for serializing it
+
+        :rtype: dict
+        """
+        raise NotImplementedError
+
 
 class Channel(MappingAttributeAdapter):
     """
     Represents a channel and relevant data
     """
 
+    __slots__ = ('data', 'name', 'conn', 'users', 'receiving_names', '__weakref__')
+
     class Member(MappingAttributeAdapter):
         """
-        Store a user's membership with the channel
+        A view of a user's membership with the channel
         """
 
-        def __init__(self, user, channel):
+        __slots__ = ('user', 'channel', 'key')
+
+        def __init__(self, user, channel, key=None):
+            """
+            :type user: User
+            :type channel: Channel
+            :param key: The user's casefolded nick
+            """
             self.user = user
             self.channel = channel
-            self.conn = user.conn
-            self.status = []
-            super().__init__()
+            self.key = key or user.key
+
+        @property
+        def conn(self):
+            return self.user.conn
+
+        @property
+        def status_bits(self):
+            """
+            The bitmask of this member's statuses
+            """
+            return self.channel.users.get_status_bits(self.key)
+
+        @status_bits.setter
+        def status_bits(self, value):
+            self.channel.users.set_status_bits(self.key, value)
+
+        @property
+        def status(self):
+            """
+            The member's statuses, highest level first
+            """
+            return get_status_list(self.channel.conn, self.status_bits)
+
+        @status.setter
+        def status(self, value):
+            self.status_bits = status_bits(value)
+
+        @property
+        def data(self):
+            return self.channel.users.get_data(self.key, create=True)
 
         def add_status(self, status, sort=True):
             """
@@ -172,44 +426,64 @@ class Channel(MappingAttributeAdapter):
             :type status: plugins.core.server_info.Status
             :type sort: bool
             """
-            if status in self.status:
+            bit = 1 << status.level
+            bits = self.status_bits
+            if bits & bit:
                 logger.warning(
                     "[%s|chantrack] Attempted to add existing status "
                     "to channel member: %s %s",
                     self.conn.name, self, status
                 )
             else:
-                self.status.append(status)
-                if sort:
-                    self.sort_status()
+                self.status_bits = bits | bit
 
         def remove_status(self, status):
             """
             :type status: plugins.core.server_info.Status
             """
-            if status not in self.status:
+            bit = 1 << status.level
+            bits = self.status_bits
+            if not bits & bit:
                 logger.warning(
                     "[%s|chantrack] Attempted to remove status not set "
                     "on member: %s %s",
                     self.conn.name, self, status
                 )
             else:
-                self.status.remove(status)
+                self.status_bits = bits & ~bit
 
         def sort_status(self):
             """
-            Ensure the status list is properly sorted
+            Statuses are always sorted, kept for compatibility
             """
-            status = list(set(self.status))
-            status.sort(key=attrgetter("level"), reverse=True)
-            self.status = status
+
+        def as_dict(self):
+            return {
+                'user': self.user,
+                'channel': self.channel,
+                'conn': self.conn,
+                'status': self.status,
+                'data': self.channel.users.get_data(self.key) or {},
+            }
+
+        def __eq__(self, other):
+            if not isinstance(other, Channel.Member):
+                return NotImplemented
+
+            return self.user is other.user and self.channel is other.channel
+
+        def __hash__(self):
+            return hash((id(self.user), id(self.channel)))
+
+        def __repr__(self):
+            return "<Member {!r} in {!r}>".format(self.user.nick, self.channel.name)
 
     def __init__(self, name, conn):
         """
         :type name: str
         :type conn: cloudbot.client.Client
         """
-        super().__init__()
+        self.data = {}
         self.name = name
         self.conn = weakref.proxy(conn)
         self.users = ChannelMembersDict(self)
@@ -221,15 +495,23 @@ class Channel(MappingAttributeAdapter):
         :type create: bool
         :rtype: Channel.Member
         """
-        try:
-            data = self.users[user.nick]
-        except KeyError:
-            if not create:
-                raise
+        member = self.users.get(user.key)
+        if member is not None:
+            return member
 
-            self.users[user.nick] = data = self.Member(user, self)
+        if not create:
+            raise MemberNotFoundException(user.nick, self)
 
-        return data
+        return self.users.add(user)
+
+    def as_dict(self):
+        return {
+            'data': self.data,
+            'name': self.name,
+            'conn': self.conn,
+            'users': self.users,
+            'receiving_names': self.receiving_names,
+        }
 
 
 class User(MappingAttributeAdapter):
@@ -237,12 +519,19 @@ class User(MappingAttributeAdapter):
     Represent a user on a network
     """
 
+    __slots__ = (
+        'key', '_nick', 'ident', 'host', 'conn', 'realname', '_account', 'server', 'is_away', 'away_message',
+        'is_oper', 'chans', '_data',
+    )
+
     def __init__(self, name, conn):
         """
         :type name: str
         :type conn: cloudbot.client.Client
         """
-        self.mask = Prefix(name)
+        self.nick = name
+        self.ident = ''
+        self.host = ''
         self.conn = weakref.proxy(conn)
         self.realname = None
         self._account = None
@@ -253,17 +542,48 @@ class User(MappingAttributeAdapter):
 
         self.is_oper = False
 
-        self.channels = KeyFoldWeakValueDict()
-        super().__init__()
+        # The channels this user is in
+        self.chans = ()
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = {}
+
+        return self._data
+
+    @property
+    def channels(self):
+        """
+        The user's memberships, keyed by channel name
+
+        :rtype: KeyFoldDict
+        """
+        channels = KeyFoldDict()
+        for chan in self.chans:
+            channels[chan.name] = Channel.Member(self, chan, self.key)
+
+        return channels
 
     def join_channel(self, channel):
         """
         :type channel: Channel
+        :rtype: Channel.Member
         """
-        self.channels[channel.name] = memb = channel.get_member(
-            self, create=True
-        )
-        return memb
+        return channel.users.add(self)
+
+    def leave_channel(self, channel):
+        """
+        Remove a channel from the user's channels, forgetting the user if it was their last
+
+        :type channel: Channel
+        """
+        self.chans = tuple(chan for chan in self.chans if chan is not channel)
+        if not self.chans:
+            users = self.conn.memory.get("users")
+            if users is not None:
+                users.forget(self)
 
     @property
     def account(self):
@@ -284,33 +604,42 @@ class User(MappingAttributeAdapter):
         """
         The user's nickname
         """
-        return self.mask.nick
+        return self._nick
 
     @nick.setter
     def nick(self, value):
-        self.mask = Prefix(value, self.ident, self.host)
+        self._nick = value
+        self.key = fold(value)
 
     @property
-    def ident(self):
+    def mask(self):
         """
-        The user's ident/username
+        The user's full nick!ident@host mask
         """
-        return self.mask.user
-
-    @ident.setter
-    def ident(self, value):
-        self.mask = Prefix(self.nick, value, self.host)
+        return Prefix(self._nick, self.ident, self.host)
 
-    @property
-    def host(self):
+    @mask.setter
+    def mask(self, value):
         """
-        The user's host/address
+        :type value: Prefix
         """
-        return self.mask.host
-
-    @host.setter
-    def host(self, value):
-        self.mask = Prefix(self.nick, self.ident, value)
+        self.nick = value.nick
+        self.ident = value.user
+        self.host = value.host
+
+    def as_dict(self):
+        return {
+            'mask': self.mask,
+            'conn': self.conn,
+            'realname': self.realname,
+            '_account': self._account,
+            'server': self.server,
+            'is_away': self.is_away,
+            'away_message': self.away_message,
+            'is_oper': self.is_oper,
+            'channels': self.channels,
+            'data': self._data or {},
+        }
 
 
 # region util functions
@@ -332,6 +661,16 @@ def get_chans(conn):
     return conn.memory.setdefault("chan_data", ChanDict(conn))
 
 
+def find_user(conn, nick):
+    """
+    Get a user, if they're in any of the channels being tracked
+    :type conn: cloudbot.client.Client
+    :type nick: str
+    :rtype: User | None
+    """
+    return get_users(conn).get(nick)
+
+
 # endregion util functions
 
 
@@ -449,6 +788,10 @@ def init_chan_data(conn, _clear=True):
     if _clear:
         chan_data.clear()
         users.clear()
+        conn.memory.pop("who_replies", None)
+        queue = conn.memory.get("who_queue")
+        if queue is not None:
+            queue.cancel()
 
     return None
 
@@ -481,78 +824,232 @@ def parse_names_item(item, statuses, has_multi_prefix, has_userhost):
     return prefix.nick, prefix.user, prefix.host, user_status
 
 
+def _parse_names_bits(item, prefix_bits, has_multi_prefix, has_userhost):
+    """
+    parse_names_item, returning the status bitmask instead of a list of statuses
+    :param prefix_bits: Each status prefix on this network, mapped to its bit
+    """
+    bits = 0
+    while item[:1] in prefix_bits:
+        bits |= prefix_bits[item[:1]]
+        item = item[1:]
+        if not has_multi_prefix:
+            break
+
+    if not has_userhost:
+        return item, '', '', bits
+
+    # Equivalent to Prefix.parse(), without the regex
+    nick, _, host = item.partition('@')
+    nick, _, ident = nick.partition('!')
+    return nick, ident, host, bits
+
+
 def replace_user_data(conn, chan_data):
     """
     :type conn: cloudbot.client.Client
     :type chan_data: Channel
     """
-    statuses = {
-        status.prefix: status
-        for status in set(conn.memory["server_info"]["statuses"].values())
+    prefix_bits = {
+        status.prefix: 1 << status.level
+        for status in conn.memory["server_info"]["statuses"].values()
     }
     new_data = chan_data.data.pop("new_users", [])
     has_uh_i_n = is_cap_available(conn, "userhost-in-names")
     has_multi_pfx = is_cap_available(conn, "multi-prefix")
-    old_data = chan_data.data.pop('old_users', {})
+    old_data = chan_data.data.pop('old_users', ())
     new_names = set()
+    users = get_users(conn)
+    members = chan_data.users
+    new_members = []
 
     for name in new_data:
-        nick, ident, host, status = parse_names_item(
-            name, statuses, has_multi_pfx, has_uh_i_n
+        nick, ident, host, bits = _parse_names_bits(
+            name, prefix_bits, has_multi_pfx, has_uh_i_n
         )
 
-        new_names.update(nick.casefold())
+        user_data = users.getuser(nick)
+        new_names.add(user_data.key)
+        if user_data.nick != nick:
+            user_data.nick = nick
 
-        user_data = get_users(conn).getuser(nick)
-        user_data.nick = nick
         if ident:
             user_data.ident = ident
 
         if host:
             user_data.host = host
 
-        memb_data = user_data.join_channel(chan_data)
-        memb_data.status = status
+        new_members.append((user_data, bits))
+
+    members.add_many(new_members)
 
     for old_nick in old_data:
-        if old_nick not in new_names:
-            del chan_data.users[old_nick]
+        if old_nick not in new_names and old_nick in members:
+            del members[old_nick]
 
 
-@hook.irc_raw(['353', '366'], singlethread=True)
-def on_names(conn, irc_paramlist, irc_command):
+def names_reply(conn, chan, names):
     """
+    Store a line of a channel's NAMES reply, until the whole reply has been received
     :type conn: cloudbot.client.Client
-    :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
-    :type irc_command: str
+    :type chan: str
+    :type names: str
     """
-    chan = irc_paramlist[2 if irc_command == '353' else 1]
     chan_data = get_chans(conn).getchan(chan)
-    if irc_command == '366':
-        chan_data.receiving_names = False
-        replace_user_data(conn, chan_data)
-        return
-
     users = chan_data.data.setdefault("new_users", [])
     if not chan_data.receiving_names:
-        chan_data.data['old_users'] = old = ChannelMembersDict(chan_data)
-        old.update(chan_data.users)
+        # Members who were here before the NAMES reply started, any not in it will be removed
+        chan_data.data['old_users'] = set(chan_data.users)
 
         chan_data.receiving_names = True
         users.clear()
 
-    names = irc_paramlist[-1].strip()
-
     users.extend(names.split())
 
 
+def names_end(conn, chan):
+    """
+    Replace a channel's members with its whole NAMES reply, then queue a WHO for the channel if it hasn't had one
+    :type conn: cloudbot.client.Client
+    :type chan: str
+    """
+    chan_data = get_chans(conn).getchan(chan)
+    chan_data.receiving_names = False
+    replace_user_data(conn, chan_data)
+    if not chan_data.data.get('who_queued') and conn.config.get('sync_who', True):
+        chan_data.data['who_queued'] = True
+        get_who_queue(conn).add(chan_data.name)
+
+
+# Run in the event loop, as handing each line of a large NAMES reply to the executor costs more than handling it
+@hook.irc_raw(['353', '366'])
+async def on_names(conn, irc_paramlist, irc_command):
+    """
+    :type conn: cloudbot.client.Client
+    :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
+    :type irc_command: str
+    """
+    if irc_command == '366':
+        names_end(conn, irc_paramlist[1])
+    else:
+        names_reply(conn, irc_paramlist[2], irc_paramlist[-1].strip())
+
+
+# Marks replies to our own WHOX queries
+WHOX_TOKEN = "152"
+
+# The fields requested with WHOX: token, channel, ident, host, server, nick, flags, account and realname
+WHOX_FIELDS = "tcuhsnfar"
+
+# Apply stored WHO replies once this many have built up, even if the end of the reply hasn't been received
+WHO_BUFFER_LIMIT = 5000
+
+
+class WhoQueue:
+    """
+    Channels waiting for a WHO query
+
+    Queries are sent in groups of as many channels as the server accepts in one WHO, a group every `who_throttle`
+    seconds, so joining many channels at once doesn't flood the connection. WHOX is used where the server supports it,
+    to get each user's account along with the rest of their details.
+    """
+
+    def __init__(self, conn):
+        """
+        :type conn: cloudbot.client.Client
+        """
+        self.conn = weakref.proxy(conn)
+        self.pending = []
+        self._timer = None
+
+    def add(self, chan):
+        """
+        :type chan: str
+        """
+        if chan in self.pending:
+            return
+
+        self.pending.append(chan)
+        if self._timer is None:
+            self._timer = self.conn.loop.call_soon(self._flush)
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        self.pending.clear()
+
+    def _flush(self):
+        self._timer = None
+        try:
+            if not self.conn.connected:
+                self.pending.clear()
+                return
+        except ReferenceError:
+            return
+
+        serv_info = self.conn.memory.get("server_info", {})
+        group = self.pending[:get_who_targets(serv_info)]
+        del self.pending[:len(group)]
+        if is_whox_supported(serv_info):
+            self.conn.cmd("WHO", ','.join(group), "%{},{}".format(WHOX_FIELDS, WHOX_TOKEN))
+        else:
+            self.conn.cmd("WHO", ','.join(group))
+
+        if self.pending:
+            self._timer = self.conn.loop.call_later(self.conn.config.get('who_throttle', 1), self._flush)
+
+
+def get_who_queue(conn):
+    """
+    :type conn: cloudbot.client.Client
+    :rtype: WhoQueue
+    """
+    queue = conn.memory.get("who_queue")
+    if queue is None:
+        conn.memory["who_queue"] = queue = WhoQueue(conn)
+
+    return queue
+
+
+def is_whox_supported(serv_info):
+    """
+    :type serv_info: dict
+    """
+    return "WHOX" in serv_info.get("isupport_tokens", {})
+
+
+def get_who_targets(serv_info):
+    """
+    Get the number of channels the server accepts in one WHO query, from the TARGMAX token
+
+    >>> get_who_targets({"isupport_tokens": {"TARGMAX": "NAMES:1,WHO:4,PRIVMSG:3"}})
+    4
+    >>> get_who_targets({"isupport_tokens": {}})
+    1
+
+    :type serv_info: dict
+    :rtype: int
+    """
+    targmax = serv_info.get("isupport_tokens", {}).get("TARGMAX") or ''
+    for item in targmax.split(','):
+        name, _, value = item.partition(':')
+        if name.upper() == "WHO":
+            # No value means no limit, but don't make the reply too large
+            return int(value) if value else 10
+
+    return 1
+
+
 class MappingSerializer:
     """
     Serialize generic mappings to json
     """
 
     def __init__(self):
-        self._seen_objects = []
+        # Objects already serialized, by id, keeping them alive so their ids can't be reused by another object
+        self._seen_objects = {}
 
     def _serialize(self, obj):
         if isinstance(obj, (str, Number, bool)) or obj is None:
@@ -561,14 +1058,20 @@ class MappingSerializer:
         if isinstance(obj, Client):
             return '<client name={!r}>'.format(obj.name)
 
+        obj_id = id(obj)
         if isinstance(obj, MappingAttributeAdapter):
-            obj = vars(obj)
+            if obj_id in self._seen_objects:
+                return '<dict with id {}>'.format(obj_id)
+
+            self._seen_objects[obj_id] = obj
+            obj = obj.as_dict()
+            obj_id = id(obj)
 
         if isinstance(obj, Mapping):
-            if id(obj) in self._seen_objects:
-                return '<{} with id {}>'.format(type(obj).__name__, id(obj))
+            if obj_id in self._seen_objects:
+                return '<{} with id {}>'.format(type(obj).__name__, obj_id)
 
-            self._seen_objects.append(id(obj))
+            self._seen_objects[obj_id] = obj
 
             return {
                 self._serialize(k): self._serialize(v)
@@ -576,10 +1079,10 @@ class MappingSerializer:
             }
 
         if isinstance(obj, Iterable):
-            if id(obj) in self._seen_objects:
-                return '<{} with id {}>'.format(type(obj).__name__, id(obj))
+            if obj_id in self._seen_objects:
+                return '<{} with id {}>'.format(type(obj).__name__, obj_id)
 
-            self._seen_objects.append(id(obj))
+            self._seen_objects[obj_id] = obj
 
             return [
                 self._serialize(item)
@@ -611,16 +1114,8 @@ def perm_check(chan, conn, nick):
     except KeyError:
         return False
 
-    try:
-        memb = chan_data.users[nick]
-    except KeyError:
-        return False
-
-    status = memb.status
-    if status and status[0].level > 1:
-        return True
-
-    return False
+    # The highest status level is the highest bit set
+    return chan_data.users.get_status_bits(fold(nick)).bit_length() - 1 > 1
 
 
 @hook.command(permissions=["botcontrol"], autohelp=False)
@@ -727,33 +1222,74 @@ def clean_pms(bot):
                 pass
 
 
-@hook.irc_raw('JOIN')
-def on_join(nick, user, host, conn, irc_paramlist):
+def join_user(users, chans, nick, user, host, irc_paramlist, extended_join):
     """
+    :type users: UsersDict
+    :type chans: ChanDict
     :type nick: str
     :type user: str
     :type host: str
-    :type conn: cloudbot.client.Client
     :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
+    :type extended_join: bool
     """
     chan, *other_data = irc_paramlist
 
-    users = get_users(conn)
-
     user_data = users.getuser(nick)
 
     user_data.ident = user
     user_data.host = host
 
-    if is_cap_available(conn, "extended-join") and other_data:
+    if extended_join and other_data:
         acct, realname = other_data
         user_data.account = acct
         user_data.realname = realname
 
-    chan_data = get_chans(conn).getchan(chan)
+    chan_data = chans.getchan(chan)
     user_data.join_channel(chan_data)
 
 
+def quit_user(users, nick):
+    """
+    :type users: UsersDict
+    :type nick: str
+    """
+    if nick in users:
+        user = users.pop(nick)
+        for chan in user.chans:
+            del chan.users[nick]
+
+
+@hook.irc_raw('JOIN')
+def on_join(nick, user, host, conn, irc_paramlist):
+    """
+    :type nick: str
+    :type user: str
+    :type host: str
+    :type conn: cloudbot.client.Client
+    :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
+    """
+    join_user(
+        get_users(conn), get_chans(conn), nick, user, host, irc_paramlist, is_cap_available(conn, "extended-join")
+    )
+
+
+@hook.irc_batch(['JOIN', 'QUIT'])
+def on_join_quit_batch(conn, events):
+    """
+    Apply a batch of joins and quits from a netsplit, in the order they were received
+    :type conn: cloudbot.client.Client
+    :type events: list[cloudbot.event.Event]
+    """
+    users = get_users(conn)
+    chans = get_chans(conn)
+    extended_join = is_cap_available(conn, "extended-join")
+    for event in events:
+        if event.irc_command == 'JOIN':
+            join_user(users, chans, event.nick, event.user, event.host, event.irc_paramlist, extended_join)
+        else:
+            quit_user(users, event.nick)
+
+
 ModeChange = namedtuple('ModeChange', 'mode adding param is_status')
 
 
@@ -853,12 +1389,7 @@ def on_quit(nick, conn):
     :type nick: str
     :type conn: cloudbot.client.Client
     """
-    users = get_users(conn)
-    if nick in users:
-        user = users.pop(nick)
-        for memb in user.channels.values():
-            chan = memb.channel
-            del chan.users[nick]
+    quit_user(get_users(conn), nick)
 
 
 @hook.irc_raw('NICK')
@@ -876,16 +1407,12 @@ def on_nick(nick, irc_paramlist, conn):
     user = users.pop(nick)
     users[new_nick] = user
     user.nick = new_nick
-    for memb in user.channels.values():
-        chan_users = memb.channel.users
-        chan_users[new_nick] = chan_users.pop(nick)
+    for chan in user.chans:
+        chan.users.rename(nick, new_nick)
 
     if conn.nick.lower() in (nick.lower(), new_nick.lower()) and nick in chans:
+        # Users store their channels themselves, not by name, so only the mapping needs updating
         chans[new_nick] = chans.pop(nick)
-        pms = chans.getchan(new_nick)
-        for memb in pms.users.values():
-            user_chans = memb.user.channels
-            user_chans[new_nick] = user_chans.pop(nick)
 
 
 @hook.irc_raw('ACCOUNT')
@@ -895,7 +1422,9 @@ def on_account(conn, nick, irc_paramlist):
     :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
     :type conn: cloudbot.client.Client
     """
-    get_users(conn).getuser(nick).account = irc_paramlist[0]
+    user = find_user(conn, nick)
+    if user is not None:
+        user.account = irc_paramlist[0]
 
 
 @hook.irc_raw('CHGHOST')
@@ -906,7 +1435,10 @@ def on_chghost(conn, nick, irc_paramlist):
     :type conn: cloudbot.client.Client
     """
     ident, host = irc_paramlist
-    user = get_users(conn).getuser(nick)
+    user = find_user(conn, nick)
+    if user is None:
+        return
+
     user.ident = ident
     user.host = host
 
@@ -923,29 +1455,105 @@ def on_away(conn, nick, irc_paramlist):
     else:
         reason = None
 
-    user = get_users(conn).getuser(nick)
+    user = find_user(conn, nick)
+    if user is None:
+        return
+
     user.is_away = (reason is not None)
     user.away_message = reason
 
 
+def who_reply(conn, nick, ident, host, server, flags, realname, account=None):
+    """
+    Store a user from a WHO reply, to update them along with the rest of the reply
+    :param flags: The user's flags, H or G for here or gone (away) followed by * for IRC operators and their statuses
+    :param account: The user's account from WHOX, "0" if they aren't logged in, or None if it wasn't requested
+    """
+    replies = conn.memory.setdefault("who_replies", [])
+    replies.append((nick, ident, host, server, flags, realname, account))
+    if len(replies) >= WHO_BUFFER_LIMIT:
+        who_end(conn)
+
+
+def who_end(conn):
+    """
+    Update all the users from the stored WHO replies
+    :type conn: cloudbot.client.Client
+    """
+    replies = conn.memory.pop("who_replies", None)
+    if not replies:
+        return
+
+    users = get_users(conn)
+    for nick, ident, host, server, flags, realname, account in replies:
+        user = dict.get(users, nick.casefold())
+        if user is None:
+            continue
+
+        user.ident = ident
+        user.host = host
+        user.server = server
+        user.realname = realname
+        user.is_away = flags[:1] == "G"
+        user.is_oper = "*" in flags
+        if account is not None:
+            user.account = None if account == "0" else account
+
+
+def parse_who_line(conn, command, irc_paramlist):
+    """
+    Store a user from a 352 (WHO) or 354 (WHOX) reply line
+    :type conn: cloudbot.client.Client
+    :type command: str
+    :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
+    """
+    if command == '352':
+        _, _, ident, host, server, nick, flags, realname = irc_paramlist
+        realname = realname.split(None, 1)[1]
+        who_reply(conn, nick, ident, host, server, flags, realname)
+    elif len(irc_paramlist) == 10 and irc_paramlist[1] == WHOX_TOKEN:
+        _, _, _, ident, host, server, nick, flags, account, realname = irc_paramlist
+        who_reply(conn, nick, ident, host, server, flags, realname, account)
+
+
 @hook.irc_raw('352')
-def on_who(conn, irc_paramlist):
+async def on_who(conn, irc_paramlist):
     """
     :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
     :type conn: cloudbot.client.Client
     """
-    _, _, ident, host, server, nick, status, realname = irc_paramlist
-    realname = realname.split(None, 1)[1]
-    user = get_users(conn).getuser(nick)
-    status = list(status)
-    is_away = status.pop(0) == "G"
-    is_oper = status[:1] == "*"
-    user.ident = ident
-    user.host = host
-    user.server = server
-    user.realname = realname
-    user.is_away = is_away
-    user.is_oper = is_oper
+    parse_who_line(conn, '352', irc_paramlist)
+
+
+@hook.irc_raw('354')
+async def on_whox(conn, irc_paramlist):
+    """
+    :type irc_paramlist: cloudbot.util.parsers.irc.ParamList
+    :type conn: cloudbot.client.Client
+    """
+    parse_who_line(conn, '354', irc_paramlist)
+
+
+@hook.irc_batch(['352', '354', '315'])
+async def on_who_batch(conn, events):
+    """
+    Apply a batch of WHO reply lines, see cloudbot.util.reply_batch
+    :type conn: cloudbot.client.Client
+    :type events: list[cloudbot.event.Event]
+    """
+    for event in events:
+        if event.irc_command == '315':
+            who_end(conn)
+        else:
+            parse_who_line(conn, event.irc_command, event.irc_paramlist)
+
+
+@hook.irc_raw('315')
+async def on_who_end(conn):
+    """
+    :type conn: cloudbot.client.Client
+    """
+    who_end(conn)
 
 
 @hook.irc_raw('311')
@@ -955,7 +1563,10 @@ def on_whois_name(conn, irc_paramlist):
     :type conn: cloudbot.client.Client
     """
     _, nick, ident, host, _, realname = irc_paramlist
-    user = get_users(conn).getuser(nick)
+    user = find_user(conn, nick)
+    if user is None:
+        return
+
     user.ident = ident
     user.host = host
     user.realname = realname
@@ -968,7 +1579,9 @@ def on_whois_acct(conn, irc_paramlist):
     :type conn: cloudbot.client.Client
     """
     _, nick, acct = irc_paramlist[:3]
-    get_users(conn).getuser(nick).account = acct
+    user = find_user(conn, nick)
+    if user is not None:
+        user.account = acct
 
 
 @hook.irc_raw('301')
@@ -978,7 +1591,10 @@ def on_whois_away(conn, irc_paramlist):
     :type conn: cloudbot.client.Client
     """
     _, nick, msg = irc_paramlist
-    user = get_users(conn).getuser(nick)
+    user = find_user(conn, nick)
+    if user is None:
+        return
+
     user.is_away = True
     user.away_message = msg
 
@@ -990,7 +1606,9 @@ def on_whois_server(conn, irc_paramlist):
     :type conn: cloudbot.client.Client
     """
     _, nick, server, _ = irc_paramlist
-    get_users(conn).getuser(nick).server = server
+    user = find_user(conn, nick)
+    if user is not None:
+        user.server = server
 
 
 @hook.irc_raw('313')
@@ -1000,4 +1618,6 @@ def on_whois_oper(conn, irc_paramlist):
     :type conn: cloudbot.client.Client
     """
     nick = irc_paramlist[1]
-    get_users(conn).getuser(nick).is_oper = True
+    user = find_user(conn, nick)
+    if user is not None:
+        user.is_oper = True
@@ -6,6 +6,7 @@ from cloudbot.util import colors
 
 
 async def do_reconnect(conn, auto=True):
+    conn.memory["reconnects"] = conn.memory.get("reconnects", 0) + 1
     if conn.connected:
         conn.quit("Reconnecting...")
         await asyncio.sleep(5)
@@ -73,13 +74,32 @@ def format_conn(conn):
     ))
 
 
+def get_conn_list(bot):
+    return [format_conn(conn) for conn in bot.connections.values()]
+
+
+@hook.on_start
+def register_shard_handler(bot):
+    if bot.shard:
+        bot.shard.handlers["connections"] = get_conn_list
+
+
 @hook.command("connlist", "listconns", autohelp=False, permissions=["botcontrol"])
-def list_conns(bot):
+async def list_conns(bot):
     """- Lists all current connections and their status"""
-    conns = ', '.join(
-        map(format_conn, bot.connections.values())
-    )
-    return "Current connections: {}".format(conns)
+    if bot.shard:
+        # Include the connections run by every other worker
+        results = await bot.shard.gather("connections")
+        conns = []
+        for name, shard_conns in sorted(results.items()):
+            if shard_conns is None:
+                conns.append(colors.parse("$(red){}$(clear) (worker not responding)".format(name)))
+            else:
+                conns.extend(shard_conns)
+    else:
+        conns = get_conn_list(bot)
+
+    return "Current connections: {}".format(', '.join(conns))
 
 
 @hook.connect
@@ -154,6 +174,7 @@ def on_pong(conn, irc_paramlist):
 
 
 @hook.irc_raw('*')
+@hook.irc_batch('*')
 async def on_act(conn):
     now = time.time()
     conn.memory['last_activity'] = now
@@ -9,6 +9,51 @@ buckets = {}
 logger = logging.getLogger("cloudbot")
 
 
+class ConnSettings:
+    """
+    A connection's ACL, disabled command and rate limit settings, read once from its config
+    """
+
+    __slots__ = ('acls', 'disabled_commands', 'tokens', 'restore_rate', 'message_cost', 'strict')
+
+    def __init__(self, config):
+        self.acls = {
+            name: (_lower_set(acl.get('deny-except')), _lower_set(acl.get('allow-except')))
+            for name, acl in config.get('acls', {}).items() if acl
+        }
+        self.disabled_commands = set(config.get('disabled_commands', []))
+
+        ratelimit = config.get('ratelimit', {})
+        self.tokens = ratelimit.get('tokens', 17.5)
+        self.restore_rate = ratelimit.get('restore_rate', 2.5)
+        self.message_cost = ratelimit.get('message_cost', 5)
+        self.strict = ratelimit.get('strict', True)
+
+
+def _lower_set(values):
+    if values is None:
+        return None
+
+    return set(map(str.lower, values))
+
+
+# ConnSettings by connection name, rebuilt when the connections' config changes
+conn_settings = {}
+
+
+def get_settings(conn):
+    try:
+        return conn_settings[conn.name]
+    except LookupError:
+        conn_settings[conn.name] = settings = ConnSettings(conn.config)
+        return settings
+
+
+@hook.config("connections")
+def clear_settings():
+    conn_settings.clear()
+
+
 @hook.periodic(600)
 def task_clear():
     for uid, _bucket in buckets.copy().items():
@@ -19,23 +64,21 @@ def task_clear():
 @hook.sieve(priority=100)
 async def sieve_suite(bot, event, _hook):
     conn = event.conn
+    settings = get_settings(conn)
 
     # check acls
-    acl = conn.config.get('acls', {}).get(_hook.function_name)
+    acl = settings.acls.get(_hook.function_name)
     if acl:
-        if 'deny-except' in acl:
-            allowed_channels = list(map(str.lower, acl['deny-except']))
-            if event.chan.lower() not in allowed_channels:
-                return None
-        if 'allow-except' in acl:
-            denied_channels = list(map(str.lower, acl['allow-except']))
-            if event.chan.lower() in denied_channels:
-                return None
+        allowed_channels, denied_channels = acl
+        if allowed_channels is not None and event.chan.lower() not in allowed_channels:
+            return None
+
+        if denied_channels is not None and event.chan.lower() in denied_channels:
+            return None
 
     # check disabled_commands
     if _hook.type == "command":
-        disabled_commands = conn.config.get('disabled_commands', [])
-        if event.triggered_command in disabled_commands:
+        if event.triggered_command in settings.disabled_commands:
             return None
 
     # check permissions
@@ -55,10 +98,10 @@ async def sieve_suite(bot, event, _hook):
     if _hook.type == "command":
         uid = "!".join([conn.name, event.chan, event.nick]).lower()
 
-        tokens = conn.config.get('ratelimit', {}).get('tokens', 17.5)
-        restore_rate = conn.config.get('ratelimit', {}).get('restore_rate', 2.5)
-        message_cost = conn.config.get('ratelimit', {}).get('message_cost', 5)
-        strict = conn.config.get('ratelimit', {}).get('strict', True)
+        tokens = settings.tokens
+        restore_rate = settings.restore_rate
+        message_cost = settings.message_cost
+        strict = settings.strict
 
         if uid not in buckets:
             bucket = TokenBucket(tokens, restore_rate)
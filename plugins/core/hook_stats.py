@@ -1,103 +1,335 @@
 """
-Tracks successful and errored launches of all hooks, allowing users to query the stats
+Tracks successful and errored launches of all hooks, along with how long they took to run and how long they waited
+to start, allowing users to query the stats
 
 Author:
     - linuxdaemon <https://github.com/linuxdaemon>
 """
 
-from collections import defaultdict
+import sys
+import threading
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
 
 from cloudbot import hook
 from cloudbot.hook import Priority
 from cloudbot.util import web
 from cloudbot.util.formatting import gen_markdown_table
+from cloudbot.util.histogram import Histogram
 
+# Per-channel stats are dropped least-recently-used first once this many channels are tracked
+MAX_CHANNELS = 250
 
-def default_hook_counter():
-    return {'success': 0, 'failure': 0}
+_hook_keys = WeakKeyDictionary()
 
 
-def hook_sorter(n):
-    def _sorter(data):
-        return sum(data[n].values())
+class HookCounter:
+    """
+    Usage counts and latency histograms for a single hook in a single scope
+    """
 
-    return _sorter
+    __slots__ = ('success', 'failure', 'latency', 'queued')
+
+    def __init__(self, track_queue=True):
+        self.success = 0
+        self.failure = 0
+        self.latency = Histogram()
+        self.queued = Histogram() if track_queue else None
+
+    @property
+    def total(self):
+        return self.success + self.failure
+
+    def record(self, ok, run_time, queue_time):
+        if ok:
+            self.success += 1
+        else:
+            self.failure += 1
+
+        if run_time is not None:
+            self.latency.record(run_time)
+
+        if queue_time is not None and self.queued is not None:
+            self.queued.record(queue_time)
+
+    def merge(self, other):
+        """
+        :type other: HookCounter
+        """
+        self.success += other.success
+        self.failure += other.failure
+        self.latency.merge(other.latency)
+        if self.queued is not None and other.queued is not None:
+            self.queued.merge(other.queued)
+
+    def to_state(self):
+        return {
+            'success': self.success, 'failure': self.failure, 'latency': self.latency.to_state(),
+            'queued': self.queued.to_state() if self.queued is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        counter = cls(state['queued'] is not None)
+        counter.success = state['success']
+        counter.failure = state['failure']
+        counter.latency = Histogram.from_state(state['latency'])
+        if state['queued'] is not None:
+            counter.queued = Histogram.from_state(state['queued'])
+
+        return counter
+
+
+class HookStats:
+    """
+    Stats are recorded from the post hook, in executor threads, so anything iterating them from elsewhere takes a
+    snapshot with `global_snapshot()` or holds `lock`
+
+    :type global_stats: dict[str, HookCounter]
+    :type network: dict[str, dict[str, HookCounter]]
+    :type channel: OrderedDict[(str, str), dict[str, HookCounter]]
+    """
+
+    def __init__(self, max_channels=MAX_CHANNELS):
+        self.max_channels = max_channels
+        self.global_stats = {}
+        self.network = {}
+        self.channel = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _get_counter(data, key, track_queue=True):
+        try:
+            return data[key]
+        except LookupError:
+            data[key] = counter = HookCounter(track_queue)
+            return counter
+
+    def _get_channel(self, network, chan):
+        key = (network, chan)
+        try:
+            data = self.channel[key]
+        except LookupError:
+            self.channel[key] = data = {}
+            if len(self.channel) > self.max_channels:
+                self.channel.popitem(last=False)
+        else:
+            self.channel.move_to_end(key)
+
+        return data
+
+    def record(self, key, network, chan, ok, run_time=None, queue_time=None):
+        with self.lock:
+            self._record(key, network, chan, ok, run_time, queue_time)
+
+    def _record(self, key, network, chan, ok, run_time, queue_time):
+        self._get_counter(self.global_stats, key).record(ok, run_time, queue_time)
+        if network is None:
+            return
+
+        try:
+            net_data = self.network[network]
+        except LookupError:
+            self.network[network] = net_data = {}
+
+        self._get_counter(net_data, key).record(ok, run_time, queue_time)
+        if chan is None:
+            return
+
+        # Queue times aren't tracked per channel to keep the per-channel footprint small
+        self._get_counter(self._get_channel(network, chan), key, False).record(ok, run_time, None)
+
+    def global_snapshot(self):
+        """
+        :return: The global stats' (hook name, counter) pairs, as they are now
+        :rtype: list[(str, HookCounter)]
+        """
+        with self.lock:
+            return list(self.global_stats.items())
+
+    def to_state(self):
+        """
+        Serialize the global and per-network stats for sending between shard workers,
+        per-channel stats are left out as each network's channels only live in one worker anyway
+        """
+        with self.lock:
+            return {
+                'global': {key: counter.to_state() for key, counter in self.global_stats.items()},
+                'network': {
+                    network: {key: counter.to_state() for key, counter in data.items()}
+                    for network, data in self.network.items()
+                },
+            }
+
+    def merge_state(self, state):
+        """
+        Add serialized stats from another worker to these
+        """
+        for key, counter in state['global'].items():
+            self._get_counter(self.global_stats, key).merge(HookCounter.from_state(counter))
+
+        for network, data in state['network'].items():
+            net_data = self.network.setdefault(network, {})
+            for key, counter in data.items():
+                self._get_counter(net_data, key).merge(HookCounter.from_state(counter))
+
+
+def get_hook_key(_hook):
+    try:
+        return _hook_keys[_hook]
+    except LookupError:
+        _hook_keys[_hook] = key = sys.intern(_hook.plugin.title + '.' + _hook.function_name)
+        return key
 
 
 def get_stats(bot):
+    """
+    :rtype: HookStats
+    """
     try:
         stats = bot.memory["hook_stats"]
     except LookupError:
-        bot.memory["hook_stats"] = stats = {
-            'global': defaultdict(default_hook_counter),
-            'network': defaultdict(lambda: defaultdict(default_hook_counter)),
-            'channel': defaultdict(lambda: defaultdict(lambda: defaultdict(default_hook_counter))),
-        }
+        bot.memory["hook_stats"] = stats = HookStats()
 
     return stats
 
 
 @hook.post_hook(priority=Priority.HIGHEST)
-def stats_sieve(launched_event, error, bot, launched_hook):
+def stats_sieve(launched_event, error, bot, launched_hook, run_time, queue_time):
     chan = launched_event.chan
     conn = launched_event.conn
-    status = 'success' if error is None else 'failure'
     stats = get_stats(bot)
-    name = launched_hook.plugin.title + '.' + launched_hook.function_name
-    stats['global'][name][status] += 1
-    if conn:
-        stats['network'][conn.name.casefold()][name][status] += 1
+    network = conn.name.casefold() if conn else None
+    stats.record(
+        get_hook_key(launched_hook), network, chan.casefold() if (network and chan) else None, error is None,
+        run_time, queue_time
+    )
+
+
+def get_shard_stats(bot):
+    return get_stats(bot).to_state()
+
+
+@hook.on_start
+def register_shard_handler(bot):
+    if bot.shard:
+        bot.shard.handlers["hook_stats"] = get_shard_stats
+
+
+async def get_all_stats(bot):
+    """
+    Merge the stats from every shard worker into a single HookStats, keeping this worker's per-channel stats
 
-        if chan:
-            stats['channel'][conn.name.casefold()][chan.casefold()][name][status] += 1
+    :rtype: HookStats
+    """
+    local = get_stats(bot)
+    merged = HookStats()
+    merged.channel = local.channel
+    results = await bot.shard.gather("hook_stats")
+    for state in results.values():
+        if state is not None:
+            merged.merge_state(state)
+
+    return merged
+
+
+def format_ms(value):
+    if value is None:
+        return '-'
+
+    return '{:.1f}'.format(value * 1000)
+
+
+def latency_columns(counter):
+    return tuple(format_ms(counter.latency.percentile(pct)) for pct in (50, 95, 99))
+
+
+LATENCY_HEADERS = ("p50 (ms)", "p95 (ms)", "p99 (ms)")
 
 
 def do_basic_stats(data):
     table = [
-        (hook_name, str(count['success']), str(count['failure']))
-        for hook_name, count in sorted(data.items(), key=hook_sorter(1), reverse=True)
+        (hook_name, str(count.success), str(count.failure)) + latency_columns(count)
+        for hook_name, count in sorted(data.items(), key=lambda item: item[1].total, reverse=True)
     ]
-    return ("Hook", "Uses - Success", "Uses - Errored"), table
+    return ("Hook", "Uses - Success", "Uses - Errored") + LATENCY_HEADERS, table
 
 
-def do_global_stats(data):
-    return do_basic_stats(data['global'])
+def do_global_stats(bot, data):
+    return do_basic_stats(data.global_stats)
 
 
-def do_network_stats(data, network):
-    return do_basic_stats(data['network'][network.casefold()])
+def do_network_stats(bot, data, network):
+    return do_basic_stats(data.network.get(network.casefold(), {}))
 
 
-def do_channel_stats(data, network, channel):
-    return do_basic_stats(data['channel'][network.casefold()][channel.casefold()])
+def do_channel_stats(bot, data, network, channel):
+    return do_basic_stats(data.channel.get((network.casefold(), channel.casefold()), {}))
 
 
-def do_hook_stats(data, hook_name):
+def do_hook_stats(bot, data, hook_name):
     table = [
-        (net, chan, hooks[hook_name]) for net, chans in data['channel'].items() for chan, hooks in chans.items()
+        (net, chan, hooks[hook_name]) for (net, chan), hooks in data.channel.items() if hook_name in hooks
     ]
-    return ("Network", "Channel", "Uses - Success", "Uses - Errored"), \
+    return ("Network", "Channel", "Uses - Success", "Uses - Errored") + LATENCY_HEADERS, \
            [
-               (net, chan, str(count['success']), str(count['failure']))
-               for net, chan, count in sorted(table, key=hook_sorter(2), reverse=True)
+               (net, chan, str(count.success), str(count.failure)) + latency_columns(count)
+               for net, chan, count in sorted(table, key=lambda row: row[2].total, reverse=True)
            ]
 
 
+def do_slowest_stats(bot, data):
+    counters = [
+        (hook_name, count) for hook_name, count in data.global_stats.items() if count.latency.count
+    ]
+    counters.sort(key=lambda item: item[1].latency.percentile(95), reverse=True)
+    table = [
+        (hook_name, str(count.total)) + latency_columns(count) + (
+            format_ms(count.latency.max), format_ms(count.queued.percentile(95)),
+        )
+        for hook_name, count in counters
+    ]
+    return ("Hook", "Uses") + LATENCY_HEADERS + ("Max (ms)", "Queued p95 (ms)"), table
+
+
+def do_limit_stats(bot, data):
+    table = []
+    for plugin in bot.plugin_manager.plugins.values():
+        for hook_type, hooks in plugin.hooks.items():
+            for _hook in hooks:
+                if not (_hook.max_concurrency or _hook.timeout or _hook.rejected or _hook.timed_out):
+                    continue
+
+                table.append((
+                    plugin.title + '.' + _hook.function_name, hook_type,
+                    str(_hook.max_concurrency or '-'), str(_hook.timeout or '-'),
+                    str(_hook.rejected), str(_hook.timed_out),
+                ))
+
+    table.sort(key=lambda row: int(row[4]) + int(row[5]), reverse=True)
+    return ("Hook", "Type", "Max Concurrency", "Timeout", "Rejected", "Timed Out"), table
+
+
 stats_funcs = {
     'global': (do_global_stats, 0),
     'network': (do_network_stats, 1),
     'channel': (do_channel_stats, 2),
     'hook': (do_hook_stats, 1),
+    'slowest': (do_slowest_stats, 0),
+    'limits': (do_limit_stats, 0),
 }
 
 
 @hook.command(permissions=["snoonetstaff", "botcontrol"])
-def hookstats(text, bot, notice_doc):
-    """{global|network <name>|channel <network> <channel>|hook <hook>} - Get hook usage statistics"""
+async def hookstats(text, bot, notice_doc):
+    """{global|network <name>|channel <network> <channel>|hook <hook>|slowest|limits} - Get hook usage statistics"""
     args = text.split()
     stats_type = args.pop(0).lower()
 
-    data = get_stats(bot)
+    if bot.shard:
+        data = await get_all_stats(bot)
+    else:
+        data = get_stats(bot)
 
     try:
         handler, arg_count = stats_funcs[stats_type]
@@ -109,11 +341,11 @@ def hookstats(text, bot, notice_doc):
         notice_doc()
         return
 
-    headers, data = handler(data, *args[:arg_count])
+    headers, data = handler(bot, data, *args[:arg_count])
 
     if not data:
         return "No stats available."
 
     table = gen_markdown_table(headers, data)
 
-    return web.paste(table, 'md', 'hastebin')
+    return await bot.loop.run_in_executor(None, web.paste, table, 'md', 'hastebin')
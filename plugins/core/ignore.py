@@ -86,7 +86,7 @@ async def ignore_sieve(bot, event, _hook):
     :type _hook: cloudbot.plugin_hooks.Hook
     """
     # don't block event hooks
-    if _hook.type in ("irc_raw", "event"):
+    if _hook.type in ("irc_raw", "irc_batch", "event"):
         return event
 
     # don't block an event that could be unignoring
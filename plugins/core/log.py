@@ -207,36 +207,75 @@ def get_raw_log_stream(server):
     return log_stream
 
 
-@hook.irc_raw("*", singlethread=True)
-def log_raw(event):
+def write_raw(bot, conn, events):
     """
-    :type event: cloudbot.event.Event
+    :type bot: cloudbot.bot.CloudBot
+    :type conn: cloudbot.client.Client
+    :type events: list[cloudbot.event.Event]
     """
-    logging_config = event.bot.config.get("logging", {})
+    logging_config = bot.config.get("logging", {})
     if not logging_config.get("raw_file_log", False):
         return
 
-    stream = get_raw_log_stream(event.conn.name)
-    stream.write(event.irc_raw + os.linesep)
+    stream = get_raw_log_stream(conn.name)
+    # Prefix each line with the time it was received, allowing logs to be replayed with their original timing. Lines
+    # from a batch are stamped with the time it was handled, at most its batch interval late.
+    stamp = "{:.3f} ".format(time.time()) if logging_config.get("raw_file_log_timestamps", False) else ""
+    for event in events:
+        stream.write(stamp + event.irc_raw + os.linesep)
+
     stream.flush()
 
 
+def write_log(bot, conn, events):
+    """
+    :type bot: cloudbot.bot.CloudBot
+    :type conn: cloudbot.client.Client
+    :type events: list[cloudbot.event.Event]
+    """
+    logging_config = bot.config.get("logging", {})
+    if not logging_config.get("file_log", False):
+        return
+
+    streams = set()
+    for event in events:
+        text = format_event(event)
+
+        if text is not None:
+            if event.irc_command in ["PRIVMSG", "PART", "JOIN", "MODE", "TOPIC", "QUIT", "NOTICE"] and event.chan:
+                stream = get_log_stream(conn.name, event.chan)
+                stream.write(text + os.linesep)
+                streams.add(stream)
+
+    for stream in streams:
+        stream.flush()
+
+
+@hook.irc_raw("*", singlethread=True)
+def log_raw(event):
+    """
+    :type event: cloudbot.event.Event
+    """
+    write_raw(event.bot, event.conn, [event])
+
+
 @hook.irc_raw("*", singlethread=True)
 def log(event):
     """
     :type event: cloudbot.event.Event
     """
-    logging_config = event.bot.config.get("logging", {})
-    if not logging_config.get("file_log", False):
-        return
+    write_log(event.bot, event.conn, [event])
 
-    text = format_event(event)
 
-    if text is not None:
-        if event.irc_command in ["PRIVMSG", "PART", "JOIN", "MODE", "TOPIC", "QUIT", "NOTICE"] and event.chan:
-            stream = get_log_stream(event.conn.name, event.chan)
-            stream.write(text + os.linesep)
-            stream.flush()
+@hook.irc_batch("*", singlethread=True)
+def log_batch(bot, conn, events):
+    """
+    :type bot: cloudbot.bot.CloudBot
+    :type conn: cloudbot.client.Client
+    :type events: list[cloudbot.event.Event]
+    """
+    write_raw(bot, conn, events)
+    write_log(bot, conn, events)
 
 
 # Log console separately to prevent lag
@@ -251,6 +290,16 @@ async def console_log(bot, event):
         logger.info(text)
 
 
+@hook.irc_batch("*")
+async def console_log_batch(events):
+    """
+    :type events: list[cloudbot.event.Event]
+    """
+    lines = [text for text in map(format_event, events) if text is not None]
+    if lines:
+        logger.info('\n'.join(lines))
+
+
 @hook.command("flushlog", permissions=["botcontrol"])
 def flush_log():
     """- Flush all log streams"""
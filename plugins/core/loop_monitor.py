@@ -0,0 +1,207 @@
+"""
+Watches the event loop for stalls and attributes them to the hook that was running at the time
+
+A heartbeat callback runs on the loop every `interval` seconds while a watchdog thread checks that it keeps up. If the
+heartbeat falls more than `threshold` seconds behind, the watchdog captures the loop thread's stack and matches it
+against the hooks currently running, so the offender can be reported once the loop recovers.
+
+Configured through the "loop_monitor" section of the config, e.g.
+    "loop_monitor": {"enabled": true, "interval": 0.05, "threshold": 0.5, "history": 20, "report_interval": 300}
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from cloudbot import hook
+from cloudbot.util import web
+
+logger = logging.getLogger("cloudbot")
+
+PLUGIN_DIR = os.path.abspath("plugins")
+
+monitor = None
+
+
+class StallReport:
+    """
+    :type started: float
+    :type duration: float | None
+    :type hooks: list[cloudbot.plugin_hooks.Hook]
+    :type stack: traceback.StackSummary
+    """
+
+    def __init__(self, started, hooks, stack):
+        self.started = started
+        self.duration = None
+        self.hooks = hooks
+        self.stack = stack
+
+    @property
+    def location(self):
+        """
+        The innermost plugin frame in the captured stack, or the innermost frame if no plugin code was running
+        """
+        if not self.stack:
+            return None
+
+        for frame in reversed(self.stack):
+            if frame.filename.startswith(PLUGIN_DIR):
+                return frame
+
+        return self.stack[-1]
+
+    @property
+    def culprit(self):
+        if self.hooks:
+            return ', '.join(_hook.description for _hook in self.hooks)
+
+        return "no running hook"
+
+    def describe(self):
+        out = "Event loop stalled for {:.2f}s in {}".format(self.duration or 0, self.culprit)
+        frame = self.location
+        if frame is not None:
+            out += " ({}:{} in {})".format(os.path.relpath(frame.filename), frame.lineno, frame.name)
+
+        return out
+
+
+class LoopMonitor:
+    def __init__(self, bot, interval=0.05, threshold=0.5, history=20, report_interval=300):
+        self.bot = bot
+        self.loop = bot.loop
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+
+        self.reports = deque(maxlen=history)
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.suppressed = 0
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._current = None
+        self._last_beat = time.monotonic()
+        self._last_report = None
+        self._loop_thread = None
+        self._handle = None
+        self._thread = None
+
+    def start(self):
+        """
+        Start monitoring, must be called from the loop thread
+        """
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._handle = self.loop.call_later(self.interval, self._beat)
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            self.lag = max(0.0, now - self._last_beat - self.interval)
+            self._last_beat = now
+            report, self._current = self._current, None
+
+        self.max_lag = max(self.max_lag, self.lag)
+        if report is not None:
+            report.duration = self.lag
+            self._finish(report)
+
+        if not self._stopped.is_set():
+            self._handle = self.loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """
+        Capture the loop thread's stack if the heartbeat has fallen behind. Called from the watchdog thread.
+        """
+        with self._lock:
+            behind = time.monotonic() - self._last_beat - self.interval
+            if behind < self.threshold or self._current is not None:
+                return
+
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                return
+
+            self._current = StallReport(
+                time.time() - behind, self.bot.plugin_manager.find_frame_hooks(frame),
+                traceback.extract_stack(frame)
+            )
+
+    def _finish(self, report):
+        self.reports.append(report)
+        now = time.monotonic()
+        if self._last_report is not None and now - self._last_report < self.report_interval:
+            self.suppressed += 1
+            return
+
+        self._last_report = now
+        message = report.describe()
+        if self.suppressed:
+            message += " ({} more stalls since the last report)".format(self.suppressed)
+            self.suppressed = 0
+
+        logger.warning("[loop_monitor] %s", message)
+        for conn in self.bot.connections.values():
+            if conn.connected:
+                conn.admin_log(message, console=False)
+
+
+def format_report(report):
+    lines = [
+        "# {} - {}".format(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(report.started)), report.describe())
+    ]
+    lines.extend(line.rstrip('\n') for line in report.stack.format())
+    return '\n'.join(lines)
+
+
+@hook.on_start()
+async def start_monitor(bot):
+    global monitor
+    conf = bot.config.get("loop_monitor", {})
+    if not conf.get("enabled", True):
+        return
+
+    monitor = LoopMonitor(
+        bot, interval=conf.get("interval", 0.05), threshold=conf.get("threshold", 0.5),
+        history=conf.get("history", 20), report_interval=conf.get("report_interval", 300),
+    )
+    monitor.start()
+
+
+@hook.on_stop()
+async def stop_monitor():
+    global monitor
+    if monitor is not None:
+        monitor.stop()
+        monitor = None
+
+
+@hook.command("stalls", autohelp=False, permissions=["botcontrol"])
+def stalls_command():
+    """- Show the most recent event loop stalls and the hooks responsible for them"""
+    if monitor is None:
+        return "The loop monitor is not running"
+
+    if not monitor.reports:
+        return "No stalls recorded (max lag {:.3f}s)".format(monitor.max_lag)
+
+    return web.paste('\n\n'.join(format_report(report) for report in reversed(monitor.reports)), ext='txt')
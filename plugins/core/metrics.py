@@ -0,0 +1,316 @@
+"""
+Serves bot metrics over HTTP in the Prometheus text exposition format
+
+Enabled through the "metrics" section of the config, e.g.
+    "metrics": {"enabled": true, "host": "127.0.0.1", "port": 9797}
+"""
+
+import asyncio
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy import event as sa_event
+
+from cloudbot import hook
+
+logger = logging.getLogger("cloudbot")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LAG_INTERVAL = 1
+QUANTILES = (0.5, 0.95, 0.99)
+REQUEST_TIMEOUT = 10
+
+server = None
+lag_task = None
+loop_lag = 0.0
+db_stats = {'checked_out': 0, 'checkouts': 0}
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+
+    value = float(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+
+    return repr(value)
+
+
+class MetricsWriter:
+    """
+    Builds a metrics page in the Prometheus text format
+    """
+
+    def __init__(self):
+        self.lines = []
+
+    def add(self, name, metric_type, doc, samples):
+        """
+        :param name: The base metric name
+        :param metric_type: The metric type, e.g. 'counter' or 'gauge'
+        :param doc: The help text for this metric
+        :param samples: An iterable of (suffix, labels, value) tuples
+        """
+        self.lines.append("# HELP {} {}".format(name, doc))
+        self.lines.append("# TYPE {} {}".format(name, metric_type))
+        for suffix, labels, value in samples:
+            if labels:
+                label_str = '{' + ','.join(
+                    '{}="{}"'.format(key, escape_label(val)) for key, val in labels
+                ) + '}'
+            else:
+                label_str = ''
+
+            self.lines.append("{}{}{} {}".format(name, suffix, label_str, format_value(value)))
+
+    def add_simple(self, name, metric_type, doc, value, labels=()):
+        self.add(name, metric_type, doc, [('', labels, value)])
+
+    def render(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def summary_samples(label_name, data):
+    """
+    :type data: list[(str, cloudbot.util.histogram.Histogram)]
+    """
+    for label, hist in data:
+        labels = ((label_name, label),)
+        for quantile in QUANTILES:
+            yield '', labels + (('quantile', quantile),), hist.percentile(quantile * 100)
+
+        yield '_sum', labels, hist.total
+        yield '_count', labels, hist.count
+
+
+def get_executor_stats(loop):
+    executor = getattr(loop, '_default_executor', None)
+    if not isinstance(executor, ThreadPoolExecutor):
+        return None
+
+    # ThreadPoolExecutor doesn't expose any of this publicly
+    try:
+        return len(executor._threads), executor._max_workers, executor._work_queue.qsize()
+    except AttributeError:
+        return None
+
+
+def write_connection_metrics(writer, bot):
+    conns = sorted(bot.connections.values(), key=lambda conn: conn.name)
+
+    def per_conn(func):
+        return [('', (('connection', conn.name),), func(conn)) for conn in conns]
+
+    writer.add(
+        'cloudbot_connection_connected', 'gauge', "Whether the connection is currently connected",
+        per_conn(lambda conn: 1 if conn.connected else 0)
+    )
+    writer.add(
+        'cloudbot_connection_lines_received_total', 'counter', "Lines received from the server",
+        per_conn(lambda conn: conn.lines_in)
+    )
+    writer.add(
+        'cloudbot_connection_lines_sent_total', 'counter', "Lines sent to the server",
+        per_conn(lambda conn: conn.lines_out)
+    )
+    writer.add(
+        'cloudbot_connection_pending_events', 'gauge', "Received events still being processed",
+        per_conn(lambda conn: conn.pending_events)
+    )
+    writer.add(
+        'cloudbot_connection_reconnects_total', 'counter', "Reconnects triggered by core.check_conn",
+        per_conn(lambda conn: conn.memory.get("reconnects", 0))
+    )
+    writer.add(
+        'cloudbot_connection_lag_seconds', 'gauge', "Last measured server ping lag",
+        per_conn(lambda conn: conn.memory.get("lag", 0))
+    )
+
+    # Only IRC connections batch joins and quits
+    batchers = [(conn.name, conn.batcher) for conn in conns if getattr(conn, 'batcher', None) is not None]
+    writer.add(
+        'cloudbot_connection_netsplit_batching', 'gauge', "Whether joins and quits are being batched for a netsplit",
+        [('', (('connection', name),), 1 if batcher.active else 0) for name, batcher in batchers]
+    )
+    writer.add(
+        'cloudbot_connection_batched_lines_total', 'counter', "JOIN and QUIT lines handled in netsplit batches",
+        [('', (('connection', name),), batcher.batched_lines) for name, batcher in batchers]
+    )
+
+
+def write_hook_metrics(writer, bot):
+    stats_plugin = bot.plugin_manager.find_plugin("core.hook_stats")
+    if stats_plugin is None:
+        return
+
+    stats = sorted(stats_plugin.code.get_stats(bot).global_snapshot())
+
+    writer.add(
+        'cloudbot_hook_invocations_total', 'counter', "Hook invocations by result", [
+            ('', (('hook', name), ('status', status)), value)
+            for name, counter in stats
+            for status, value in (('success', counter.success), ('failure', counter.failure))
+        ]
+    )
+    writer.add(
+        'cloudbot_hook_duration_seconds', 'summary', "Time spent running hooks",
+        summary_samples('hook', [(name, counter.latency) for name, counter in stats])
+    )
+    writer.add(
+        'cloudbot_hook_queue_seconds', 'summary', "Time hooks spent waiting on sieves, locks and the executor",
+        summary_samples('hook', [(name, counter.queued) for name, counter in stats if counter.queued is not None])
+    )
+
+
+def render_metrics(bot):
+    writer = MetricsWriter()
+    writer.add_simple(
+        'cloudbot_uptime_seconds', 'gauge', "Seconds since the bot started", time.time() - bot.start_time
+    )
+    writer.add_simple(
+        'cloudbot_event_loop_lag_seconds', 'gauge', "How late the last event loop heartbeat ran", loop_lag
+    )
+
+    write_connection_metrics(writer, bot)
+    write_hook_metrics(writer, bot)
+
+    executor_stats = get_executor_stats(bot.loop)
+    if executor_stats is not None:
+        threads, max_threads, queued = executor_stats
+        writer.add_simple('cloudbot_executor_threads', 'gauge', "Worker threads in the default executor", threads)
+        writer.add_simple(
+            'cloudbot_executor_max_threads', 'gauge', "Maximum worker threads in the default executor", max_threads
+        )
+        writer.add_simple(
+            'cloudbot_executor_queued_jobs', 'gauge', "Jobs waiting for a free executor thread", queued
+        )
+
+    writer.add_simple(
+        'cloudbot_db_connections_checked_out', 'gauge', "Database connections currently in use",
+        get_checked_out(bot.db_engine)
+    )
+    writer.add_simple(
+        'cloudbot_db_checkouts_total', 'counter', "Database connections checked out from the pool",
+        db_stats['checkouts']
+    )
+
+    writer.add(
+        'cloudbot_plugin_load_seconds', 'gauge', "Time taken to load each plugin", [
+            ('', (('plugin', plugin.title),), plugin.load_time)
+            for plugin in sorted(bot.plugin_manager.plugins.values(), key=lambda p: p.title)
+            if plugin.load_time is not None
+        ]
+    )
+
+    return writer.render()
+
+
+async def send_response(writer, status, body, content_type="text/plain; charset=utf-8", include_body=True):
+    data = body.encode()
+    head = "HTTP/1.0 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n".format(
+        status, content_type, len(data)
+    )
+    writer.write(head.encode())
+    if include_body:
+        writer.write(data)
+
+    await writer.drain()
+
+
+async def handle_request(bot, reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+        # Skip the request headers
+        while True:
+            line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+            if not line.strip():
+                break
+
+        parts = request_line.decode('latin-1').split()
+        if len(parts) < 2 or parts[0] not in ('GET', 'HEAD'):
+            await send_response(writer, "405 Method Not Allowed", "Method not allowed\n")
+        elif parts[1].split('?', 1)[0] != '/metrics':
+            await send_response(writer, "404 Not Found", "Not found\n")
+        else:
+            await send_response(
+                writer, "200 OK", render_metrics(bot), CONTENT_TYPE, include_body=parts[0] == 'GET'
+            )
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    except Exception:
+        logger.exception("Error serving metrics request")
+    finally:
+        writer.close()
+
+
+def on_checkout(dbapi_conn, conn_record, conn_proxy):
+    db_stats['checked_out'] += 1
+    db_stats['checkouts'] += 1
+
+
+def on_checkin(dbapi_conn, conn_record):
+    # Connections checked out before the listeners were added are checked in without having been counted
+    db_stats['checked_out'] = max(0, db_stats['checked_out'] - 1)
+
+
+def get_checked_out(engine):
+    """
+    Get the number of database connections in use, from the pool itself where it keeps count
+
+    :type engine: sqlalchemy.engine.Engine
+    :rtype: int
+    """
+    checkedout = getattr(engine.pool, 'checkedout', None)
+    if checkedout is not None:
+        return checkedout()
+
+    return db_stats['checked_out']
+
+
+async def sample_lag(loop):
+    global loop_lag
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        loop_lag = max(0.0, loop.time() - start - LAG_INTERVAL)
+
+
+@hook.on_start()
+async def start_server(bot):
+    global server, lag_task
+    conf = bot.config.get("metrics", {})
+    if not conf.get("enabled", False):
+        return
+
+    host = conf.get("host", "127.0.0.1")
+    port = conf.get("port", 9797)
+    server = await asyncio.start_server(partial(handle_request, bot), host, port)
+    logger.info("Serving metrics on %s:%s", host, port)
+
+    sa_event.listen(bot.db_engine, 'checkout', on_checkout)
+    sa_event.listen(bot.db_engine, 'checkin', on_checkin)
+    lag_task = asyncio.ensure_future(sample_lag(bot.loop), loop=bot.loop)
+
+
+@hook.on_stop()
+async def stop_server(bot):
+    global server, lag_task
+    if server is None:
+        return
+
+    lag_task.cancel()
+    lag_task = None
+    sa_event.remove(bot.db_engine, 'checkout', on_checkout)
+    sa_event.remove(bot.db_engine, 'checkin', on_checkin)
+
+    server.close()
+    await server.wait_closed()
+    server = None
@@ -98,9 +98,6 @@ def set_optout(db, conn, chan, pattern, allowed):
     if not res.rowcount:
         db.execute(optout_table.insert().values(network=conn_cf, chan=chan_cf, hook=pattern_cf, allow=allowed))
 
-    db.commit()
-    load_cache(db)
-
 
 def del_optout(db, conn, chan, pattern):
     conn_cf = conn.casefold()
@@ -109,9 +106,6 @@ def del_optout(db, conn, chan, pattern):
     clause = and_(optout_table.c.network == conn_cf, optout_table.c.chan == chan_cf, optout_table.c.hook == pattern_cf)
     res = db.execute(optout_table.delete().where(clause))
 
-    db.commit()
-    load_cache(db)
-
     return res.rowcount > 0
 
 
@@ -124,8 +118,6 @@ def clear_optout(db, conn, chan=None):
         clause = optout_table.c.network == conn_cf
 
     res = db.execute(optout_table.delete().where(clause))
-    db.commit()
-    load_cache(db)
 
     return res.rowcount
 
@@ -144,6 +136,15 @@ def load_cache(db):
         optout_cache.update(new_cache)
 
 
+def write_and_reload(db, func, *args):
+    """
+    Make a change with `func` and reload the cache, in the same transaction
+    """
+    result = func(db, *args)
+    load_cache(db)
+    return result
+
+
 # noinspection PyUnusedLocal
 @hook.sieve(priority=Priority.HIGHEST)
 def optout_sieve(bot, event, _hook):
@@ -170,7 +171,7 @@ def optout_sieve(bot, event, _hook):
 
 
 @hook.command
-async def optout(text, event, chan, db, conn):
+async def optout(text, event, chan, adb, conn):
     """[chan] <pattern> [allow] - Set the global allow option for hooks matching <pattern> in [chan], or the current
     channel if not specified
 
@@ -197,7 +198,7 @@ async def optout(text, event, chan, db, conn):
         except KeyError:
             return "Invalid allow option."
 
-    await event.async_call(set_optout, db, conn.name, chan, pattern, allowed)
+    await adb.run(write_and_reload, set_optout, conn.name, chan, pattern, allowed)
 
     return "{action} hooks matching {pattern} in {channel}.".format(
         action="Enabled" if allowed else "Disabled",
@@ -207,7 +208,7 @@ async def optout(text, event, chan, db, conn):
 
 
 @hook.command
-async def deloptout(text, event, chan, db, conn):
+async def deloptout(text, event, chan, adb, conn):
     """[chan] <pattern> - Delete global optout hooks matching <pattern> in [chan], or the current channel if not
     specified"""
     args = text.split()
@@ -222,7 +223,7 @@ async def deloptout(text, event, chan, db, conn):
 
     pattern = args.pop(0)
 
-    deleted = await event.async_call(del_optout, db, conn.name, chan, pattern)
+    deleted = await adb.run(write_and_reload, del_optout, conn.name, chan, pattern)
 
     if deleted:
         return "Deleted optout '{}' in channel '{}'.".format(pattern, chan)
@@ -272,13 +273,13 @@ async def list_optout(conn, event, async_call):
 
 
 @hook.command("clearoptout", autohelp=False)
-async def clear(conn, event, db, async_call):
+async def clear(conn, event, adb):
     """[channel] - Clears the optout list for a channel. Specify "global" to clear all data for this network"""
     chan, allowed = await check_global_perms(event)
 
     if not allowed:
         return
 
-    count = await async_call(clear_optout, db, conn.name, chan)
+    count = await adb.run(write_and_reload, clear_optout, conn.name, chan)
 
     return "Cleared {} opt outs from the list.".format(count)
@@ -19,21 +19,48 @@ def pluginlist(bot):
     return web.paste(table, service="hastebin")
 
 
+async def shard_load_plugin(bot, path):
+    await bot.plugin_manager.reload_plugin(path)
+
+
+async def shard_unload_plugin(bot, path):
+    await bot.plugin_manager.unload_plugin(path)
+
+
+@hook.on_start
+def register_shard_handlers(bot):
+    if bot.shard:
+        bot.shard.handlers["load_plugin"] = shard_load_plugin
+        bot.shard.handlers["unload_plugin"] = shard_unload_plugin
+
+
 @hook.command(permissions=["botcontrol"])
 async def pluginload(bot, text, reply):
     """<plugin path> - (Re)load <plugin> manually"""
     manager = bot.plugin_manager
     path = str(Path(text.strip()).resolve())
     was_loaded = path in manager.plugins
-    coro = bot.plugin_manager.load_plugin(path)
+    coro = bot.plugin_manager.reload_plugin(path)
 
     try:
-        await coro
+        loaded = await coro
     except Exception:
         reply("Plugin failed to load.")
         raise
-    else:
-        return "Plugin {}loaded successfully.".format("re" if was_loaded else "")
+
+    if not loaded:
+        if was_loaded:
+            return "Plugin failed to reload, the previous version is still loaded."
+
+        return "Plugin failed to load."
+
+    if bot.shard:
+        await bot.shard.broadcast("load_plugin", path=path)
+
+    if was_loaded:
+        return "Plugin reloaded successfully in {:.3f} seconds.".format(manager.reload_stats.last_time)
+
+    return "Plugin loaded successfully."
 
 
 @hook.command(permissions=["botcontrol"])
@@ -47,6 +74,9 @@ async def pluginunload(bot, text):
         return "Plugin not loaded, unable to unload."
 
     if await manager.unload_plugin(path):
+        if bot.shard:
+            await bot.shard.broadcast("unload_plugin", path=path)
+
         return "Plugin unloaded successfully."
 
     return "Plugin failed to unload."
@@ -4,6 +4,7 @@ from sqlalchemy import Table, Column, UniqueConstraint, String
 
 from cloudbot import hook
 from cloudbot.util import database
+from cloudbot.util.cached_table import CachedTable
 
 table = Table(
     "regex_chans",
@@ -18,7 +19,7 @@ table = Table(
 # If True, all channels without a setting will have regex enabled
 # If False, all channels without a setting will have regex disabled
 default_enabled = True
-status_cache = {}
+status_cache = CachedTable(table, ('connection', 'channel'))
 logger = logging.getLogger("cloudbot")
 
 
@@ -27,15 +28,11 @@ def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
     """
-    new_cache = {}
-    for row in db.execute(table.select()):
-        conn = row["connection"]
-        chan = row["channel"]
-        status = row["status"]
-        new_cache[(conn, chan)] = status
+    status_cache.load(db)
 
-    status_cache.clear()
-    status_cache.update(new_cache)
+
+def get_status(conn, chan):
+    return status_cache.get_value((conn, chan), 'status')
 
 
 def set_status(db, conn, chan, status):
@@ -45,25 +42,17 @@ def set_status(db, conn, chan, status):
     :type chan: str
     :type status: str
     """
-    if (conn, chan) in status_cache:
-        # if we have a set value, update
-        db.execute(
-            table.update().values(status=status).where(table.c.connection == conn).where(table.c.channel == chan))
-    else:
-        # otherwise, insert
-        db.execute(table.insert().values(connection=conn, channel=chan, status=status))
-    db.commit()
+    status_cache.set(db, {'connection': conn, 'channel': chan, 'status': status})
 
 
 def delete_status(db, conn, chan):
-    db.execute(table.delete().where(table.c.connection == conn).where(table.c.channel == chan))
-    db.commit()
+    status_cache.delete(db, (conn, chan))
 
 
 @hook.sieve()
 def sieve_regex(bot, event, _hook):
     if _hook.type == "regex" and event.chan.startswith("#") and _hook.plugin.title != "factoids":
-        status = status_cache.get((event.conn.name, event.chan))
+        status = get_status(event.conn.name, event.chan)
         if status != "ENABLED" and (status == "DISABLED" or not default_enabled):
             logger.info("[%s] Denying %s from %s", event.conn.name, _hook.function_name, event.chan)
             return None
@@ -90,7 +79,6 @@ def change_status(db, event, status):
         action, channel
     ))
     set_status(db, event.conn.name, channel, "ENABLED" if status else "DISABLED")
-    load_cache(db)
 
 
 @hook.command(autohelp=False, permissions=["botcontrol"])
@@ -119,7 +107,6 @@ def resetregex(text, db, conn, chan, nick, message, notice):
     message("Resetting regex matching setting (youtube, etc) (issued by {})".format(nick), target=channel)
     notice("Resetting regex matching setting (youtube, etc) in channel {}".format(channel))
     delete_status(db, conn.name, channel)
-    load_cache(db)
 
 
 @hook.command(autohelp=False, permissions=["botcontrol"])
@@ -132,7 +119,7 @@ def regexstatus(text, conn, chan):
         channel = text
     else:
         channel = "#{}".format(text)
-    status = status_cache.get((conn.name, chan))
+    status = get_status(conn.name, chan)
     if status is None:
         if default_enabled:
             status = "ENABLED"
@@ -145,8 +132,8 @@ def regexstatus(text, conn, chan):
 def listregex(conn):
     """- List non-default regex statuses for channels"""
     values = []
-    for (conn_name, chan), status in status_cache.values():
+    for (conn_name, chan), row in status_cache.items():
         if conn_name != conn.name:
             continue
-        values.append("{}: {}".format(chan, status))
+        values.append("{}: {}".format(chan, row["status"]))
     return ", ".join(values)
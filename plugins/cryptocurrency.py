@@ -172,7 +172,7 @@ def init_aliases():
         globals()[_hook.__name__] = hook.command(*alias.cmds, autohelp=False)(_hook)
 
 
-@hook.onload
+@hook.on_start(defer=True)
 @hook.periodic(3600)
 def update_cache(bot):
     api.set_user_agent(bot.user_agent)
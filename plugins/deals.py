@@ -1,7 +1,8 @@
-import feedparser
-
 from cloudbot import hook
 from cloudbot.util import web
+from cloudbot.util.lazy_import import lazy_module
+
+feedparser = lazy_module("feedparser")
 
 
 @hook.command('meh', autohelp=False)
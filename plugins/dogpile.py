@@ -17,7 +17,7 @@ HEADERS = {
 session = requests.Session()
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def check_certs(bot):
     try:
         with requests.get(search_url):
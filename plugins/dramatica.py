@@ -2,11 +2,14 @@ import re
 from urllib import parse
 
 import requests
-from lxml import html
 from requests import HTTPError
 
 from cloudbot import hook
 from cloudbot.util import formatting
+from cloudbot.util.lazy_import import lazy_module
+
+html = lazy_module("lxml.html")
+
 
 api_url = "http://encyclopediadramatica.se/api.php"
 ed_url = "http://encyclopediadramatica.se/"
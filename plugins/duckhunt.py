@@ -109,7 +109,7 @@ def get_config(conn, field, default):
             return default
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 def load_optout(db):
     """load a list of channels duckhunt should be off in. Right now I am being lazy and not
     differentiating between networks this should be cleaned up later."""
@@ -131,7 +131,7 @@ def is_opt_out(network, chan):
     return chan.casefold() in opt_out[network]
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def load_status(db):
     """
     :type db: sqlalchemy.orm.Session
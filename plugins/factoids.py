@@ -28,7 +28,7 @@ table = Table(
 )
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
@@ -1,21 +1,26 @@
-import codecs
 import os
-import random
 
 from cloudbot import hook
+from cloudbot.util.datafile import DataFile
 
-fortunes = []
+fortunes = None
 
 
 @hook.on_start()
 def load_fortunes(bot):
-    path = os.path.join(bot.data_dir, "fortunes.txt")
-    fortunes.clear()
-    with codecs.open(path, encoding="utf-8") as f:
-        fortunes.extend(line.strip() for line in f.readlines() if not line.startswith("//"))
+    global fortunes
+    fortunes = DataFile(os.path.join(bot.data_dir, "fortunes.txt"), skip_comments=True)
+
+
+@hook.on_stop()
+def close_fortunes():
+    global fortunes
+    if fortunes is not None:
+        fortunes.close()
+        fortunes = None
 
 
 @hook.command(autohelp=False)
 async def fortune():
     """- hands out a fortune cookie"""
-    return random.choice(fortunes)
+    return fortunes.random_line()
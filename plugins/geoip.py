@@ -5,12 +5,13 @@ import shutil
 import socket
 import time
 
-import geoip2.database
-import geoip2.errors
 import requests
 
 from cloudbot import hook
 from cloudbot.util import async_util
+from cloudbot.util.lazy_import import lazy_module
+
+geoip2 = lazy_module("geoip2")
 
 logger = logging.getLogger("cloudbot")
 
@@ -29,7 +29,7 @@ cache_lock = RLock()
 logger = logging.getLogger("cloudbot")
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
@@ -1,16 +1,21 @@
 import random
 import re
 import time
-from collections import defaultdict
 
 from sqlalchemy import Table, Column, String, PrimaryKeyConstraint
 
 from cloudbot import hook
 from cloudbot.util import database
+from cloudbot.util.cached_table import CachedTable
 
 delay = 10
 floodcheck = {}
 
+decoy_re = re.compile('[Òo○O0öøóȯôőŏᴏōο][<>＜]')
+colors_re = re.compile(r'\x02|\x03(?:\d{1,2}(?:,\d{1,2})?)?', re.UNICODE)
+bino_re = re.compile('b+i+n+o+', re.IGNORECASE)
+offensive_re = re.compile('卐')
+
 table = Table(
     'herald',
     database.metadata,
@@ -20,17 +25,16 @@ table = Table(
     PrimaryKeyConstraint('name', 'chan')
 )
 
-herald_cache = defaultdict(dict)
+herald_cache = CachedTable(table, ('chan', 'name'))
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def load_cache(db):
-    new_cache = defaultdict(dict)
-    for row in db.execute(table.select()):
-        new_cache[row["chan"]][row["name"]] = row["quote"]
+    herald_cache.load(db)
+
 
-    herald_cache.clear()
-    herald_cache.update(new_cache)
+def get_herald(chan, nick):
+    return herald_cache.get_value((chan.casefold(), nick.casefold()), 'quote')
 
 
 @hook.command()
@@ -38,36 +42,24 @@ def herald(text, nick, chan, db, reply):
     """{<message>|show|delete|remove} - adds a greeting for your nick that will be announced everytime you join the
     channel. Using .herald show will show your current herald and .herald delete will remove your greeting."""
     if text.lower() == "show":
-        greeting = herald_cache[chan.casefold()].get(nick.casefold())
+        greeting = get_herald(chan, nick)
         if greeting is None:
             return "you don't have a herald set try .herald <message> to set your greeting."
 
         return greeting
 
     if text.lower() in ["delete", "remove"]:
-        greeting = herald_cache[chan.casefold()].get(nick.casefold())
+        greeting = get_herald(chan, nick)
         if greeting is None:
             return "no herald set, unable to delete."
 
-        query = table.delete().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower())
-        db.execute(query)
-        db.commit()
+        herald_cache.delete(db, (chan.lower(), nick.lower()))
 
         reply("greeting \'{}\' for {} has been removed".format(greeting, nick))
-
-        load_cache(db)
     else:
-        res = db.execute(
-            table.update().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower()).values(quote=text)
-        )
-        if res.rowcount == 0:
-            db.execute(table.insert().values(name=nick.lower(), chan=chan.lower(), quote=text))
-
-        db.commit()
+        herald_cache.set(db, {'name': nick.lower(), 'chan': chan.lower(), 'quote': text})
         reply("greeting successfully added")
 
-        load_cache(db)
-
 
 @hook.command(permissions=["botcontrol", "snoonetstaff", "deleteherald", "chanop"])
 def deleteherald(text, chan, db, reply):
@@ -75,27 +67,28 @@ def deleteherald(text, chan, db, reply):
 
     nick = text.strip()
 
-    res = db.execute(
-        table.delete().where(table.c.name == nick.lower()).where(table.c.chan == chan.lower())
-    )
-
-    db.commit()
-
-    if res.rowcount > 0:
+    if herald_cache.delete(db, (chan.lower(), nick.lower())):
         reply("greeting for {} has been removed".format(text.lower()))
     else:
         reply("{} does not have a herald".format(text.lower()))
 
-    load_cache(db)
-
 
 @hook.irc_raw("JOIN", singlethread=True)
 def welcome(nick, message, bot, chan):
-    decoy = re.compile('[Òo○O0öøóȯôőŏᴏōο][<>＜]')
-    colors_re = re.compile(r'\x02|\x03(?:\d{1,2}(?:,\d{1,2})?)?', re.UNICODE)
-    bino_re = re.compile('b+i+n+o+', re.IGNORECASE)
-    offensive_re = re.compile('卐')
+    greet_user(nick, chan, message, bot)
+
+
+@hook.irc_batch("JOIN", singlethread=True)
+def welcome_batch(events, returning, message, bot):
+    """
+    Greet users joining during a netsplit, except those rejoining after it
+    """
+    for event in events:
+        if event.nick.casefold() not in returning:
+            greet_user(event.nick, event.chan, message, bot)
+
 
+def greet_user(nick, chan, message, bot):
     grab = bot.plugin_manager.find_plugin("grab")
 
     if chan in floodcheck:
@@ -104,12 +97,12 @@ def welcome(nick, message, bot, chan):
     else:
         floodcheck[chan] = time.time()
 
-    greet = herald_cache[chan.casefold()].get(nick.casefold())
+    greet = get_herald(chan, nick)
     if greet:
         stripped = greet.translate(dict.fromkeys(["\u200b", " ", "\u202f", "\x02"]))
         stripped = colors_re.sub("", stripped)
-        greet = re.sub(bino_re, 'flenny', greet)
-        greet = re.sub(offensive_re, ' freespeech oppression ', greet)
+        greet = bino_re.sub('flenny', greet)
+        greet = offensive_re.sub(' freespeech oppression ', greet)
 
         words = greet.lower().split()
         cmd = words.pop(0)
@@ -125,7 +118,7 @@ def welcome(nick, message, bot, chan):
 
             if out:
                 message(out, chan)
-        elif decoy.search(stripped):
+        elif decoy_re.search(stripped):
             message("DECOY DUCK --> {}".format(greet), chan)
         else:
             message("\u200b {}".format(greet), chan)
@@ -34,7 +34,7 @@ def make_api():
     return ImgurClient(client_id, client_secret)
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def set_api():
     container.api = make_api()
 
@@ -22,7 +22,7 @@ karma_table = Table(
 )
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def remove_non_channel_points(db):
     """Temporary on_start hook to remove non-channel points"""
     db.execute(karma_table.delete().where(sqlalchemy.not_(karma_table.c.chan.startswith('#'))))
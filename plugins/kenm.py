@@ -1,10 +1,9 @@
-import codecs
 import os
-import random
 
 from cloudbot import hook
+from cloudbot.util.datafile import DataFile
 
-kenm_data = []
+kenm_data = None
 
 
 @hook.on_start()
@@ -12,12 +11,19 @@ def load_kenm(bot):
     """
     :type bot: cloudbot.bot.Cloudbot
     """
-    kenm_data.clear()
-    with codecs.open(os.path.join(bot.data_dir, "kenm.txt"), encoding="utf-8") as f:
-        kenm_data.extend(line.strip() for line in f.readlines() if not line.startswith("//"))
+    global kenm_data
+    kenm_data = DataFile(os.path.join(bot.data_dir, "kenm.txt"), skip_comments=True)
+
+
+@hook.on_stop()
+def close_kenm():
+    global kenm_data
+    if kenm_data is not None:
+        kenm_data.close()
+        kenm_data = None
 
 
 @hook.command("kenm", autohelp=False)
 def kenm(message):
     """- Wisdom from Ken M."""
-    message(random.choice(kenm_data))
+    message(kenm_data.random_line())
@@ -9,6 +9,7 @@ from sqlalchemy import Table, Column, PrimaryKeyConstraint, String
 from cloudbot import hook
 from cloudbot.bot import bot
 from cloudbot.util import timeformat, web, database
+from cloudbot.util.cached_table import CachedTable
 
 api_url = "http://ws.audioscrobbler.com/2.0/?format=json"
 
@@ -60,27 +61,20 @@ def filter_tags(tags, artist, limit=4):
             return filtered_tags
 
 
-last_cache = {}
+last_cache = CachedTable(table, 'nick')
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
     """
-    new_cache = {}
-    for row in db.execute(table.select()):
-        nick = row["nick"]
-        account = row["acc"]
-        new_cache[nick] = account
-
-    last_cache.clear()
-    last_cache.update(new_cache)
+    last_cache.load(db)
 
 
 def get_account(nick, text=None):
     """looks in last_cache for the lastfm account name"""
-    return last_cache.get(nick.lower(), text)
+    return last_cache.get_value(nick.lower(), 'acc', text)
 
 
 def api_request(method, **params):
@@ -294,14 +288,7 @@ def lastfm(event, db, text, nick):
     out += ending
 
     if text and not dontsave:
-        if get_account(nick):
-            db.execute(table.update().values(acc=user).where(table.c.nick == nick.lower()))
-            db.commit()
-        else:
-            db.execute(table.insert().values(nick=nick.lower(), acc=user))
-            db.commit()
-
-        load_cache(db)
+        last_cache.set(db, {'nick': nick.lower(), 'acc': user})
     return out
 
 
@@ -5,6 +5,7 @@ from sqlalchemy import Table, Column, PrimaryKeyConstraint, String
 
 from cloudbot import hook
 from cloudbot.util import timeformat, web, database
+from cloudbot.util.cached_table import CachedTable
 
 api_url = "https://libre.fm/2.0/?format=json"
 
@@ -19,7 +20,7 @@ table = Table(
     PrimaryKeyConstraint('nick')
 )
 
-last_cache = []
+last_cache = CachedTable(table, 'nick')
 
 
 def api_request(method, **params):
@@ -33,29 +34,17 @@ def api_request(method, **params):
     return response, None
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
     """
-    new_cache = []
-    for row in db.execute(table.select()):
-        nick = row["nick"]
-        account = row["acc"]
-        new_cache.append((nick, account))
-
-    last_cache.clear()
-    last_cache.extend(new_cache)
+    last_cache.load(db)
 
 
 def get_account(nick):
     """looks in last_cache for the libre.fm account name"""
-    last_account = [row[1] for row in last_cache if nick.lower() == row[0]]
-    if not last_account:
-        return
-
-    last_account = last_account[0]
-    return last_account
+    return last_cache.get_value(nick.lower(), 'acc')
 
 
 @hook.command("librefm", "librelast", "librenp", autohelp=False)
@@ -133,12 +122,7 @@ def librefm(text, nick, db, event):
     out += ending
 
     if text and not dontsave:
-        res = db.execute(table.update().values(acc=user).where(table.c.nick == nick.lower()))
-        if res.rowcount <= 0:
-            db.execute(table.insert().values(nick=nick.lower(), acc=user))
-
-        db.commit()
-        load_cache(db)
+        last_cache.set(db, {'nick': nick.lower(), 'acc': user})
     return out
 
 
@@ -1,9 +1,11 @@
 import re
 
 import requests
-from lxml import html
 
 from cloudbot import hook
+from cloudbot.util.lazy_import import lazy_module
+
+html = lazy_module("lxml.html")
 
 
 @hook.command("metacritic", "mc")
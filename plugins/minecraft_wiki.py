@@ -1,10 +1,13 @@
 import re
 
 import requests
-from lxml import html
 
 from cloudbot import hook
 from cloudbot.util import formatting
+from cloudbot.util.lazy_import import lazy_module
+
+html = lazy_module("lxml.html")
+
 
 api_url = "http://minecraft.gamepedia.com/api.php?action=opensearch"
 mc_url = "http://minecraft.gamepedia.com/"
@@ -32,7 +32,7 @@ async def refresh_fml_cache(loop):
         fml_cache.append((fml_id, text))
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 async def initial_refresh(loop):
     # do an initial refresh of the caches
     await refresh_fml_cache(loop)
@@ -18,12 +18,30 @@ from cloudbot import hook
 from cloudbot.util import formatting, textgen
 
 
+# path -> (mtime, size, generator), so name files are only parsed again once they change
+_generators = {}
+
+
 def get_generator(_json):
     data = json.loads(_json)
     return textgen.TextGenerator(data["templates"],
                                  data["parts"], default_templates=data["default_templates"])
 
 
+def load_generator(path):
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _generators.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with codecs.open(path, encoding="utf-8") as f:
+        generator = get_generator(f.read())
+
+    _generators[path] = (key, generator)
+    return generator
+
+
 @hook.command(autohelp=False)
 def namegen(text, bot, notice):
     """[generator|list] - generates some names using the chosen generator, or lists all generators
@@ -60,11 +78,10 @@ def namegen(text, bot, notice):
     # load the name generator
     path = os.path.join(bot.data_dir, "name_files", "{}.json".format(selected_module))
 
-    with codecs.open(path, encoding="utf-8") as f:
-        try:
-            generator = get_generator(f.read())
-        except ValueError as error:
-            return "Unable to read name file: {}".format(error)
+    try:
+        generator = load_generator(path)
+    except ValueError as error:
+        return "Unable to read name file: {}".format(error)
 
     # time to generate some names
     name_list = generator.generate_strings(10)
@@ -2,6 +2,7 @@ import random as std_random
 import string
 
 from cloudbot import hook
+from cloudbot.util.datafile import DataFile
 
 try:
     from Crypto.Random import random
@@ -12,8 +13,12 @@ except ImportError:
     # Just use the regular random module, not the strong one
     gen = std_random.SystemRandom()
 
-with open("data/password_words.txt") as f:
-    common_words = [line.strip() for line in f.readlines()]
+common_words = DataFile("data/password_words.txt")
+
+
+@hook.on_stop()
+def close_words():
+    common_words.close()
 
 
 @hook.command(autohelp=False)
@@ -81,6 +86,6 @@ def word_password(text, notice):
     words = []
     # generate password
     for _ in range(length):
-        words.append(gen.choice(common_words))
+        words.append(common_words.random_line(gen))
 
     notice("Your password is '{}'. Feel free to remove the spaces when using it.".format(" ".join(words)))
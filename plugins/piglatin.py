@@ -61,7 +61,7 @@ def translate_basic(word, vowels="aeiou", start=0):
     return word[i:] + word[:i] + "w" * (i == 0) + "ay" * word.isalnum()
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 def load_nltk():
     nltk.download('cmudict')
 
@@ -1,8 +1,13 @@
+import cProfile
+import io
 import os
+import pstats
 import signal
 import sys
 import threading
+import time
 import traceback
+from collections import Counter
 
 PYMPLER_ENABLED = False
 
@@ -22,7 +27,23 @@ except ImportError:
     objgraph = None
 
 from cloudbot import hook
+from cloudbot.event import CommandEvent
 from cloudbot.util import web
+from cloudbot.util.func_utils import call_with_args
+
+MAX_PROFILE_TIME = 60
+SAMPLE_INTERVAL = 0.005
+TOP_COUNT = 25
+
+# (file name, function) pairs where a thread's innermost frame means it is just waiting for work
+IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+profile_running = False
 
 
 def create_tracker():
@@ -73,12 +94,236 @@ def get_thread_dump():
     return web.paste("\n".join(code), ext='txt')
 
 
+class SamplingProfiler:
+    """
+    Periodically samples the stacks of every thread in the process, attributing each sample to the hook that was
+    running in it (if any) and aggregating them into collapsed stacks suitable for flamegraph tools
+    """
+
+    def __init__(self, plugin_manager, interval=SAMPLE_INTERVAL):
+        self.plugin_manager = plugin_manager
+        self.interval = interval
+        self.stacks = Counter()
+        self.hooks = Counter()
+        self.self_time = Counter()
+        self.total_time = Counter()
+        self.threads = set()
+        self.samples = 0
+        self.idle = 0
+        self.duration = 0.0
+        self._names = {}
+
+    def _frame_name(self, code):
+        try:
+            return self._names[code]
+        except KeyError:
+            name = "{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+            self._names[code] = name = name.replace(';', ':')
+            return name
+
+    @staticmethod
+    def is_idle(frame):
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+    def sample(self, own_thread=None):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+
+            if self.is_idle(frame):
+                self.idle += 1
+                continue
+
+            hooks = self.plugin_manager.find_frame_hooks(frame, thread_id)
+            if hooks:
+                root = "hook:" + hooks[-1].description
+            else:
+                thread = threading._active.get(thread_id)
+                root = "thread:" + (thread.name if thread is not None else str(thread_id))
+
+            names = []
+            while frame is not None:
+                names.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+
+            names.reverse()
+            self.stacks[root + ';' + ';'.join(names)] += 1
+            self.hooks[root] += 1
+            self.self_time[names[-1]] += 1
+            self.total_time.update(set(names))
+            self.threads.add(thread_id)
+            self.samples += 1
+
+    def run(self, seconds):
+        """
+        Sample all other threads for `seconds` seconds, blocking the calling thread
+        """
+        own_thread = threading.get_ident()
+        start = time.perf_counter()
+        end = start + seconds
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+
+            self.sample(own_thread)
+            time.sleep(self.interval)
+
+        self.duration = time.perf_counter() - start
+
+    def collapsed(self):
+        """
+        :return: The samples in the collapsed stack format read by flamegraph.pl, speedscope and similar tools
+        """
+        return '\n'.join("{} {}".format(stack, count) for stack, count in self.stacks.most_common())
+
+    def summary(self, count=TOP_COUNT):
+        def pct(value):
+            return "{:6.2f}%".format(100 * value / self.samples) if self.samples else "  0.00%"
+
+        lines = [
+            "# Sampled {} stacks from {} threads over {:.2f}s every {:.1f}ms ({} idle samples skipped)".format(
+                self.samples, len(self.threads), self.duration, self.interval * 1000, self.idle
+            ),
+            "",
+            "## Top hooks / threads",
+        ]
+        lines.extend("{} {:>6} {}".format(pct(n), n, name) for name, n in self.hooks.most_common(count))
+        lines += ["", "## Top functions (self)"]
+        lines.extend("{} {:>6} {}".format(pct(n), n, name) for name, n in self.self_time.most_common(count))
+        lines += ["", "## Top functions (total)"]
+        lines.extend("{} {:>6} {}".format(pct(n), n, name) for name, n in self.total_time.most_common(count))
+        return '\n'.join(lines)
+
+
+def run_profiled(profiler, _hook, event):
+    event.prepare_threaded()
+    try:
+        return profiler.runcall(call_with_args, _hook.function, event)
+    finally:
+        event.close_threaded()
+
+
+async def profile_hook(loop, _hook, event):
+    """
+    Run a single hook under cProfile, returning the profiler and the hook's result
+
+    Coroutine hooks are profiled on the event loop thread, so anything else the loop runs while the hook is waiting
+    will show up in the profile as well.
+    """
+    profiler = cProfile.Profile()
+    if _hook.threaded:
+        result = await loop.run_in_executor(None, run_profiled, profiler, _hook, event)
+    else:
+        await event.prepare()
+        try:
+            profiler.enable()
+            try:
+                result = await call_with_args(_hook.function, event)
+            finally:
+                profiler.disable()
+        finally:
+            await event.close()
+
+    return profiler, result
+
+
+def format_profile(profiler, sort='cumulative', count=40):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(sort).print_stats(count)
+    return out.getvalue()
+
+
 @hook.command("threaddump", autohelp=False, permissions=["botcontrol"])
 async def threaddump_command():
     """- Return a full thread dump"""
     return get_thread_dump()
 
 
+@hook.command("profile", permissions=["botcontrol"])
+async def profile_command(text, bot, notice_doc, reply):
+    """<seconds> - Sample the stacks of all threads for <seconds> seconds and paste a summary of where time was spent
+    along with collapsed stacks for use with flamegraph tools"""
+    try:
+        seconds = float(text.split()[0])
+    except ValueError:
+        notice_doc()
+        return
+
+    if not 0 < seconds <= MAX_PROFILE_TIME:
+        return "Profile time must be between 0 and {} seconds".format(MAX_PROFILE_TIME)
+
+    global profile_running
+    if profile_running:
+        return "A profile is already running"
+
+    profile_running = True
+    try:
+        profiler = SamplingProfiler(bot.plugin_manager)
+        reply("Profiling for {:g} seconds...".format(seconds))
+        # Sample from a dedicated thread so the profiler doesn't tie up one of the executor's workers
+        done = bot.loop.create_future()
+
+        def _run():
+            try:
+                profiler.run(seconds)
+            finally:
+                bot.loop.call_soon_threadsafe(done.set_result, None)
+
+        threading.Thread(target=_run, name="sampling-profiler", daemon=True).start()
+        await done
+    finally:
+        profile_running = False
+
+    if not profiler.samples:
+        return "No samples collected, all threads were idle"
+
+    summary_url = await bot.loop.run_in_executor(None, web.paste, profiler.summary(), 'txt')
+    stacks_url = await bot.loop.run_in_executor(None, web.paste, profiler.collapsed(), 'txt')
+    return "Summary: {} - Collapsed stacks: {}".format(summary_url, stacks_url)
+
+
+@hook.command("cprofile", permissions=["botcontrol"])
+async def cprofile_command(text, bot, event, notice_doc):
+    """<command> [args] - Run a single invocation of <command> under cProfile and paste the results"""
+    cmd, _, args = text.partition(' ')
+    cmd = cmd.lower()
+    cmd_hook = bot.plugin_manager.commands.get(cmd)
+    if cmd_hook is None:
+        notice_doc()
+        return
+
+    if cmd_hook is event.hook:
+        return "Can't profile the profiler"
+
+    # Commands from plugins which haven't been imported yet are only stand-ins
+    cmd_hook = await bot.plugin_manager.resolve_hook(cmd_hook)
+    if cmd_hook is None:
+        return "Unable to load the plugin for {}".format(cmd)
+
+    cmd_event = CommandEvent(
+        hook=cmd_hook, text=args.strip(), triggered_command=cmd, cmd_prefix=event.triggered_prefix,
+        base_event=event
+    )
+
+    # The same checks as a normal invocation, so ignores, ACLs, disabled commands and permissions still apply
+    cmd_event = await bot.plugin_manager.check_launch(cmd_hook, cmd_event)
+    if cmd_event is None:
+        return "{} was blocked by a sieve, not profiling it".format(cmd)
+
+    profiler, result = await profile_hook(bot.loop, cmd_hook, cmd_event)
+    if result is not None:
+        if isinstance(result, (list, tuple)):
+            cmd_event.reply(*result)
+        else:
+            cmd_event.reply(result)
+
+    out = await bot.loop.run_in_executor(None, web.paste, format_profile(profiler), 'txt')
+    return "Profile of {}: {}".format(cmd_hook.description, out)
+
+
 @hook.command("objtypes", autohelp=False, permissions=["botcontrol"])
 def show_types():
     """- Print object type data to the console"""
@@ -22,7 +22,7 @@ qtable = Table(
 )
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
 def migrate_table(db, logger):
     old_table = Table(
         'quote',
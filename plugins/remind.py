@@ -36,24 +36,22 @@ table = Table(
 reminder_cache = []
 
 
-async def delete_reminder(async_call, db, network, remind_time, user):
+async def delete_reminder(adb, network, remind_time, user):
     query = table.delete() \
         .where(table.c.network == network.lower()) \
         .where(table.c.remind_time == remind_time) \
         .where(table.c.added_user == user.lower())
-    await async_call(db.execute, query)
-    await async_call(db.commit)
+    await adb.execute(query)
 
 
-async def delete_all(async_call, db, network, user):
+async def delete_all(adb, network, user):
     query = table.delete() \
         .where(table.c.network == network.lower()) \
         .where(table.c.added_user == user.lower())
-    await async_call(db.execute, query)
-    await async_call(db.commit)
+    await adb.execute(query)
 
 
-async def add_reminder(async_call, db, network, added_user, added_chan, message, remind_time, added_time):
+async def add_reminder(adb, network, added_user, added_chan, message, remind_time, added_time):
     query = table.insert().values(
         network=network.lower(),
         added_user=added_user.lower(),
@@ -62,28 +60,22 @@ async def add_reminder(async_call, db, network, added_user, added_chan, message,
         message=message,
         remind_time=remind_time
     )
-    await async_call(db.execute, query)
-    await async_call(db.commit)
+    await adb.execute(query)
 
 
 @hook.on_start()
-async def load_cache(async_call, db):
-    new_cache = []
-
-    for network, remind_time, added_time, user, message in (await async_call(_load_cache_db, db)):
-        new_cache.append((network, remind_time, added_time, user, message))
+async def load_cache(adb):
+    new_cache = [
+        (row["network"], row["remind_time"], row["added_time"], row["added_user"], row["message"])
+        for row in await adb.execute(table.select())
+    ]
 
     reminder_cache.clear()
     reminder_cache.extend(new_cache)
 
 
-def _load_cache_db(db):
-    query = db.execute(table.select())
-    return [(row["network"], row["remind_time"], row["added_time"], row["added_user"], row["message"]) for row in query]
-
-
 @hook.periodic(30, initial_interval=30)
-async def check_reminders(bot, async_call, db):
+async def check_reminders(bot, adb):
     current_time = datetime.now()
 
     for reminder in reminder_cache:
@@ -111,12 +103,12 @@ async def check_reminders(bot, async_call, db):
                        " it seems I was unable to deliver it on time)".format(late_time)
                 conn.message(user, colors.parse(late))
 
-            await delete_reminder(async_call, db, network, remind_time, user)
-            await load_cache(async_call, db)
+            await delete_reminder(adb, network, remind_time, user)
+            await load_cache(adb)
 
 
 @hook.command('remind', 'reminder', 'in')
-async def remind(text, nick, chan, db, conn, event, async_call):
+async def remind(text, nick, chan, adb, conn, event):
     """<1 minute, 30 seconds>: <do task> - reminds you to <do task> in <1 minute, 30 seconds>"""
 
     count = len([x for x in reminder_cache if x[0] == conn.name and x[3] == nick.lower()])
@@ -125,8 +117,8 @@ async def remind(text, nick, chan, db, conn, event, async_call):
         if count == 0:
             return "You have no reminders to delete."
 
-        await delete_all(async_call, db, conn.name, nick)
-        await load_cache(async_call, db)
+        await delete_all(adb, conn.name, nick)
+        await load_cache(adb)
         return "Deleted all ({}) reminders for {}!".format(count, nick)
 
     # split the input on the first ":"
@@ -163,8 +155,8 @@ async def remind(text, nick, chan, db, conn, event, async_call):
         return "I can't remind you in the past!"
 
     # finally, add the reminder and send a confirmation message
-    await add_reminder(async_call, db, conn.name, nick, chan, message, remind_time, current_time)
-    await load_cache(async_call, db)
+    await add_reminder(adb, conn.name, nick, chan, message, remind_time, current_time)
+    await load_cache(adb)
 
     remind_text = format_time(seconds, count=2)
     output = "Alright, I'll remind you \"{}\" in $(b){}$(clear)!".format(message, remind_text)
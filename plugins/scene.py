@@ -16,10 +16,12 @@ License:
 import datetime
 
 import requests
-from lxml import html
 
 from cloudbot import hook
 from cloudbot.util import timeformat
+from cloudbot.util.lazy_import import lazy_module
+
+html = lazy_module("lxml.html")
 
 
 @hook.command("pre", "scene")
@@ -1,10 +1,13 @@
 import re
 
 import requests
-from lxml import html
 
 from cloudbot import hook
 from cloudbot.util import formatting, web
+from cloudbot.util.lazy_import import lazy_module
+
+html = lazy_module("lxml.html")
+
 
 search_url = "http://search.atomz.com/search/?sp_a=00062d45-sp00000000"
 
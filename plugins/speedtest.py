@@ -1,9 +1,12 @@
 import re
 
 import requests
-from lxml import html
 
 from cloudbot import hook
+from cloudbot.util.lazy_import import lazy_module
+
+html = lazy_module("lxml.html")
+
 
 speedtest_re = re.compile(r'.*://www.speedtest.net/my-result/([0-9]+)?.*', re.I)
 base_url = "http://www.speedtest.net/my-result/{}"
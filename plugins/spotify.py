@@ -150,6 +150,7 @@ def _format_search(text, _type, reply):
 
 
 @hook.on_start
+@hook.config("api_keys.spotify_client_id", "api_keys.spotify_client_secret")
 def set_keys():
     api.set_keys(
         bot.config.get_api_key("spotify_client_id"),
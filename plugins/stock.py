@@ -68,6 +68,7 @@ def format_num(n):
 
 
 @hook.on_start
+@hook.config("api_keys.alphavantage")
 def setup_api(bot):
     api.api_key = bot.config.get_api_key("alphavantage")
     api.user_agent = bot.user_agent
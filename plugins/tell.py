@@ -50,7 +50,7 @@ ignore_cache = defaultdict(lambda: defaultdict(list))
 tell_cache = []
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def load_cache(db):
     """
     :type db: sqlalchemy.orm.Session
@@ -65,7 +65,7 @@ def load_cache(db):
     tell_cache.extend(new_cache)
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def load_disabled(db):
     """
     :type db: sqlalchemy.orm.Session
@@ -78,7 +78,7 @@ def load_disabled(db):
     disable_cache.update(new_cache)
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def load_ignores(db):
     """
     :type db: sqlalchemy.orm.Session
@@ -1,10 +1,9 @@
-import codecs
 import os
-import random
 
 from cloudbot import hook
+from cloudbot.util.datafile import DataFile
 
-topicchange_data = []
+topicchange_data = None
 
 
 @hook.on_start()
@@ -12,12 +11,19 @@ def load_topicchange(bot):
     """
     :type bot: cloudbot.bot.Cloudbot
     """
-    topicchange_data.clear()
-    with codecs.open(os.path.join(bot.data_dir, "topicchange.txt"), encoding="utf-8") as f:
-        topicchange_data.extend(line.strip() for line in f.readlines() if not line.startswith("//"))
+    global topicchange_data
+    topicchange_data = DataFile(os.path.join(bot.data_dir, "topicchange.txt"), skip_comments=True)
+
+
+@hook.on_stop()
+def close_topicchange():
+    global topicchange_data
+    if topicchange_data is not None:
+        topicchange_data.close()
+        topicchange_data = None
 
 
 @hook.command("changetopic", "discuss", "question", autohelp=False)
 def topicchange(message):
     """- generates a random question to help start a conversation or change a topic"""
-    message(random.choice(topicchange_data))
+    message(topicchange_data.random_line())
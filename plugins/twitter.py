@@ -3,11 +3,13 @@ import random
 import re
 from datetime import datetime
 
-import tweepy
-
 from cloudbot import hook
 from cloudbot.bot import bot
 from cloudbot.util import timeformat
+from cloudbot.util.lazy_import import lazy_module
+
+tweepy = lazy_module("tweepy")
+
 
 TWITTER_RE = re.compile(r"(?:(?:www.twitter.com|twitter.com)/(?:[-_a-zA-Z0-9]+)/status/)([0-9]+)", re.I)
 
@@ -210,7 +210,7 @@ def reverse(text):
 # hashing
 
 
-@hook.command("hash")
+@hook.command("hash", isolated=True)
 def hash_command(text):
     """<string> - Returns hashes of <string>."""
     return ', '.join(x + ": " + getattr(hashlib, x)(text.encode("utf-8")).hexdigest()
@@ -1,21 +1,27 @@
-import codecs
 import os
-import random
 
 from cloudbot import hook
+from cloudbot.util.datafile import DataFile
 
-vsquotes = []
+vsquotes = None
 
 
 @hook.on_start()
 def load_quotes(bot):
     """- Import quotes from data directory."""
-    vsquotes.clear()
-    with codecs.open(os.path.join(bot.data_dir, "verysmart.txt"), encoding="utf-8") as fp:
-        vsquotes.extend(quote.strip() for quote in fp.readlines())
+    global vsquotes
+    vsquotes = DataFile(os.path.join(bot.data_dir, "verysmart.txt"))
+
+
+@hook.on_stop()
+def close_quotes():
+    global vsquotes
+    if vsquotes is not None:
+        vsquotes.close()
+        vsquotes = None
 
 
 @hook.command('smart', 'verysmart', 'vs', 'iamverysmart', 'iavs', autohelp=False)
 def verysmart():
     """- Return a random choice from the quote list."""
-    return random.choice(vsquotes)
+    return vsquotes.random_line()
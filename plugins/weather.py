@@ -2,19 +2,19 @@ import math
 from fractions import Fraction
 from typing import Optional
 
-import googlemaps
 from forecastiopy.ForecastIO import ForecastIO
-from googlemaps.exceptions import ApiError
 from sqlalchemy import Table, Column, PrimaryKeyConstraint, String
 
 from cloudbot import hook
 from cloudbot.util import web, database, colors
+from cloudbot.util.cached_table import CachedTable
+from cloudbot.util.lazy_import import lazy_module
 
-Api = Optional[googlemaps.Client]
+googlemaps = lazy_module("googlemaps")
 
 
 class PluginData:
-    maps_api = None  # type: Api
+    maps_api = None  # type: Optional[googlemaps.Client]
 
 
 data = PluginData()
@@ -29,7 +29,7 @@ table = Table(
     PrimaryKeyConstraint('nick')
 )
 
-location_cache = []
+location_cache = CachedTable(table, 'nick')
 
 BEARINGS = (
     'N', 'NNE',
@@ -100,31 +100,16 @@ def find_location(location, bias=None):
 
 
 def add_location(nick, location, db):
-    test = dict(location_cache)
-    location = str(location)
-    if nick.lower() in test:
-        db.execute(table.update().values(loc=location.lower()).where(table.c.nick == nick.lower()))
-        db.commit()
-        load_cache(db)
-    else:
-        db.execute(table.insert().values(nick=nick.lower(), loc=location.lower()))
-        db.commit()
-        load_cache(db)
+    location_cache.set(db, {'nick': nick.lower(), 'loc': str(location).lower()})
 
 
-@hook.on_start
+@hook.on_start(defer=True)
 def load_cache(db):
-    new_cache = []
-    for row in db.execute(table.select()):
-        nick = row["nick"]
-        location = row["loc"]
-        new_cache.append((nick, location))
-
-    location_cache.clear()
-    location_cache.extend(new_cache)
+    location_cache.load(db)
 
 
 @hook.on_start()
+@hook.config("api_keys.google_dev_key")
 def create_maps_api(bot):
     google_key = bot.config.get_api_key("google_dev_key")
     if google_key:
@@ -135,12 +120,7 @@ def create_maps_api(bot):
 
 def get_location(nick):
     """looks in location_cache for a saved location"""
-    location = [row[1] for row in location_cache if nick.lower() == row[0]]
-    if not location:
-        return
-
-    location = location[0]
-    return location
+    return location_cache.get_value(nick.lower(), 'loc')
 
 
 def check_and_parse(event, db):
@@ -171,7 +151,7 @@ def check_and_parse(event, db):
     # use find_location to get location data from the user input
     try:
         location_data = find_location(location, bias=bias)
-    except ApiError:
+    except googlemaps.exceptions.ApiError:
         event.reply("API Error occurred.")
         raise
     except LocationNotFound as e:
@@ -10,7 +10,8 @@ lang_dict = {}
 lang_dir = []
 
 
-@hook.on_start()
+@hook.on_start(defer=True)
+@hook.config("api_keys.yandex_translate")
 def load_key():
     api_key = bot.config.get_api_key("yandex_translate")
     if not api_key:
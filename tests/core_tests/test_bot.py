@@ -1,7 +1,8 @@
+import asyncio
 import textwrap
 
 import pytest
-from mock import patch
+from mock import MagicMock, patch
 
 from cloudbot import config
 
@@ -64,3 +65,40 @@ def test_load_clients():
         bot = CloudBot()
         assert bot.connections['foobar'].nick == 'TestBot'
         assert bot.connections['foobar'].type == 'irc'
+
+
+def test_process_batch():
+    from cloudbot.bot import CloudBot
+    from cloudbot.event import Event
+
+    launched = {}
+
+    async def launch(_hook, event):
+        launched[_hook.function_name] = event
+
+    def make_hook(name, triggers, clients=()):
+        _hook = MagicMock(function_name=name, triggers=set(triggers), clients=list(clients))
+        _hook.is_catch_all.return_value = '*' in triggers
+        return _hook
+
+    bot = MagicMock()
+    bot.plugin_manager.launch = launch
+    bot.plugin_manager.batch_hooks = [
+        make_hook('all', ['*']),
+        make_hook('joins', ['JOIN']),
+        make_hook('parts', ['PART']),
+        make_hook('other_client', ['*'], clients=['loopback']),
+    ]
+    conn = MagicMock(type='irc')
+    events = [Event(irc_command='JOIN', nick='foo'), Event(irc_command='QUIT', nick='bar')]
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(CloudBot.process_batch(bot, conn, events, frozenset({'foo'})))
+    finally:
+        loop.close()
+
+    assert set(launched) == {'all', 'joins'}
+    assert launched['all'].events == events
+    assert launched['joins'].events == events[:1]
+    assert launched['joins'].returning == {'foo'}
+    assert launched['joins'].conn is conn
@@ -0,0 +1,88 @@
+import json
+from unittest.mock import MagicMock
+
+from cloudbot.config import MISSING, Config, diff_config
+
+
+class MockConn:
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.permissions = MagicMock()
+
+
+class MockBot:
+    def __init__(self):
+        self.connections = {}
+        self.plugin_manager = MagicMock()
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data))
+
+
+def test_diff_config():
+    old = {
+        "api_keys": {"a": "1", "b": "2"},
+        "connections": [{"name": "one", "nick": "x"}, {"name": "two", "nick": "y"}],
+        "list": [1, 2],
+    }
+    new = {
+        "api_keys": {"a": "1", "c": "3"},
+        "connections": [{"name": "two", "nick": "z"}, {"name": "one", "nick": "x"}],
+        "list": [1, 3],
+    }
+    assert diff_config(old, new) == {
+        ("api_keys", "b"): ("2", MISSING),
+        ("api_keys", "c"): (MISSING, "3"),
+        ("connections", "two", "nick"): ("y", "z"),
+        ("list",): ([1, 2], [1, 3]),
+    }
+    assert diff_config(old, old) == {}
+
+
+def test_reload(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    path = tmp_path / "config.json"
+    data = {
+        "api_keys": {"a": "1", "b": "2"},
+        "connections": [
+            {"name": "one", "nick": "x", "permissions": {}},
+            {"name": "two", "nick": "y", "permissions": {}},
+        ],
+        "removed": True,
+    }
+    _write(path, data)
+
+    bot = MockBot()
+    config = Config(bot)
+    assert config.get_api_key("a") == "1"
+    assert config.get_api_key("b") == "2"
+    one = MockConn("one", config["connections"][0])
+    two = MockConn("two", config["connections"][1])
+    bot.connections = {"one": one, "two": two}
+    one_config = one.config
+
+    # Nothing changed
+    assert config.load_config() == {}
+    bot.plugin_manager.config_changed.assert_not_called()
+
+    data["api_keys"]["b"] = "3"
+    data["connections"][0]["permissions"] = {"admins": {"perms": ["botcontrol"], "users": ["*!*@host"]}}
+    del data["removed"]
+    _write(path, data)
+
+    changes = config.load_config()
+    assert set(changes) == {("api_keys", "b"), ("connections", "one", "permissions", "admins"), ("removed",)}
+    assert "removed" not in config
+    assert config.get_api_key("a") == "1"
+    assert config.get_api_key("b") == "3"
+
+    # The connection keeps its config object, updated in place
+    assert one.config is one_config
+    assert one.config["permissions"]["admins"]["users"] == ["*!*@host"]
+    assert config["connections"][0] is one_config
+    one.permissions.reload.assert_called_once_with()
+    two.permissions.reload.assert_not_called()
+
+    bot.plugin_manager.config_changed.assert_called_once_with(changes)
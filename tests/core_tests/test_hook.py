@@ -13,6 +13,7 @@ def test_hook_decorate():
     @hook.command('test')
     @hook.irc_raw('*')
     @hook.irc_raw(['PRIVMSG'])
+    @hook.irc_batch(['JOIN', 'QUIT'])
     @hook.irc_out()
     @hook.on_stop()
     @hook.on_start()
@@ -33,6 +34,7 @@ def test_hook_decorate():
     }
     assert f._cloudbot_hook['command'].aliases == {'test'}
     assert f._cloudbot_hook['irc_raw'].triggers == {'*', 'PRIVMSG'}
+    assert f._cloudbot_hook['irc_batch'].triggers == {'JOIN', 'QUIT'}
 
     assert 'irc_out' in f._cloudbot_hook
     assert 'on_start' in f._cloudbot_hook
@@ -63,6 +65,9 @@ def test_hook_decorate():
     with pytest.raises(TypeError):
         hook.irc_raw(f)
 
+    with pytest.raises(TypeError):
+        hook.irc_batch(f)
+
     @hook.sieve
     def sieve_func(bot, event, _hook):
         pass  # pragma: no cover
@@ -0,0 +1,89 @@
+import asyncio
+
+from mock import MagicMock
+
+from cloudbot.clients.loopback import LoopbackClient, OutMessage
+from cloudbot.event import Event, EventType
+
+
+class MockBot:
+    def __init__(self, loop):
+        self.loop = loop
+        self.plugin_manager = MagicMock()
+        self.plugin_manager.connect_hooks = []
+        self.events = []
+
+    async def process(self, event):
+        await asyncio.sleep(0)
+        self.events.append(event)
+
+
+def make_client(loop=None):
+    bot = MockBot(loop or asyncio.get_event_loop())
+    return LoopbackClient(bot, 'loopback', 'test', 'TestBot', channels=['#foo'], config={'name': 'test'})
+
+
+def test_registered():
+    from venusian import Scanner
+    from cloudbot import clients
+
+    bot = MagicMock()
+    Scanner(bot=bot).scan(clients, categories=['cloudbot.client'])
+    bot.register_client.assert_any_call('loopback', LoopbackClient)
+
+
+def test_output():
+    conn = make_client()
+    conn.loop.run_until_complete(conn.connect())
+    assert conn.connected
+
+    conn.message('#foo', 'a', 'b')
+    conn.notice('someone', 'c')
+    conn.action('#foo', 'waves')
+    conn.cmd('MODE', '#foo', '+o', 'someone')
+    conn.join('#bar')
+
+    assert conn.drain() == [
+        OutMessage('PRIVMSG', '#foo', 'a'),
+        OutMessage('PRIVMSG', '#foo', 'b'),
+        OutMessage('NOTICE', 'someone', 'c'),
+        OutMessage('ACTION', '#foo', 'waves'),
+        OutMessage('RAW', None, 'MODE #foo +o someone'),
+        OutMessage('JOIN', '#bar', None),
+    ]
+    assert not conn.outgoing
+    assert conn.lines_out == 6
+    assert conn.channels == ['#foo', '#bar']
+
+    conn.close()
+    assert not conn.connected
+    assert conn.drain() == [OutMessage('QUIT', None, None)]
+
+
+def test_feed_line():
+    conn = make_client()
+    conn.feed_line(':nick!user@host PRIVMSG #foo :\x01ACTION waves\x01')
+    conn.feed_line(':nick!user@host PRIVMSG TestBot :hello')
+    assert conn.pending_events == 2
+
+    conn.loop.run_until_complete(conn.wait_idle())
+
+    assert conn.pending_events == 0
+    assert conn.lines_in == 2
+    action, privmsg = conn.bot.events
+    assert action.type is EventType.action
+    assert action.chan == '#foo'
+    assert action.content == 'waves'
+    assert privmsg.type is EventType.message
+    assert privmsg.chan == 'nick'
+    assert privmsg.conn is conn
+
+
+def test_feed_event():
+    conn = make_client()
+    event = Event(
+        bot=conn.bot, conn=conn, event_type=EventType.message, channel='#foo', nick='nick', content='hi'
+    )
+    conn.loop.run_until_complete(conn.feed_event(event))
+    assert conn.bot.events == [event]
+    assert conn.pending_events == 0
@@ -14,7 +14,7 @@ from mock import patch
 
 import cloudbot.bot
 from cloudbot.event import (
-    CapEvent, CommandEvent, Event, EventType, IrcOutEvent, PostHookEvent, RegexEvent,
+    BatchEvent, CapEvent, CommandEvent, ConfigEvent, Event, EventType, IrcOutEvent, PostHookEvent, RegexEvent,
 )
 from cloudbot.hook import Action
 from cloudbot.plugin import Plugin
@@ -34,6 +34,7 @@ class MockConfig(OrderedDict):
 class MockBot:
     loop = None
     user_agent = None
+    adb = None
 
     def __init__(self):
         self.config = MockConfig()
@@ -171,6 +172,10 @@ def test_hook_args(hook):
         event = PostHookEvent(bot=bot)
     elif hook.type == "irc_out":
         event = IrcOutEvent(bot=bot)
+    elif hook.type == "config":
+        event = ConfigEvent(bot=bot, changes={})
+    elif hook.type == "irc_batch":
+        event = BatchEvent(bot=bot, events=[])
     elif hook.type == "sieve":
         return
     else:  # pragma: no cover
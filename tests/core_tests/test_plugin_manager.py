@@ -166,3 +166,489 @@ def test_safe_resolve(mock_manager):
     assert str(path) == str(base_path.absolute())
     assert path.is_absolute()
     assert not path.exists()
+
+
+class MockLimitBot:
+    def __init__(self, config=None):
+        self.loop = asyncio.get_event_loop()
+        self.config = config or {}
+        self.base_dir = Path().resolve()
+        self.plugin_manager = PluginManager(self)
+
+
+def make_limit_plugin(manager, func, hook_type, **kwargs):
+    from cloudbot import hook
+    from cloudbot.plugin import Plugin
+
+    module = MockModule()
+    if hook_type == 'command':
+        module.func = hook.command('test', **kwargs)(func)
+    else:
+        module.func = hook.irc_raw('*', **kwargs)(func)
+
+    file_path = Path('plugins').resolve() / 'test.py'
+    plugin = Plugin(str(file_path), file_path.name, 'test', module)
+    manager._configure_limits(plugin)
+    return plugin
+
+
+def test_limits_from_config():
+    bot = MockLimitBot({
+        'plugins': {
+            'test': {
+                'hook_limits': {
+                    'max_concurrency': 2,
+                    'timeout': 5,
+                    'reject_excess': True,
+                },
+            },
+        },
+    })
+
+    def func():
+        pass  # pragma: no cover
+
+    plugin = make_limit_plugin(bot.plugin_manager, func, 'command', max_concurrency=3)
+    _hook = plugin.hooks['command'][0]
+    assert _hook.max_concurrency == 3
+    assert _hook.timeout == 5
+    assert _hook.reject_excess is True
+    assert _hook.semaphore is not None
+
+
+def test_reject_excess():
+    from cloudbot.event import Event
+
+    bot = MockLimitBot()
+    manager = bot.plugin_manager
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def func():
+        started.set()
+        await release.wait()
+
+    plugin = make_limit_plugin(manager, func, 'irc_raw', max_concurrency=1, reject_excess=True)
+    _hook = plugin.hooks['irc_raw'][0]
+
+    async def run():
+        first = asyncio.ensure_future(manager.launch(_hook, Event(bot=bot, hook=_hook)))
+        await started.wait()
+        assert not await manager.launch(_hook, Event(bot=bot, hook=_hook))
+        release.set()
+        assert await first
+
+    bot.loop.run_until_complete(run())
+    assert _hook.rejected == 1
+    assert not plugin.tasks
+
+
+def test_coroutine_timeout():
+    from cloudbot.event import Event
+
+    bot = MockLimitBot()
+    manager = bot.plugin_manager
+    cancelled = []
+
+    async def func():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    plugin = make_limit_plugin(manager, func, 'irc_raw', timeout=0.01)
+    _hook = plugin.hooks['irc_raw'][0]
+
+    ok, _ = bot.loop.run_until_complete(manager.internal_launch(_hook, Event(bot=bot, hook=_hook)))
+    assert not ok
+    assert cancelled == [True]
+    assert _hook.timed_out == 1
+    assert not plugin.tasks
+
+
+def isolated_upper(content):
+    import os
+    return content.upper(), os.getpid()
+
+
+def test_isolated_hook():
+    import os
+    from cloudbot.event import Event
+
+    bot = MockLimitBot()
+    manager = bot.plugin_manager
+    plugin = make_limit_plugin(manager, isolated_upper, 'irc_raw', isolated={'cpu_time': 2})
+    _hook = plugin.hooks['irc_raw'][0]
+    assert _hook.isolated == {'cpu_time': 2}
+
+    try:
+        ok, out = bot.loop.run_until_complete(
+            manager.internal_launch(_hook, Event(bot=bot, hook=_hook, content='hi'))
+        )
+    finally:
+        bot.loop.run_until_complete(manager.unload_all())
+
+    assert ok
+    assert out[0] == 'HI'
+    assert out[1] != os.getpid()
+
+
+def test_isolated_bad_args():
+    bot = MockLimitBot()
+
+    def func(conn):
+        pass  # pragma: no cover
+
+    async def coro(text):
+        pass  # pragma: no cover
+
+    for _func in (func, coro):
+        plugin = make_limit_plugin(bot.plugin_manager, _func, 'command', isolated=True)
+        assert plugin.hooks['command'][0].isolated is None
+
+    def prefixed(text, triggered_prefix):
+        pass  # pragma: no cover
+
+    plugin = make_limit_plugin(bot.plugin_manager, prefixed, 'command', isolated=True)
+    assert plugin.hooks['command'][0].isolated == {}
+
+
+def make_deferred_module(calls, fail=False):
+    from cloudbot import hook
+
+    module = MockModule()
+
+    @hook.on_start(defer=True)
+    async def loader():
+        await asyncio.sleep(0.01)
+        calls.append('loader')
+        if fail:
+            raise ValueError("failed")
+
+    @hook.command('test')
+    async def command():
+        calls.append('command')
+
+    module.loader = loader
+    module.command = command
+    return module
+
+
+def test_deferred_on_start(patch_import_module):
+    from cloudbot.event import Event
+
+    mock_manager = MockLimitBot().plugin_manager
+    calls = []
+    patch_import_module.return_value = make_deferred_module(calls)
+    loop = mock_manager.bot.loop
+    loop.run_until_complete(mock_manager.load_plugin('plugins/test.py'))
+    plugin = mock_manager.get_plugin('plugins/test.py')
+    assert calls == []
+    assert plugin.warmup is None
+    assert set(plugin.startup_times) == {'import', 'tables', 'on_start', 'register'}
+
+    # A hook firing before startup finishes waits for the loader
+    _hook = mock_manager.commands['test']
+    assert loop.run_until_complete(mock_manager.launch(_hook, Event(hook=_hook)))
+    assert calls == ['loader', 'command']
+
+    loop.run_until_complete(mock_manager.start_deferred())
+    assert calls == ['loader', 'command']
+    assert 'deferred' in plugin.startup_times
+
+
+def test_deferred_on_start_failed(patch_import_module):
+    from cloudbot.event import Event
+
+    mock_manager = MockLimitBot().plugin_manager
+    calls = []
+    patch_import_module.return_value = make_deferred_module(calls, fail=True)
+    loop = mock_manager.bot.loop
+    loop.run_until_complete(mock_manager.load_plugin('plugins/test.py'))
+    loop.run_until_complete(mock_manager.start_deferred())
+    assert calls == ['loader']
+
+    _hook = mock_manager.commands['test']
+    assert not loop.run_until_complete(mock_manager.launch(_hook, Event(hook=_hook)))
+    assert calls == ['loader']
+
+
+def test_format_startup_times():
+    from cloudbot.plugin import format_startup_times
+
+    class _Plugin:
+        def __init__(self, title, times):
+            self.title = title
+            self.startup_times = times
+
+    table = format_startup_times([
+        _Plugin('fast', {'import': 0.001}),
+        _Plugin('slow', {'import': 0.5, 'tables': 0.25, 'on_start': 1, 'deferred': 2}),
+    ])
+    lines = table.splitlines()
+    assert lines[0].split() == ['plugin', 'import', 'tables', 'on_start', 'register', 'deferred', 'total']
+    assert lines[1].split() == ['slow', '0.500', '0.250', '1.000', '-', '2.000', '3.750']
+    assert lines[2].split() == ['fast', '0.001', '-', '-', '-', '-', '0.001']
+
+
+def make_lazy_module(calls):
+    from cloudbot import hook
+
+    module = MockModule()
+
+    @hook.command('lazy')
+    async def command():
+        """<text> - Does lazy things"""
+        calls.append('command')
+
+    @hook.regex(r'^lazy (\w+)$')
+    async def regex():
+        calls.append('regex')  # pragma: no cover
+
+    module.command = command
+    module.regex = regex
+    return module
+
+
+def test_manifest_lazy_load(tmp_path, patch_import_module):
+    from cloudbot.event import Event
+
+    plugin_dir = tmp_path / 'plugins'
+    plugin_dir.mkdir()
+    plugin_file = plugin_dir / 'lazy.py'
+    plugin_file.write_text('# lazy\n')
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+
+    calls = []
+    patch_import_module.side_effect = lambda name: make_lazy_module(calls)
+
+    def start():
+        bot = MockLimitBot({'plugin_loading': {'lazy': True}})
+        bot.base_dir = tmp_path
+        bot.data_dir = str(data_dir)
+        bot.loop.run_until_complete(bot.plugin_manager.load_all(str(plugin_dir)))
+        return bot.plugin_manager
+
+    # Nothing recorded yet, so the plugin is imported and recorded
+    manager = start()
+    assert patch_import_module.call_count == 1
+    assert not manager.find_plugin('lazy').stub
+    assert (data_dir / 'plugin_manifest.json').exists()
+
+    # Registered from the manifest without importing it
+    manager = start()
+    assert patch_import_module.call_count == 1
+    plugin = manager.find_plugin('lazy')
+    assert plugin.stub
+    _hook = manager.commands['lazy']
+    assert _hook.doc == '<text> - Does lazy things'
+    assert _hook.function_name == 'command'
+    assert [regex.pattern for regex, _ in manager.regex_hooks] == [r'^lazy (\w+)$']
+
+    # Imported on first use
+    event = Event(hook=_hook)
+    assert manager.bot.loop.run_until_complete(manager.launch(_hook, event))
+    assert patch_import_module.call_count == 2
+    assert calls == ['command']
+    assert not manager.find_plugin('lazy').stub
+    assert manager.commands['lazy'] is not _hook
+    assert event.hook is manager.commands['lazy']
+    assert len(manager.regex_hooks) == 1
+
+    # Changed files are imported on startup
+    plugin_file.write_text('# lazy, changed\n')
+    manager = start()
+    assert patch_import_module.call_count == 3
+    assert not manager.find_plugin('lazy').stub
+
+
+def test_manifest_eager_hooks(tmp_path, patch_import_module):
+    plugin_dir = tmp_path / 'plugins'
+    plugin_dir.mkdir()
+    (plugin_dir / 'test.py').write_text('# test\n')
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+
+    patch_import_module.side_effect = lambda name: make_deferred_module([])
+
+    for count in (1, 2):
+        bot = MockLimitBot({'plugin_loading': {'lazy': True}})
+        bot.base_dir = tmp_path
+        bot.data_dir = str(data_dir)
+        bot.loop.run_until_complete(bot.plugin_manager.load_all(str(plugin_dir)))
+        # Plugins with on_start hooks are always imported
+        assert patch_import_module.call_count == count
+        assert not bot.plugin_manager.find_plugin('test').stub
+
+
+def test_config_hooks(patch_import_module):
+    from cloudbot import hook
+
+    calls = []
+    module = MockModule()
+
+    @hook.config("plugins.test", "api_keys.test")
+    async def config_changed(changes):
+        calls.append(changes)
+
+    module.config_changed = config_changed
+    patch_import_module.return_value = module
+
+    mock_manager = MockLimitBot().plugin_manager
+    loop = mock_manager.bot.loop
+    loop.run_until_complete(mock_manager.load_plugin('plugins/test.py'))
+    assert len(mock_manager.config_hooks) == 1
+
+    assert mock_manager.config_changed({('api_keys', 'other'): ('a', 'b')}) is None
+    assert calls == []
+
+    loop.run_until_complete(mock_manager.config_changed({
+        ('plugins', 'test', 'value'): (1, 2),
+        ('plugins', 'other'): (1, 2),
+    }))
+    assert calls == [{('plugins', 'test', 'value'): (1, 2)}]
+
+    loop.run_until_complete(mock_manager.unload_plugin('plugins/test.py'))
+    assert mock_manager.config_hooks == []
+
+
+def make_reload_module(calls, version, fail_start=False, claimed=None):
+    """
+    :param claimed: A set of names the module claims one of on start and gives back on stop, like a port
+    """
+    from cloudbot import hook
+
+    module = MockModule()
+    module.__name__ = 'plugins.test'
+
+    @hook.on_start
+    async def start(bot):
+        # The previous version keeps handling commands while this one starts
+        old_hook = bot.plugin_manager.commands.get('test')
+        calls.append(('start', version, old_hook and old_hook.function.version))
+        if fail_start:
+            raise ValueError("failed")
+
+        if claimed is not None:
+            if 'test' in claimed:
+                raise ValueError("Attempt to register duplicate item")
+
+            claimed.add('test')
+
+    @hook.on_stop
+    def stop():
+        calls.append(('stop', version))
+        if claimed is not None:
+            claimed.remove('test')
+
+    @hook.command('test')
+    def command():
+        pass  # pragma: no cover
+
+    command.version = version
+    module.start = start
+    module.stop = stop
+    module.command = command
+    return module
+
+
+def test_reload_plugin(patch_import_module):
+    mock_manager = MockLimitBot().plugin_manager
+    loop = mock_manager.bot.loop
+    calls = []
+    patch_import_module.return_value = make_reload_module(calls, 1)
+    with patch.dict('sys.modules'), patch.object(PluginManager, '_import_fresh') as import_fresh:
+        assert loop.run_until_complete(mock_manager.reload_plugin('plugins/test.py'))
+        old_plugin = mock_manager.get_plugin('plugins/test.py')
+        import_fresh.assert_not_called()
+
+        import_fresh.return_value = new_module = make_reload_module(calls, 2)
+        assert loop.run_until_complete(mock_manager.reload_plugin('plugins/test.py'))
+        import_fresh.assert_called_once_with('plugins.test')
+
+        import sys
+        assert sys.modules['plugins.test'] is new_module
+
+    plugin = mock_manager.get_plugin('plugins/test.py')
+    assert plugin is not old_plugin
+    assert plugin.code is new_module
+    assert mock_manager.commands['test'].plugin is plugin
+    assert calls == [('start', 1, None), ('start', 2, 1), ('stop', 1)]
+    assert mock_manager.reload_stats.count == 1
+    assert mock_manager.reload_stats.failures == 0
+    assert mock_manager.reload_stats.last_time > 0
+
+
+@pytest.mark.parametrize('fail_import', [True, False])
+def test_reload_plugin_failed(patch_import_module, fail_import):
+    mock_manager = MockLimitBot().plugin_manager
+    loop = mock_manager.bot.loop
+    calls = []
+    patch_import_module.return_value = make_reload_module(calls, 1)
+    loop.run_until_complete(mock_manager.load_plugin('plugins/test.py'))
+    old_plugin = mock_manager.get_plugin('plugins/test.py')
+    old_hook = mock_manager.commands['test']
+
+    with patch.object(PluginManager, '_import_fresh') as import_fresh:
+        if fail_import:
+            import_fresh.side_effect = SyntaxError("invalid syntax")
+        else:
+            import_fresh.return_value = make_reload_module(calls, 2, fail_start=True)
+
+        assert not loop.run_until_complete(mock_manager.reload_plugin('plugins/test.py'))
+
+    if fail_import:
+        # Nothing is stopped for a version which can't even be imported
+        assert mock_manager.get_plugin('plugins/test.py') is old_plugin
+        assert mock_manager.commands['test'] is old_hook
+        assert ('stop', 1) not in calls
+    else:
+        # A version which won't start is tried again once the old version is stopped, as an unload and load would
+        assert mock_manager.get_plugin('plugins/test.py') is None
+        assert 'test' not in mock_manager.commands
+        assert calls == [('start', 1, None), ('start', 2, 1), ('stop', 1), ('start', 2, None)]
+
+    assert mock_manager.reload_stats.count == 1
+    assert mock_manager.reload_stats.failures == 1
+
+
+def test_reload_plugin_exclusive(patch_import_module):
+    mock_manager = MockLimitBot().plugin_manager
+    loop = mock_manager.bot.loop
+    calls = []
+    claimed = set()
+    patch_import_module.return_value = make_reload_module(calls, 1, claimed=claimed)
+    with patch.dict('sys.modules'), patch.object(PluginManager, '_import_fresh') as import_fresh:
+        loop.run_until_complete(mock_manager.load_plugin('plugins/test.py'))
+        import_fresh.return_value = new_module = make_reload_module(calls, 2, claimed=claimed)
+        assert loop.run_until_complete(mock_manager.reload_plugin('plugins/test.py'))
+
+        import sys
+        assert sys.modules['plugins.test'] is new_module
+
+    # The new version can't claim what the old one holds, so the old one is stopped before it's started again
+    plugin = mock_manager.get_plugin('plugins/test.py')
+    assert plugin.code is new_module
+    assert mock_manager.commands['test'].plugin is plugin
+    assert calls == [('start', 1, None), ('start', 2, 1), ('stop', 1), ('start', 2, None)]
+    assert claimed == {'test'}
+    assert mock_manager.reload_stats.count == 1
+    assert mock_manager.reload_stats.failures == 0
+
+    loop.run_until_complete(mock_manager.unload_plugin('plugins/test.py'))
+    assert not claimed
+
+
+def test_import_fresh(mock_manager):
+    import sys
+    from plugins.core import plugin_control
+
+    module = mock_manager._import_fresh('plugins.core.plugin_control')
+    assert module is not plugin_control
+    assert sys.modules['plugins.core.plugin_control'] is plugin_control
+    assert module.pluginload is not plugin_control.pluginload
+
+    with pytest.raises(ImportError):
+        mock_manager._import_fresh('plugins.core.does_not_exist')
@@ -0,0 +1,114 @@
+import asyncio
+
+from mock import MagicMock
+
+from cloudbot import shard
+
+
+def test_groups():
+    config = {
+        "connections": [{"name": "a"}, {"name": "b"}, {"name": "c"}, {"name": "d"}],
+        "sharding": {"enabled": True, "groups": [["b", "c"], ["c", "missing"]]},
+    }
+    assert list(shard.get_groups(config).items()) == [("b", ["b", "c"]), ("a", ["a"]), ("d", ["d"])]
+
+
+class MockBot:
+    def __init__(self, loop):
+        self.loop = loop
+        self.running = True
+        self.stopped = []
+
+    async def stop(self, reason=None, *, restart=False, forwarded=False):
+        self.stopped.append((reason, restart, forwarded))
+        self.running = False
+
+
+async def make_client(supervisor, name):
+    bot = MockBot(supervisor.loop)
+    client = shard.ShardClient(bot, supervisor.address, supervisor.token, name, [name])
+    bot.shard = client
+    await client.connect()
+    return client
+
+
+async def wait_for_workers(supervisor, count):
+    while len(supervisor.workers) < count:
+        await asyncio.sleep(0.01)
+
+
+async def wait_for_workers_closed(supervisor):
+    while supervisor.workers:
+        await asyncio.sleep(0.01)
+
+    # Let the connection handlers finish closing their sockets
+    await asyncio.sleep(0.01)
+
+
+async def _run_shards(loop):
+    supervisor = shard.Supervisor({"connections": [{"name": "a"}, {"name": "b"}]}, loop)
+    await supervisor.start(spawn=False)
+    client_a = await make_client(supervisor, "a")
+    client_b = await make_client(supervisor, "b")
+    await wait_for_workers(supervisor, 2)
+
+    for client in (client_a, client_b):
+        client.handlers["conns"] = lambda bot, prefix: [prefix + bot.shard.name]
+
+    assert await client_a.gather("conns", prefix="net-") == {"a": ["net-a"], "b": ["net-b"]}
+
+    received = asyncio.Event()
+    seen = []
+
+    def on_reload(bot, path):
+        seen.append((bot.shard.name, path))
+        received.set()
+
+    client_a.handlers["reload"] = on_reload
+    client_b.handlers["reload"] = on_reload
+    await client_a.broadcast("reload", path="plugins/test.py")
+    await asyncio.wait_for(received.wait(), 5)
+    # Broadcasts aren't sent back to the sender
+    assert seen == [("b", "plugins/test.py")]
+
+    # A stop from one worker is forwarded to all of them
+    await client_b.stop("bye")
+    await asyncio.wait_for(supervisor.stopped_future, 5)
+    assert supervisor.stopped_future.result() is False
+    while client_a.bot.running or client_b.bot.running:
+        await asyncio.sleep(0.01)
+
+    assert client_a.bot.stopped == [("bye", False, True)]
+    assert client_b.bot.stopped == [("bye", False, True)]
+    client_a.close()
+    client_b.close()
+    await wait_for_workers_closed(supervisor)
+
+
+def test_supervisor():
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_run_shards(loop))
+    finally:
+        loop.close()
+
+
+async def _run_bad_token(loop):
+    supervisor = shard.Supervisor({"connections": [{"name": "a"}]}, loop)
+    await supervisor.start(spawn=False)
+    bot = MagicMock(loop=loop, running=False)
+    client = shard.ShardClient(bot, supervisor.address, "wrong", "a", ["a"])
+    await client.connect()
+    await asyncio.wait_for(client._read_task, 5)
+    assert not supervisor.workers
+    assert not client.connected
+    supervisor.server.close()
+    await asyncio.sleep(0.01)
+
+
+def test_bad_token():
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_run_bad_token(loop))
+    finally:
+        loop.close()
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import StaticPool
+
+from cloudbot.util.async_db import AsyncDatabase
+
+metadata = MetaData()
+
+table = Table(
+    'test',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String),
+)
+
+
+@pytest.fixture()
+def adb():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    metadata.create_all(engine)
+    adb = AsyncDatabase(engine, batch_size=20)
+    try:
+        yield adb
+    finally:
+        adb.close()
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_execute(adb):
+    async def _test():
+        res = await adb.execute(table.insert().values(id=1, name='foo'))
+        assert res.rowcount == 1
+        assert res.inserted_primary_key == [1]
+
+        res = await adb.execute(table.select())
+        assert [tuple(row) for row in res] == [(1, 'foo')]
+        assert res.first()['name'] == 'foo'
+
+        assert (await adb.execute(table.select().where(table.c.id == 2))).first() is None
+
+    _run(_test())
+
+
+def test_batching(adb):
+    async def _test():
+        await asyncio.gather(*[adb.execute(table.insert().values(id=i, name=str(i))) for i in range(100)])
+        return await adb.execute(table.select())
+
+    assert len(_run(_test())) == 100
+    assert adb.requests == 101
+    # Inserts made in the same tick go in batch_size chunks
+    assert adb.batches == 6
+
+
+def test_failed_request(adb):
+    async def _test():
+        await adb.execute(table.insert().values(id=1, name='foo'))
+        results = await asyncio.gather(
+            adb.execute(table.insert().values(id=2, name='bar')),
+            adb.execute(table.insert().values(id=1, name='duplicate')),
+            adb.execute(table.insert().values(id=3, name='baz')),
+            return_exceptions=True
+        )
+        return results, await adb.execute(table.select().order_by(table.c.id))
+
+    results, rows = _run(_test())
+    assert isinstance(results[1], IntegrityError)
+    assert results[0].rowcount == results[2].rowcount == 1
+    # The failed insert only fails its own caller
+    assert [tuple(row) for row in rows] == [(1, 'foo'), (2, 'bar'), (3, 'baz')]
+
+
+def test_run(adb):
+    def _update(conn, name):
+        conn.execute(table.insert().values(id=1, name='foo'))
+        return conn.execute(table.update().values(name=name)).rowcount
+
+    async def _test():
+        assert await adb.run(_update, 'bar') == 1
+        return (await adb.execute(table.select())).first()['name']
+
+    assert _run(_test()) == 'bar'
+
+
+def test_close(adb):
+    adb.close()
+    # The worker is started again on demand
+    assert _run(adb.execute(table.select())).fetchall() == []
+
+
+def test_failed_run_not_repeated(adb):
+    calls = []
+
+    def _insert(conn, num):
+        calls.append(num)
+        conn.execute(table.insert().values(id=num, name=str(num)))
+
+    async def _test():
+        await adb.execute(table.insert().values(id=1, name='foo'))
+        return await asyncio.gather(
+            adb.run(_insert, 2), adb.run(_insert, 1), adb.run(_insert, 3), return_exceptions=True
+        )
+
+    results = _run(_test())
+    assert isinstance(results[1], IntegrityError)
+    # Only the requests which succeeded are run again, and the one after the failure hadn't run yet
+    assert calls == [2, 1, 2, 3]
@@ -0,0 +1,130 @@
+import pytest
+from sqlalchemy import Boolean, Column, MetaData, PrimaryKeyConstraint, String, Table, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from cloudbot.util.cached_table import CachedTable
+
+metadata = MetaData()
+
+table = Table(
+    'test',
+    metadata,
+    Column('chan', String),
+    Column('nick', String),
+    Column('value', String),
+    Column('flag', Boolean, default=False),
+    PrimaryKeyConstraint('chan', 'nick'),
+)
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(table.insert(), [
+        {'chan': '#a', 'nick': 'foo', 'value': '1', 'flag': True},
+        {'chan': '#a', 'nick': 'bar', 'value': '2', 'flag': False},
+        {'chan': '#b', 'nick': 'foo', 'value': '3', 'flag': False},
+    ])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _table_data(db):
+    return sorted(tuple(row) for row in db.execute(table.select()))
+
+
+def test_load(db):
+    cache = CachedTable(table, ('chan', 'nick'), indexes=['nick'])
+    assert cache.get(('#a', 'foo')) is None
+
+    cache.load(db)
+    assert len(cache) == 3
+    assert ('#a', 'foo') in cache
+    assert cache.get_value(('#a', 'bar'), 'value') == '2'
+    assert cache.get_value(('#c', 'bar'), 'value', 'default') == 'default'
+    assert sorted(row['chan'] for row in cache.lookup('nick', 'foo')) == ['#a', '#b']
+    assert cache.lookup('nick', 'baz') == []
+
+
+def test_set(db):
+    cache = CachedTable(table, ('chan', 'nick'), indexes=['nick'])
+    cache.load(db)
+
+    cache.set(db, {'chan': '#a', 'nick': 'foo', 'value': 'new'})
+    cache.set(db, {'chan': '#c', 'nick': 'baz', 'value': '4'})
+    assert cache.get(('#a', 'foo')) == {'chan': '#a', 'nick': 'foo', 'value': 'new', 'flag': True}
+    # Columns not given take their defaults
+    assert cache.get(('#c', 'baz')) == {'chan': '#c', 'nick': 'baz', 'value': '4', 'flag': False}
+    assert [row['chan'] for row in cache.lookup('nick', 'baz')] == ['#c']
+    assert _table_data(db) == [
+        ('#a', 'bar', '2', False), ('#a', 'foo', 'new', True), ('#b', 'foo', '3', False), ('#c', 'baz', '4', False)
+    ]
+
+    cache.load(db)
+    assert len(cache) == 4
+    assert cache.get_value(('#a', 'foo'), 'value') == 'new'
+
+
+def test_set_keys_only(db):
+    cache = CachedTable(table, ('chan', 'nick', 'value'))
+    cache.load(db)
+    cache.set(db, {'chan': '#a', 'nick': 'foo', 'value': '1'})
+    cache.set(db, {'chan': '#d', 'nick': 'foo', 'value': '5'})
+    assert len(cache) == 4
+    assert len(_table_data(db)) == 4
+
+
+def test_delete(db):
+    cache = CachedTable(table, ('chan', 'nick'), indexes=['nick'])
+    cache.load(db)
+
+    assert cache.delete(db, ('#a', 'foo'))
+    assert not cache.delete(db, ('#a', 'foo'))
+    assert ('#a', 'foo') not in cache
+    assert [row['chan'] for row in cache.lookup('nick', 'foo')] == ['#b']
+    assert _table_data(db) == [('#a', 'bar', '2', False), ('#b', 'foo', '3', False)]
+
+
+def test_failed_write(db):
+    cache = CachedTable(table, ('chan', 'nick'))
+    cache.load(db)
+    with pytest.raises(Exception):
+        cache.set(db, {'chan': '#a', 'nick': 'foo', 'missing': 'x'})
+
+    db.rollback()
+    assert cache.get_value(('#a', 'foo'), 'value') == '1'
+
+
+def test_lazy(db):
+    cache = CachedTable(table, 'value', lazy=True)
+    cache.load(db)
+    assert len(cache) == 0
+    assert cache.get('1') is None
+    assert cache.get('1', db=db)['nick'] == 'foo'
+    assert len(cache) == 1
+    assert cache.get('9', db=db) is None
+
+    db.execute(table.insert().values(chan='#e', nick='qux', value='9'))
+    db.commit()
+    # Misses are remembered until the cache is reloaded or the key is written through it
+    assert cache.get('9', db=db) is None
+    cache.load(db)
+    assert cache.get('9', db=db)['nick'] == 'qux'
+
+
+def test_lazy_update_uncached(db):
+    cache = CachedTable(table, ('chan', 'nick'), indexes=['nick'], lazy=True)
+    cache.load(db)
+
+    # Columns left out of the update come from the existing row, not the defaults
+    row = cache.set(db, {'chan': '#a', 'nick': 'foo', 'value': 'new'})
+    assert row == {'chan': '#a', 'nick': 'foo', 'value': 'new', 'flag': True}
+    assert cache.lookup('nick', 'foo') == [row]
+
+    assert cache.set(db, {'chan': '#a', 'nick': 'bar'}) == {'chan': '#a', 'nick': 'bar', 'value': '2', 'flag': False}
+    assert cache.set(db, {'chan': '#d', 'nick': 'new'}) == {'chan': '#d', 'nick': 'new', 'value': None, 'flag': False}
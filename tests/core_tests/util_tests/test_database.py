@@ -1,5 +1,9 @@
 import importlib
 
+import pytest
+
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
+
 from cloudbot.util import database
 
 
@@ -7,3 +11,73 @@ def test_database():
     importlib.reload(database)
     assert database.metadata.bind is None
     assert database.base is None
+
+
+def test_sqlite_file_engine(tmp_path):
+    options = {"sqlite": {"synchronous": "FULL", "mmap_size": None}, "pool_size": 3}
+    engine = database.make_engine("sqlite:///" + str(tmp_path / "test.db"), options)
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+    with engine.connect() as conn:
+        assert conn.execute("PRAGMA journal_mode").scalar() == "wal"
+        # FULL
+        assert conn.execute("PRAGMA synchronous").scalar() == 2
+        assert conn.execute("PRAGMA busy_timeout").scalar() == 30000
+
+        assert database.read_sqlite_pragmas(conn.connection, ["journal_mode"]) == ["journal_mode=wal"]
+
+    assert "QueuePool(size=3, overflow=10" in database.describe_engine(engine)
+
+
+def test_sqlite_memory_engine():
+    engine = database.make_engine("sqlite://")
+    assert isinstance(engine.pool, SingletonThreadPool)
+    with engine.connect() as conn:
+        # In-memory databases can't use WAL
+        assert conn.execute("PRAGMA journal_mode").scalar() == "memory"
+        assert conn.execute("PRAGMA temp_store").scalar() == 2
+
+
+def test_invalid_pragma():
+    with pytest.raises(ValueError):
+        database.make_engine("sqlite://", {"sqlite": {"synchronous": "SOMETIMES"}})
+
+
+def _make_tables(metadata, *names):
+    from sqlalchemy import Column, Integer, Table
+
+    return [Table(name, metadata, Column('id', Integer, primary_key=True)) for name in names]
+
+
+def test_create_tables(tmp_path):
+    from sqlalchemy import MetaData
+
+    engine = database.make_engine("sqlite:///" + str(tmp_path / "test.db"))
+    metadata = MetaData()
+    first, second = _make_tables(metadata, 'first', 'second')
+    assert database.create_tables(engine, [first]) == [first]
+    assert database.create_tables(engine, [first, second]) == [second]
+    assert database.create_tables(engine, [first, second]) == []
+    assert set(engine.table_names()) == {'first', 'second'}
+
+
+def test_table_registry(tmp_path):
+    import asyncio
+    from sqlalchemy import MetaData
+
+    loop = asyncio.get_event_loop()
+    engine = database.make_engine("sqlite:///" + str(tmp_path / "test.db"))
+    metadata = MetaData()
+    tables = _make_tables(metadata, 'a', 'b', 'c')
+    registry = database.TableRegistry(engine, loop)
+    # Tables registered in the same tick are created in one batch
+    loop.run_until_complete(asyncio.gather(
+        registry.register(tables[:2]), registry.register(tables[1:]),
+    ))
+    assert registry.batches == 1
+    assert registry.created == 3
+    assert set(engine.table_names()) == {'a', 'b', 'c'}
+
+    loop.run_until_complete(registry.register(tables))
+    assert registry.batches == 2
+    assert registry.created == 3
@@ -0,0 +1,93 @@
+import os
+import random
+
+import pytest
+
+from cloudbot.util.datafile import DataFile
+
+
+def _write(path, text):
+    path.write_bytes(text.encode())
+
+
+def test_lines(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "// comment\nfirst\n  second  \n//another\nthird")
+    data = DataFile(path, skip_comments=True)
+    assert len(data) == 3
+    assert data[0] == "first"
+    assert data[1] == "second"
+    assert data[-1] == "third"
+    assert list(data) == ["first", "second", "third"]
+
+    with pytest.raises(IndexError):
+        data[3]
+
+
+def test_keep_comments(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "// comment\nfirst\n")
+    data = DataFile(path)
+    assert list(data) == ["// comment", "first"]
+
+
+def test_unicode(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "café\n☃\n")
+    assert list(DataFile(path)) == ["café", "☃"]
+
+
+def test_random_line(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "a\nb\nc\n")
+    data = DataFile(path)
+    seen = {data.random_line(random.Random(i)) for i in range(50)}
+    assert seen == {"a", "b", "c"}
+
+
+def test_empty(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "")
+    data = DataFile(path)
+    assert not data
+    assert list(data) == []
+    with pytest.raises(IndexError):
+        data.random_line()
+
+
+def test_reload_on_change(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "a\nb\n")
+    data = DataFile(path, check_interval=0)
+    assert list(data) == ["a", "b"]
+
+    _write(path, "c\nd\ne\n")
+    st = os.stat(str(path))
+    os.utime(str(path), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert list(data) == ["c", "d", "e"]
+
+
+def test_check_interval(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "a\nb\n")
+    data = DataFile(path, check_interval=3600)
+    _write(path, "c\nd\ne\n")
+    assert len(data) == 2
+    data.load()
+    assert len(data) == 3
+
+
+def test_cached_index(tmp_path):
+    path = tmp_path / "data.txt"
+    _write(path, "//x\na\nb\n")
+    data = DataFile(path, skip_comments=True, cache_index=True)
+    assert os.path.exists(data.index_path)
+    data.close()
+
+    loaded = DataFile(path, skip_comments=True, cache_index=True)
+    assert loaded._read_cached_index() is not None
+    assert list(loaded) == ["a", "b"]
+
+    # An index built with different options isn't reused
+    other = DataFile(path, cache_index=True)
+    assert list(other) == ["//x", "a", "b"]
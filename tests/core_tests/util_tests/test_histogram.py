@@ -0,0 +1,52 @@
+import pytest
+
+from cloudbot.util.histogram import BUCKET_BOUNDS, Histogram
+
+
+def test_empty():
+    hist = Histogram()
+    assert hist.count == 0
+    assert hist.mean is None
+    assert hist.percentile(50) is None
+
+
+def test_percentiles():
+    hist = Histogram()
+    for i in range(1, 1001):
+        hist.record(i / 1000)
+
+    assert hist.count == 1000
+    assert hist.min == pytest.approx(0.001)
+    assert hist.max == pytest.approx(1.0)
+    assert hist.mean == pytest.approx(0.5005)
+
+    for pct in (50, 95, 99):
+        expected = pct / 100
+        # Bucket resolution is 25%
+        assert expected <= hist.percentile(pct) <= expected * 1.25
+
+
+def test_overflow():
+    hist = Histogram()
+    hist.record(BUCKET_BOUNDS[-1] * 10)
+    hist.record(-1)
+
+    assert hist.min == 0
+    assert hist.percentile(100) == BUCKET_BOUNDS[-1] * 10
+    assert list(hist.buckets())[-1] == (float('inf'), 2)
+
+
+def test_merge():
+    first = Histogram()
+    second = Histogram()
+    for i in range(10):
+        first.record(0.001)
+        second.record(1)
+
+    first.merge(second)
+    first.merge(Histogram())
+
+    assert first.count == 20
+    assert first.max == 1
+    assert first.percentile(50) == pytest.approx(0.001, rel=0.25)
+    assert first.percentile(99) == 1
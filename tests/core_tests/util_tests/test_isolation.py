@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+
+from cloudbot.util.isolation import IsolatedPool, IsolationTimeout
+
+
+def get_pid(value):
+    return os.getpid(), value
+
+
+def fail():
+    raise ValueError("bad input")
+
+
+def spin():
+    while True:
+        pass
+
+
+def sleep():
+    import time
+    time.sleep(10)
+
+
+def allocate(size):
+    return len(bytearray(size))
+
+
+@pytest.fixture()
+def pool():
+    loop = asyncio.new_event_loop()
+    pool = IsolatedPool(loop, 1)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        loop.close()
+
+
+def run(pool, coro):
+    return pool.loop.run_until_complete(coro)
+
+
+def test_reuse_worker(pool):
+    pid, value = run(pool, pool.run(get_pid, 'a'))
+    assert pid != os.getpid()
+    assert value == 'a'
+
+    with pytest.raises(ValueError, match="bad input"):
+        run(pool, pool.run(fail))
+
+    # Errors raised by the function don't cost us the worker
+    assert run(pool, pool.run(get_pid, 'b')) == (pid, 'b')
+    assert pool.calls == 3
+    assert pool.killed == 0
+
+
+def test_wall_time(pool):
+    pid, _ = run(pool, pool.run(get_pid, None))
+    with pytest.raises(IsolationTimeout):
+        run(pool, pool.run(sleep, wall_time=0.5))
+
+    assert pool.killed == 1
+    new_pid, _ = run(pool, pool.run(get_pid, None))
+    assert new_pid != pid
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="Resource limits are only applied on Unix")
+def test_cpu_time(pool):
+    with pytest.raises(IsolationTimeout, match="CPU time"):
+        run(pool, pool.run(spin, cpu_time=1, wall_time=20))
+
+    assert pool.killed == 1
+    assert run(pool, pool.run(get_pid, 'c'))[1] == 'c'
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason="Memory limits need /proc")
+def test_memory(pool):
+    with pytest.raises(MemoryError):
+        run(pool, pool.run(allocate, 512 * 1024 * 1024, memory=32 * 1024 * 1024))
+
+    # The limit is lifted once the call is over
+    assert run(pool, pool.run(allocate, 64 * 1024 * 1024)) == 64 * 1024 * 1024
+    assert pool.killed == 0
+
+
+def test_wait_for_worker(pool):
+    async def run_both():
+        first = asyncio.ensure_future(pool.run(sleep, wall_time=1))
+        await asyncio.sleep(0)
+        start = pool.loop.time()
+        with pytest.raises(IsolationTimeout, match="waiting for a free worker"):
+            await pool.run(get_pid, 'd', wall_time=0.2)
+
+        assert pool.loop.time() - start < 0.9
+        with pytest.raises(IsolationTimeout):
+            await first
+
+    run(pool, run_both())
+    assert pool.killed == 1
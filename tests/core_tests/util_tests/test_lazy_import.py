@@ -0,0 +1,67 @@
+import sys
+import threading
+
+import pytest
+
+from cloudbot.util.lazy_import import lazy_module
+
+
+@pytest.fixture()
+def unimported():
+    name = "xml.dom.minidom"
+    saved = {mod: sys.modules.pop(mod) for mod in list(sys.modules) if mod.startswith(name)}
+    yield name
+    sys.modules.update(saved)
+
+
+def test_deferred_import(unimported):
+    mod = lazy_module(unimported)
+    assert not mod.loaded
+    assert unimported not in sys.modules
+    assert 'not loaded' in repr(mod)
+
+    assert mod.parseString("<a/>").documentElement.tagName == 'a'
+    assert mod.loaded
+    assert mod.load() is sys.modules[unimported]
+    assert 'not loaded' not in repr(mod)
+
+
+def test_submodule():
+    mod = lazy_module("xml.etree")
+    assert mod.ElementTree.fromstring("<a/>").tag == 'a'
+
+
+def test_missing_attr():
+    mod = lazy_module("json")
+    with pytest.raises(AttributeError):
+        mod.does_not_exist
+
+
+def test_missing_module():
+    mod = lazy_module("cloudbot.does_not_exist")
+    with pytest.raises(ImportError):
+        mod.load()
+
+
+def test_setattr():
+    mod = lazy_module("json")
+    mod._lazy_test_value = 1
+    try:
+        assert sys.modules["json"]._lazy_test_value == 1
+    finally:
+        del mod._lazy_test_value
+
+    assert not hasattr(sys.modules["json"], "_lazy_test_value")
+
+
+def test_threads(unimported):
+    mod = lazy_module(unimported)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(mod.load())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, results))) == 1
@@ -0,0 +1,101 @@
+import asyncio
+
+from irclib.parser import Message
+from mock import MagicMock
+
+from cloudbot.clients.irc import make_event
+from cloudbot.util.netsplit import JoinQuitBatcher
+
+
+class MockConn:
+    def __init__(self, loop, **config):
+        self.name = 'testconn'
+        self.nick = 'TestBot'
+        self.loop = loop
+        self.config = {'netsplit': config}
+        self.pending_events = 0
+        self.batches = []
+        self.bot = MagicMock()
+        self.bot.process_batch = self.process_batch
+
+    async def process_batch(self, conn, events, returning):
+        assert conn is self
+        self.batches.append((events, returning))
+
+
+def make(conn, line):
+    return make_event(conn, Message.parse(line), line)
+
+
+def test_netsplit():
+    loop = asyncio.new_event_loop()
+    conn = MockConn(loop, batch_interval=0.01, quiet_time=0.05)
+    batcher = JoinQuitBatcher(conn)
+    try:
+        # Ordinary quits and joins aren't batched
+        assert not batcher.add(make(conn, ':a!u@h QUIT :Quit: bye'))
+        assert not batcher.add(make(conn, ':a!u@h JOIN #foo'))
+        assert not batcher.add(make(conn, ':a!u@h PRIVMSG #foo :hi'))
+
+        # A netsplit quit starts batching
+        assert batcher.add(make(conn, ':b!u@h QUIT :hub.example.net leaf.example.net'))
+        assert batcher.active
+        assert batcher.add(make(conn, ':c!u@h QUIT :hub.example.net leaf.example.net'))
+        assert batcher.add(make(conn, ':d!u@h JOIN #foo'))
+        assert conn.pending_events == 1
+
+        # Our own joins are never batched
+        assert not batcher.add(make(conn, ':TestBot!u@h JOIN #bar'))
+
+        # and the pending batch is dispatched before them
+        loop.run_until_complete(asyncio.sleep(0))
+        assert [[event.nick for event in events] for events, _ in conn.batches] == [['b', 'c', 'd']]
+        assert conn.pending_events == 0
+
+        assert batcher.add(make(conn, ':b!u@h JOIN #foo'))
+        assert batcher.add(make(conn, ':e!u@h JOIN #foo'))
+        assert not batcher.add(make(conn, ':e!u@h MODE #foo +o e'))
+        loop.run_until_complete(asyncio.sleep(0))
+        events, returning = conn.batches[-1]
+        assert [event.nick for event in events] == ['b', 'e']
+        assert returning == {'b'}
+
+        # Batches are dispatched after the batch interval
+        assert batcher.add(make(conn, ':c!u@h JOIN #foo'))
+        loop.run_until_complete(asyncio.sleep(0.02))
+        assert [event.nick for event in conn.batches[-1][0]] == ['c']
+
+        # Normal handling resumes once it's quiet, without waiting for another line
+        loop.run_until_complete(asyncio.sleep(0.06))
+        assert not batcher.active
+        assert not batcher.add(make(conn, ':f!u@h JOIN #foo'))
+        assert (batcher.storms, batcher.batches, batcher.batched_lines) == (1, 3, 6)
+    finally:
+        loop.close()
+
+
+def test_burst():
+    loop = asyncio.new_event_loop()
+    conn = MockConn(loop, burst_lines=5, burst_window=10, max_batch=3)
+    batcher = JoinQuitBatcher(conn)
+    try:
+        results = [batcher.add(make(conn, ':user{0}!u@h JOIN #foo'.format(i))) for i in range(10)]
+        assert results == [False] * 4 + [True] * 6
+        loop.run_until_complete(asyncio.sleep(0))
+
+        # Full batches are dispatched straight away
+        assert [len(events) for events, _ in conn.batches] == [3, 3]
+        assert all(not returning for _, returning in conn.batches)
+    finally:
+        loop.close()
+
+
+def test_disabled():
+    loop = asyncio.new_event_loop()
+    conn = MockConn(loop, enabled=False)
+    batcher = JoinQuitBatcher(conn)
+    try:
+        assert not batcher.add(make(conn, ':b!u@h QUIT :hub.example.net leaf.example.net'))
+        assert not batcher.active
+    finally:
+        loop.close()
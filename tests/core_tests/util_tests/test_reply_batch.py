@@ -0,0 +1,73 @@
+import asyncio
+
+from irclib.parser import Message
+from mock import MagicMock
+
+from cloudbot.clients.irc import make_event
+from cloudbot.util.reply_batch import WhoReplyBatcher
+
+
+class MockConn:
+    def __init__(self, loop, **config):
+        self.name = 'testconn'
+        self.nick = 'TestBot'
+        self.loop = loop
+        self.config = {'reply_batch': config}
+        self.pending_events = 0
+        self.batches = []
+        self.bot = MagicMock()
+        self.bot.process_batch = self.process_batch
+
+    async def process_batch(self, conn, events):
+        assert conn is self
+        self.batches.append([event.irc_command for event in events])
+
+
+def make(conn, line):
+    return make_event(conn, Message.parse(line), line)
+
+
+WHO_LINE = ':server 352 TestBot #foo ident host server Nick H :0 Real Name'
+END_LINE = ':server 315 TestBot #foo :End of /WHO list'
+
+
+def test_who_reply():
+    loop = asyncio.new_event_loop()
+    conn = MockConn(loop, batch_interval=0.01, max_batch=3)
+    batcher = WhoReplyBatcher(conn)
+    try:
+        assert not batcher.add(make(conn, ':a!u@h PRIVMSG #foo :hi'))
+
+        # Replies are held until the end of the reply
+        assert batcher.add(make(conn, WHO_LINE))
+        assert batcher.add(make(conn, WHO_LINE))
+        assert conn.pending_events == 1
+        assert batcher.add(make(conn, END_LINE))
+        loop.run_until_complete(asyncio.sleep(0))
+        assert conn.batches == [['352', '352', '315']]
+        assert conn.pending_events == 0
+
+        # or until there are too many of them
+        for _ in range(4):
+            assert batcher.add(make(conn, WHO_LINE))
+
+        loop.run_until_complete(asyncio.sleep(0))
+        assert conn.batches[-1] == ['352'] * 3
+
+        # or they've been held too long
+        loop.run_until_complete(asyncio.sleep(0.02))
+        assert conn.batches[-1] == ['352']
+        assert (batcher.batches, batcher.batched_lines) == (3, 7)
+    finally:
+        loop.close()
+
+
+def test_disabled():
+    loop = asyncio.new_event_loop()
+    conn = MockConn(loop, enabled=False)
+    batcher = WhoReplyBatcher(conn)
+    try:
+        assert not batcher.add(make(conn, WHO_LINE))
+        assert not batcher.add(make(conn, END_LINE))
+    finally:
+        loop.close()
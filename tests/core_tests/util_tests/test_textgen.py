@@ -45,3 +45,45 @@ def test_textgen_default_tmpl():
 
     assert generator.get_template(0) == '{thing} is {stuff} {a}'
     assert generator.get_template(1) == '{thing} are {stuff} {a}'
+
+
+def test_textgen_no_repeats():
+    from cloudbot.util.textgen import TextGenerator
+    generator = TextGenerator(
+        ['{x} {x} {y}'],
+        {
+            'x': ['a', ('b', 3), 'a', ('c', 0)],
+            'y': ['{user} wins'],
+        },
+        variables={'user': 'foo'},
+    )
+
+    for s in generator.generate_strings(20):
+        assert s in ('a b foo wins', 'b a foo wins')
+
+
+def test_textgen_exhausted():
+    import pytest
+    from cloudbot.util.textgen import TextGenerator
+    generator = TextGenerator(['{x} {x}'], {'x': ['a']})
+
+    with pytest.raises(IndexError):
+        generator.generate_string()
+
+
+def test_weighted_parts():
+    import random
+    from cloudbot.util.textgen import WeightedParts
+    parts = WeightedParts(['a', ('b', 15), ('c', 0), 'd'])
+    assert parts.values == ['a', 'b', 'd']
+    assert parts.cum_weights == [5, 20, 25]
+
+    rand = random.Random(1)
+    counts = [0, 0, 0]
+    for _ in range(2500):
+        counts[parts.choice(rand)] += 1
+
+    assert counts[1] > counts[0] + counts[2]
+
+    # Mostly excluded, so the remaining weight is scanned
+    assert {parts.choice(rand, {0, 1}, 20) for _ in range(10)} == {2}
@@ -0,0 +1,150 @@
+"""
+Throughput benchmark for the brainfuck plugin's compiled interpreter
+
+Runs a set of standard test programs through the compiled interpreter and through a reference character-at-a-time
+interpreter equivalent to the one the plugin used before programs were compiled, checking they agree and reporting:
+
+    source_steps       characters executed by the reference interpreter
+    compiled_steps     ops executed by the compiled interpreter, which is what MAX_STEPS now counts
+    reference_ms       time taken by the reference interpreter
+    compiled_ms        time taken to compile and run the program
+    speedup            reference_ms / compiled_ms
+
+Usage:
+    python -m tests.perf.bench_brainfuck --repeat 5
+"""
+
+import argparse
+import json
+import random
+import time
+
+from plugins.brainfuck import BUFFER_SIZE, compile_program, run_program
+
+PROGRAMS = {
+    "hello": "++++++++[>++++[>++>+++>+++>+<<<<-]>+>+>->>+[<]<-]>>.>---.+++++++..+++.>>.<-.<.+++.------.--------.>>+.>++.",
+    # Prints the printable ASCII range
+    "ascii": "++++[>++++++++<-]>[>+>+<<-]>>[<<+>>-]+++++++++[>++++++++++<-]>+++++[<<.+>>-]",
+    # Nested counting loops, 8^4 iterations of the innermost loop, then prints the result's low byte
+    "nested": "++++++++[>++++++++[>++++++++[>++++++++[>+>+<<-]<-]<-]<-]>>>>>.",
+    # Repeatedly copies and scales cells, the case multiply ops are for
+    "copy": "+++++[>+++++[>++++[>+>++>+++<<<-]>[-]<<-]<-]>>>[<+>-]<[>>>+<<<-]>>>[>++++<-]>.",
+    # Counts down from 20, shuffling values between cells with move loops and printing two cells each iteration
+    "shuffle": "+>+>++++++++++++++++++++[<<[>>>+>+<<<<-]>[<+>-]>>[<<<+>>>-]>[<<+>>-]<<<<.>>.[<+>-]<<[>+<-]>[>+<-]<>>-]",
+}
+
+
+def reference_run(text, max_steps=None):
+    """
+    Interpret source a character at a time, as the plugin did before compiling programs
+
+    :return: The output and the number of characters executed
+    :rtype: (str, int)
+    """
+    bracket_map = {}
+    stack = []
+    for pos, c in enumerate(text):
+        if c == '[':
+            stack.append(pos)
+        elif c == ']':
+            start = stack.pop()
+            bracket_map[start] = pos
+            bracket_map[pos] = start
+
+    memory = [0] * BUFFER_SIZE
+    output = ""
+    mp = ip = steps = 0
+    while ip < len(text):
+        if max_steps is not None and steps >= max_steps:
+            break
+
+        c = text[ip]
+        if c == '+':
+            memory[mp] = (memory[mp] + 1) % 256
+        elif c == '-':
+            memory[mp] = (memory[mp] - 1) % 256
+        elif c == '>':
+            mp += 1
+            if mp >= len(memory):
+                memory.extend([0] * BUFFER_SIZE)
+        elif c == '<':
+            mp -= 1
+        elif c == '.':
+            output += chr(memory[mp])
+        elif c == ',':
+            memory[mp] = random.randrange(1, 256)
+        elif c == '[':
+            if memory[mp] == 0:
+                ip = bracket_map[ip]
+        elif c == ']':
+            if memory[mp] != 0:
+                ip = bracket_map[ip]
+
+        ip += 1
+        steps += 1
+
+    return output, steps
+
+
+def bench_program(text, repeat=3):
+    """
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        expected, source_steps = reference_run(text)
+
+    reference = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output, compiled_steps, exceeded = run_program(compile_program(text), float('inf'))
+
+    compiled = (time.perf_counter() - start) / repeat
+
+    if exceeded or output != expected:
+        raise AssertionError("Compiled output {!r} doesn't match reference output {!r}".format(output, expected))
+
+    return {
+        "output": output,
+        "source_steps": source_steps,
+        "compiled_steps": compiled_steps,
+        "reference_ms": reference * 1000,
+        "compiled_ms": compiled * 1000,
+        "speedup": reference / compiled if compiled else None,
+    }
+
+
+def run_benchmark(programs=None, repeat=3):
+    programs = PROGRAMS if programs is None else programs
+    return {name: bench_program(text, repeat) for name, text in programs.items()}
+
+
+def format_report(results):
+    lines = ["{:<10} {:>14} {:>14} {:>14} {:>14} {:>8}".format(
+        "program", "source_steps", "compiled_steps", "reference_ms", "compiled_ms", "speedup"
+    )]
+    for name, result in results.items():
+        lines.append("{:<10} {:>14} {:>14} {:>14.2f} {:>14.2f} {:>7.1f}x".format(
+            name, result["source_steps"], result["compiled_steps"], result["reference_ms"], result["compiled_ms"],
+            result["speedup"] or 0
+        ))
+
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Brainfuck interpreter benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    opts = parser.parse_args(args)
+
+    results = run_benchmark(repeat=opts.repeat)
+    if opts.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(format_report(results))
+
+
+if __name__ == '__main__':
+    main()
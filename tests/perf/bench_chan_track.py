@@ -0,0 +1,161 @@
+"""
+Channel tracking scale benchmark
+
+Feeds core.chan_track the NAMES and WHO replies for a large network, each user joined to a few of many channels, and
+reports how long each took to ingest and how much memory the tracked data takes:
+
+    names_ms    handling every 353/366 line
+    who_ms      handling a 352 line for each user
+    memory_mb   memory allocated for the tracked users and channels, measured in a separate run
+    bytes_per_user
+
+Usage:
+    python -m tests.perf.bench_chan_track --users 50000 --channels 300
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from plugins.core import chan_track
+from plugins.core.server_info import handle_chan_modes, handle_prefixes
+
+STATUS_PREFIXES = ['', '', '', '', '', '', '+', '@', '@+']
+
+# Roughly the most a server fits in one 353 line
+NAMES_LINE_LENGTH = 400
+
+
+class MockConn:
+    def __init__(self):
+        self.name = 'bench'
+        self.nick = 'BenchBot'
+        self.config = {'sync_who': False}
+        self.memory = {
+            'server_info': {},
+            'server_caps': {
+                'userhost-in-names': True,
+                'multi-prefix': True,
+            },
+        }
+        handle_prefixes('(ov)@+', self.memory['server_info'])
+        handle_chan_modes('beI,k,l,imnpst', self.memory['server_info'])
+
+    def cmd(self, *args):
+        pass
+
+
+def make_network(users, channels, channels_per_user, seed=0):
+    """
+    :return: The NAMES entries for each channel, and the WHO reply parameters for each user
+    """
+    rand = random.Random(seed)
+    names = {'#chan{}'.format(num): [] for num in range(channels)}
+    chan_names = list(names)
+    who = []
+    for num in range(users):
+        nick = 'User{}'.format(num)
+        ident = 'ident{}'.format(num % 1000)
+        host = 'host{}.example.com'.format(num % 5000)
+        joined = rand.sample(chan_names, channels_per_user)
+        for chan in joined:
+            names[chan].append('{}{}!{}@{}'.format(rand.choice(STATUS_PREFIXES), nick, ident, host))
+
+        who.append(['BenchBot', joined[0], ident, host, 'irc.example.com', nick, 'H', '0 Real Name'])
+
+    return names, who
+
+
+def names_lines(names):
+    for chan, entries in names.items():
+        line = []
+        length = 0
+        for entry in entries:
+            if length + len(entry) > NAMES_LINE_LENGTH:
+                yield '353', ['BenchBot', '=', chan, ' '.join(line)]
+                line = []
+                length = 0
+
+            line.append(entry)
+            length += len(entry) + 1
+
+        if line:
+            yield '353', ['BenchBot', '=', chan, ' '.join(line)]
+
+        yield '366', ['BenchBot', chan, 'End of /NAMES list.']
+
+
+def ingest(conn, names, who):
+    """
+    :return: Seconds spent handling NAMES and WHO replies
+    """
+    chan_track.init_chan_data(conn)
+    start = time.perf_counter()
+    for command, params in names_lines(names):
+        if command == '366':
+            chan_track.names_end(conn, params[1])
+        else:
+            chan_track.names_reply(conn, params[2], params[-1])
+
+    names_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _, _, ident, host, server, nick, flags, realname in who:
+        chan_track.who_reply(conn, nick, ident, host, server, flags, realname.split(None, 1)[1])
+
+    chan_track.who_end(conn)
+    return names_time, time.perf_counter() - start
+
+
+def run_benchmark(users=50000, channels=300, channels_per_user=3):
+    names, who = make_network(users, channels, channels_per_user)
+
+    conn = MockConn()
+    names_time, who_time = ingest(conn, names, who)
+    tracked = len(chan_track.get_users(conn))
+    memberships = sum(len(chan.users) for chan in chan_track.get_chans(conn).values())
+
+    conn = MockConn()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        ingest(conn, names, who)
+        gc.collect()
+        memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "users": tracked,
+        "memberships": memberships,
+        "names_ms": names_time * 1000,
+        "who_ms": who_time * 1000,
+        "memory_mb": memory / (1024 * 1024),
+        "bytes_per_user": memory / max(tracked, 1),
+    }
+
+
+def format_report(results):
+    return '\n'.join("{:<16} {:>12,.1f}".format(name, value) for name, value in results.items())
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Channel tracking benchmark")
+    parser.add_argument("--users", type=int, default=50000, help="Users on the network")
+    parser.add_argument("--channels", type=int, default=300, help="Channels the bot is in")
+    parser.add_argument("--per-user", type=int, default=3, help="Channels each user is in")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    opts = parser.parse_args(args)
+
+    results = run_benchmark(opts.users, opts.channels, opts.per_user)
+    if opts.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(format_report(results))
+
+
+if __name__ == '__main__':
+    main()
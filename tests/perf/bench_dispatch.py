@@ -0,0 +1,276 @@
+"""
+End-to-end throughput benchmark for the dispatch pipeline
+
+Pushes synthetic PRIVMSG/JOIN/MODE/NAMES traffic through `_IrcProtocol.data_received` -> `CloudBot.process` ->
+hooks -> `_IrcProtocol.send` with the core plugins and a selection of regular plugins loaded, then reports:
+
+    lines_per_sec          lines fully processed per second of wall time
+    latency_p50/p99/max    time from a line being received until every hook it triggered has finished, which is
+                           dominated by queueing unless --rate is used to pace the input
+    executor_hops          `run_in_executor` calls per line (threaded hooks, table checks, etc.)
+    threadsafe_calls       `call_soon_threadsafe` callbacks per line (mostly replies being sent)
+    gc_gen0_per_kline      generation 0 collections per 1000 lines, a proxy for container allocation churn
+    retained_blocks        memory blocks still allocated per line once the run is over
+    tracemalloc_peak       peak traced memory per line during a separate tracemalloc pass (with --allocations)
+
+Usage:
+    python -m tests.perf.bench_dispatch --lines 20000 --output results.json
+    python -m tests.perf.bench_dispatch --lines 20000 --compare results.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+from tests.perf.harness import BenchBot, DEFAULT_PLUGINS, TrafficGenerator, make_config
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(len(values) * pct / 100)) - 1))
+    return values[index]
+
+
+class LoopCounter:
+    """
+    Counts hops between the event loop and other threads
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.executor = 0
+        self.threadsafe = 0
+        self._run_in_executor = loop.run_in_executor
+        self._call_soon_threadsafe = loop.call_soon_threadsafe
+
+    def install(self):
+        def run_in_executor(*args, **kwargs):
+            self.executor += 1
+            return self._run_in_executor(*args, **kwargs)
+
+        def call_soon_threadsafe(*args, **kwargs):
+            self.threadsafe += 1
+            return self._call_soon_threadsafe(*args, **kwargs)
+
+        self.loop.run_in_executor = run_in_executor
+        self.loop.call_soon_threadsafe = call_soon_threadsafe
+
+    def uninstall(self):
+        del self.loop.run_in_executor
+        del self.loop.call_soon_threadsafe
+
+    def reset(self):
+        self.executor = 0
+        self.threadsafe = 0
+
+
+class GCCounter:
+    def __init__(self):
+        self.collections = [0, 0, 0]
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self.collections[info['generation']] += 1
+
+    def install(self):
+        gc.callbacks.append(self)
+
+    def uninstall(self):
+        gc.callbacks.remove(self)
+
+
+async def _run(bot, gen, count, batch, rate, allocations):
+    latencies = []
+    process = bot.process
+
+    def timed_process(event):
+        start = time.perf_counter()
+
+        async def _process():
+            try:
+                return await process(event)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        return _process()
+
+    await bot.load_plugins(bot.plugin_names)
+    await bot.connect()
+    bot.feed(*gen.registration())
+    await bot.settle()
+
+    lines = list(gen.lines(count))
+    bot.process = timed_process
+
+    hops = LoopCounter(bot.loop)
+    gc_counter = GCCounter()
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    lines_before = bot.conn.lines_in
+    sent_before = bot.conn.lines_out
+
+    if allocations:
+        tracemalloc.start()
+
+    hops.install()
+    gc_counter.install()
+    start = time.perf_counter()
+    try:
+        for i in range(0, len(lines), batch):
+            bot.feed(*lines[i:i + batch])
+            if rate:
+                delay = start + (i + batch) / rate - time.perf_counter()
+            else:
+                delay = 0
+
+            # Give the loop a chance to run, as it would between socket reads
+            await asyncio.sleep(max(0, delay))
+
+        await bot.settle(None)
+    finally:
+        elapsed = time.perf_counter() - start
+        gc_counter.uninstall()
+        hops.uninstall()
+
+    if allocations:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        peak = None
+
+    received = bot.conn.lines_in - lines_before
+    sent = bot.conn.lines_out - sent_before
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks_before
+
+    await bot.close()
+
+    return {
+        "lines": received,
+        "replies": sent,
+        "seconds": elapsed,
+        "lines_per_sec": received / elapsed,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p99": percentile(latencies, 99),
+        "latency_max": max(latencies) if latencies else None,
+        "executor_hops": hops.executor / received,
+        "threadsafe_calls": hops.threadsafe / received,
+        "gc_gen0_per_kline": gc_counter.collections[0] * 1000 / received,
+        "retained_blocks": retained / received,
+        "tracemalloc_peak": peak / received if peak is not None else None,
+    }
+
+
+def run_benchmark(lines=5000, channels=10, users=200, batch=20, rate=None, plugins=DEFAULT_PLUGINS, seed=1,
+                  allocations=False, client_type="irc"):
+    """
+    Run a single benchmark pass in a fresh event loop
+
+    Timing figures from a pass with `allocations` enabled are skewed by tracemalloc, so compare like with like.
+
+    :rtype: dict
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    gen = TrafficGenerator(channels=channels, users=users, seed=seed)
+    bot = BenchBot(make_config(channels=gen.channels, client_type=client_type), loop=loop)
+    bot.plugin_names = plugins
+    try:
+        result = loop.run_until_complete(_run(bot, gen, lines, batch, rate, allocations))
+    finally:
+        loop.close()
+
+    result["params"] = {
+        "lines": lines, "channels": channels, "users": users, "batch": batch, "rate": rate,
+        "plugins": list(plugins),
+        "seed": seed, "allocations": allocations, "client": client_type, "python": sys.version.split()[0],
+    }
+    return result
+
+
+# Metrics where a lower value is better, used when comparing runs
+LOWER_IS_BETTER = (
+    "latency_p50", "latency_p99", "latency_max", "executor_hops", "threadsafe_calls", "gc_gen0_per_kline",
+    "retained_blocks", "tracemalloc_peak",
+)
+
+REPORT_KEYS = ("lines_per_sec",) + LOWER_IS_BETTER
+
+
+def format_value(key, value):
+    if value is None:
+        return '-'
+
+    if key.startswith('latency'):
+        return '{:.3f}ms'.format(value * 1000)
+
+    return '{:.2f}'.format(value)
+
+
+def format_report(result, baseline=None):
+    lines = ["{} lines in {:.2f}s, {} replies sent".format(result["lines"], result["seconds"], result["replies"])]
+    for key in REPORT_KEYS:
+        line = "{:<20} {:>14}".format(key, format_value(key, result.get(key)))
+        old = baseline.get(key) if baseline else None
+        if old and result.get(key) is not None:
+            change = (result[key] - old) / old * 100
+            line += "  ({:+.1f}% vs {})".format(change, format_value(key, old))
+
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="CloudBot dispatch pipeline benchmark")
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=20, help="Lines per simulated socket read")
+    parser.add_argument("--rate", type=float, help="Feed lines at this many per second instead of all at once")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--plugins", help="Comma separated list of non-core plugins to load")
+    parser.add_argument(
+        "--client", default="irc", choices=("irc", "loopback"),
+        help="Connection type, loopback skips the IRC protocol to measure pure dispatch cost"
+    )
+    parser.add_argument("--allocations", action="store_true", help="Trace memory with tracemalloc")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against results previously written with --output")
+    opts = parser.parse_args(args)
+
+    logging.getLogger("cloudbot").setLevel(logging.WARNING)
+    plugins = DEFAULT_PLUGINS if opts.plugins is None else tuple(filter(None, opts.plugins.split(',')))
+    result = run_benchmark(
+        lines=opts.lines, channels=opts.channels, users=opts.users, batch=opts.batch, rate=opts.rate,
+        plugins=plugins, seed=opts.seed, allocations=opts.allocations,
+        client_type=opts.client
+    )
+
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            json.dump(result, f, indent=4)
+            f.write('\n')
+
+    if opts.json:
+        print(json.dumps(result, indent=4))
+    else:
+        baseline = None
+        if opts.compare:
+            with open(opts.compare) as f:
+                baseline = json.load(f)
+
+        print(format_report(result, baseline))
+
+
+if __name__ == '__main__':
+    main()
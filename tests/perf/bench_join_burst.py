@@ -0,0 +1,178 @@
+"""
+Join burst benchmark for channel tracking
+
+Replays what the bot receives when it autojoins many channels at once, each JOIN followed by its NAMES reply, then
+the WHO replies for every channel, through the full dispatch pipeline with the core plugins loaded, and reports:
+
+    join_ms         time to process the JOIN and NAMES lines
+    who_ms          time to process the WHO (or WHOX, with --whox) replies
+    executor_hops   `run_in_executor` calls per line
+    who_queries     WHO queries the bot sent while processing the burst
+    members         channel memberships tracked afterwards
+
+A recorded burst can be used instead of a generated one with --log, given a raw log written by core.log.
+
+Usage:
+    python -m tests.perf.bench_join_burst --channels 300 --users 20000 --whox
+    python -m tests.perf.bench_join_burst --log logs/raw/2019/snoonet_20190822.log
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+from tests.perf.bench_dispatch import LoopCounter
+from tests.perf.harness import BOT_NICK, SERVER_NAME, BenchBot, make_config
+from tests.perf.replay import parse_raw_log
+
+# Lines from a recorded log which are part of a join burst
+BURST_COMMANDS = {"JOIN", "353", "366", "352", "354", "315"}
+
+WHOX_TOKEN = "152"
+
+
+def make_burst(channels=300, users=20000, per_channel=200, seed=0):
+    """
+    :return: The JOIN/NAMES lines and the WHO lines for each channel
+    """
+    rand = random.Random(seed)
+    nicks = ["user{}".format(num) for num in range(users)]
+    join_lines = [
+        ":{} 005 {} PREFIX=(ov)@+ CHANTYPES=# CHANMODES=b,k,l,imnpst WHOX TARGMAX=WHO:1 "
+        ":are supported by this server".format(SERVER_NAME, BOT_NICK),
+    ]
+    members = {}
+    for num in range(channels):
+        chan = "#chan{}".format(num)
+        members[chan] = rand.sample(nicks, min(per_channel, users))
+        join_lines.append(":{0}!~{0}@bot.bench.test JOIN {1}".format(BOT_NICK, chan))
+        names = ["@" + BOT_NICK] + [rand.choice(("", "", "", "+", "@")) + nick for nick in members[chan]]
+        for i in range(0, len(names), 40):
+            join_lines.append(":{} 353 {} = {} :{}".format(SERVER_NAME, BOT_NICK, chan, ' '.join(names[i:i + 40])))
+
+        join_lines.append(":{} 366 {} {} :End of /NAMES list.".format(SERVER_NAME, BOT_NICK, chan))
+
+    return join_lines, members
+
+
+def who_lines(members, whox):
+    for chan, nicks in members.items():
+        for nick in nicks:
+            if whox:
+                yield ":{} 354 {} {} {} ~{} host-{}.bench.test {} {} H 0 :Real Name".format(
+                    SERVER_NAME, BOT_NICK, WHOX_TOKEN, chan, nick, nick, SERVER_NAME, nick
+                )
+            else:
+                yield ":{} 352 {} {} ~{} host-{}.bench.test {} {} H :0 Real Name".format(
+                    SERVER_NAME, BOT_NICK, chan, nick, nick, SERVER_NAME, nick
+                )
+
+        yield ":{} 315 {} {} :End of /WHO list.".format(SERVER_NAME, BOT_NICK, chan)
+
+
+def load_burst(path):
+    """
+    Split a recorded log's join burst into JOIN/NAMES lines and WHO lines
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        entries = parse_raw_log(f)
+
+    join_lines = []
+    who = []
+    for _, line in entries:
+        parts = line.split(' ', 3)
+        if len(parts) < 2 or parts[1] not in BURST_COMMANDS:
+            continue
+
+        (who if parts[1] in ("352", "354", "315") else join_lines).append(line)
+
+    return join_lines, who
+
+
+async def _feed(bot, lines, batch=500):
+    for i in range(0, len(lines), batch):
+        bot.feed(*lines[i:i + batch])
+        await asyncio.sleep(0)
+
+    await bot.settle(timeout=None)
+
+
+async def _run(bot, join_lines, who):
+    await bot.load_plugins(())
+    await bot.connect()
+    await bot.settle()
+
+    hops = LoopCounter(bot.loop)
+    sent_before = len(bot.transport.lines)
+    hops.install()
+    try:
+        start = time.perf_counter()
+        await _feed(bot, join_lines)
+        join_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await _feed(bot, who)
+        who_time = time.perf_counter() - start
+    finally:
+        hops.uninstall()
+
+    from plugins.core import chan_track
+
+    sent = bot.transport.lines[sent_before:]
+    chans = chan_track.get_chans(bot.conn)
+    return {
+        "lines": len(join_lines) + len(who),
+        "join_ms": join_time * 1000,
+        "who_ms": who_time * 1000,
+        "executor_hops": hops.executor / max(len(join_lines) + len(who), 1),
+        "who_queries": sum(1 for line in sent if line.startswith("WHO ")),
+        "members": sum(len(chan.users) for chan in chans.values()),
+    }
+
+
+def run_benchmark(channels=300, users=20000, per_channel=200, whox=True, log=None):
+    if log:
+        join_lines, who = load_burst(log)
+    else:
+        join_lines, members = make_burst(channels, users, per_channel)
+        who = list(who_lines(members, whox))
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    # Send WHO queries as soon as they're queued, rather than spacing them out
+    bot = BenchBot(make_config(channels=()), loop=loop)
+    bot.conn.config["who_throttle"] = 0
+    try:
+        return loop.run_until_complete(_run(bot, join_lines, who))
+    finally:
+        loop.run_until_complete(bot.close())
+        loop.close()
+
+
+def format_report(results):
+    return '\n'.join("{:<16} {:>12,.2f}".format(name, value) for name, value in results.items())
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Join burst benchmark")
+    parser.add_argument("--channels", type=int, default=300, help="Channels joined")
+    parser.add_argument("--users", type=int, default=20000, help="Users on the network")
+    parser.add_argument("--per-channel", type=int, default=200, help="Users in each channel")
+    parser.add_argument("--whox", action="store_true", help="Reply to WHO with WHOX (354) lines")
+    parser.add_argument("--log", help="Use the join burst from a raw log instead")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    opts = parser.parse_args(args)
+
+    logging.getLogger("cloudbot").setLevel(logging.WARNING)
+    results = run_benchmark(opts.channels, opts.users, opts.per_channel, opts.whox, opts.log)
+    if opts.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(format_report(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Netsplit benchmark
+
+Puts the bot in many channels full of users, then replays a netsplit, every user on one side of it quitting at once,
+and the rejoin, each of them joining their channels again with the server's MODE lines giving back their statuses,
+through the full dispatch pipeline with the default plugins loaded. Reports:
+
+    split_ms        time to process the netsplit quits
+    rejoin_ms       time to process the joins and modes of the rejoin
+    executor_hops   `run_in_executor` calls per line
+    batches         batches the joins and quits were handled in, 0 with --no-batch
+    rejoined        channel memberships of the returning users tracked afterwards
+    expected        channel memberships the returning users should have
+
+Usage:
+    python -m tests.perf.bench_netsplit --channels 50 --users 5000 --split 0.5
+    python -m tests.perf.bench_netsplit --no-batch
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+from tests.perf.bench_dispatch import LoopCounter
+from tests.perf.harness import BOT_NICK, SERVER_NAME, BenchBot, make_config
+
+SPLIT_REASON = "hub.bench.test leaf.bench.test"
+
+
+def make_network(channels=50, users=5000, channels_per_user=3, seed=0):
+    """
+    :return: The channels each user is in
+    """
+    rand = random.Random(seed)
+    chans = ["#chan{}".format(num) for num in range(channels)]
+    return {
+        "user{}".format(num): rand.sample(chans, min(channels_per_user, channels))
+        for num in range(users)
+    }
+
+
+def setup_lines(network):
+    members = {}
+    for nick, chans in network.items():
+        for chan in chans:
+            members.setdefault(chan, []).append(nick)
+
+    lines = [
+        ":{} 005 {} PREFIX=(ov)@+ CHANTYPES=# CHANMODES=b,k,l,imnpst :are supported by this server".format(
+            SERVER_NAME, BOT_NICK
+        ),
+    ]
+    for chan, nicks in sorted(members.items()):
+        lines.append(":{0}!~{0}@bot.bench.test JOIN {1}".format(BOT_NICK, chan))
+        names = ["@" + BOT_NICK] + nicks
+        for i in range(0, len(names), 40):
+            lines.append(":{} 353 {} = {} :{}".format(SERVER_NAME, BOT_NICK, chan, ' '.join(names[i:i + 40])))
+
+        lines.append(":{} 366 {} {} :End of /NAMES list.".format(SERVER_NAME, BOT_NICK, chan))
+
+    return lines
+
+
+def get_split_nicks(network, split):
+    return sorted(network)[:int(len(network) * split)]
+
+
+def split_lines(network, split):
+    """
+    :return: The quits when `split` of the users are lost in a netsplit, and the joins and modes when they return
+    """
+    nicks = get_split_nicks(network, split)
+    quits = [":{0}!~{0}@host-{0}.bench.test QUIT :{1}".format(nick, SPLIT_REASON) for nick in nicks]
+    joins = []
+    ops = {}
+    for num, nick in enumerate(nicks):
+        for chan in network[nick]:
+            joins.append(":{0}!~{0}@host-{0}.bench.test JOIN {1}".format(nick, chan))
+            if num % 5 == 0:
+                ops.setdefault(chan, []).append(nick)
+
+    for chan, nicks in sorted(ops.items()):
+        for i in range(0, len(nicks), 4):
+            group = nicks[i:i + 4]
+            joins.append(":{} MODE {} +{} {}".format(SERVER_NAME, chan, 'o' * len(group), ' '.join(group)))
+
+    return quits, joins
+
+
+async def _feed(bot, lines, batch=500):
+    for i in range(0, len(lines), batch):
+        bot.feed(*lines[i:i + batch])
+        await asyncio.sleep(0)
+
+    await bot.settle(timeout=None)
+
+
+async def _run(bot, network, split):
+    from plugins.core import chan_track
+
+    await bot.load_plugins()
+    await bot.connect()
+    await _feed(bot, setup_lines(network))
+
+    quits, joins = split_lines(network, split)
+    hops = LoopCounter(bot.loop)
+    hops.install()
+    try:
+        start = time.perf_counter()
+        await _feed(bot, quits)
+        split_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await _feed(bot, joins)
+        rejoin_time = time.perf_counter() - start
+    finally:
+        hops.uninstall()
+
+    users = chan_track.get_users(bot.conn)
+    split_nicks = get_split_nicks(network, split)
+    return {
+        "lines": len(quits) + len(joins),
+        "split_ms": split_time * 1000,
+        "rejoin_ms": rejoin_time * 1000,
+        "executor_hops": hops.executor / max(len(quits) + len(joins), 1),
+        "batches": bot.conn.batcher.batches,
+        "rejoined": sum(len(users[nick].chans) for nick in split_nicks if nick in users),
+        "expected": sum(len(network[nick]) for nick in split_nicks),
+    }
+
+
+def run_benchmark(channels=50, users=5000, channels_per_user=3, split=0.5, batch=True):
+    network = make_network(channels, users, channels_per_user)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    bot = BenchBot(make_config(channels=()), loop=loop)
+    bot.conn.config["sync_who"] = False
+    bot.conn.config["netsplit"] = {"enabled": batch}
+    try:
+        return loop.run_until_complete(_run(bot, network, split))
+    finally:
+        loop.run_until_complete(bot.close())
+        loop.close()
+
+
+def format_report(results):
+    return '\n'.join("{:<16} {:>12,.2f}".format(name, value) for name, value in results.items())
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Netsplit benchmark")
+    parser.add_argument("--channels", type=int, default=50, help="Channels the bot is in")
+    parser.add_argument("--users", type=int, default=5000, help="Users on the network")
+    parser.add_argument("--per-user", type=int, default=3, help="Channels each user is in")
+    parser.add_argument("--split", type=float, default=0.5, help="Share of the users lost in the netsplit")
+    parser.add_argument("--no-batch", action="store_true", help="Handle each join and quit on its own")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    opts = parser.parse_args(args)
+
+    logging.getLogger("cloudbot").setLevel(logging.WARNING)
+    results = run_benchmark(opts.channels, opts.users, opts.per_user, opts.split, not opts.no_batch)
+    if opts.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(format_report(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Startup table creation benchmark
+
+Simulates many plugins each registering a few tables at once, as they do when the bot starts, against a fresh SQLite
+file and again once the tables all exist, comparing:
+
+    per_table_ms    each plugin checking and creating its tables one at a time in the executor, as before
+    batched_ms      every plugin registering with a TableRegistry, which creates them together
+
+Usage:
+    python -m tests.perf.bench_tables --plugins 60 --tables 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+from cloudbot.util import database
+
+
+def make_plugin_tables(plugins, tables_per_plugin):
+    metadata = MetaData()
+    return [
+        [
+            Table(
+                "plugin{}_table{}".format(plugin, num), metadata,
+                Column('id', Integer, primary_key=True), Column('value', String),
+            )
+            for num in range(tables_per_plugin)
+        ]
+        for plugin in range(plugins)
+    ]
+
+
+async def create_per_table(loop, engine, tables):
+    for table in tables:
+        if not (await loop.run_in_executor(None, table.exists, engine)):
+            await loop.run_in_executor(None, table.create, engine)
+
+
+async def _gather(coros):
+    await asyncio.gather(*coros)
+
+
+def run_per_table(loop, engine, plugin_tables):
+    start = time.perf_counter()
+    loop.run_until_complete(_gather([create_per_table(loop, engine, tables) for tables in plugin_tables]))
+    return time.perf_counter() - start
+
+
+def run_batched(loop, engine, plugin_tables):
+    registry = database.TableRegistry(engine, loop)
+    start = time.perf_counter()
+    loop.run_until_complete(_gather([registry.register(tables) for tables in plugin_tables]))
+    return time.perf_counter() - start
+
+
+def run_benchmark(plugins=60, tables_per_plugin=2):
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for name, func in (("per_table", run_per_table), ("batched", run_batched)):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                engine = database.make_engine("sqlite:///" + os.path.join(tmp_dir, "bench.db"))
+                plugin_tables = make_plugin_tables(plugins, tables_per_plugin)
+                results[name] = {
+                    "cold_ms": func(loop, engine, plugin_tables) * 1000,
+                    "warm_ms": func(loop, engine, plugin_tables) * 1000,
+                }
+                engine.dispose()
+    finally:
+        loop.close()
+
+    return results
+
+
+def format_report(results):
+    lines = ["{:<12} {:>10} {:>10}".format("method", "cold (ms)", "warm (ms)")]
+    for name, result in results.items():
+        lines.append("{:<12} {:>10.1f} {:>10.1f}".format(name, result["cold_ms"], result["warm_ms"]))
+
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Table creation benchmark")
+    parser.add_argument("--plugins", type=int, default=60, help="Plugins registering tables")
+    parser.add_argument("--tables", type=int, default=2, help="Tables per plugin")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    opts = parser.parse_args(args)
+
+    results = run_benchmark(opts.plugins, opts.tables)
+    if opts.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(format_report(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark for TextGenerator over the attack and food data files
+
+Generates strings from every data file in data/attacks and data/food with TextGenerator and with a reference
+implementation equivalent to the one it replaced, which deep copied the parts for every string and expanded each
+weighted part list into a population list for every placeholder.
+
+Usage:
+    python -m tests.perf.bench_textgen --count 2000
+"""
+
+import argparse
+import copy
+import json
+import random
+import time
+
+from cloudbot.util.textgen import TEMPLATE_RE, TextGenerator
+from tests.perf.harness import BASE_DIR
+
+DATA_DIRS = ("attacks", "food")
+
+VARIABLES = {"user": "someone", "target": "someone", "nick": "benchbot"}
+
+
+def reference_generate(templates, parts, variables):
+    """
+    Generate a string as TextGenerator did before it precompiled templates and weights
+    """
+    text = random.choice(templates)
+    _parts = copy.deepcopy(parts)
+    for required_part in TEMPLATE_RE.findall(text):
+        if required_part not in _parts:
+            continue
+
+        population = [
+            val for val, cnt in (
+                part if isinstance(part, (list, tuple)) else (part, 5) for part in _parts[required_part]
+            ) for _ in range(cnt)
+        ]
+        replacement = random.choice(population)
+        for _part in _parts[required_part]:
+            if isinstance(_part, (list, tuple)) and _part[0] == replacement:
+                _parts[required_part].remove(_part)
+            elif _part == replacement:
+                _parts[required_part].remove(_part)
+
+        text = text.replace("{%s}" % required_part, replacement, 1)
+
+    for key, value in variables.items():
+        text = text.replace("{%s}" % key, value)
+
+    return text
+
+
+def load_data(dirs=DATA_DIRS):
+    data = {}
+    for name in dirs:
+        for path in sorted((BASE_DIR / "data" / name).glob("*.json")):
+            with path.open(encoding='utf-8') as f:
+                data["{}/{}".format(name, path.stem)] = json.load(f)
+
+    return data
+
+
+def bench_file(data, count):
+    templates = data.get("target_templates") or data["templates"]
+    parts = data.get("parts", {})
+
+    start = time.perf_counter()
+    for _ in range(count):
+        reference_generate(templates, parts, VARIABLES)
+
+    reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(count):
+        # Plugins build a new generator for every command, so do the same here
+        TextGenerator(templates, parts, variables=VARIABLES).generate_string()
+
+    compiled = time.perf_counter() - start
+
+    return {
+        "reference_us": reference / count * 1e6,
+        "compiled_us": compiled / count * 1e6,
+        "speedup": reference / compiled if compiled else None,
+    }
+
+
+def run_benchmark(count=1000, seed=1, dirs=DATA_DIRS):
+    random.seed(seed)
+    return {name: bench_file(data, count) for name, data in load_data(dirs).items()}
+
+
+def format_report(results):
+    lines = ["{:<20} {:>14} {:>14} {:>8}".format("file", "reference (us)", "compiled (us)", "speedup")]
+    for name, result in sorted(results.items(), key=lambda item: item[1]["reference_us"], reverse=True):
+        lines.append("{:<20} {:>14.1f} {:>14.1f} {:>7.1f}x".format(
+            name, result["reference_us"], result["compiled_us"], result["speedup"] or 0
+        ))
+
+    total_ref = sum(result["reference_us"] for result in results.values())
+    total_new = sum(result["compiled_us"] for result in results.values())
+    lines.append("{:<20} {:>14.1f} {:>14.1f} {:>7.1f}x".format(
+        "total", total_ref, total_new, total_ref / total_new if total_new else 0
+    ))
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="TextGenerator benchmark")
+    parser.add_argument("--count", type=int, default=1000, help="Strings to generate per data file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    opts = parser.parse_args(args)
+
+    results = run_benchmark(opts.count, opts.seed)
+    if opts.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(format_report(results))
+
+
+if __name__ == '__main__':
+    main()
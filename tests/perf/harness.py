@@ -0,0 +1,327 @@
+"""
+A CloudBot-like harness for driving real plugins with synthetic IRC traffic, without sockets or a config file
+
+The bot gets a real PluginManager, an in-memory SQLite database and a real IrcClient whose protocol writes to a
+RecordingTransport, so lines fed to `BenchBot.feed` travel the same path as live traffic:
+`_IrcProtocol.data_received` -> `CloudBot.process` -> hooks -> `_IrcProtocol.send`.
+
+With a "loopback" connection the IRC protocol is skipped entirely, leaving just the dispatch and hook cost.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import cloudbot.bot
+from cloudbot.bot import CloudBot
+from cloudbot.clients.irc import IrcClient, _IrcProtocol
+from cloudbot.clients.loopback import LoopbackClient
+from cloudbot.event import Event
+from cloudbot.plugin import PluginManager
+from cloudbot.util import database
+from cloudbot.util.mapping import KeyFoldDict
+from tests.util.mock_bot import MockBot
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+PLUGIN_DIR = BASE_DIR / "plugins"
+
+# A representative selection of plugins which don't need network access or API keys
+DEFAULT_PLUGINS = (
+    "attacks", "correction", "eightball", "factoids", "flip", "fortune", "herald", "karma", "seen", "tell",
+    "utility", "yelling",
+)
+
+BOT_NICK = "benchbot"
+
+SERVER_NAME = "irc.bench.test"
+
+
+def make_config(channels=("#bench",), nick=BOT_NICK, server=SERVER_NAME, port=6667, client_type="irc",
+                **overrides):
+    config = {
+        "connections": [
+            {
+                "name": "bench",
+                "type": client_type,
+                "nick": nick,
+                "channels": list(channels),
+                "connection": {"server": server, "port": port, "timeout": 10},
+                "join_throttle": 0,
+                "command_prefix": ".",
+                "permissions": {},
+            }
+        ],
+        "logging": {"console_debug": False, "file_log": False, "raw_file_log": False},
+        "plugin_loading": {},
+        "loop_monitor": {"enabled": False},
+        "metrics": {"enabled": False},
+        "plugins": {},
+        "api_keys": {},
+    }
+    config.update(overrides)
+    return config
+
+
+def run_json(module, *args):
+    """
+    Run a benchmark module in a separate process with --json, for smoke testing it
+
+    Loading plugins through a PluginManager in the test process would disturb the modules other tests use.
+
+    :param module: The module to run, as with `python -m`
+    :param args: Command line arguments for it
+    :return: Its parsed JSON output
+    """
+    out = subprocess.check_output(
+        [sys.executable, '-m', module] + [str(arg) for arg in args] + ['--json'],
+        cwd=str(BASE_DIR), stderr=subprocess.DEVNULL, timeout=300,
+    )
+    return json.loads(out.decode())
+
+
+class RecordingTransport(asyncio.Transport):
+    """
+    A transport which keeps everything the bot writes
+    """
+
+    def __init__(self, on_write=None):
+        super().__init__()
+        self.lines = []
+        self.bytes_written = 0
+        self.closed = False
+        self._buffer = b""
+        self._on_write = on_write
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        self._buffer += data
+        while b"\r\n" in self._buffer:
+            line, self._buffer = self._buffer.split(b"\r\n", 1)
+            line = line.decode("utf-8", "replace")
+            self.lines.append(line)
+            if self._on_write is not None:
+                self._on_write(line)
+
+    def close(self):
+        self.closed = True
+
+    def is_closing(self):
+        return self.closed
+
+
+class BenchBot(MockBot):
+    """
+    Enough of CloudBot for plugins to load and run against a single IRC connection
+    """
+
+    process = CloudBot.process
+    process_batch = CloudBot.process_batch
+
+    def __init__(self, config, loop=None):
+        super().__init__(config, loop)
+        self.base_dir = BASE_DIR
+        self.data_dir = str(BASE_DIR / "data")
+        self.start_time = time.time()
+        self.running = True
+        self.logger = logging.getLogger("cloudbot")
+        self.memory = collections.defaultdict()
+        self.user_agent = "CloudBot/3.0 - Benchmark"
+        self.clients = {"irc": IrcClient, "loopback": LoopbackClient}
+        self.connections = KeyFoldDict()
+
+        self.db_engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        self.db_factory = sessionmaker(bind=self.db_engine)
+        self.db_session = scoped_session(self.db_factory)
+        self.db_metadata = database.metadata
+        self.db_base = declarative_base(metadata=self.db_metadata, bind=self.db_engine)
+        database.base = self.db_base
+
+        self.plugin_manager = PluginManager(self)
+
+        for conn_config in self.config["connections"]:
+            self.connections[conn_config["name"]] = self.get_client(conn_config["type"])(
+                self, conn_config["type"], conn_config["name"], conn_config["nick"], config=conn_config,
+                channels=conn_config["channels"]
+            )
+
+        self.conn = next(iter(self.connections.values()))
+        self.transport = None
+        self.protocol = None
+
+    def get_client(self, name):
+        return self.clients[name]
+
+    async def load_plugins(self, names=DEFAULT_PLUGINS):
+        """
+        Load all core plugins and the named extra plugins
+        """
+        cloudbot.bot.bot.set(self)
+        paths = sorted((PLUGIN_DIR / "core").glob("[!_]*.py"))
+        paths.extend(PLUGIN_DIR / (name + ".py") for name in names)
+        for path in paths:
+            await self.plugin_manager.load_plugin(path)
+
+    async def connect(self):
+        """
+        Attach the connection to a RecordingTransport and run connect hooks, as IrcClient.connect would
+        """
+        conn = self.conn
+        if isinstance(conn, LoopbackClient):
+            await conn.connect()
+            return
+
+        conn.active = True
+        self.transport = RecordingTransport()
+        self.protocol = _IrcProtocol(conn)
+        self.protocol.connection_made(self.transport)
+        conn._transport, conn._protocol = self.transport, self.protocol
+        await asyncio.gather(*[
+            self.plugin_manager.launch(_hook, Event(bot=self, conn=conn, hook=_hook))
+            for _hook in self.plugin_manager.connect_hooks
+        ])
+
+    def feed(self, *lines):
+        """
+        Hand raw lines to the protocol as if they had just been read from the socket
+        """
+        if isinstance(self.conn, LoopbackClient):
+            for line in lines:
+                for part in line.split('\r\n'):
+                    self.conn.feed_line(part)
+
+            return
+
+        self.protocol.data_received(''.join(line + '\r\n' for line in lines).encode())
+
+    async def settle(self, timeout=30):
+        """
+        Wait until all received lines and queued sends have been processed
+
+        :param timeout: Seconds to wait before giving up, or None to wait indefinitely
+        """
+        end = None if timeout is None else self.loop.time() + timeout
+        idle_checks = 0
+        # Replies are scheduled with call_soon_threadsafe, so only consider things settled once nothing has been
+        # running for two checks in a row
+        while idle_checks < 2:
+            if end is not None and self.loop.time() > end:
+                raise asyncio.TimeoutError("Timed out waiting for events to finish")
+
+            await asyncio.sleep(0.001)
+            if self.conn.pending_events or self.plugin_manager.running_hooks:
+                idle_checks = 0
+            else:
+                idle_checks += 1
+
+    async def close(self):
+        await self.plugin_manager.unload_all()
+        self.db_session.remove()
+        self.db_engine.dispose()
+        if cloudbot.bot.bot.get() is self:
+            cloudbot.bot.bot.set(None)
+
+
+class TrafficGenerator:
+    """
+    Produces a repeatable mix of raw IRC traffic across a set of channels and users
+    """
+
+    MESSAGES = (
+        "hello there", "anyone around?", "lol", "that's what I said earlier", "brb", "s/earlier/before/",
+        "http is a protocol, not a place", "ok", "benchmarks++", "how's everyone doing today?", "THIS IS SO LOUD",
+    )
+
+    COMMANDS = (
+        ".flip hello world", ".8ball will this be fast?", ".lower SOME TEXT", ".upper some text",
+        ".fortune", ".pluspts", ".seen user0",
+    )
+
+    def __init__(self, channels=10, users=200, seed=1):
+        self.random = random.Random(seed)
+        self.channels = ["#chan{}".format(i) for i in range(channels)]
+        self.users = ["user{}".format(i) for i in range(users)]
+        self.joined = {chan: set() for chan in self.channels}
+        self.voiced = {chan: set() for chan in self.channels}
+
+    @staticmethod
+    def mask(nick):
+        return "{0}!~{0}@host-{0}.bench.test".format(nick)
+
+    def registration(self):
+        """
+        The lines a server sends on connect, including the bot joining each channel with the initial NAMES reply
+        """
+        yield ":{} 001 {} :Welcome to the benchmark network".format(SERVER_NAME, BOT_NICK)
+        yield ":{} 005 {} PREFIX=(ov)@+ CHANTYPES=# CHANMODES=b,k,l,imnpst CASEMAPPING=rfc1459 " \
+              ":are supported by this server".format(SERVER_NAME, BOT_NICK)
+        for chan in self.channels:
+            yield from self.bot_join(chan)
+
+    def bot_join(self, chan):
+        members = self.random.sample(self.users, min(len(self.users), 20))
+        self.joined[chan].update(members)
+        self.voiced[chan].update(members[::7])
+        yield ":{} JOIN {}".format(self.mask(BOT_NICK), chan)
+        yield from self.names(chan)
+
+    def names(self, chan):
+        nicks = ["@" + BOT_NICK] + [
+            ("+" if nick in self.voiced[chan] else "") + nick for nick in sorted(self.joined[chan])
+        ]
+        for i in range(0, len(nicks), 50):
+            yield ":{} 353 {} = {} :{}".format(SERVER_NAME, BOT_NICK, chan, ' '.join(nicks[i:i + 50]))
+
+        yield ":{} 366 {} {} :End of /NAMES list.".format(SERVER_NAME, BOT_NICK, chan)
+
+    def line(self):
+        """
+        Generate a single line of traffic, weighted towards channel chatter
+        """
+        rand = self.random
+        chan = rand.choice(self.channels)
+        roll = rand.random()
+        members = self.joined[chan]
+        if (roll < 0.05 or not members) and len(members) < len(self.users):
+            nick = rand.choice([user for user in self.users if user not in members])
+            members.add(nick)
+            return ":{} JOIN {}".format(self.mask(nick), chan)
+
+        nick = rand.choice(sorted(members))
+        if roll < 0.08:
+            voiced = self.voiced[chan]
+            if nick in voiced:
+                voiced.remove(nick)
+                mode = "-v"
+            else:
+                voiced.add(nick)
+                mode = "+v"
+
+            return ":{} MODE {} {} {}".format(self.mask(BOT_NICK), chan, mode, nick)
+
+        if roll < 0.09:
+            # A NAMES burst, as a client or the bot requesting it would see
+            return '\r\n'.join(self.names(chan))
+
+        if roll < 0.19:
+            text = rand.choice(self.COMMANDS)
+        else:
+            text = rand.choice(self.MESSAGES)
+
+        return ":{} PRIVMSG {} :{}".format(self.mask(nick), chan, text)
+
+    def lines(self, count):
+        for _ in range(count):
+            yield self.line()
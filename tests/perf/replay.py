@@ -0,0 +1,383 @@
+"""
+Replays raw logs written by core.log against a bot through a local fake IRC server
+
+The server answers CAP negotiation, registration, PING and JOIN itself, then replays the logged traffic either as
+fast as possible, at its original timing (for logs written with "raw_file_log_timestamps" enabled) or accelerated by
+a constant factor. The bot connects to it through the normal IrcClient.connect path and everything it sends is
+recorded, giving throughput, per-command reply latency and a transcript which can be diffed between two builds.
+
+Usage:
+    python -m tests.perf.replay logs/raw/2019/snoonet_20190822.log --speed 10 --output new.json
+    python -m tests.perf.replay --diff old.json new.json
+"""
+
+import argparse
+import asyncio
+import difflib
+import json
+import logging
+import time
+from collections import defaultdict, deque
+
+from irclib.parser import Message
+
+from tests.perf.bench_dispatch import percentile
+from tests.perf.harness import BenchBot, DEFAULT_PLUGINS, make_config
+
+SERVER_NAME = "replay.test"
+
+# Lines the fake server produces itself, or which only make sense during registration
+SKIPPED_COMMANDS = {
+    "CAP", "PING", "PONG", "AUTHENTICATE", "ERROR",
+    "001", "002", "003", "004", "005", "250", "251", "252", "253", "254", "255", "265", "266",
+    "372", "375", "376", "422", "900", "901", "902", "903", "904", "905", "906", "907", "908",
+}
+
+# Bot output which changes from run to run and is left out of transcripts
+TRANSCRIPT_IGNORED = {"PING", "PONG", "CAP", "NICK", "USER", "QUIT"}
+
+
+def parse_raw_log(lines):
+    """
+    Parse raw log lines, with or without the timestamps written when "raw_file_log_timestamps" is enabled
+
+    >>> parse_raw_log(["1566497676.250 :a!b@c PRIVMSG #chan :hi", ":a!b@c JOIN #chan", ""])
+    [(1566497676.25, ':a!b@c PRIVMSG #chan :hi'), (None, ':a!b@c JOIN #chan')]
+
+    :rtype: list[(float | None, str)]
+    """
+    out = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+
+        stamp = None
+        first, _, rest = line.partition(' ')
+        try:
+            stamp = float(first)
+        except ValueError:
+            pass
+        else:
+            line = rest
+
+        out.append((stamp, line))
+
+    return out
+
+
+def find_nick(entries, default="replaybot"):
+    """
+    Find the bot's nick from the welcome numeric in the log, if it was logged
+    """
+    for _, line in entries:
+        msg = Message.parse(line)
+        if msg.command == "001" and msg.parameters:
+            return msg.parameters[0]
+
+    return default
+
+
+def find_channels(entries, nick):
+    channels = []
+    for _, line in entries:
+        msg = Message.parse(line)
+        if msg.command in ("JOIN", "PRIVMSG", "NOTICE", "MODE", "TOPIC", "PART", "KICK") and msg.parameters:
+            chan = msg.parameters[0]
+            if chan.startswith('#') and chan.lower() not in channels:
+                channels.append(chan.lower())
+
+    return channels
+
+
+class FakeIrcServer:
+    """
+    A single client IRC server which handles registration itself and replays lines on request
+    """
+
+    def __init__(self, nick, loop, command_prefix='.'):
+        self.nick = nick
+        self.loop = loop
+        self.command_prefix = command_prefix
+        self.server = None
+        self.writer = None
+        self.registered = asyncio.Event()
+        self.received = []
+        self.replayed = 0
+        self.latencies = defaultdict(list)
+        self.unanswered = defaultdict(int)
+        self._pending = defaultdict(deque)
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, '127.0.0.1', 0)
+
+    async def stop(self):
+        if self.writer is not None:
+            self.writer.close()
+
+        self.server.close()
+        await self.server.wait_closed()
+
+    def send(self, line):
+        self.writer.write(line.encode('utf-8', 'replace') + b'\r\n')
+
+    def numeric(self, num, *params):
+        self.send(str(Message(None, SERVER_NAME, num, [self.nick] + list(params))))
+
+    async def handle_client(self, reader, writer):
+        self.writer = writer
+        while True:
+            data = await reader.readline()
+            if not data:
+                break
+
+            line = data.decode('utf-8', 'replace').rstrip('\r\n')
+            if line:
+                self.handle_line(line)
+
+    def handle_line(self, line):
+        now = time.perf_counter()
+        msg = Message.parse(line)
+        cmd = msg.command
+        params = msg.parameters
+        if cmd not in TRANSCRIPT_IGNORED:
+            self.received.append((now, line))
+
+        if cmd == "CAP" and params:
+            sub = params[0].upper()
+            if sub == "LS":
+                self.send(":{} CAP * LS :".format(SERVER_NAME))
+            elif sub == "REQ":
+                self.send(":{} CAP * NAK :{}".format(SERVER_NAME, params[-1]))
+        elif cmd == "NICK":
+            self.nick = params[0]
+        elif cmd == "USER":
+            self.numeric("001", "Welcome to the replay server")
+            self.numeric("004", SERVER_NAME, "replay", "iow", "bklmnopstv")
+            self.numeric(
+                "005", "PREFIX=(ov)@+", "CHANTYPES=#", "CHANMODES=b,k,l,imnpst", "CASEMAPPING=rfc1459",
+                "are supported by this server"
+            )
+            self.numeric("376", "End of /MOTD command.")
+            self.registered.set()
+        elif cmd == "PING":
+            self.send(":{0} PONG {0} :{1}".format(SERVER_NAME, params[-1]))
+        elif cmd == "JOIN":
+            for chan in params[0].split(','):
+                self.send(":{0}!{0}@replay.test JOIN {1}".format(self.nick, chan))
+                self.numeric("353", "=", chan, "@" + self.nick)
+                self.numeric("366", chan, "End of /NAMES list.")
+        elif cmd in ("PRIVMSG", "NOTICE") and params:
+            self._record_reply(now, params[0])
+
+    def _record_reply(self, now, target):
+        queue = self._pending.get(target.lower())
+        if queue:
+            sent, command = queue.popleft()
+            self.latencies[command].append(now - sent)
+
+    def replay_line(self, line):
+        msg = Message.parse(line)
+        params = msg.parameters
+        if msg.command == "PRIVMSG" and params and msg.prefix is not None:
+            text = params[-1]
+            if text.startswith(self.command_prefix) and len(text) > 1:
+                command = text[1:].split(None, 1)[0].lower()
+                target = params[0] if params[0].startswith('#') else msg.prefix.nick
+                self._pending[target.lower()].append((time.perf_counter(), command))
+
+        self.send(line)
+        self.replayed += 1
+
+    def finish(self):
+        """
+        Count commands which never got a reply
+        """
+        for queue in self._pending.values():
+            for _, command in queue:
+                self.unanswered[command] += 1
+
+            queue.clear()
+
+
+def should_replay(line, nick):
+    msg = Message.parse(line)
+    if msg.command in SKIPPED_COMMANDS:
+        return False
+
+    # The server echoes the bot's own joins and parts as they happen
+    if msg.command in ("JOIN", "PART") and msg.prefix is not None and msg.prefix.nick == nick:
+        return False
+
+    return True
+
+
+async def replay(bot, server, entries, speed=0.0):
+    """
+    Feed log entries to the connected bot
+
+    :param speed: 0 to replay as fast as possible, otherwise a multiple of the original timing
+    """
+    start = time.perf_counter()
+    first_stamp = None
+    for stamp, line in entries:
+        if speed and stamp is not None:
+            if first_stamp is None:
+                first_stamp = stamp
+
+            delay = start + (stamp - first_stamp) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        server.replay_line(line)
+        if not speed:
+            await server.writer.drain()
+            # Let the bot read as it goes, rather than queueing the whole log in the socket
+            await asyncio.sleep(0)
+
+    await server.writer.drain()
+    # Wait for the bot to read everything before checking whether it's idle
+    while bot.conn.lines_in < server.replayed:
+        await asyncio.sleep(0.01)
+
+    await bot.settle(None)
+    return time.perf_counter() - start
+
+
+async def _run(entries, speed, plugins, loop):
+    nick = find_nick(entries)
+    entries = [entry for entry in entries if should_replay(entry[1], nick)]
+    server = FakeIrcServer(nick, loop)
+    await server.start()
+
+    bot = BenchBot(
+        make_config(channels=find_channels(entries, nick), nick=nick, server='127.0.0.1', port=server.port),
+        loop=loop
+    )
+    try:
+        await bot.load_plugins(plugins)
+        await bot.conn.connect(10)
+        await asyncio.wait_for(server.registered.wait(), 10)
+        await bot.settle()
+        bot.conn.lines_in = 0
+        replay_start = len(server.received)
+
+        elapsed = await replay(bot, server, entries, speed)
+        server.finish()
+    finally:
+        bot.conn.quit()
+        await server.stop()
+        await bot.close()
+
+    commands = {}
+    for command in sorted(set(server.latencies) | set(server.unanswered)):
+        latencies = server.latencies.get(command, [])
+        commands[command] = {
+            "replies": len(latencies),
+            "unanswered": server.unanswered.get(command, 0),
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        }
+
+    return {
+        "lines": server.replayed,
+        "seconds": elapsed,
+        "lines_per_sec": server.replayed / elapsed if elapsed else None,
+        "sent": len(server.received) - replay_start,
+        "commands": commands,
+        "transcript": [line for _, line in server.received[replay_start:]],
+        "params": {"speed": speed, "nick": nick, "plugins": list(plugins)},
+    }
+
+
+def run_replay(entries, speed=0.0, plugins=DEFAULT_PLUGINS):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(_run(entries, speed, plugins, loop))
+    finally:
+        loop.close()
+
+
+def diff_transcripts(old, new, old_name="old", new_name="new"):
+    """
+    :return: A unified diff of the bot output recorded in two replay results
+    """
+    return '\n'.join(difflib.unified_diff(
+        old["transcript"], new["transcript"], old_name, new_name, lineterm=''
+    ))
+
+
+def format_report(result):
+    lines = [
+        "Replayed {} lines in {:.2f}s ({:.1f} lines/sec), bot sent {} lines".format(
+            result["lines"], result["seconds"], result["lines_per_sec"] or 0, result["sent"]
+        ),
+        "{:<16} {:>8} {:>10} {:>10} {:>10} {:>10}".format(
+            "command", "replies", "unanswered", "p50 (ms)", "p99 (ms)", "max (ms)"
+        ),
+    ]
+
+    def _ms(value):
+        return '-' if value is None else '{:.1f}'.format(value * 1000)
+
+    for command, stats in sorted(result["commands"].items()):
+        lines.append("{:<16} {:>8} {:>10} {:>10} {:>10} {:>10}".format(
+            command, stats["replies"], stats["unanswered"], _ms(stats["p50"]), _ms(stats["p99"]), _ms(stats["max"])
+        ))
+
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Replay core.log raw logs against the bot")
+    parser.add_argument("log", nargs='?', help="Raw log file to replay")
+    parser.add_argument(
+        "--speed", type=float, default=0,
+        help="Multiple of the logged timing to replay at, 0 (the default) replays as fast as possible"
+    )
+    parser.add_argument("--plugins", help="Comma separated list of non-core plugins to load")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="Diff the output of two saved replays")
+    opts = parser.parse_args(args)
+
+    if opts.diff:
+        old_file, new_file = opts.diff
+        with open(old_file) as f:
+            old = json.load(f)
+
+        with open(new_file) as f:
+            new = json.load(f)
+
+        print(diff_transcripts(old, new, old_file, new_file) or "No differences in bot output")
+        return
+
+    if not opts.log:
+        parser.error("a log file is required unless --diff is used")
+
+    logging.getLogger("cloudbot").setLevel(logging.WARNING)
+    with open(opts.log, encoding='utf-8', errors='replace') as f:
+        entries = parse_raw_log(f)
+
+    plugins = DEFAULT_PLUGINS if opts.plugins is None else tuple(filter(None, opts.plugins.split(',')))
+    result = run_replay(entries, opts.speed, plugins)
+
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            json.dump(result, f, indent=4)
+            f.write('\n')
+
+    if opts.json:
+        print(json.dumps(result, indent=4))
+    else:
+        print(format_report(result))
+
+
+if __name__ == '__main__':
+    main()
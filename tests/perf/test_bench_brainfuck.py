@@ -0,0 +1,15 @@
+from tests.perf.bench_brainfuck import PROGRAMS, format_report, reference_run, run_benchmark
+
+
+def test_benchmark_smoke():
+    results = run_benchmark(repeat=1)
+    assert set(results) == set(PROGRAMS)
+    assert results["hello"]["output"] == "Hello World!\n"
+    for result in results.values():
+        assert result["compiled_steps"] < result["source_steps"]
+
+    assert "hello" in format_report(results)
+
+
+def test_reference_steps():
+    assert reference_run("+++[-]") == ("", 10)
@@ -0,0 +1,9 @@
+from tests.perf.bench_chan_track import format_report, run_benchmark
+
+
+def test_benchmark_smoke():
+    results = run_benchmark(users=200, channels=10, channels_per_user=3)
+    assert results["users"] == 200
+    assert results["memberships"] == 600
+    assert results["memory_mb"] > 0
+    assert "names_ms" in format_report(results)
@@ -0,0 +1,12 @@
+from tests.perf.harness import run_json
+
+
+def test_benchmark_smoke():
+    result = run_json('tests.perf.bench_dispatch', '--lines', 50, '--channels', 2)
+
+    assert result["lines"] >= 50
+    assert result["replies"] > 0
+    assert result["lines_per_sec"] > 0
+    assert result["latency_p50"] <= result["latency_p99"] <= result["latency_max"]
+    assert result["executor_hops"] > 0
+    assert result["params"]["channels"] == 2
@@ -0,0 +1,12 @@
+from tests.perf.harness import run_json
+
+
+def test_benchmark_smoke():
+    result = run_json(
+        'tests.perf.bench_join_burst', '--channels', 3, '--users', 50, '--per-channel', 20, '--whox',
+    )
+
+    assert result["members"] == 3 * 21
+    assert result["who_queries"] == 3
+    assert result["join_ms"] > 0
+    assert result["who_ms"] > 0
@@ -0,0 +1,9 @@
+from tests.perf.harness import run_json
+
+
+def test_benchmark_smoke():
+    result = run_json('tests.perf.bench_netsplit', '--channels', 3, '--users', 100)
+
+    assert result["batches"] > 0
+    assert result["rejoined"] == result["expected"] == 150
+    assert result["split_ms"] > 0
@@ -0,0 +1,8 @@
+from tests.perf.bench_tables import format_report, run_benchmark
+
+
+def test_benchmark_smoke():
+    results = run_benchmark(plugins=4, tables_per_plugin=2)
+    assert set(results) == {"per_table", "batched"}
+    assert all(result["cold_ms"] > 0 for result in results.values())
+    assert "batched" in format_report(results)
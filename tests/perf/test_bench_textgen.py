@@ -0,0 +1,9 @@
+from tests.perf.bench_textgen import format_report, load_data, run_benchmark
+
+
+def test_benchmark_smoke():
+    results = run_benchmark(count=5)
+    assert set(results) == set(load_data())
+    assert "attacks/slap" in results
+    assert all(result["compiled_us"] > 0 for result in results.values())
+    assert "total" in format_report(results)
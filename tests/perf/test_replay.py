@@ -0,0 +1,46 @@
+from tests.perf.harness import run_json
+from tests.perf.replay import diff_transcripts, find_channels, find_nick, parse_raw_log, should_replay
+
+RAW_LOG = """\
+1566497670.000 :irc.example.net 001 cloudbot :Welcome
+1566497670.100 PING :irc.example.net
+1566497671.000 :cloudbot!bot@host JOIN #test
+1566497672.000 :alice!a@host JOIN #test
+1566497672.500 :alice!a@host PRIVMSG #test :hello everyone
+1566497673.000 :alice!a@host PRIVMSG #test :.upper shout
+1566497673.500 :bob!b@host PRIVMSG cloudbot :.lower QUIET
+"""
+
+
+def test_parse_log():
+    entries = parse_raw_log(RAW_LOG.splitlines())
+    nick = find_nick(entries)
+    assert nick == 'cloudbot'
+    assert find_channels(entries, nick) == ['#test']
+
+    replayed = [line for _, line in entries if should_replay(line, nick)]
+    assert replayed == [
+        ':alice!a@host JOIN #test',
+        ':alice!a@host PRIVMSG #test :hello everyone',
+        ':alice!a@host PRIVMSG #test :.upper shout',
+        ':bob!b@host PRIVMSG cloudbot :.lower QUIET',
+    ]
+
+
+def test_diff():
+    old = {"transcript": ["PRIVMSG #a :one", "PRIVMSG #a :two"]}
+    new = {"transcript": ["PRIVMSG #a :one", "PRIVMSG #a :three"]}
+    assert diff_transcripts(old, old) == ''
+    assert diff_transcripts(old, new).splitlines()[-2:] == ['-PRIVMSG #a :two', '+PRIVMSG #a :three']
+
+
+def test_replay_smoke(tmp_path):
+    log_file = tmp_path / 'raw.log'
+    log_file.write_text(RAW_LOG)
+    result = run_json('tests.perf.replay', log_file, '--speed', 20, '--plugins', 'utility')
+
+    assert result["lines"] == 4
+    assert result["commands"]["upper"]["replies"] == 1
+    assert result["commands"]["lower"]["replies"] == 1
+    assert "PRIVMSG #test :(alice) SHOUT" in result["transcript"]
+    assert "PRIVMSG bob quiet" in result["transcript"]
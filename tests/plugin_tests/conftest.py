@@ -3,6 +3,9 @@ from mock import patch
 from responses import RequestsMock
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from cloudbot.util.async_db import AsyncDatabase
 
 
 @pytest.fixture()
@@ -13,7 +16,10 @@ def mock_requests():
 
 class MockDB:
     def __init__(self):
-        self.engine = create_engine('sqlite:///:memory:')
+        # One connection shared between threads, so the async database's worker sees the same in-memory database
+        self.engine = create_engine(
+            'sqlite:///:memory:', poolclass=StaticPool, connect_args={'check_same_thread': False}
+        )
         self.session = scoped_session(sessionmaker(self.engine))
 
     def get_data(self, table):
@@ -30,6 +36,15 @@ def mock_db():
     return MockDB()
 
 
+@pytest.fixture()
+def mock_adb(mock_db):
+    adb = AsyncDatabase(mock_db.engine)
+    try:
+        yield adb
+    finally:
+        adb.close()
+
+
 @pytest.fixture
 def patch_paste():
     with patch('cloudbot.util.web.paste') as mock:
@@ -20,3 +20,24 @@ import pytest
 def test_brainfuck(text, output):
     from plugins.brainfuck import bf
     assert bf(text) == output
+
+
+def test_compile():
+    from plugins.brainfuck import ADD, CLEAR, JUMP_NONZERO, JUMP_ZERO, MOVE, MULTIPLY, OUTPUT, compile_program
+
+    assert compile_program("++-->><") == [(MOVE, 1)]
+    assert compile_program("+[>+[-]<-]") == [
+        (ADD, 1), (JUMP_ZERO, 7), (MOVE, 1), (ADD, 1), (CLEAR, None), (MOVE, -1), (ADD, 255), (JUMP_NONZERO, 1)
+    ]
+    assert compile_program("[-<<+>>>++<]") == [(MULTIPLY, ((-2, 1), (1, 2)))]
+    # The counter doesn't go down by one each time, so it's left as a loop
+    assert compile_program("[-->+<].") == [
+        (JUMP_ZERO, 5), (ADD, 254), (MOVE, 1), (ADD, 1), (MOVE, -1), (JUMP_NONZERO, 0), (OUTPUT, None)
+    ]
+
+
+def test_multiply():
+    from plugins.brainfuck import compile_program, run_program
+
+    # 7 * 3 + 2 * 7 = 35
+    assert run_program(compile_program("+++++++[->+++>++<<]>[->+<]>.")) == ('#', 6, False)
@@ -7,6 +7,8 @@ from cloudbot.util.func_utils import call_with_args
 
 
 class MockConn:
+    connected = True
+
     def __init__(self, bot=None):
         self.name = 'foo'
         self.memory = {
@@ -20,6 +22,9 @@ class MockConn:
         }
         self.nick = 'BotFoo'
         self.bot = bot
+        self.config = {}
+        self.loop = bot.loop if bot else None
+        self.cmd = MagicMock()
 
     def get_statuses(self, chars):
         return [
@@ -120,6 +125,12 @@ def test_channel_members():
     on_quit('foo1', conn)
     assert 'foo1' not in chan.users
 
+    # Members can still be copied between channels like any other mapping
+    other = chans.getchan('#baz')
+    other.users.update(chans['#bar'].users)
+    assert other.users['Nick1'].user is users['nick1']
+    assert other in users['nick1'].chans
+
 
 NAMES_MOCK_TRAFFIC = [
     ':BotFoo!myname@myhost JOIN #foo',
@@ -136,7 +147,7 @@ NAMES_MOCK_TRAFFIC = [
 
 def test_names_handling():
     from plugins.core.server_info import handle_prefixes, handle_chan_modes
-    from plugins.core.chan_track import on_join, on_part, on_kick, on_quit, on_names
+    from plugins.core.chan_track import get_chans, on_join, on_part, on_kick, on_quit, on_names
 
     handlers = {
         'JOIN': on_join,
@@ -182,4 +193,189 @@ def test_names_handling():
         if line.command == 'KICK':
             data['target'] = line.parameters[1]
 
-        call_with_args(handlers[line.command], data)
+        res = call_with_args(handlers[line.command], data)
+        if asyncio.iscoroutine(res):
+            bot.loop.run_until_complete(res)
+
+    chan = get_chans(conn)['#foo']
+    assert set(chan.users) == {'botfoo', 'otheruser', 'personc', 'foobar123'}
+
+    # Once the NAMES reply is done, a WHO is sent to fill in the members' details
+    bot.loop.run_until_complete(asyncio.sleep(0))
+    conn.cmd.assert_called_once_with('WHO', '#foo')
+
+
+def test_user_lifetime():
+    from plugins.core.server_info import handle_prefixes
+    from plugins.core.chan_track import (
+        get_users, get_chans, on_join, on_part, on_quit, on_nick, on_account, perm_check,
+    )
+
+    conn = MockConn()
+    handle_prefixes('(ov)@+', conn.memory['server_info'])
+    users = get_users(conn)
+    chans = get_chans(conn)
+
+    on_join('Nick1', 'user', 'host', conn, ['#foo'])
+    on_join('Nick1', 'user', 'host', conn, ['#bar'])
+    user = users['nick1']
+    assert [chan.name for chan in user.chans] == ['#foo', '#bar']
+
+    chans['#foo'].users['nick1'].add_status(conn.memory['server_info']['statuses']['@'])
+    assert perm_check('#foo', conn, 'NICK1')
+    assert not perm_check('#bar', conn, 'Nick1')
+
+    on_nick('Nick1', ['Nick2'], conn)
+    assert 'nick1' not in chans['#foo'].users
+    assert chans['#foo'].users['nick2'].user is user
+    assert perm_check('#foo', conn, 'Nick2')
+
+    # Users stay tracked until they leave their last channel
+    on_part('#foo', 'Nick2', conn)
+    assert users.get('nick2') is user
+    on_part('#bar', 'Nick2', conn)
+    assert 'nick2' not in users
+
+    # Replies about users who aren't in any tracked channel are ignored
+    on_account(conn, 'Other', ['acct'])
+    assert 'other' not in users
+
+    on_join('Nick3', 'user', 'host', conn, ['#foo'])
+    on_quit('Nick3', conn)
+    assert 'nick3' not in users
+    assert 'nick3' not in chans['#foo'].users
+
+    # The bot leaving a channel drops its members
+    on_join('Nick4', 'user', 'host', conn, ['#foo'])
+    on_part('#foo', conn.nick, conn)
+    assert '#foo' not in chans
+    assert 'nick4' not in users
+
+
+def test_serialize_users():
+    import json
+    from plugins.core.server_info import handle_prefixes
+    from cloudbot.client import Client
+    from plugins.core.chan_track import MappingSerializer, get_users, on_join, on_msg
+
+    class ClientConn(MockConn, Client):
+        pass
+
+    conn = ClientConn()
+    handle_prefixes('(ov)@+', conn.memory['server_info'])
+    conn.cmd = MagicMock()
+    on_join('Nick1', 'user', 'host', conn, ['#foo'])
+    on_msg(conn, 'Nick1', 'user', 'host', [conn.nick, 'hello'])
+
+    text = MappingSerializer().serialize(get_users(conn))
+    data = json.loads(text)
+    user = data['nick1']
+    assert set(user) == {
+        'mask', 'conn', 'realname', '_account', 'server', 'is_away', 'away_message', 'is_oper', 'channels', 'data',
+    }
+    assert user['mask'] == ['Nick1', 'user', 'host']
+    assert set(user['channels']) == {'#foo', 'botfoo'}
+    assert set(user['channels']['#foo']) == {'user', 'channel', 'conn', 'status', 'data'}
+    assert user['channels']['#foo']['status'] == []
+    assert 'last_privmsg' in text
+
+
+def test_who_replies():
+    from plugins.core.server_info import handle_prefixes
+    from plugins.core.chan_track import (
+        WHOX_TOKEN, get_users, get_who_queue, on_join, on_who, on_who_end, on_whox,
+    )
+
+    bot = MagicMock()
+    bot.loop = asyncio.get_event_loop()
+    conn = MockConn(bot)
+    serv_info = conn.memory['server_info']
+    handle_prefixes('(ov)@+', serv_info)
+    serv_info['isupport_tokens'] = {'WHOX': None, 'TARGMAX': 'WHO:2'}
+    on_join('Nick1', 'user', 'host', conn, ['#foo'])
+    on_join('Nick2', 'user', 'host', conn, ['#foo'])
+    users = get_users(conn)
+
+    async def run():
+        await on_who(conn, ['BotFoo', '#foo', 'ident1', 'host1', 'server', 'Nick1', 'G*@', '0 Real Name'])
+        await on_whox(conn, ['BotFoo', WHOX_TOKEN, '#foo', 'ident2', 'host2', 'server', 'Nick2', 'H', 'acct', 'Name'])
+        await on_whox(conn, ['BotFoo', '1', '#foo', 'ident3', 'host3', 'server', 'Nick2', 'H', 'acct', 'Name'])
+        await on_whox(conn, ['BotFoo', WHOX_TOKEN, '#foo', 'ident4', 'host4', 'server', 'Other', 'H', '0', 'Name'])
+
+        # Nothing is applied until the end of the reply
+        assert users['nick1'].host == 'host'
+
+        await on_who_end(conn)
+
+    bot.loop.run_until_complete(run())
+    user1 = users['nick1']
+    assert (user1.ident, user1.host, user1.realname) == ('ident1', 'host1', 'Real Name')
+    assert user1.is_away and user1.is_oper
+    assert user1.account is None
+
+    user2 = users['nick2']
+    assert (user2.ident, user2.host, user2.account) == ('ident2', 'host2', 'acct')
+    assert not user2.is_away and not user2.is_oper
+    assert 'other' not in users
+
+    # Queued channels are sent in groups as large as the server allows
+    queue = get_who_queue(conn)
+    for chan in ('#a', '#b', '#c'):
+        queue.add(chan)
+
+    bot.loop.run_until_complete(asyncio.sleep(0))
+    conn.cmd.assert_called_once_with('WHO', '#a,#b', '%tcuhsnfar,' + WHOX_TOKEN)
+    assert queue.pending == ['#c']
+    queue.cancel()
+
+
+def test_join_quit_batch():
+    from plugins.core.chan_track import get_chans, get_users, on_join, on_join_quit_batch
+    from cloudbot.event import Event
+
+    conn = MockConn()
+    on_join('Nick1', 'user', 'host', conn, ['#foo'])
+    on_join('Nick2', 'user', 'host', conn, ['#foo'])
+
+    def make(command, nick, *params):
+        return Event(irc_command=command, nick=nick, user='ident', host='newhost', irc_paramlist=list(params))
+
+    on_join_quit_batch(conn, [
+        make('QUIT', 'Nick1', 'hub.example.net leaf.example.net'),
+        make('QUIT', 'Nick2', 'hub.example.net leaf.example.net'),
+        make('JOIN', 'Nick1', '#foo'),
+        make('JOIN', 'Nick1', '#bar'),
+        make('QUIT', 'Unknown', 'hub.example.net leaf.example.net'),
+    ])
+
+    users = get_users(conn)
+    chans = get_chans(conn)
+    assert set(users) == {'nick1'}
+    assert users['nick1'].host == 'newhost'
+    assert set(chans['#foo'].users) == {'nick1'}
+    assert set(chans['#bar'].users) == {'nick1'}
+
+
+def test_who_batch():
+    from plugins.core.chan_track import WHOX_TOKEN, get_users, on_join, on_who_batch
+    from cloudbot.event import Event
+
+    bot = MagicMock()
+    bot.loop = asyncio.get_event_loop()
+    conn = MockConn(bot)
+    on_join('Nick1', 'user', 'host', conn, ['#foo'])
+    on_join('Nick2', 'user', 'host', conn, ['#foo'])
+
+    def make(command, *params):
+        return Event(irc_command=command, irc_paramlist=list(params))
+
+    bot.loop.run_until_complete(on_who_batch(conn, [
+        make('352', 'BotFoo', '#foo', 'ident1', 'host1', 'server', 'Nick1', 'G', '0 Real Name'),
+        make('354', 'BotFoo', WHOX_TOKEN, '#foo', 'ident2', 'host2', 'server', 'Nick2', 'H', 'acct', 'Name'),
+        make('315', 'BotFoo', '#foo', 'End of /WHO list'),
+    ]))
+
+    users = get_users(conn)
+    assert (users['nick1'].host, users['nick1'].is_away) == ('host1', True)
+    assert (users['nick2'].host, users['nick2'].account) == ('host2', 'acct')
+    assert 'who_replies' not in conn.memory
@@ -0,0 +1,86 @@
+from mock import MagicMock
+
+
+def make_hook(title, name):
+    _hook = MagicMock()
+    _hook.plugin.title = title
+    _hook.function_name = name
+    return _hook
+
+
+def test_record_stats():
+    from plugins.core import hook_stats
+
+    bot = MagicMock()
+    bot.memory = {}
+    conn = MagicMock()
+    conn.name = 'TestConn'
+    event = MagicMock(conn=conn, chan='#Chan')
+
+    _hook = make_hook('test', 'func')
+    hook_stats.stats_sieve(event, None, bot, _hook, 0.5, 0.1)
+    hook_stats.stats_sieve(event, (None, None, None), bot, _hook, 0.25, None)
+
+    stats = hook_stats.get_stats(bot)
+    counter = stats.global_stats['test.func']
+    assert counter.success == 1
+    assert counter.failure == 1
+    assert counter.latency.count == 2
+    assert counter.queued.count == 1
+
+    assert stats.network['testconn']['test.func'].total == 2
+    chan_counter = stats.channel[('testconn', '#chan')]['test.func']
+    assert chan_counter.latency.count == 2
+    assert chan_counter.queued is None
+
+    headers, table = hook_stats.do_slowest_stats(bot, stats)
+    assert table[0][0] == 'test.func'
+    assert table[0][1] == '2'
+
+    headers, table = hook_stats.do_hook_stats(bot, stats, 'test.func')
+    assert table[0][:4] == ('testconn', '#chan', '1', '1')
+
+
+def test_channel_limit():
+    from plugins.core.hook_stats import HookStats
+
+    stats = HookStats(max_channels=2)
+    for chan in ('#a', '#b', '#a', '#c'):
+        stats.record('test.func', 'net', chan, True, 0.1)
+
+    assert list(stats.channel) == [('net', '#a'), ('net', '#c')]
+
+
+def test_global_snapshot():
+    from plugins.core.hook_stats import HookStats
+
+    stats = HookStats()
+    stats.record('test.a', None, None, True, 0.1)
+    # New hooks recorded while the snapshot is being read don't disturb it
+    for name, _ in stats.global_snapshot():
+        stats.record(name + '.new', None, None, True, 0.1)
+
+    assert sorted(stats.global_stats) == ['test.a', 'test.a.new']
+
+
+def test_merge_state():
+    from plugins.core.hook_stats import HookStats
+
+    first = HookStats()
+    first.record('test.func', 'net1', '#a', True, 0.1, 0.01)
+    second = HookStats()
+    second.record('test.func', 'net2', '#b', False, 0.2)
+    second.record('test.other', 'net2', None, True, 0.3)
+
+    merged = HookStats()
+    merged.merge_state(first.to_state())
+    merged.merge_state(second.to_state())
+
+    counter = merged.global_stats['test.func']
+    assert (counter.success, counter.failure) == (1, 1)
+    assert counter.latency.count == 2
+    assert counter.latency.max == 0.2
+    assert counter.queued.count == 1
+    assert sorted(merged.network) == ['net1', 'net2']
+    assert merged.network['net2']['test.other'].total == 1
+    assert not merged.channel
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from mock import MagicMock
+
+from cloudbot.plugin import PluginManager
+
+
+class MockHook:
+    threaded = False
+    description = 'test:blocking_hook'
+
+    def __init__(self, func):
+        self.function = func
+
+
+def make_bot(loop):
+    bot = MagicMock()
+    bot.loop = loop
+    bot.plugin_manager = PluginManager(bot)
+    conn = MagicMock()
+    conn.connected = True
+    bot.connections = {'test': conn}
+    return bot
+
+
+def test_stall_attribution():
+    from plugins.core.loop_monitor import LoopMonitor
+
+    loop = asyncio.get_event_loop()
+    bot = make_bot(loop)
+    monitor = LoopMonitor(bot, interval=0.01, threshold=0.05, report_interval=0)
+
+    async def blocking_hook():
+        time.sleep(0.3)
+
+    _hook = MockHook(blocking_hook)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        task = asyncio.ensure_future(blocking_hook())
+        bot.plugin_manager.running_hooks[task] = _hook
+        await task
+        del bot.plugin_manager.running_hooks[task]
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    loop.run_until_complete(run())
+
+    assert len(monitor.reports) == 1
+    report = monitor.reports[0]
+    assert report.hooks == [_hook]
+    assert report.duration >= 0.2
+    assert report.location.name == 'blocking_hook'
+    assert report.describe().startswith('Event loop stalled for ')
+    assert 'test:blocking_hook' in report.describe()
+
+    conn = bot.connections['test']
+    conn.admin_log.assert_called_once_with(report.describe(), console=False)
+
+
+def test_report_rate_limit():
+    from plugins.core.loop_monitor import LoopMonitor, StallReport
+
+    bot = make_bot(asyncio.get_event_loop())
+    monitor = LoopMonitor(bot, report_interval=300)
+    for _ in range(3):
+        report = StallReport(time.time(), [], None)
+        report.duration = 1
+        monitor._finish(report)
+
+    assert len(monitor.reports) == 3
+    assert monitor.suppressed == 2
+    bot.connections['test'].admin_log.assert_called_once_with(
+        'Event loop stalled for 1.00s in no running hook', console=False
+    )
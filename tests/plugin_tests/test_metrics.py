@@ -0,0 +1,138 @@
+import asyncio
+
+from mock import MagicMock
+from sqlalchemy import create_engine
+
+
+class MockConn:
+    def __init__(self, name):
+        self.name = name
+        self.connected = True
+        self.lines_in = 10
+        self.lines_out = 5
+        self.pending_events = 2
+        self.memory = {'reconnects': 1, 'lag': 0.25}
+        self.batcher = MagicMock(active=True, batched_lines=120)
+
+
+def make_bot(loop, port=0):
+    bot = MagicMock()
+    bot.loop = loop
+    bot.start_time = 0
+    bot.config = {'metrics': {'enabled': True, 'host': '127.0.0.1', 'port': port}}
+    bot.connections = {'testconn': MockConn('testconn')}
+    bot.db_engine = create_engine('sqlite:///:memory:')
+    bot.plugin_manager.find_plugin.return_value = None
+    plugin = MagicMock()
+    plugin.title = 'test'
+    plugin.load_time = 0.5
+    bot.plugin_manager.plugins = {'test': plugin}
+    return bot
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write("GET {} HTTP/1.0\r\nHost: localhost\r\n\r\n".format(path).encode())
+    data = await reader.read()
+    writer.close()
+    return data.decode()
+
+
+def test_render_metrics():
+    from plugins.core import metrics
+
+    bot = make_bot(asyncio.get_event_loop())
+    text = metrics.render_metrics(bot)
+
+    assert 'cloudbot_connection_lines_received_total{connection="testconn"} 10.0' in text
+    assert 'cloudbot_connection_lines_sent_total{connection="testconn"} 5.0' in text
+    assert 'cloudbot_connection_pending_events{connection="testconn"} 2.0' in text
+    assert 'cloudbot_connection_netsplit_batching{connection="testconn"} 1.0' in text
+    assert 'cloudbot_connection_batched_lines_total{connection="testconn"} 120.0' in text
+    assert 'cloudbot_connection_reconnects_total{connection="testconn"} 1.0' in text
+    assert 'cloudbot_plugin_load_seconds{plugin="test"} 0.5' in text
+    assert '# TYPE cloudbot_db_checkouts_total counter' in text
+
+
+def test_hook_metrics():
+    from plugins.core import hook_stats, metrics
+
+    bot = make_bot(asyncio.get_event_loop())
+    bot.memory = {}
+    stats = hook_stats.get_stats(bot)
+    stats.record('test.func', None, None, True, 0.5, 0.001)
+    stats.record('test.func', None, None, False, 0.5, 0.001)
+
+    plugin = MagicMock()
+    plugin.code = hook_stats
+    bot.plugin_manager.find_plugin.return_value = plugin
+
+    text = metrics.render_metrics(bot)
+
+    assert 'cloudbot_hook_invocations_total{hook="test.func",status="success"} 1.0' in text
+    assert 'cloudbot_hook_invocations_total{hook="test.func",status="failure"} 1.0' in text
+    assert 'cloudbot_hook_duration_seconds_count{hook="test.func"} 2.0' in text
+    assert 'cloudbot_hook_duration_seconds{hook="test.func",quantile="0.5"} 0.5' in text
+
+
+def test_escape_label():
+    from plugins.core.metrics import escape_label
+
+    assert escape_label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+def test_http_endpoint():
+    from plugins.core import metrics
+
+    loop = asyncio.get_event_loop()
+    bot = make_bot(loop)
+
+    async def run():
+        await metrics.start_server(bot)
+        try:
+            port = metrics.server.sockets[0].getsockname()[1]
+            ok = await fetch(port, '/metrics')
+            missing = await fetch(port, '/other')
+        finally:
+            await metrics.stop_server(bot)
+
+        return ok, missing
+
+    ok, missing = loop.run_until_complete(run())
+
+    assert ok.startswith('HTTP/1.0 200 OK\r\n')
+    assert 'Content-Type: text/plain; version=0.0.4' in ok
+    assert 'cloudbot_event_loop_lag_seconds' in ok
+    assert missing.startswith('HTTP/1.0 404 Not Found\r\n')
+    assert metrics.server is None
+
+
+def test_disabled():
+    from plugins.core import metrics
+
+    loop = asyncio.get_event_loop()
+    bot = make_bot(loop)
+    bot.config['metrics']['enabled'] = False
+
+    loop.run_until_complete(metrics.start_server(bot))
+    assert metrics.server is None
+    loop.run_until_complete(metrics.stop_server(bot))
+
+
+def test_db_checked_out():
+    from sqlalchemy.pool import QueuePool
+    from plugins.core import metrics
+
+    metrics.db_stats['checked_out'] = 0
+    # A connection checked out before the listeners were added
+    metrics.on_checkin(None, None)
+    assert metrics.get_checked_out(create_engine('sqlite:///:memory:')) == 0
+
+    engine = create_engine('sqlite:///:memory:', poolclass=QueuePool)
+    conn = engine.connect()
+    try:
+        assert metrics.get_checked_out(engine) == 1
+    finally:
+        conn.close()
+
+    assert metrics.get_checked_out(engine) == 0
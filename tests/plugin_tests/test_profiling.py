@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+from mock import MagicMock
+
+from cloudbot.plugin import PluginManager
+
+
+class MockHook:
+    def __init__(self, func, threaded=True):
+        self.function = func
+        self.threaded = threaded
+        self.description = 'test:' + func.__name__
+
+
+def busy_hook(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler():
+    from plugins.profiling import SamplingProfiler
+
+    bot = MagicMock()
+    manager = PluginManager(bot)
+    stop = threading.Event()
+    _hook = MockHook(busy_hook)
+
+    def worker():
+        manager.hook_threads[threading.get_ident()] = _hook
+        try:
+            busy_hook(stop)
+        finally:
+            del manager.hook_threads[threading.get_ident()]
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    profiler = SamplingProfiler(manager, interval=0.001)
+    try:
+        profiler.run(0.1)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profiler.samples > 0
+    assert profiler.hooks['hook:test:busy_hook'] > 0
+    assert any('busy_hook (test_profiling.py:' in name for name in profiler.total_time)
+
+    for line in profiler.collapsed().splitlines():
+        stack, _, count = line.rpartition(' ')
+        assert int(count) > 0
+        assert stack.startswith(('hook:', 'thread:'))
+
+    summary = profiler.summary()
+    assert summary.startswith('# Sampled {} stacks'.format(profiler.samples))
+    assert 'hook:test:busy_hook' in summary
+
+
+def test_idle_threads_skipped():
+    from plugins.profiling import SamplingProfiler
+
+    manager = PluginManager(MagicMock())
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    profiler = SamplingProfiler(manager)
+    try:
+        time.sleep(0.01)
+        profiler.sample(threading.get_ident())
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profiler.idle >= 1
+    assert not any(thread.name in root for root in profiler.hooks)
+
+
+async def noop():
+    pass
+
+
+def test_profile_hook():
+    from plugins.profiling import profile_hook, format_profile
+
+    def threaded_cmd(text):
+        return text.upper()
+
+    async def async_cmd(text):
+        await asyncio.sleep(0)
+        return text[::-1]
+
+    loop = asyncio.get_event_loop()
+    for func, expected in ((threaded_cmd, 'ABC'), (async_cmd, 'cba')):
+        event = MagicMock()
+        event.__getitem__.side_effect = {'text': 'abc'}.__getitem__
+        event.prepare.side_effect = event.close.side_effect = noop
+        _hook = MockHook(func, threaded=not asyncio.iscoroutinefunction(func))
+
+        profiler, result = loop.run_until_complete(profile_hook(loop, _hook, event))
+
+        assert result == expected
+        assert func.__name__ in format_profile(profiler)
+
+
+def test_cprofile_sieved():
+    from plugins.profiling import cprofile_command
+
+    loop = asyncio.get_event_loop()
+    cmd_hook = MockHook(noop, threaded=False)
+    cmd_hook.doc = None
+    bot = MagicMock()
+    bot.loop = loop
+    bot.plugin_manager.commands = {'test': cmd_hook}
+    sieved = []
+
+    async def resolve_hook(_hook):
+        return _hook
+
+    async def check_launch(_hook, _event):
+        sieved.append((_hook, _event.text))
+        return None
+
+    bot.plugin_manager.resolve_hook = resolve_hook
+    bot.plugin_manager.check_launch = check_launch
+    event = MagicMock(triggered_prefix='.')
+
+    result = loop.run_until_complete(cprofile_command('test some args', bot, event, MagicMock()))
+    assert result == "test was blocked by a sieve, not profiling it"
+    assert sieved == [(cmd_hook, 'some args')]
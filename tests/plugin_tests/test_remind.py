@@ -28,23 +28,17 @@ def setup_db(mock_db):
     remind.table.create(mock_db.engine, checkfirst=True)
 
 
-async def async_call(func, *args):
-    return func(*args)
+async def make_reminder(text, nick, chan, mock_adb, conn, event):
+    return await remind.remind(text, nick, chan, mock_adb, conn, event)
 
 
-async def make_reminder(text, nick, chan, mock_db, conn, event):
-    return await remind.remind(
-        text, nick, chan, mock_db.session(), conn, event, async_call
-    )
-
-
-async def test_invalid_reminder(mock_db, freeze_time, refresh_mods, setup_db):
+async def test_invalid_reminder(mock_db, mock_adb, freeze_time, refresh_mods, setup_db):
     mock_conn = MagicMock()
     mock_conn.name = "test"
     mock_event = MagicMock()
 
     result = await make_reminder(
-        "1 day some reminder", "user", "#chan", mock_db, mock_conn, mock_event
+        "1 day some reminder", "user", "#chan", mock_adb, mock_conn, mock_event
     )
 
     mock_event.notice_doc.assert_called()
@@ -54,13 +48,13 @@ async def test_invalid_reminder(mock_db, freeze_time, refresh_mods, setup_db):
     assert mock_db.get_data(remind.table) == []
 
 
-async def test_invalid_reminder_time(mock_db, freeze_time, refresh_mods, setup_db):
+async def test_invalid_reminder_time(mock_db, mock_adb, freeze_time, refresh_mods, setup_db):
     mock_conn = MagicMock()
     mock_conn.name = "test"
     mock_event = MagicMock()
 
     result = await make_reminder(
-        "0 days: some reminder", "user", "#chan", mock_db, mock_conn, mock_event
+        "0 days: some reminder", "user", "#chan", mock_adb, mock_conn, mock_event
     )
 
     assert result == 'Invalid input.'
@@ -68,13 +62,13 @@ async def test_invalid_reminder_time(mock_db, freeze_time, refresh_mods, setup_d
     assert mock_db.get_data(remind.table) == []
 
 
-async def test_invalid_reminder_overtime(mock_db, freeze_time, refresh_mods, setup_db):
+async def test_invalid_reminder_overtime(mock_db, mock_adb, freeze_time, refresh_mods, setup_db):
     mock_conn = MagicMock()
     mock_conn.name = "test"
     mock_event = MagicMock()
 
     result = await make_reminder(
-        "6 weeks: some reminder", "user", "#chan", mock_db, mock_conn, mock_event
+        "6 weeks: some reminder", "user", "#chan", mock_adb, mock_conn, mock_event
     )
 
     expected = (
@@ -86,7 +80,7 @@ async def test_invalid_reminder_overtime(mock_db, freeze_time, refresh_mods, set
     assert mock_db.get_data(remind.table) == []
 
 
-async def test_add_reminder(mock_db, freeze_time, refresh_mods, setup_db):
+async def test_add_reminder(mock_db, mock_adb, freeze_time, refresh_mods, setup_db):
     mock_conn = MagicMock()
     mock_conn.name = "test"
     mock_event = MagicMock()
@@ -97,7 +91,7 @@ async def test_add_reminder(mock_db, freeze_time, refresh_mods, setup_db):
         "2 hours, 30 minutes: some reminder",
         "user",
         "#chan",
-        mock_db,
+        mock_adb,
         mock_conn,
         mock_event,
     )
@@ -113,7 +107,7 @@ async def test_add_reminder(mock_db, freeze_time, refresh_mods, setup_db):
     ]
 
 
-async def test_add_reminder_fail_count(mock_db, freeze_time, refresh_mods, setup_db):
+async def test_add_reminder_fail_count(mock_db, mock_adb, freeze_time, refresh_mods, setup_db):
     mock_conn = MagicMock()
     mock_conn.name = "test"
     mock_event = MagicMock()
@@ -144,13 +138,13 @@ async def test_add_reminder_fail_count(mock_db, freeze_time, refresh_mods, setup
             remind_time=row[5],
         )
 
-    await remind.load_cache(async_call, mock_db.session())
+    await remind.load_cache(mock_adb)
 
     result = await make_reminder(
         "2 hours, 30 minutes: some reminder",
         "user",
         "#chan",
-        mock_db,
+        mock_adb,
         mock_conn,
         mock_event,
     )
@@ -189,7 +183,7 @@ class TestCheckReminders:
     def remind_time(self):
         return (self.now - (5 * minute)) - self.delay
 
-    async def check_reminders(self, mock_db, bot):
+    async def check_reminders(self, mock_db, mock_adb, bot):
         mock_db.add_row(
             remind.table,
             network='test',
@@ -199,17 +193,17 @@ class TestCheckReminders:
             message='a reminder',
             remind_time=self.remind_time,
         )
-        await remind.load_cache(async_call, mock_db.session())
-        await remind.check_reminders(bot, async_call, mock_db.session())
+        await remind.load_cache(mock_adb)
+        await remind.check_reminders(bot, mock_adb)
 
-    async def test_no_conn(self, mock_db, setup_db, refresh_mods, freeze_time):
+    async def test_no_conn(self, mock_db, mock_adb, setup_db, refresh_mods, freeze_time):
         bot = MockBot({})
         bot.connections = {}
         mock_conn = MagicMock()
         mock_conn.name = "test"
         mock_conn.ready = True
 
-        await self.check_reminders(mock_db, bot)
+        await self.check_reminders(mock_db, mock_adb, bot)
 
         assert mock_conn.message.mock_calls == []
 
@@ -217,14 +211,14 @@ class TestCheckReminders:
             ('test', 'user', self.set_time, '#chan', 'a reminder', self.remind_time)
         ]
 
-    async def test_conn_not_ready(self, mock_db, setup_db, refresh_mods, freeze_time):
+    async def test_conn_not_ready(self, mock_db, mock_adb, setup_db, refresh_mods, freeze_time):
         bot = MockBot({})
         mock_conn = MagicMock()
         mock_conn.name = "test"
         mock_conn.ready = False
         bot.connections = {mock_conn.name: mock_conn}
 
-        await self.check_reminders(mock_db, bot)
+        await self.check_reminders(mock_db, mock_adb, bot)
 
         assert mock_conn.message.mock_calls == []
 
@@ -232,7 +226,7 @@ class TestCheckReminders:
             ('test', 'user', self.set_time, '#chan', 'a reminder', self.remind_time)
         ]
 
-    async def test_late(self, mock_db, setup_db, refresh_mods, freeze_time):
+    async def test_late(self, mock_db, mock_adb, setup_db, refresh_mods, freeze_time):
         bot = MockBot({})
         mock_conn = MagicMock()
         mock_conn.name = "test"
@@ -240,7 +234,7 @@ class TestCheckReminders:
         bot.connections = {mock_conn.name: mock_conn}
 
         with self.set_delay(40 * minute):
-            await self.check_reminders(mock_db, bot)
+            await self.check_reminders(mock_db, mock_adb, bot)
 
         assert mock_conn.message.mock_calls == [
             call('user', 'user, you have a reminder from \x0260 minutes\x0f ago!'),
@@ -254,14 +248,14 @@ class TestCheckReminders:
 
         assert mock_db.get_data(remind.table) == []
 
-    async def test_normal(self, mock_db, setup_db, refresh_mods, freeze_time):
+    async def test_normal(self, mock_db, mock_adb, setup_db, refresh_mods, freeze_time):
         bot = MockBot({})
         mock_conn = MagicMock()
         mock_conn.name = "test"
         mock_conn.ready = True
         bot.connections = {mock_conn.name: mock_conn}
 
-        await self.check_reminders(mock_db, bot)
+        await self.check_reminders(mock_db, mock_adb, bot)
 
         assert mock_conn.message.mock_calls == [
             call('user', 'user, you have a reminder from \x0260 minutes\x0f ago!'),
@@ -271,7 +265,7 @@ class TestCheckReminders:
         assert mock_db.get_data(remind.table) == []
 
 
-async def test_clear_reminders(mock_db, setup_db, refresh_mods):
+async def test_clear_reminders(mock_db, mock_adb, setup_db, refresh_mods):
     now = datetime.datetime.now()
 
     mock_db.add_row(
@@ -286,7 +280,7 @@ async def test_clear_reminders(mock_db, setup_db, refresh_mods):
 
     assert len(mock_db.get_data(remind.table)) == 1
 
-    await remind.load_cache(async_call, mock_db.session())
+    await remind.load_cache(mock_adb)
 
     mock_conn = MagicMock()
     mock_conn.name = "test"
@@ -294,7 +288,7 @@ async def test_clear_reminders(mock_db, setup_db, refresh_mods):
     mock_event = MagicMock()
 
     result = await remind.remind(
-        "clear", "user", "#chan", mock_db.session(), mock_conn, mock_event, async_call
+        "clear", "user", "#chan", mock_adb, mock_conn, mock_event
     )
 
     assert result == 'Deleted all (1) reminders for user!'
@@ -302,11 +296,11 @@ async def test_clear_reminders(mock_db, setup_db, refresh_mods):
     assert mock_db.get_data(remind.table) == []
 
 
-async def test_clear_reminders_empty(mock_db, refresh_mods):
+async def test_clear_reminders_empty(mock_db, mock_adb, refresh_mods):
     remind.table.create(mock_db.engine, checkfirst=True)
     assert mock_db.get_data(remind.table) == []
 
-    await remind.load_cache(async_call, mock_db.session())
+    await remind.load_cache(mock_adb)
 
     mock_conn = MagicMock()
     mock_conn.name = "test"
@@ -314,7 +308,7 @@ async def test_clear_reminders_empty(mock_db, refresh_mods):
     mock_event = MagicMock()
 
     result = await remind.remind(
-        "clear", "user", "#chan", mock_db.session(), mock_conn, mock_event, async_call
+        "clear", "user", "#chan", mock_adb, mock_conn, mock_event
     )
 
     assert result == 'You have no reminders to delete.'
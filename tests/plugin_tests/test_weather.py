@@ -220,7 +220,7 @@ def test_find_location(mock_requests, patch_try_shorten, mock_db):
     assert wrap_result(weather.weather, cmd_event) == [(
         'notice', ('foobar', '.we - foobar'), {}
     )]
-    weather.location_cache.append(('foobar', 'test location'))
+    weather.location_cache.cache_row({'nick': 'foobar', 'loc': 'test location'})
 
     mock_requests.add(
         mock_requests.GET,
@@ -318,7 +318,7 @@ def test_find_location(mock_requests, patch_try_shorten, mock_db):
     assert data is not None
     assert err is None
 
-    assert weather.location_cache == [(cmd_event.nick, cmd_event.text)]
+    assert weather.location_cache.items() == [(cmd_event.nick, {'nick': cmd_event.nick, 'loc': cmd_event.text})]
 
     db_data = mock_db.session().execute(weather.table.select()).fetchall()
     assert len(db_data) == 1
@@ -15,3 +15,5 @@ class MockBot:
 
         self.loop = loop
         self.config = MockConfig(self, config)
+        self.shard = None
+        self.adb = None